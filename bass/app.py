@@ -9,6 +9,9 @@ import os
 import sys
 import json
 import uuid
+import base64
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from flask import Flask, jsonify, render_template, request
@@ -22,6 +25,7 @@ from services.bass.filters import BassFilters
 from services.bass.phase import PhaseAlignment
 from services.bass.testtones import TestToneGenerator
 from services.bass.database import BassDatabase
+from services.bass.spl import SPLMeter, decode_pcm, validate_weighting
 
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
@@ -33,6 +37,10 @@ phase_align = PhaseAlignment()
 tone_gen = TestToneGenerator()
 db = BassDatabase()
 
+spl_sessions = {}
+spl_sessions_lock = threading.Lock()
+SPL_SESSION_TTL_SECONDS = float(os.getenv('BASS_SPL_SESSION_TTL', '600'))
+
 current_session = {
     'subwoofers': [],
     'subsonic_filter': None,
@@ -171,6 +179,39 @@ def api_subwoofer_optimize_dual_placement():
         return jsonify({'ok': False, 'error': str(e)}), 400
 
 
+@app.route('/api/subwoofer/optimize-placement', methods=['POST'])
+def api_subwoofer_optimize_placement():
+    """Search cabin grid for the best 1-4 subwoofer layouts."""
+    try:
+        data = request.json or {}
+        
+        options = {}
+        for key in ('grid_spacing', 'sub_height', 'max_delay_ms'):
+            if key in data:
+                options[key] = float(data[key])
+        for key in ('top_n', 'beam_width', 'workers', 'frequency_points'):
+            if key in data:
+                options[key] = int(data[key])
+        if 'freq_range' in data:
+            options['freq_range'] = tuple(float(f) for f in data['freq_range'])
+        if 'candidate_positions' in data:
+            options['candidate_positions'] = data['candidate_positions']
+        
+        optimization = sub_controller.optimize_sub_placement(
+            room_dimensions=data.get('room_dimensions'),
+            seats=data.get('seats'),
+            sub_counts=data.get('sub_counts', [2]),
+            **options
+        )
+        
+        return jsonify({
+            'ok': True,
+            'placement_optimization': optimization
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
 @app.route('/api/subwoofer/group-output', methods=['POST'])
 def api_subwoofer_group_output():
     """Calculate combined output of multiple subwoofers."""
@@ -414,6 +455,33 @@ def api_phase_optimize():
         return jsonify({'ok': False, 'error': str(e)}), 400
 
 
+@app.route('/api/phase/search-alignment', methods=['POST'])
+def api_phase_search_alignment():
+    """Search delay and polarity from the summed sub/main response."""
+    try:
+        data = request.json or {}
+        
+        subwoofer_config = data.get('subwoofer_config', {})
+        if 'lowpass' not in subwoofer_config and current_session.get('lowpass_crossover'):
+            subwoofer_config['lowpass'] = current_session['lowpass_crossover']
+        if 'subsonic' not in subwoofer_config and current_session.get('subsonic_filter'):
+            subwoofer_config['subsonic'] = current_session['subsonic_filter']
+        main_speaker_config = data.get('main_speaker_config', {})
+        delay_range_ms = tuple(data.get('delay_range_ms', [-10, 10]))
+        step_ms = data.get('step_ms', 0.05)
+        
+        alignment = phase_align.search_optimal_alignment(
+            subwoofer_config, main_speaker_config, delay_range_ms, step_ms
+        )
+        
+        return jsonify({
+            'ok': True,
+            'alignment': alignment
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
 @app.route('/api/phase/visualize', methods=['POST'])
 def api_phase_visualize():
     """Create phase response visualization."""
@@ -606,7 +674,7 @@ def api_spl_test_tones():
 
 @app.route('/api/spl/measure', methods=['POST'])
 def api_spl_measure():
-    """Simulate SPL measurement."""
+    """Measure SPL from a recorded PCM buffer, or simulate when none is given."""
     try:
         data = request.json or {}
         
@@ -614,7 +682,30 @@ def api_spl_measure():
         subwoofer_level = data.get('subwoofer_level', 75.0)
         room_acoustics = data.get('room_acoustics', 'average')
         
-        measurement = tone_gen.simulate_spl_measurement(frequency_hz, subwoofer_level, room_acoustics)
+        weighting = validate_weighting(data.get('weighting', 'C'))
+        
+        if data.get('pcm_base64'):
+            meter = SPLMeter(
+                sample_rate=int(data.get('sample_rate', 48000)),
+                reference_spl_db=float(data.get('reference_spl_db', 120.0))
+            )
+            meter.process(decode_pcm(
+                base64.b64decode(data['pcm_base64']),
+                data.get('sample_format', 's16le'),
+                int(data.get('channels', 1))
+            ))
+            levels = meter.close()
+            measurement = {
+                'frequency_hz': frequency_hz,
+                'measured_spl_db': levels[f'l{weighting.lower()}eq_db'],
+                'weighting': weighting,
+                'room_acoustics': room_acoustics,
+                'source': 'recorded',
+                'levels': levels
+            }
+        else:
+            measurement = tone_gen.simulate_spl_measurement(frequency_hz, subwoofer_level,
+                                                            room_acoustics)
         
         measurement_id = f"spl_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
@@ -636,6 +727,134 @@ def api_spl_measure():
         return jsonify({'ok': False, 'error': str(e)}), 400
 
 
+def expire_spl_sessions():
+    """Close sessions that have received no PCM for SPL_SESSION_TTL_SECONDS."""
+    now = time.time()
+    with spl_sessions_lock:
+        expired = [
+            session_id for session_id, meter in spl_sessions.items()
+            if now - meter.last_activity > SPL_SESSION_TTL_SECONDS
+        ]
+        meters = [spl_sessions.pop(session_id) for session_id in expired]
+    
+    for meter in meters:
+        try:
+            meter.close()
+        except Exception as e:
+            print(f"SPL session expiry error: {e}")
+    return len(meters)
+
+
+@app.route('/api/spl/session/start', methods=['POST'])
+def api_spl_session_start():
+    """Start a streaming SPL meter session."""
+    try:
+        expire_spl_sessions()
+        data = request.json or {}
+        session_id = data.get('session_id') or (
+            f"splsess_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        )
+        
+        meter = SPLMeter(
+            sample_rate=int(data.get('sample_rate', 48000)),
+            reference_spl_db=float(data.get('reference_spl_db', 120.0)),
+            summary_seconds=float(data.get('summary_seconds', 1.0)),
+            batch_size=int(data.get('batch_size', 60)),
+            sink=db.save_spl_summaries,
+            session_id=session_id,
+            sample_format=data.get('sample_format', 's16le'),
+            channels=int(data.get('channels', 1))
+        )
+        
+        with spl_sessions_lock:
+            if session_id in spl_sessions:
+                return jsonify({'ok': False, 'error': 'Session already active'}), 400
+            spl_sessions[session_id] = meter
+        
+        return jsonify({
+            'ok': True,
+            'session_id': session_id,
+            'frame_size': meter.frame_size,
+            'instructions': f'POST raw {meter.sample_format} PCM to '
+                            f'/api/spl/session/{session_id}/ingest'
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/spl/session/<session_id>/ingest', methods=['POST'])
+def api_spl_session_ingest(session_id):
+    """Feed a PCM chunk (raw request body) into an SPL session."""
+    try:
+        expire_spl_sessions()
+        with spl_sessions_lock:
+            meter = spl_sessions.get(session_id)
+        if meter is None:
+            return jsonify({'ok': False, 'error': 'Session not found'}), 404
+        
+        try:
+            frames = meter.process_pcm(request.get_data())
+        except RuntimeError:
+            # Stopped or expired while this chunk was arriving
+            return jsonify({'ok': False, 'error': 'Session not found'}), 404
+        snapshot = meter.snapshot()
+        
+        return jsonify({
+            'ok': True,
+            'frames_completed': frames,
+            'duration_seconds': snapshot['duration_seconds'],
+            'laeq_db': snapshot['laeq_db'],
+            'lceq_db': snapshot['lceq_db'],
+            'lcpeak_db': snapshot['lcpeak_db']
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/spl/session/<session_id>')
+def api_spl_session_status(session_id):
+    """Get running levels for an active session or stored summaries."""
+    try:
+        expire_spl_sessions()
+        meter = spl_sessions.get(session_id)
+        
+        return jsonify({
+            'ok': True,
+            'active': meter is not None,
+            'levels': meter.snapshot() if meter else None,
+            'summaries': db.get_spl_summaries(session_id, int(request.args.get('limit', 3600)))
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/spl/session/<session_id>/stop', methods=['POST'])
+def api_spl_session_stop(session_id):
+    """Stop an SPL session, flush summaries and record the result."""
+    try:
+        with spl_sessions_lock:
+            meter = spl_sessions.pop(session_id, None)
+        if meter is None:
+            return jsonify({'ok': False, 'error': 'Session not found'}), 404
+        
+        levels = meter.close()
+        
+        db.save_measurement(
+            measurement_id=session_id,
+            measurement_type='spl_session',
+            measurement_data=levels,
+            spl_db=levels['lceq_db']
+        )
+        
+        return jsonify({
+            'ok': True,
+            'session_id': session_id,
+            'levels': levels
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
 @app.route('/api/config/current')
 def api_config_current():
     """Get current session configuration."""
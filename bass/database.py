@@ -94,6 +94,26 @@ class BassDatabase:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bass_spl_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                window_index INTEGER NOT NULL,
+                offset_seconds REAL NOT NULL,
+                duration_seconds REAL NOT NULL,
+                laeq_db REAL,
+                lceq_db REAL,
+                lzeq_db REAL,
+                lafmax_db REAL,
+                lcfmax_db REAL,
+                lzfmax_db REAL,
+                lcpeak_db REAL,
+                lzpeak_db REAL,
+                third_octave_db TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_bass_config_name 
             ON bass_configurations(config_name)
@@ -109,6 +129,11 @@ class BassDatabase:
             ON bass_calibration_sessions(start_time)
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bass_spl_session 
+            ON bass_spl_summaries(session_id, window_index)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -392,6 +417,71 @@ class BassDatabase:
             'created_at': row['created_at']
         } for row in rows]
     
+    def save_spl_summaries(self, rows: List[dict]) -> int:
+        """Save a batch of SPL summary rows in one transaction."""
+        if not rows:
+            return 0
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO bass_spl_summaries 
+            (session_id, window_index, offset_seconds, duration_seconds, laeq_db,
+             lceq_db, lzeq_db, lafmax_db, lcfmax_db, lzfmax_db, lcpeak_db, lzpeak_db,
+             third_octave_db)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            row['session_id'],
+            row['window_index'],
+            row['offset_seconds'],
+            row['duration_seconds'],
+            row.get('laeq_db'),
+            row.get('lceq_db'),
+            row.get('lzeq_db'),
+            row.get('lafmax_db'),
+            row.get('lcfmax_db'),
+            row.get('lzfmax_db'),
+            row.get('lcpeak_db'),
+            row.get('lzpeak_db'),
+            json.dumps(row.get('third_octave_db', {}))
+        ) for row in rows])
+        
+        conn.commit()
+        conn.close()
+        
+        return len(rows)
+    
+    def get_spl_summaries(self, session_id: str, limit: int = 3600) -> List[dict]:
+        """Get SPL summary rows for a session in time order."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT * FROM bass_spl_summaries 
+            WHERE session_id = ? 
+            ORDER BY window_index 
+            LIMIT ?
+        ''', (session_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'window_index': row['window_index'],
+            'offset_seconds': row['offset_seconds'],
+            'duration_seconds': row['duration_seconds'],
+            'laeq_db': row['laeq_db'],
+            'lceq_db': row['lceq_db'],
+            'lzeq_db': row['lzeq_db'],
+            'lafmax_db': row['lafmax_db'],
+            'lcfmax_db': row['lcfmax_db'],
+            'lzfmax_db': row['lzfmax_db'],
+            'lcpeak_db': row['lcpeak_db'],
+            'lzpeak_db': row['lzpeak_db'],
+            'third_octave_db': json.loads(row['third_octave_db']) if row['third_octave_db'] else {}
+        } for row in rows]
+    
     def start_calibration_session(self, session_id: str, vehicle_info: Optional[dict] = None) -> int:
         """Start new calibration session."""
         conn = self._get_connection()
@@ -4,8 +4,11 @@ Phase Alignment Module
 Phase control and alignment tools for subwoofer integration
 """
 
-import math
-from typing import Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from services.bass.transfer import TransferFunctionEngine
 
 
 class PhaseAlignment:
@@ -14,6 +17,7 @@ class PhaseAlignment:
     def __init__(self):
         """Initialize phase alignment tools."""
         self.speed_of_sound_ms = 343.0
+        self.engine = TransferFunctionEngine()
         
     def set_phase(self, phase_degrees: float, fine_adjust: bool = False) -> dict:
         """
@@ -82,9 +86,13 @@ class PhaseAlignment:
         """
         Simulate phase meter measurement at crossover region.
         
+        Phase is taken from the complex responses of the sub and main
+        chains (crossover filters, subsonic, boost, delay and polarity).
+        
         Args:
-            subwoofer_config: Subwoofer settings with delay and phase
-            main_speaker_config: Main speaker settings with delay
+            subwoofer_config: Subwoofer settings with delay, phase and optional
+                              'lowpass', 'subsonic', 'boost' filter configs
+            main_speaker_config: Main speaker settings with delay and optional 'highpass'
             test_frequencies: List of test frequencies (default: crossover region)
             
         Returns:
@@ -93,31 +101,29 @@ class PhaseAlignment:
         if test_frequencies is None:
             test_frequencies = [40, 50, 63, 80, 100, 125, 160, 200]
         
-        sub_delay = subwoofer_config.get('delay_ms', 0)
-        sub_phase = subwoofer_config.get('phase_degrees', 0)
-        main_delay = main_speaker_config.get('delay_ms', 0)
+        freqs = np.asarray(test_frequencies, dtype=float)
+        responses = self.engine.system_response(subwoofer_config, main_speaker_config, freqs)
+        
+        sub_phase = np.degrees(np.angle(responses['sub'])) % 360
+        main_phase = np.degrees(np.angle(responses['main'])) % 360
+        phase_diff = (sub_phase - main_phase) % 360
+        phase_diff = np.where(phase_diff > 180, phase_diff - 360, phase_diff)
+        coherence = np.maximum(0.0, np.cos(np.radians(phase_diff)))
+        summed_db = 20 * np.log10(np.maximum(np.abs(responses['sum']), 1e-9))
         
         measurements = []
-        for freq in test_frequencies:
-            sub_phase_total = self._calculate_total_phase(freq, sub_delay, sub_phase)
-            main_phase_total = self._calculate_total_phase(freq, main_delay, 0)
-            
-            phase_difference = (sub_phase_total - main_phase_total) % 360
-            if phase_difference > 180:
-                phase_difference -= 360
-            
-            coherence = self._calculate_coherence(phase_difference)
-            
+        for i, freq in enumerate(test_frequencies):
             measurements.append({
                 'frequency_hz': freq,
-                'subwoofer_phase': round(sub_phase_total, 1),
-                'main_speaker_phase': round(main_phase_total, 1),
-                'phase_difference': round(phase_difference, 1),
-                'coherence': round(coherence, 2),
-                'status': self._phase_status(phase_difference)
+                'subwoofer_phase': round(float(sub_phase[i]), 1),
+                'main_speaker_phase': round(float(main_phase[i]), 1),
+                'phase_difference': round(float(phase_diff[i]), 1),
+                'coherence': round(float(coherence[i]), 2),
+                'summed_level_db': round(float(summed_db[i]), 2),
+                'status': self._phase_status(float(phase_diff[i]))
             })
         
-        overall_coherence = sum(m['coherence'] for m in measurements) / len(measurements)
+        overall_coherence = float(coherence.mean())
         
         return {
             'measurements': measurements,
@@ -126,6 +132,32 @@ class PhaseAlignment:
             'recommendations': self._phase_response_recommendations(measurements)
         }
     
+    def search_optimal_alignment(self, subwoofer_config: dict, main_speaker_config: dict,
+                                 delay_range_ms: Tuple[float, float] = (-10.0, 10.0),
+                                 step_ms: float = 0.05) -> dict:
+        """
+        Search sub delay and polarity from the summed transfer function.
+        
+        Args:
+            subwoofer_config: Subwoofer filters and crossover_frequency
+            main_speaker_config: Main speaker filters
+            delay_range_ms: Relative delay search range (negative delays the mains)
+            step_ms: Search resolution
+            
+        Returns:
+            Best delay/polarity and the score curve for both polarities
+        """
+        result = self.engine.search_alignment(
+            subwoofer_config, main_speaker_config, delay_range_ms, step_ms
+        )
+        
+        aligned_sub = dict(subwoofer_config, phase_degrees=result['phase_degrees'],
+                           delay_ms=max(result['delay_ms'], 0))
+        aligned_main = dict(main_speaker_config, delay_ms=max(-result['delay_ms'], 0))
+        result['verification'] = self.measure_phase_response(aligned_sub, aligned_main)
+        
+        return result
+    
     def optimize_phase_and_delay(self, subwoofer_distance: float, main_speaker_distance: float,
                                 unit: str = 'inches', crossover_frequency: float = 80) -> dict:
         """
@@ -223,33 +255,47 @@ class PhaseAlignment:
             ]
         }
     
-    def calculate_group_delay(self, filter_configs: List[dict]) -> dict:
+    def calculate_group_delay(self, filter_configs: List[dict],
+                              reference_frequency: Optional[float] = None) -> dict:
         """
         Calculate group delay from filter configurations.
         
         Args:
             filter_configs: List of filter configs (crossover, subsonic, etc.)
+            reference_frequency: Frequency to report (default: crossover frequency)
             
         Returns:
-            Group delay analysis
+            Group delay analysis (zero delay when no filter can be modeled;
+            unsupported filter types are listed and otherwise ignored)
         """
-        total_group_delay = 0
+        supported = [f for f in filter_configs if f and self.engine.supports(f)]
+        ignored = [f.get('type') for f in filter_configs if f and not self.engine.supports(f)]
         
-        for filt in filter_configs:
-            filter_type = filt.get('type', '')
-            frequency = filt.get('frequency_hz', 80)
-            slope = filt.get('slope_db_per_octave', 24)
-            
-            order = slope // 6
-            
-            delay_at_fc = order / (2 * math.pi * frequency) * 1000
-            
-            total_group_delay += delay_at_fc
+        freqs = self.engine.frequency_grid()
+        response = self.engine.chain_response(supported, freqs)
+        group_delay = self.engine.group_delay_ms(response, freqs)
+        
+        if reference_frequency is None:
+            lowpass = [f for f in supported if f.get('type') == 'lowpass_crossover']
+            source = lowpass[0] if lowpass else (supported[0] if supported else {})
+            reference_frequency = source.get('frequency_hz', 80)
+        
+        total_group_delay = float(np.interp(np.log(reference_frequency), np.log(freqs),
+                                            group_delay))
+        peak_index = int(np.argmax(group_delay))
         
         return {
             'total_group_delay_ms': round(total_group_delay, 3),
+            'reference_frequency_hz': reference_frequency,
             'equivalent_distance_inches': round(total_group_delay * 13.5, 2),
-            'filter_count': len(filter_configs),
+            'peak_group_delay_ms': round(float(group_delay[peak_index]), 3),
+            'peak_frequency_hz': round(float(freqs[peak_index]), 1),
+            'filter_count': len(supported),
+            'ignored_filters': ignored,
+            'curve': {
+                'frequencies_hz': np.round(freqs, 2).tolist(),
+                'group_delay_ms': np.round(group_delay, 3).tolist()
+            },
             'recommendation': 'Use delay adjustment to compensate' if total_group_delay > 1 else 'Minimal group delay'
         }
     
@@ -258,19 +304,6 @@ class PhaseAlignment:
         period_ms = 1000.0 / frequency_hz
         return (phase_degrees / 360.0) * period_ms
     
-    def _calculate_total_phase(self, frequency: float, delay_ms: float, base_phase: float) -> float:
-        """Calculate total phase including delay and base phase."""
-        period_ms = 1000.0 / frequency
-        delay_phase = (delay_ms / period_ms * 360.0) % 360
-        total_phase = (base_phase + delay_phase) % 360
-        return total_phase
-    
-    def _calculate_coherence(self, phase_difference: float) -> float:
-        """Calculate coherence from phase difference (0-1 scale)."""
-        abs_diff = abs(phase_difference)
-        coherence = math.cos(math.radians(abs_diff))
-        return max(0, coherence)
-    
     def _phase_status(self, phase_diff: float) -> str:
         """Determine phase alignment status."""
         abs_diff = abs(phase_diff)
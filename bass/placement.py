@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Subwoofer Placement Optimizer
+Modal search for 1-4 subwoofer layouts over a cabin grid
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.soundstage.acoustic_engine import AcousticModelEngine
+
+
+# Transfer matrix shared with pool workers (set by _init_worker)
+_WORKER_TRANSFER = None
+
+
+def _init_worker(transfer: np.ndarray):
+    """Process pool initializer: keep the transfer matrix resident per worker."""
+    global _WORKER_TRANSFER
+    _WORKER_TRANSFER = transfer
+
+
+def _seat_variance(summed: np.ndarray) -> np.ndarray:
+    """
+    Mean (over frequency) of seat-to-seat variance of the dB response.
+
+    Args:
+        summed: (..., R, F) complex pressure at every seat point
+
+    Returns:
+        (...) variance score in dB^2, lower is better
+    """
+    power = summed.real ** 2 + summed.imag ** 2
+    level_db = 10.0 * np.log10(np.maximum(power, 1e-18))
+    return np.var(level_db, axis=-2).mean(axis=-1)
+
+
+def _score_layouts(transfer: np.ndarray, layouts: np.ndarray,
+                   chunk_size: int = 1024) -> np.ndarray:
+    """Score equal-drive layouts (N, k) of candidate indices in chunks."""
+    scores = np.empty(len(layouts))
+    for start in range(0, len(layouts), chunk_size):
+        chunk = layouts[start:start + chunk_size]
+        summed = transfer[chunk].sum(axis=1)
+        scores[start:start + chunk_size] = _seat_variance(summed)
+    return scores
+
+
+def _score_chunk_worker(layouts: np.ndarray) -> np.ndarray:
+    return _score_layouts(_WORKER_TRANSFER, layouts)
+
+
+class SubPlacementOptimizer:
+    """
+    Search candidate subwoofer positions for the flattest seat-to-seat bass.
+
+    The cabin is modeled as a rigid rectangular enclosure; the modal
+    transfer from every candidate position to every seat point is built
+    once per search, after which layouts are scored with array ops.
+    Pairs are searched exhaustively; 3 and 4 sub layouts are grown from
+    the best smaller layouts (beam search), which prunes the space early.
+    """
+
+    SONIC_CABIN = {'length': 68.0, 'width': 55.0, 'height': 38.0}
+
+    SONIC_SEATS = {
+        'driver': {'x': 32.0, 'y': 12.0, 'z': 20.0},
+        'passenger': {'x': 32.0, 'y': 43.0, 'z': 20.0},
+        'rear_left': {'x': 48.0, 'y': 12.0, 'z': 18.0},
+        'rear_right': {'x': 48.0, 'y': 43.0, 'z': 18.0}
+    }
+
+    def __init__(self):
+        """Initialize placement optimizer."""
+        self.speed_of_sound_inches_per_sec = 13503.9
+        self.damping_ratio = 0.08
+        self.max_mode_order = 6
+        self.engine = AcousticModelEngine(speed_of_sound=self.speed_of_sound_inches_per_sec)
+        self.parallel_threshold = 20000
+        self.chunk_size = 1024
+
+    def build_candidate_grid(self, room_dimensions: dict, spacing: float = 6.0,
+                             sub_height: float = 8.0, margin: float = 4.0) -> np.ndarray:
+        """
+        Build a floor-level grid of candidate subwoofer positions.
+
+        Args:
+            room_dimensions: {'length', 'width', 'height'} in inches
+            spacing: Grid spacing in inches
+            sub_height: Height of the driver center above the floor
+            margin: Minimum distance from the walls
+
+        Returns:
+            (C, 3) array of positions
+        """
+        if spacing <= 0:
+            raise ValueError("Grid spacing must be positive")
+
+        length = room_dimensions['length']
+        width = room_dimensions['width']
+
+        xs = np.arange(margin, length - margin + 1e-9, spacing)
+        ys = np.arange(margin, width - margin + 1e-9, spacing)
+        if len(xs) == 0 or len(ys) == 0:
+            raise ValueError("Cabin too small for the requested grid")
+
+        gx, gy = np.meshgrid(xs, ys, indexing='ij')
+        gz = np.full(gx.size, min(sub_height, room_dimensions['height']))
+        return np.stack([gx.ravel(), gy.ravel(), gz], axis=1)
+
+    def build_seat_grid(self, seats: Dict[str, dict], spread: float = 3.0,
+                        points_per_axis: int = 3) -> Tuple[np.ndarray, List[str]]:
+        """
+        Expand each seat into a small head-position grid.
+
+        Returns:
+            ((R, 3) receiver positions, seat name per receiver)
+        """
+        if points_per_axis > 1:
+            offsets = np.linspace(-spread, spread, points_per_axis)
+        else:
+            offsets = np.zeros(1)
+        ox, oy = np.meshgrid(offsets, offsets, indexing='ij')
+        ox, oy = ox.ravel(), oy.ravel()
+
+        receivers = []
+        labels = []
+        for name, pos in seats.items():
+            for dx, dy in zip(ox, oy):
+                receivers.append((pos['x'] + dx, pos['y'] + dy, pos.get('z', 20.0)))
+                labels.append(name)
+        return np.asarray(receivers, dtype=float), labels
+
+    def modal_transfer(self, room_dimensions: dict, sources: np.ndarray,
+                       receivers: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+        """
+        Complex modal pressure from each source to each receiver, from the
+        shared acoustic model so placement and the soundstage agree.
+
+        Returns:
+            (S, R, F) complex64 array
+        """
+        dims = (room_dimensions['length'], room_dimensions['width'],
+                room_dimensions['height'])
+        transfer = self.engine.modal_pressure(dims, sources, receivers, frequencies,
+                                              max_order=self.max_mode_order,
+                                              damping_ratio=self.damping_ratio)
+        return transfer.astype(np.complex64)
+
+    def _rank_pairs(self, transfer: np.ndarray, keep: int,
+                    workers: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Exhaustively score every candidate pair and keep the best."""
+        count = transfer.shape[0]
+        pairs = np.array(list(combinations(range(count), 2)), dtype=np.int32)
+        if len(pairs) == 0:
+            return pairs, np.empty(0), 0
+
+        scores = None
+        if workers > 1 and len(pairs) >= self.parallel_threshold:
+            chunks = np.array_split(pairs, workers * 4)
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(transfer,)) as pool:
+                    scores = np.concatenate(list(pool.map(_score_chunk_worker, chunks)))
+            except (OSError, RuntimeError):
+                scores = None
+
+        if scores is None:
+            scores = _score_layouts(transfer, pairs, self.chunk_size)
+
+        best = np.argsort(scores)[:keep]
+        return pairs[best], scores[best], len(pairs)
+
+    def _extend_layouts(self, transfer: np.ndarray, layouts: np.ndarray,
+                        keep: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Grow each layout by one candidate and keep the best results."""
+        count = transfer.shape[0]
+        grown = set()
+        for layout in layouts.tolist():
+            members = set(layout)
+            for candidate in range(count):
+                if candidate not in members:
+                    grown.add(tuple(sorted(layout + [candidate])))
+
+        grown = np.array(sorted(grown), dtype=np.int32)
+        scores = _score_layouts(transfer, grown, self.chunk_size)
+        best = np.argsort(scores)[:keep]
+        return grown[best], scores[best], len(grown)
+
+    def _tune_layout(self, transfer: np.ndarray, layout: np.ndarray,
+                     frequencies: np.ndarray, delay_steps: np.ndarray,
+                     gain_steps_db: np.ndarray, passes: int = 2) -> dict:
+        """
+        Choose delay, gain and polarity per sub for a fixed layout.
+
+        Sub 1 is the reference; each other sub is tuned in turn by scoring
+        every (delay, gain, polarity) option in one batched evaluation.
+        """
+        responses = transfer[layout]
+        sub_count = len(layout)
+        w = 2 * np.pi * frequencies
+
+        delays = np.zeros(sub_count)
+        gains_db = np.zeros(sub_count)
+        polarity = np.ones(sub_count)
+
+        d, g, p = np.meshgrid(delay_steps, gain_steps_db, np.array([1.0, -1.0]),
+                              indexing='ij')
+        d, g, p = d.ravel(), g.ravel(), p.ravel()
+        # (O, F) complex weight for every option
+        option_weights = (p * 10 ** (g / 20.0))[:, None] * \
+            np.exp(-1j * w[None, :] * d[:, None] / 1000.0)
+
+        def weighted(i):
+            weight = polarity[i] * 10 ** (gains_db[i] / 20.0) * \
+                np.exp(-1j * w * delays[i] / 1000.0)
+            return responses[i] * weight[None, :]
+
+        baseline = _seat_variance(responses.sum(axis=0))
+        for _ in range(passes if sub_count > 2 else 1):
+            for i in range(1, sub_count):
+                others = sum(weighted(j) for j in range(sub_count) if j != i)
+                candidates = (others[None, :, :]
+                              + option_weights[:, None, :] * responses[i][None, :, :])
+                best = int(np.argmin(_seat_variance(candidates)))
+                delays[i], gains_db[i], polarity[i] = d[best], g[best], p[best]
+
+        summed = sum(weighted(j) for j in range(sub_count))
+        level_db = 20.0 * np.log10(np.maximum(np.abs(summed), 1e-9))
+
+        return {
+            'delays_ms': delays,
+            'gains_db': gains_db,
+            'polarity': polarity,
+            'equal_drive_variance': float(baseline),
+            'seat_variance': float(_seat_variance(summed)),
+            'spatial_deviation_db': float(np.std(level_db, axis=0).mean()),
+            'mean_level_db': float(level_db.mean())
+        }
+
+    def optimize(self, room_dimensions: Optional[dict] = None,
+                 seats: Optional[Dict[str, dict]] = None,
+                 sub_counts: Tuple[int, ...] = (2,),
+                 candidate_positions: Optional[List[dict]] = None,
+                 grid_spacing: float = 6.0, sub_height: float = 8.0,
+                 freq_range: Tuple[float, float] = (20.0, 120.0),
+                 frequency_points: int = 48, top_n: int = 5,
+                 beam_width: int = 32, max_delay_ms: float = 5.0,
+                 workers: Optional[int] = None) -> dict:
+        """
+        Search subwoofer layouts for minimum seat-to-seat variation.
+
+        Args:
+            room_dimensions: {'length', 'width', 'height'} in inches (Sonic default)
+            seats: Seat name -> {'x', 'y', 'z'} (Sonic front/rear seats default)
+            sub_counts: Number of subwoofers to search for (1-4 each)
+            candidate_positions: Explicit [{'x', 'y', 'z'}] instead of a grid
+            grid_spacing: Candidate grid spacing in inches
+            freq_range: Evaluated bass band in Hz
+            top_n: Ranked layouts returned per sub count
+            beam_width: Layouts kept between 2, 3 and 4 sub stages
+            max_delay_ms: Largest delay considered when tuning a layout
+            workers: Process pool size for large grids (default: CPU count)
+
+        Returns:
+            Ranked layouts with positions, delay, gain and polarity settings
+        """
+        started = time.perf_counter()
+
+        room_dimensions = room_dimensions or dict(self.SONIC_CABIN)
+        seats = seats or self.SONIC_SEATS
+        sub_counts = tuple(sorted(set(int(c) for c in sub_counts)))
+        if not sub_counts or sub_counts[0] < 1 or sub_counts[-1] > 4:
+            raise ValueError("Subwoofer count must be between 1 and 4")
+        if not freq_range[0] < freq_range[1]:
+            raise ValueError("Invalid frequency range")
+
+        if candidate_positions:
+            candidates = np.array([[c['x'], c['y'], c.get('z', sub_height)]
+                                   for c in candidate_positions], dtype=float)
+        else:
+            candidates = self.build_candidate_grid(room_dimensions, grid_spacing, sub_height)
+        if len(candidates) < sub_counts[-1]:
+            raise ValueError("Not enough candidate positions for the requested sub count")
+
+        receivers, _ = self.build_seat_grid(seats)
+        frequencies = np.geomspace(freq_range[0], freq_range[1], frequency_points)
+        transfer = self.modal_transfer(room_dimensions, candidates, receivers, frequencies)
+
+        workers = workers or os.cpu_count() or 1
+        keep = max(beam_width, top_n)
+        delay_steps = np.arange(0.0, max_delay_ms + 1e-9, 0.25)
+        gain_steps_db = np.arange(-6.0, 0.1, 1.5)
+
+        stages = {}
+        evaluated = 0
+
+        singles = np.arange(len(candidates), dtype=np.int32)[:, None]
+        single_scores = _score_layouts(transfer, singles, self.chunk_size)
+        order = np.argsort(single_scores)[:keep]
+        stages[1] = (singles[order], single_scores[order])
+        evaluated += len(singles)
+
+        if sub_counts[-1] >= 2:
+            layouts, scores, count = self._rank_pairs(transfer, keep, workers)
+            stages[2] = (layouts, scores)
+            evaluated += count
+
+        for sub_count in range(3, sub_counts[-1] + 1):
+            layouts, scores, count = self._extend_layouts(
+                transfer, stages[sub_count - 1][0], keep
+            )
+            stages[sub_count] = (layouts, scores)
+            evaluated += count
+
+        results = {}
+        for sub_count in sub_counts:
+            layouts, _ = stages[sub_count]
+            ranked = []
+            # Only the leading layouts are worth the delay/gain refinement
+            for layout in layouts[:top_n * 2]:
+                tuning = self._tune_layout(transfer, layout, frequencies,
+                                           delay_steps, gain_steps_db)
+                ranked.append((tuning['seat_variance'], layout, tuning))
+            ranked.sort(key=lambda item: item[0])
+
+            results[str(sub_count)] = [
+                self._format_layout(rank + 1, candidates[layout], tuning)
+                for rank, (_, layout, tuning) in enumerate(ranked[:top_n])
+            ]
+
+        return {
+            'room_dimensions': room_dimensions,
+            'seats': seats,
+            'frequency_range_hz': [freq_range[0], freq_range[1]],
+            'candidate_count': int(len(candidates)),
+            'seat_points': int(len(receivers)),
+            'layouts': results,
+            'recommendation': {
+                count: layouts[0] for count, layouts in results.items() if layouts
+            },
+            'search': {
+                'evaluated_layouts': int(evaluated),
+                'beam_width': beam_width,
+                'workers': workers,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+            }
+        }
+
+    def _format_layout(self, rank: int, positions: np.ndarray, tuning: dict) -> dict:
+        """Convert a tuned layout into API-friendly settings."""
+        subwoofers = []
+        for i, pos in enumerate(positions):
+            level_db = float(tuning['gains_db'][i])
+            subwoofers.append({
+                'sub_id': i + 1,
+                'position': {'x': round(float(pos[0]), 1), 'y': round(float(pos[1]), 1),
+                             'z': round(float(pos[2]), 1)},
+                'delay_ms': round(float(tuning['delays_ms'][i]), 3),
+                'delay_samples_48k': int(tuning['delays_ms'][i] * 48),
+                'level_db': round(level_db, 2),
+                'level_percent': round(100 * 10 ** (level_db / 20.0), 1),
+                'phase_degrees': 0 if tuning['polarity'][i] > 0 else 180
+            })
+
+        return {
+            'rank': rank,
+            'subwoofers': subwoofers,
+            'seat_variance_db2': round(tuning['seat_variance'], 3),
+            'equal_drive_variance_db2': round(tuning['equal_drive_variance'], 3),
+            'spatial_deviation_db': round(tuning['spatial_deviation_db'], 2),
+            'mean_level_db': round(tuning['mean_level_db'], 2)
+        }
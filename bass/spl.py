@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+SPL Meter Module
+Streaming A/C/Z weighted sound level analysis of recorded PCM
+"""
+
+import math
+import time
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+# IEC 61672 weighting pole frequencies (Hz)
+_F1 = 20.598997
+_F2 = 107.65265
+_F3 = 737.86223
+_F4 = 12194.217
+
+THIRD_OCTAVE_CENTERS = [
+    20, 25, 31.5, 40, 50, 63, 80, 100, 125, 160,
+    200, 250, 315, 400, 500, 630, 800, 1000, 1250, 1600,
+    2000, 2500, 3150, 4000, 5000, 6300, 8000, 10000, 12500, 16000, 20000
+]
+
+WEIGHTINGS = ('A', 'C', 'Z')
+
+PCM_FORMATS = {
+    's16le': ('<i2', 32768.0),
+    's32le': ('<i4', 2147483648.0),
+    'f32le': ('<f4', 1.0)
+}
+
+
+def _weighting_response(curve: str, freqs: np.ndarray) -> np.ndarray:
+    """Complex analog A/C/Z weighting response, 0 dB at 1 kHz."""
+    if curve == 'Z':
+        return np.ones(len(freqs), dtype=complex)
+
+    def analog(f):
+        s = 2j * np.pi * f
+        w1, w2, w3, w4 = (2 * np.pi * f_ for f_ in (_F1, _F2, _F3, _F4))
+        response = s * s / ((s + w1) ** 2 * (s + w4) ** 2) * w4 ** 2
+        if curve == 'A':
+            response = response * s * s / ((s + w2) * (s + w3))
+        return response
+
+    if curve not in WEIGHTINGS:
+        raise ValueError("Weighting must be 'A', 'C' or 'Z'")
+
+    return analog(freqs) / abs(analog(np.array([1000.0]))[0])
+
+
+@lru_cache(maxsize=16)
+def design_weightings(sample_rate: int, frame_size: int) -> Dict[str, np.ndarray]:
+    """
+    Per-bin weighting designed once per (sample_rate, frame_size).
+
+    Returns complex bin responses for A/C/Z plus the Parseval power
+    factors, so a frame's mean-square level is sum(|X|^2 * power[curve]).
+    """
+    freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+
+    # One-sided spectrum: interior bins count twice
+    parseval = np.full(len(freqs), 2.0)
+    parseval[0] = 1.0
+    if frame_size % 2 == 0:
+        parseval[-1] = 1.0
+    parseval /= frame_size ** 2
+
+    design = {'freqs': freqs}
+    for curve in ('A', 'C', 'Z'):
+        response = _weighting_response(curve, np.maximum(freqs, 1e-3))
+        response.setflags(write=False)
+        power = parseval * np.abs(response) ** 2
+        power.setflags(write=False)
+        design[curve] = response
+        design[f'{curve}_power'] = power
+    return design
+
+
+@lru_cache(maxsize=16)
+def design_third_octaves(sample_rate: int, frame_size: int) -> np.ndarray:
+    """Bin -> 1/3-octave band index (len(THIRD_OCTAVE_CENTERS) for out-of-band bins)."""
+    freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+    centers = np.asarray(THIRD_OCTAVE_CENTERS, dtype=float)
+    edges = np.concatenate([centers / 2 ** (1 / 6), [centers[-1] * 2 ** (1 / 6)]])
+
+    band_index = np.searchsorted(edges, freqs, side='right') - 1
+    band_index[(band_index < 0) | (band_index >= len(centers))] = len(centers)
+    band_index.setflags(write=False)
+    return band_index
+
+
+def validate_weighting(weighting: str) -> str:
+    """Normalize a weighting name, raising ValueError if it is not A, C or Z."""
+    curve = str(weighting).upper()
+    if curve not in WEIGHTINGS:
+        raise ValueError("Weighting must be 'A', 'C' or 'Z'")
+    return curve
+
+
+def pcm_frame_bytes(sample_format: str = 's16le', channels: int = 1) -> int:
+    """Bytes per interleaved sample frame (one sample of every channel)."""
+    if sample_format not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format. Use one of: {list(PCM_FORMATS)}")
+    return np.dtype(PCM_FORMATS[sample_format][0]).itemsize * max(1, channels)
+
+
+def decode_pcm(data: bytes, sample_format: str = 's16le', channels: int = 1) -> np.ndarray:
+    """Decode interleaved PCM bytes into mono float samples in [-1, 1]."""
+    if sample_format not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format. Use one of: {list(PCM_FORMATS)}")
+
+    dtype, scale = PCM_FORMATS[sample_format]
+    samples = np.frombuffer(data, dtype=dtype).astype(np.float64) / scale
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class SPLMeter:
+    """
+    Incremental sound level meter over a fixed-size frame ring buffer.
+
+    Samples are accumulated into a ring buffer one frame (125 ms, "fast")
+    at a time. Each full frame is weighted in the frequency domain and
+    folded into running energy totals, so memory stays constant no matter
+    how long a session runs. Summary rows are emitted every
+    summary_seconds and handed to `sink` in batches. A trailing partial
+    frame is analyzed on close, weighted by the time it covers. A closed
+    meter refuses further samples, so nothing is analyzed after the
+    final flush.
+    """
+
+    def __init__(self, sample_rate: int = 48000, reference_spl_db: float = 120.0,
+                 frame_seconds: float = 0.125, summary_seconds: float = 1.0,
+                 batch_size: int = 60, sink: Optional[Callable[[List[dict]], None]] = None,
+                 session_id: Optional[str] = None, sample_format: str = 's16le',
+                 channels: int = 1):
+        """
+        Args:
+            sample_rate: PCM sample rate in Hz
+            reference_spl_db: SPL of a full-scale (0 dBFS RMS) signal from mic calibration
+            frame_seconds: Analysis frame length (0.125 = fast time weighting)
+            summary_seconds: Interval between persisted summary rows
+            batch_size: Summary rows buffered before calling sink
+            sink: Callable receiving a list of summary rows
+            sample_format: Encoding of buffers passed to process_pcm
+            channels: Interleaved channels in those buffers (averaged to mono)
+        """
+        if sample_rate <= 0:
+            raise ValueError("Sample rate must be positive")
+        if channels < 1:
+            raise ValueError("Channels must be at least 1")
+
+        self.sample_rate = int(sample_rate)
+        self.reference_spl_db = reference_spl_db
+        self.frame_size = max(256, int(round(frame_seconds * sample_rate)))
+        self.frames_per_summary = max(1, int(round(summary_seconds / frame_seconds)))
+        self.batch_size = batch_size
+        self.sink = sink
+        self.session_id = session_id
+        self.sample_format = sample_format
+        self.channels = int(channels)
+        self.pcm_frame_bytes = pcm_frame_bytes(sample_format, self.channels)
+
+        self._weights = design_weightings(self.sample_rate, self.frame_size)
+        self._bands = design_third_octaves(self.sample_rate, self.frame_size)
+        self._band_count = len(THIRD_OCTAVE_CENTERS)
+
+        self._ring = np.zeros(self.frame_size)
+        self._fill = 0
+        self._pcm_remainder = b''
+        self._lock = threading.RLock()
+        self.closed = False
+
+        self.started_at = time.time()
+        self.last_activity = self.started_at
+        self.total_samples = 0
+        self._totals = self._empty_totals()
+        self._window = self._empty_totals()
+        self._window_index = 0
+        self._pending_rows: List[dict] = []
+        self.rows_written = 0
+
+    def _empty_totals(self) -> dict:
+        return {
+            'frames': 0,
+            'weight': 0.0,
+            'energy': {'A': 0.0, 'C': 0.0, 'Z': 0.0},
+            'max_ms': {'A': 0.0, 'C': 0.0, 'Z': 0.0},
+            'peak': {'C': 0.0, 'Z': 0.0},
+            'bands': np.zeros(self._band_count + 1)
+        }
+
+    def _to_db(self, mean_square: float) -> Optional[float]:
+        if mean_square <= 0:
+            return None
+        return round(10 * math.log10(mean_square) + self.reference_spl_db, 2)
+
+    def _peak_db(self, peak: float) -> Optional[float]:
+        if peak <= 0:
+            return None
+        return round(20 * math.log10(peak) + self.reference_spl_db, 2)
+
+    def process(self, samples: np.ndarray) -> int:
+        """Feed mono float samples; returns number of frames completed."""
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        completed = 0
+
+        with self._lock:
+            self._check_open()
+            self.last_activity = time.time()
+            self.total_samples += len(samples)
+            offset = 0
+            while offset < len(samples):
+                take = min(self.frame_size - self._fill, len(samples) - offset)
+                self._ring[self._fill:self._fill + take] = samples[offset:offset + take]
+                self._fill += take
+                offset += take
+
+                if self._fill == self.frame_size:
+                    self._analyze_frame(self._ring)
+                    self._fill = 0
+                    completed += 1
+
+        return completed
+
+    def process_pcm(self, data: bytes) -> int:
+        """
+        Decode and feed a PCM buffer in the meter's sample_format/channels.
+
+        Chunks need not end on a sample frame boundary: trailing bytes are
+        kept and prepended to the next chunk, so channels never shift.
+        """
+        with self._lock:
+            self._check_open()
+            data = self._pcm_remainder + data
+            usable = len(data) - len(data) % self.pcm_frame_bytes
+            self._pcm_remainder = data[usable:]
+            return self.process(decode_pcm(data[:usable], self.sample_format, self.channels))
+
+    def _check_open(self):
+        if self.closed:
+            raise RuntimeError("SPL meter is closed")
+
+    def _analyze_frame(self, frame: np.ndarray, length: Optional[int] = None):
+        """Fold one frame into the totals; length < frame_size marks a zero-padded partial frame."""
+        length = self.frame_size if length is None else length
+        weight = length / self.frame_size
+
+        spectrum = np.fft.rfft(frame)
+        # Power of the zero-padded frame, rescaled to the mean over the samples present
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) / weight
+
+        c_weighted = np.fft.irfft(spectrum * self._weights['C'], n=self.frame_size)
+        peaks = {'Z': float(np.max(np.abs(frame))), 'C': float(np.max(np.abs(c_weighted)))}
+        bands = np.bincount(self._bands, weights=power * self._weights['Z_power'],
+                            minlength=self._band_count + 1)
+
+        mean_squares = {
+            curve: float(np.dot(power, self._weights[f'{curve}_power']))
+            for curve in ('A', 'C', 'Z')
+        }
+
+        for totals in (self._totals, self._window):
+            totals['frames'] += 1
+            totals['weight'] += weight
+            for curve, mean_square in mean_squares.items():
+                totals['energy'][curve] += mean_square * weight
+                totals['max_ms'][curve] = max(totals['max_ms'][curve], mean_square)
+            for curve, peak in peaks.items():
+                totals['peak'][curve] = max(totals['peak'][curve], peak)
+            totals['bands'] += bands * weight
+
+        if self._window['frames'] >= self.frames_per_summary:
+            self._close_window()
+
+    def _levels(self, totals: dict) -> dict:
+        frames = totals['weight'] or 1.0
+        band_levels = {
+            str(center): self._to_db(totals['bands'][i] / frames)
+            for i, center in enumerate(THIRD_OCTAVE_CENTERS)
+        }
+        return {
+            'laeq_db': self._to_db(totals['energy']['A'] / frames),
+            'lceq_db': self._to_db(totals['energy']['C'] / frames),
+            'lzeq_db': self._to_db(totals['energy']['Z'] / frames),
+            'lafmax_db': self._to_db(totals['max_ms']['A']),
+            'lcfmax_db': self._to_db(totals['max_ms']['C']),
+            'lzfmax_db': self._to_db(totals['max_ms']['Z']),
+            'lcpeak_db': self._peak_db(totals['peak']['C']),
+            'lzpeak_db': self._peak_db(totals['peak']['Z']),
+            'third_octave_db': band_levels
+        }
+
+    def _close_window(self):
+        frame_seconds = self.frame_size / self.sample_rate
+        start = self._window_index * self.frames_per_summary * frame_seconds
+        duration = self._window['weight'] * frame_seconds
+
+        row = {
+            'session_id': self.session_id,
+            'window_index': self._window_index,
+            'offset_seconds': round(start, 3),
+            'duration_seconds': round(duration, 3),
+            **self._levels(self._window)
+        }
+        self._pending_rows.append(row)
+        self._window = self._empty_totals()
+        self._window_index += 1
+
+        if len(self._pending_rows) >= self.batch_size:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        if self._pending_rows and self.sink is not None:
+            self.sink(self._pending_rows)
+            self.rows_written += len(self._pending_rows)
+        self._pending_rows = []
+
+    def snapshot(self) -> dict:
+        """Current running levels for the whole session."""
+        with self._lock:
+            frames = self._totals['frames']
+            return {
+                'session_id': self.session_id,
+                'sample_rate': self.sample_rate,
+                'duration_seconds': round(self.total_samples / self.sample_rate, 3),
+                'frames_analyzed': frames,
+                'summary_rows_written': self.rows_written,
+                'summary_rows_pending': len(self._pending_rows),
+                **self._levels(self._totals)
+            }
+
+    def close(self) -> dict:
+        """
+        Analyze the partial frame, flush the window and pending rows; return
+        the final snapshot. Closing again only returns the snapshot.
+        """
+        with self._lock:
+            if self.closed:
+                return self.snapshot()
+            self.closed = True
+            if self._fill:
+                frame = np.zeros(self.frame_size)
+                frame[:self._fill] = self._ring[:self._fill]
+                self._analyze_frame(frame, self._fill)
+                self._fill = 0
+            if self._window['frames']:
+                self._close_window()
+            self._flush_rows()
+        return self.snapshot()
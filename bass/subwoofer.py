@@ -7,6 +7,8 @@ Advanced subwoofer integration with multiple sub support
 import math
 from typing import Dict, List, Optional
 
+from services.bass.placement import SubPlacementOptimizer
+
 
 class SubwooferController:
     """Control subwoofer levels, phase, and delay alignment."""
@@ -16,6 +18,7 @@ class SubwooferController:
         self.max_subwoofers = 4
         self.speed_of_sound_inches_per_ms = 13.5
         self.speed_of_sound_cm_per_ms = 34.3
+        self.placement_optimizer = SubPlacementOptimizer()
         
     def configure_subwoofer(self, sub_id: int = 1, level_percent: float = 75.0,
                            phase_degrees: float = 0.0, delay_ms: float = 0.0) -> dict:
@@ -196,6 +199,33 @@ class SubwooferController:
             'recommendation': placements[0]['name']
         }
     
+    def optimize_sub_placement(self, room_dimensions: Optional[dict] = None,
+                               seats: Optional[Dict[str, dict]] = None,
+                               sub_counts: Optional[List[int]] = None,
+                               **options) -> dict:
+        """
+        Search candidate positions for 1-4 subwoofer layouts.
+        
+        Args:
+            room_dimensions: {'length': x, 'width': y, 'height': z} in inches
+            seats: Seat name -> {'x', 'y', 'z'} listening positions
+            sub_counts: Subwoofer counts to search (default: 2)
+            **options: Passed through to SubPlacementOptimizer.optimize
+            
+        Returns:
+            Ranked layouts with delay, gain and polarity per subwoofer
+        """
+        counts = tuple(sub_counts or (2,))
+        if any(not 1 <= count <= self.max_subwoofers for count in counts):
+            raise ValueError(f"Subwoofer count must be between 1 and {self.max_subwoofers}")
+        
+        return self.placement_optimizer.optimize(
+            room_dimensions=room_dimensions,
+            seats=seats,
+            sub_counts=counts,
+            **options
+        )
+    
     def calculate_group_output(self, subwoofers: List[dict]) -> dict:
         """
         Calculate combined output of multiple subwoofers.
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for filter-derived phase and group delay
+"""
+
+from services.bass.phase import PhaseAlignment
+
+LR24 = {'type': 'lowpass_crossover', 'frequency_hz': 80, 'slope_db_per_octave': 24}
+
+
+def test_group_delay_of_no_filters_is_zero():
+    result = PhaseAlignment().calculate_group_delay([])
+
+    assert result['total_group_delay_ms'] == 0.0
+    assert result['filter_count'] == 0
+    assert result['recommendation'] == 'Minimal group delay'
+
+
+def test_unknown_filter_types_are_ignored():
+    phase = PhaseAlignment()
+    expected = phase.calculate_group_delay([LR24])
+    result = phase.calculate_group_delay([{'type': 'notch', 'frequency_hz': 50}, LR24])
+
+    assert result['total_group_delay_ms'] == expected['total_group_delay_ms']
+    assert result['ignored_filters'] == ['notch']
+
+    only_unknown = phase.calculate_group_delay([{'type': 'notch'}])
+    assert only_unknown['total_group_delay_ms'] == 0.0
+
+
+def test_crossover_adds_group_delay_at_its_frequency():
+    result = PhaseAlignment().calculate_group_delay([LR24])
+
+    assert result['reference_frequency_hz'] == 80
+    assert result['total_group_delay_ms'] > 1.0
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for the subwoofer placement optimizer
+"""
+
+import numpy as np
+
+from services.bass.placement import SubPlacementOptimizer
+
+
+def test_transfer_matches_acoustic_engine():
+    optimizer = SubPlacementOptimizer()
+    cabin = SubPlacementOptimizer.SONIC_CABIN
+    dims = (cabin['length'], cabin['width'], cabin['height'])
+    sources = np.array([[10.0, 10.0, 8.0], [50.0, 40.0, 8.0]])
+    receivers, _ = optimizer.build_seat_grid(SubPlacementOptimizer.SONIC_SEATS)
+    frequencies = np.geomspace(20, 120, 16)
+
+    transfer = optimizer.modal_transfer(cabin, sources, receivers, frequencies)
+    expected = optimizer.engine.modal_pressure(dims, sources, receivers, frequencies,
+                                               max_order=optimizer.max_mode_order,
+                                               damping_ratio=optimizer.damping_ratio)
+
+    assert transfer.shape == (2, len(receivers), 16)
+    np.testing.assert_allclose(transfer, expected.astype(np.complex64), rtol=1e-5)
+
+
+def test_optimize_ranks_layouts_per_sub_count():
+    result = SubPlacementOptimizer().optimize(sub_counts=(1, 2), grid_spacing=12.0,
+                                              top_n=2, workers=1)
+
+    for count in ('1', '2'):
+        layouts = result['layouts'][count]
+        assert layouts
+        assert len(layouts[0]['subwoofers']) == int(count)
+    assert result['search']['evaluated_layouts'] > result['candidate_count']
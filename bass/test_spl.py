@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming SPL meter
+"""
+
+import numpy as np
+import pytest
+
+from services.bass.database import BassDatabase
+from services.bass.spl import SPLMeter, validate_weighting
+
+RATE = 48000
+
+
+def tone(seconds: float, amplitude: float = 0.5, frequency: float = 1000.0) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def test_session_shorter_than_one_frame_is_analyzed():
+    meter = SPLMeter(sample_rate=RATE)
+    meter.process(tone(0.05))
+    levels = meter.close()
+
+    # 0.5 amplitude sine: -9.03 dBFS RMS, +120 dB reference
+    assert levels['lzeq_db'] == pytest.approx(110.97, abs=0.3)
+    assert levels['laeq_db'] == pytest.approx(110.97, abs=0.5)
+
+
+def test_partial_frame_is_weighted_by_its_duration():
+    full = SPLMeter(sample_rate=RATE)
+    full.process(tone(1.0))
+    partial = SPLMeter(sample_rate=RATE)
+    partial.process(np.concatenate([tone(1.0), np.zeros(RATE // 100)]))
+
+    quiet_share = 0.01 / 1.01
+    expected = full.close()['lzeq_db'] + 10 * np.log10(1 - quiet_share)
+    assert partial.close()['lzeq_db'] == pytest.approx(expected, abs=0.05)
+
+
+def test_unaligned_stereo_chunks_keep_channels_in_place():
+    left = (tone(0.5, 0.5) * 32767).astype('<i2')
+    right = np.zeros_like(left)
+    pcm = np.column_stack([left, right]).ravel().tobytes()
+
+    whole = SPLMeter(sample_rate=RATE, channels=2)
+    whole.process_pcm(pcm)
+    chunked = SPLMeter(sample_rate=RATE, channels=2)
+    for start in range(0, len(pcm), 1001):
+        chunked.process_pcm(pcm[start:start + 1001])
+
+    assert chunked.close()['lzeq_db'] == whole.close()['lzeq_db']
+
+
+def test_invalid_weighting_is_rejected():
+    assert validate_weighting('a') == 'A'
+    with pytest.raises(ValueError):
+        validate_weighting('B')
+
+
+def test_summaries_store_fast_maxima(tmp_path):
+    db = BassDatabase(tmp_path / 'bass.db')
+    meter = SPLMeter(sample_rate=RATE, sink=db.save_spl_summaries, session_id='s1')
+    meter.process(tone(2.0))
+    meter.close()
+
+    rows = db.get_spl_summaries('s1')
+    assert len(rows) == 2
+    assert rows[0]['lcfmax_db'] is not None
+    assert rows[0]['lzfmax_db'] == pytest.approx(rows[0]['lzeq_db'], abs=0.1)
+
+
+def test_closed_meter_rejects_samples():
+    meter = SPLMeter(sample_rate=RATE)
+    meter.process(tone(0.5))
+    levels = meter.close()
+
+    with pytest.raises(RuntimeError):
+        meter.process(tone(0.5))
+    with pytest.raises(RuntimeError):
+        meter.process_pcm(b'\x00\x00' * 100)
+    assert meter.close() == levels
+
+
+def test_pcm_format_is_validated_at_construction():
+    with pytest.raises(ValueError):
+        SPLMeter(sample_rate=RATE, sample_format='mp3')
+    with pytest.raises(ValueError):
+        SPLMeter(sample_rate=RATE, channels=0)
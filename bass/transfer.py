@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Transfer Function Engine
+Complex frequency responses for bass filters, delays and summation
+"""
+
+from functools import lru_cache
+from math import factorial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@lru_cache(maxsize=32)
+def _log_grid(start_hz: float, end_hz: float, points: int) -> np.ndarray:
+    grid = np.geomspace(start_hz, end_hz, points)
+    grid.setflags(write=False)
+    return grid
+
+
+@lru_cache(maxsize=32)
+def _butterworth_poles(order: int) -> np.ndarray:
+    """Normalized (1 rad/s) Butterworth poles in the left half plane."""
+    k = np.arange(1, order + 1)
+    poles = np.exp(1j * np.pi * (2 * k + order - 1) / (2 * order))
+    poles.setflags(write=False)
+    return poles
+
+
+@lru_cache(maxsize=32)
+def _bessel_poles(order: int) -> np.ndarray:
+    """
+    Normalized Bessel poles (-3 dB at 1 rad/s).
+
+    Roots of the reverse Bessel polynomial, rescaled so the magnitude
+    response crosses -3 dB at the cutoff like the other alignments.
+    """
+    coeffs = [
+        factorial(2 * order - k) / (2 ** (order - k) * factorial(k) * factorial(order - k))
+        for k in range(order, -1, -1)
+    ]
+    poles = np.roots(coeffs)
+
+    w = np.geomspace(1e-2, 1e2, 4001)
+    mag = np.abs(np.prod(-poles[None, :] / (1j * w[:, None] - poles[None, :]), axis=1))
+    w3db = w[np.argmin(np.abs(20 * np.log10(mag) + 3.0103))]
+    poles = poles / w3db
+    poles.setflags(write=False)
+    return poles
+
+
+class TransferFunctionEngine:
+    """
+    Build complex responses of the configured bass chain on a log grid.
+
+    Filter configs are the dicts produced by BassFilters
+    (subsonic_highpass, lowpass_crossover, bass_boost_*), so anything the
+    API returns can be fed straight back in.
+    """
+
+    def __init__(self, start_hz: float = 10.0, end_hz: float = 500.0, points: int = 256):
+        """Initialize engine with the default analysis grid."""
+        self.start_hz = start_hz
+        self.end_hz = end_hz
+        self.points = points
+
+    def frequency_grid(self, start_hz: Optional[float] = None, end_hz: Optional[float] = None,
+                       points: Optional[int] = None) -> np.ndarray:
+        """Shared log-spaced frequency grid (cached, read-only)."""
+        return _log_grid(float(start_hz or self.start_hz), float(end_hz or self.end_hz),
+                         int(points or self.points))
+
+    def _prototype(self, order: int, alignment: str, fc: float, freqs: np.ndarray,
+                   highpass: bool) -> np.ndarray:
+        """Analog all-pole low/high-pass prototype evaluated at freqs."""
+        if alignment == 'linkwitz_riley' and order % 2 == 0:
+            half = self._prototype(order // 2, 'butterworth', fc, freqs, highpass)
+            return half * half
+
+        poles = _bessel_poles(order) if alignment == 'bessel' else _butterworth_poles(order)
+        s = 1j * freqs / fc
+        if highpass:
+            s = 1.0 / s
+        return np.prod(-poles[None, :] / (s[:, None] - poles[None, :]), axis=1)
+
+    def _boost(self, config: dict, freqs: np.ndarray) -> np.ndarray:
+        """Analog low-shelf or peaking biquad."""
+        fc = config.get('frequency_hz', 60)
+        gain = 10 ** (config.get('boost_db', 0) / 40.0)
+        s = 1j * freqs / fc
+
+        if config.get('type') == 'bass_boost_peak':
+            q = config.get('q_factor') or 0.7
+            return (s * s + s * (gain / q) + 1) / (s * s + s / (gain * q) + 1)
+
+        root = np.sqrt(gain)
+        q = 0.7071
+        return gain * (s * s + (root / q) * s + gain) / (gain * s * s + (root / q) * s + 1)
+
+    @staticmethod
+    def supports(config: dict) -> bool:
+        """Whether filter_response can model a filter config."""
+        filter_type = config.get('type') or ''
+        return (filter_type in ('subsonic_highpass', 'highpass', 'highpass_crossover',
+                                'lowpass_crossover', 'lowpass')
+                or filter_type.startswith('bass_boost'))
+
+    def filter_response(self, config: dict, freqs: np.ndarray) -> np.ndarray:
+        """Complex response of a single filter config."""
+        filter_type = config.get('type', '')
+        fc = config.get('frequency_hz', 80)
+        order = config.get('filter_order') or max(1, config.get('slope_db_per_octave', 24) // 6)
+
+        if filter_type in ('subsonic_highpass', 'highpass', 'highpass_crossover'):
+            alignment = config.get('alignment', 'butterworth')
+            return self._prototype(order, alignment, fc, freqs, highpass=True)
+        if filter_type in ('lowpass_crossover', 'lowpass'):
+            alignment = config.get('alignment', 'linkwitz_riley')
+            return self._prototype(order, alignment, fc, freqs, highpass=False)
+        if filter_type.startswith('bass_boost'):
+            return self._boost(config, freqs)
+
+        raise ValueError(f"Unsupported filter type: {filter_type or 'missing'}")
+
+    def chain_response(self, filter_configs: List[dict], freqs: np.ndarray,
+                       delay_ms: float = 0.0, phase_degrees: float = 0.0) -> np.ndarray:
+        """Cascade of filters plus delay and polarity/phase rotation."""
+        response = np.ones(len(freqs), dtype=complex)
+        for config in filter_configs:
+            if config:
+                response = response * self.filter_response(config, freqs)
+
+        w = 2 * np.pi * freqs
+        return (response * np.exp(-1j * w * delay_ms / 1000.0)
+                * np.exp(1j * np.radians(phase_degrees)))
+
+    def sub_chain(self, subwoofer_config: dict, crossover_frequency: float) -> List[dict]:
+        """Filter list for the subwoofer path (defaults to LR24 low-pass)."""
+        lowpass = subwoofer_config.get('lowpass') or {
+            'type': 'lowpass_crossover', 'frequency_hz': crossover_frequency,
+            'slope_db_per_octave': 24, 'alignment': 'linkwitz_riley'
+        }
+        return [subwoofer_config.get('subsonic'), lowpass, subwoofer_config.get('boost')]
+
+    def main_chain(self, main_speaker_config: dict, crossover_frequency: float,
+                   lowpass: dict) -> List[dict]:
+        """Filter list for the main speaker path (defaults to the complementary high-pass)."""
+        highpass = main_speaker_config.get('highpass') or {
+            'type': 'highpass_crossover',
+            'frequency_hz': lowpass.get('frequency_hz', crossover_frequency),
+            'slope_db_per_octave': lowpass.get('slope_db_per_octave', 24),
+            'alignment': lowpass.get('alignment', 'linkwitz_riley')
+        }
+        return [highpass]
+
+    def system_response(self, subwoofer_config: dict, main_speaker_config: dict,
+                        freqs: np.ndarray) -> Dict[str, np.ndarray]:
+        """Complex sub, main and summed responses at the listener."""
+        crossover = subwoofer_config.get('crossover_frequency', 80)
+        sub_filters = self.sub_chain(subwoofer_config, crossover)
+        main_filters = self.main_chain(main_speaker_config, crossover, sub_filters[1])
+
+        sub = self.chain_response(sub_filters, freqs,
+                                  subwoofer_config.get('delay_ms', 0),
+                                  subwoofer_config.get('phase_degrees', 0))
+        main = self.chain_response(main_filters, freqs,
+                                   main_speaker_config.get('delay_ms', 0))
+        return {'sub': sub, 'main': main, 'sum': sub + main}
+
+    @staticmethod
+    def group_delay_ms(response: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        """Group delay (-dphi/domega) in ms along the last axis."""
+        phase = np.unwrap(np.angle(response), axis=-1)
+        return -np.gradient(phase, 2 * np.pi * freqs, axis=-1) * 1000.0
+
+    def search_alignment(self, subwoofer_config: dict, main_speaker_config: dict,
+                         delay_range_ms: Tuple[float, float] = (-10.0, 10.0),
+                         step_ms: float = 0.05,
+                         band: Optional[Tuple[float, float]] = None) -> dict:
+        """
+        Find the sub delay and polarity that maximize summation in the crossover band.
+
+        Every (polarity, delay) candidate is evaluated in one (2, N, F)
+        array op. Negative delays mean the mains should be delayed instead.
+        """
+        if step_ms <= 0 or delay_range_ms[0] >= delay_range_ms[1]:
+            raise ValueError("Invalid delay search range")
+
+        crossover = subwoofer_config.get('crossover_frequency', 80)
+        band = band or (crossover / 2.0, crossover * 2.0)
+        freqs = self.frequency_grid(band[0], band[1], 96)
+
+        base = dict(subwoofer_config, delay_ms=0, phase_degrees=0)
+        main_base = dict(main_speaker_config, delay_ms=0)
+        responses = self.system_response(base, main_base, freqs)
+
+        delays = np.arange(delay_range_ms[0], delay_range_ms[1] + step_ms / 2, step_ms)
+        polarity = np.array([1.0, -1.0])
+        w = 2 * np.pi * freqs
+
+        shift = np.exp(-1j * w[None, :] * delays[:, None] / 1000.0)
+        summed = polarity[:, None, None] * responses['sub'][None, None, :] * shift[None, :, :] + \
+            responses['main'][None, None, :]
+
+        ideal = np.abs(responses['sub']) + np.abs(responses['main'])
+        efficiency = np.abs(summed) / np.maximum(ideal, 1e-12)
+        score = 20 * np.log10(np.maximum(efficiency, 1e-6)).mean(axis=-1)
+
+        best_polarity, best_index = np.unravel_index(np.argmax(score), score.shape)
+        best_delay = float(delays[best_index])
+
+        return {
+            'delay_ms': round(best_delay, 3),
+            'apply_delay_to': 'subwoofer' if best_delay >= 0 else 'main_speakers',
+            'delay_adjustment_ms': round(abs(best_delay), 3),
+            'phase_degrees': 0 if best_polarity == 0 else 180,
+            'summation_loss_db': round(float(score[best_polarity, best_index]), 2),
+            'candidates_evaluated': int(score.size),
+            'band_hz': [round(band[0], 1), round(band[1], 1)],
+            'score_curve': {
+                'delays_ms': np.round(delays, 3).tolist(),
+                'normal_db': np.round(score[0], 2).tolist(),
+                'inverted_db': np.round(score[1], 2).tolist()
+            }
+        }
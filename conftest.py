@@ -0,0 +1,17 @@
+"""
+Pytest configuration for the service packages.
+
+The services import each other as services.<name> (the tree is deployed
+under a services/ directory); when it is checked out on its own, alias
+that package to the repository root so the tests can import them the same way.
+"""
+
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+if importlib.util.find_spec('services') is None:
+    services = types.ModuleType('services')
+    services.__path__ = [str(Path(__file__).resolve().parent)]
+    sys.modules['services'] = services
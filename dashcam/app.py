@@ -29,12 +29,32 @@ app.config['JSON_SORT_KEYS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dashcam-recorder-secret-key')
 CORS(app)
 
-db = DashcamDatabase()
+db = DashcamDatabase(os.environ.get('DASHCAM_DB_PATH'))
 
-recordings_dir = ROOT / 'services' / 'dashcam' / 'recordings'
+# How long the snapshot endpoint waits for the background encode
+SNAPSHOT_WAIT_SECONDS = 5
+
+recordings_dir = Path(os.environ.get('DASHCAM_RECORDINGS_DIR')
+                      or ROOT / 'services' / 'dashcam' / 'recordings')
 recordings_dir.mkdir(parents=True, exist_ok=True)
 
-recorder = LoopRecorder(output_dir=recordings_dir, max_storage_gb=128)
+recorder = LoopRecorder(
+    output_dir=recordings_dir,
+    max_storage_gb=128,
+    container=os.environ.get('DASHCAM_CONTAINER', 'avi'),
+    pre_roll_seconds=float(db.get_setting('pre_roll_seconds') or 15),
+    database=db
+)
+
+def incident_clip_complete(clip):
+    """Callback when an incident clip's post-roll has been written."""
+    if clip.get('ok') and cloud_backup.enabled:
+        cloud_backup.queue_upload(
+            incident_id=clip['incident_id'],
+            file_path=clip['video_path'],
+            file_size_mb=clip['file_size_mb'],
+            priority=True
+        )
 
 def incident_callback(incident):
     """Callback when incident is detected."""
@@ -50,7 +70,8 @@ def incident_callback(incident):
             camera_system=camera_system,
             incident_id=incident['incident_id'],
             duration_seconds=30,
-            gps_tracker=gps_tracker
+            gps_tracker=gps_tracker,
+            on_complete=incident_clip_complete
         )
         
         if clip_result.get('ok'):
@@ -67,20 +88,33 @@ def incident_callback(incident):
                 video_clip_path=clip_result['video_path'],
                 metadata=incident
             )
-            
-            if cloud_backup.enabled:
-                cloud_backup.queue_upload(
-                    incident_id=incident['incident_id'],
-                    file_path=clip_result['video_path'],
-                    file_size_mb=clip_result['file_size_mb'],
-                    priority=True
-                )
     
     except Exception as e:
         print(f"Error processing incident: {e}")
 
 incident_detector = IncidentDetector(callback=incident_callback)
 
+def parking_event_callback(event):
+    """Callback when a parking-mode motion clip is finished."""
+    print(f"🅿️ Parking motion recorded: {event['duration_seconds']}s, "
+          f"{event['frame_count']} frames")
+    
+    try:
+        location = vehicle_state.get('location') or {}
+        db.create_incident(
+            incident_id=event['event_id'],
+            incident_type=event['event_type'],
+            recording_id=Path(event['video_path']).stem,
+            severity=event['severity'],
+            location_lat=location.get('latitude'),
+            location_lng=location.get('longitude'),
+            video_clip_path=event['video_path'],
+            metadata=event
+        )
+    
+    except Exception as e:
+        print(f"Error processing parking event: {e}")
+
 def cloud_upload_callback(upload_result):
     """Callback when cloud upload completes."""
     if upload_result['status'] == 'completed':
@@ -92,10 +126,24 @@ def cloud_upload_callback(upload_result):
                 cloud_url=upload_result.get('cloud_url')
             )
 
-cloud_backup = CloudBackupService(callback=cloud_upload_callback)
+cloud_backup = CloudBackupService(
+    callback=cloud_upload_callback,
+    database=db,
+    endpoint=os.environ.get('DASHCAM_UPLOAD_URL'),
+    # Development only: keeps uploads on the local card in dashcam/cloud_storage
+    use_local_server=os.environ.get('DASHCAM_LOCAL_UPLOAD_SERVER') == '1',
+    bandwidth_kbps=float(db.get_setting('cloud_bandwidth_kbps') or 0)
+)
 
 monitoring_active = False
 monitoring_thread = None
+imu_thread = None
+
+# Latest GPS fix, refreshed by the monitoring loop and read by the IMU loop
+vehicle_state = {
+    'speed_kmh': 0,
+    'location': None
+}
 
 battery_state = {
     'voltage': 12.6,
@@ -151,19 +199,11 @@ def monitoring_loop():
             if incident_detector.enabled:
                 gps_tracker = get_gps_tracker()
                 location = gps_tracker.get_current_location()
-                
-                incident = incident_detector.detect_incident(
-                    speed_kmh=location.get('speed_kmh', 0),
-                    location=location
-                )
+                vehicle_state['location'] = location
+                vehicle_state['speed_kmh'] = location.get('speed_kmh', 0)
                 
                 incident_detector.detect_honk()
             
-            if parking_mode_state['active']:
-                motion_detected = (os.urandom(1)[0] / 255.0) < parking_mode_state['motion_sensitivity']
-                if motion_detected:
-                    incident_detector.simulate_parking_mode_event(motion_detected=True)
-            
             if battery_state['voltage'] < battery_state['low_voltage_cutoff']:
                 print(f"⚠️ Low battery: {battery_state['voltage']}V - Stopping recording")
                 if recorder.is_recording():
@@ -175,14 +215,37 @@ def monitoring_loop():
         time.sleep(2)
 
 
+def imu_loop():
+    """Drain the accelerometer FIFO every 50 ms into the stream detector."""
+    while monitoring_active:
+        try:
+            driving_mode = 'parking' if parking_mode_state['active'] else 'normal'
+            samples = incident_detector.simulate_imu_samples(
+                speed_kmh=vehicle_state['speed_kmh'],
+                driving_mode=driving_mode
+            )
+            incident_detector.process_imu_samples(
+                samples,
+                speed_kmh=vehicle_state['speed_kmh'],
+                location=vehicle_state['location']
+            )
+        
+        except Exception as e:
+            print(f"IMU error: {e}")
+        
+        time.sleep(0.05)
+
+
 def start_monitoring():
     """Start background monitoring."""
-    global monitoring_active, monitoring_thread
+    global monitoring_active, monitoring_thread, imu_thread
     
     if not monitoring_active:
         monitoring_active = True
         monitoring_thread = threading.Thread(target=monitoring_loop, daemon=True)
         monitoring_thread.start()
+        imu_thread = threading.Thread(target=imu_loop, daemon=True)
+        imu_thread.start()
         print("✓ Dashcam monitoring started")
 
 
@@ -286,12 +349,52 @@ def api_capture_snapshot():
         reason = data.get('reason', 'manual')
         
         camera_system = get_camera_system()
-        result = recorder.capture_snapshot(camera_system, reason=reason)
+        done = threading.Event()
+        completed = {}
+        
+        def finished(snapshot):
+            completed.update(snapshot)
+            done.set()
+        
+        result = recorder.capture_snapshot(camera_system, reason=reason, on_complete=finished)
         
         if result.get('ok'):
+            # The encode runs on the snapshot worker; wait for it so the
+            # response still reports the saved file and its previews
+            if done.wait(SNAPSHOT_WAIT_SECONDS):
+                result = completed
             snapshot_event = incident_detector.trigger_manual_snapshot(reason=reason)
         
-        return jsonify(result)
+        return jsonify(with_preview_urls(result))
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+def with_preview_urls(row):
+    """Add URLs for a row's small and medium preview thumbnails, when generated."""
+    for size in ('small', 'medium'):
+        digest = row.get(f'preview_{size}')
+        row[f'preview_{size}_url'] = f"/api/previews/{digest}.jpg" if digest else None
+    return row
+
+
+@app.route('/api/previews/<digest>.jpg')
+def api_get_preview(digest):
+    """Content-addressed thumbnail; the digest is the ETag and never changes."""
+    try:
+        store = recorder.snapshots.store
+        if not store.is_digest(digest):
+            return jsonify({'ok': False, 'error': 'Invalid preview id'}), 400
+        
+        path = store.path(digest)
+        if not path.exists():
+            return jsonify({'ok': False, 'error': 'Preview not found'}), 404
+        
+        response = send_file(path, mimetype='image/jpeg', etag=digest,
+                             conditional=True, max_age=31536000)
+        response.cache_control.immutable = True
+        return response
     
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -304,7 +407,8 @@ def api_get_incidents():
         limit = int(request.args.get('limit', 100))
         incident_type = request.args.get('type')
         
-        incidents = db.get_incidents(limit=limit, incident_type=incident_type)
+        incidents = [with_preview_urls(incident)
+                     for incident in db.get_incidents(limit=limit, incident_type=incident_type)]
         
         return jsonify({
             'ok': True,
@@ -380,7 +484,9 @@ def api_get_recordings():
         limit = int(request.args.get('limit', 100))
         protected_only = request.args.get('protected', 'false').lower() == 'true'
         
-        recordings = db.get_recordings(limit=limit, protected_only=protected_only)
+        recordings = [with_preview_urls(recording)
+                      for recording in db.get_recordings(limit=limit,
+                                                         protected_only=protected_only)]
         
         return jsonify({
             'ok': True,
@@ -392,6 +498,135 @@ def api_get_recordings():
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
+@app.route('/api/snapshots')
+def api_get_snapshots():
+    """Get snapshot list with preview URLs."""
+    try:
+        limit = int(request.args.get('limit', 100))
+        snapshots = [with_preview_urls(snapshot) for snapshot in db.get_snapshots(limit=limit)]
+        
+        return jsonify({
+            'ok': True,
+            'snapshots': snapshots,
+            'count': len(snapshots)
+        })
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds from epoch, ISO 8601, or a time of day (today)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    
+    if 'T' not in value and ' ' not in value and ':' in value:
+        value = f"{datetime.now().date().isoformat()}T{value}"
+    return datetime.fromisoformat(value).timestamp()
+
+
+def with_video_url(result):
+    """Add the ranged-download URL of the recording a locator result points into."""
+    result['video_url'] = f"/api/recordings/{result['recording_id']}/video"
+    return result
+
+
+@app.route('/api/recordings/seek')
+def api_seek_recording():
+    """Recording and byte range of the frame recorded at a given time."""
+    try:
+        try:
+            when = parse_time(request.args.get('time', ''))
+        except ValueError:
+            return jsonify({'ok': False,
+                            'error': 'time must be epoch seconds, ISO 8601 or HH:MM:SS'}), 400
+        
+        frame = recorder.frame_locator.seek(when)
+        if frame is None:
+            return jsonify({'ok': False, 'error': 'No footage at that time'}), 404
+        
+        return jsonify({'ok': True, 'frame': with_video_url(frame)})
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/recordings/seek/frame')
+def api_seek_frame():
+    """JPEG of the frame recorded at a given time, read with one ranged read."""
+    try:
+        try:
+            when = parse_time(request.args.get('time', ''))
+        except ValueError:
+            return jsonify({'ok': False,
+                            'error': 'time must be epoch seconds, ISO 8601 or HH:MM:SS'}), 400
+        
+        frame = recorder.frame_locator.seek(when)
+        if frame is None or frame['byte_range'] is None:
+            return jsonify({'ok': False, 'error': 'No indexed frame at that time'}), 404
+        
+        byte_range = frame['byte_range']
+        with open(frame['video_path'], 'rb') as f:
+            f.seek(byte_range['start'])
+            jpeg = f.read(byte_range['end'] - byte_range['start'] + 1)
+        
+        return app.response_class(jpeg, mimetype='image/jpeg')
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/recordings/near')
+def api_recordings_near():
+    """Clips recorded within a radius of a point."""
+    try:
+        try:
+            latitude = float(request.args['lat'])
+            longitude = float(request.args['lng'])
+            radius_m = float(request.args.get('radius', 200))
+            limit = int(request.args.get('limit', 50))
+            start = parse_time(request.args['start']) if request.args.get('start') else None
+            end = parse_time(request.args['end']) if request.args.get('end') else None
+        except (KeyError, ValueError):
+            return jsonify({'ok': False,
+                            'error': 'lat and lng required; '
+                                     'radius, limit, start, end must be valid'}), 400
+        
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius_m <= 0:
+            return jsonify({'ok': False, 'error': 'Invalid point or radius'}), 400
+        
+        clips = recorder.frame_locator.near(latitude, longitude, radius_m, start, end, limit)
+        
+        return jsonify({
+            'ok': True,
+            'clips': [with_video_url(clip) for clip in clips],
+            'count': len(clips)
+        })
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/recordings/<recording_id>/video')
+def api_recording_video(recording_id):
+    """Recording file; honors Range requests so indexed byte ranges can be fetched."""
+    try:
+        recording = db.get_recording(recording_id)
+        if not recording:
+            return jsonify({'ok': False, 'error': 'Recording not found'}), 404
+        
+        path = Path(recording['video_path']).resolve()
+        if recordings_dir.resolve() not in path.parents or not path.exists():
+            return jsonify({'ok': False, 'error': 'Recording file not available'}), 404
+        
+        return send_file(path, conditional=True)
+    
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
 @app.route('/api/recordings/<recording_id>/protect', methods=['POST'])
 def api_protect_recording(recording_id):
     """Mark recording as protected."""
@@ -400,6 +635,8 @@ def api_protect_recording(recording_id):
         protected = data.get('protected', True)
         
         success = db.set_recording_protected(recording_id, protected)
+        if success:
+            recorder.storage.set_protected(recording_id, protected)
         
         return jsonify({
             'ok': success,
@@ -479,26 +716,12 @@ def api_queue_cloud_upload():
         if not incident:
             return jsonify({'ok': False, 'error': 'Incident not found'}), 404
         
-        file_path = incident['video_clip_path']
-        file_size_mb = 5.0
-        
         result = cloud_backup.queue_upload(
             incident_id=incident_id,
-            file_path=file_path,
-            file_size_mb=file_size_mb,
+            file_path=incident['video_clip_path'],
             priority=data.get('priority', False)
         )
         
-        if result.get('ok'):
-            upload_id = result['upload_id']
-            db.create_cloud_upload(
-                upload_id=upload_id,
-                incident_id=incident_id,
-                file_path=file_path,
-                file_size_mb=file_size_mb,
-                wifi_connected=cloud_backup.wifi_connected
-            )
-        
         return jsonify(result)
     
     except Exception as e:
@@ -550,22 +773,38 @@ def api_set_parking_mode():
         data = request.json or {}
         active = data.get('active', False)
         
+        sensitivity = float(data.get('sensitivity', 0.7))
+        if not 0.0 <= sensitivity <= 1.0:
+            return jsonify({'ok': False, 'error': 'sensitivity must be between 0 and 1'}), 400
+        
         parking_mode_state['active'] = active
-        parking_mode_state['motion_sensitivity'] = data.get('sensitivity', 0.7)
+        parking_mode_state['motion_sensitivity'] = sensitivity
         parking_mode_state['time_lapse'] = data.get('time_lapse', False)
         
         if active:
             parking_mode_state['triggered_at'] = datetime.now().isoformat()
             db.set_setting('parking_mode_enabled', 'true')
+            db.set_setting('parking_mode_sensitivity', str(sensitivity))
+            
+            recorder.start_parking_mode(
+                camera_system=get_camera_system(),
+                camera_layout=data.get('camera_layout', 'front'),
+                sensitivity=sensitivity,
+                time_lapse=parking_mode_state['time_lapse'],
+                gps_tracker=get_gps_tracker(),
+                on_event=parking_event_callback
+            )
             
             if not monitoring_active:
                 start_monitoring()
         else:
             db.set_setting('parking_mode_enabled', 'false')
+            recorder.stop_parking_mode()
         
         return jsonify({
             'ok': True,
-            'parking_mode': parking_mode_state
+            'parking_mode': parking_mode_state,
+            'recorder': recorder.get_status()['parking']
         })
     
     except Exception as e:
@@ -605,6 +844,12 @@ def api_settings():
         else:
             data = request.json or {}
             
+            if 'pre_roll_seconds' in data:
+                try:
+                    recorder.set_pre_roll(float(data['pre_roll_seconds']))
+                except ValueError as e:
+                    return jsonify({'ok': False, 'error': str(e)}), 400
+            
             for key, value in data.items():
                 db.set_setting(key, str(value))
             
@@ -614,6 +859,9 @@ def api_settings():
             if 'cloud_backup_enabled' in data:
                 cloud_backup.set_enabled(data['cloud_backup_enabled'].lower() == 'true')
             
+            if 'cloud_bandwidth_kbps' in data:
+                cloud_backup.set_bandwidth_limit(float(data['cloud_bandwidth_kbps']))
+            
             if 'cloud_auto_upload_wifi' in data:
                 cloud_backup.set_auto_upload_wifi(data['cloud_auto_upload_wifi'].lower() == 'true')
             
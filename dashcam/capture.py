@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Multi-Camera Capture Pipeline
+Per-camera capture threads, timestamp synchronization, and staged compose/encode
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from services.dashcam.segments import encode_jpeg
+
+
+class CameraCapture:
+    """
+    Captures one camera on its own thread and keeps its last few frames
+    with monotonic timestamps, so a slow camera only delays itself.
+    """
+
+    def __init__(self, position: str, camera, fps: float, history: int = 8):
+        """
+        Args:
+            position: Camera position (front, rear, left, right)
+            camera: Object with generate_frame() -> PIL Image
+            fps: Target capture rate
+            history: Frames kept for timestamp matching
+        """
+        self.position = position
+        self.camera = camera
+        self.interval = 1.0 / fps
+
+        self._frames = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.captured = 0
+        self.errors = 0
+        self.last_capture_seconds = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.position}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        next_frame = time.monotonic()
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                frame = self.camera.generate_frame()
+                # Stamp the middle of the exposure/readout window
+                captured_at = (started + time.monotonic()) / 2
+                with self._lock:
+                    self._frames.append((captured_at, frame))
+                    self.captured += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Camera {self.position} capture error: {e}")
+            self.last_capture_seconds = time.monotonic() - started
+
+            next_frame += self.interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_frame = time.monotonic()
+
+    def nearest(self, target: float) -> Optional[Tuple[float, Image.Image]]:
+        """Buffered (timestamp, frame) closest to target."""
+        with self._lock:
+            if not self._frames:
+                return None
+            return min(self._frames, key=lambda item: abs(item[0] - target))
+
+
+class CapturePipeline:
+    """
+    Capture -> synchronize/compose -> encode, each stage on its own thread.
+
+    Every camera captures independently. A compose thread ticks at the
+    target frame rate, picks each camera's frame nearest to the tick
+    (delayed by one frame interval so a frame finishing just after the
+    tick can still be paired), composes and hands the image to the
+    encoder through a bounded queue. Encoded JPEGs wait in a second
+    bounded queue for the segment writer. A stage that cannot keep up
+    drops frames instead of stalling the others; every drop is counted.
+    A camera whose nearest frame is more than STALE_INTERVALS intervals
+    from the tick is composed as missing, so a stalled camera shows the
+    placeholder instead of a frozen view.
+    """
+
+    # Frames further than this many intervals from the tick are not used
+    STALE_INTERVALS = 2
+
+    def __init__(self, cameras: Dict[str, object],
+                 compose: Callable[[Dict[str, Optional[Image.Image]]], Image.Image],
+                 fps: float = 10, jpeg_quality: int = 85, compose_queue: int = 4,
+                 output_queue: Optional[int] = None):
+        """
+        Args:
+            cameras: Position -> camera object (None for a missing camera)
+            compose: Builds the recorded frame from position -> frame (None if unavailable)
+            fps: Target output frame rate
+            jpeg_quality: JPEG quality of encoded frames
+            compose_queue: Composed frames waiting for the encoder
+            output_queue: Encoded frames waiting for the writer (default 2 s worth)
+        """
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self.jpeg_quality = jpeg_quality
+        self.compose = compose
+
+        self.captures = {position: CameraCapture(position, camera, fps)
+                         for position, camera in cameras.items() if camera is not None}
+        self.missing = [position for position, camera in cameras.items() if camera is None]
+
+        self._encode_queue = queue.Queue(maxsize=compose_queue)
+        self._output = queue.Queue(maxsize=output_queue or max(4, int(fps * 2)))
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        # Wall clock = monotonic + offset, for timestamps written to segments
+        self._clock_offset = time.time() - time.monotonic()
+
+        self._stats_lock = threading.Lock()
+        self.composed = 0
+        self.encoded = 0
+        self.dropped = {'late': 0, 'encode_queue': 0, 'output_queue': 0}
+        self.stale_frames = {position: 0 for position in self.captures}
+        self.max_skew = 0.0
+
+    def start(self):
+        self._stop.clear()
+        for capture in self.captures.values():
+            capture.start()
+        for target, name in ((self._compose_loop, 'compose'), (self._encode_loop, 'encode')):
+            thread = threading.Thread(target=target, name=f"capture-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for capture in self.captures.values():
+            capture.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def get(self, timeout: float = 1.0) -> Optional[Tuple[float, bytes]]:
+        """Next encoded frame as (wall-clock timestamp, JPEG), or None on timeout."""
+        try:
+            return self._output.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _count_drop(self, stage: str, frames: int = 1):
+        with self._stats_lock:
+            self.dropped[stage] += frames
+
+    def _synchronize(self, target: float) -> Tuple[Dict[str, Optional[Image.Image]], float]:
+        """
+        Each camera's frame nearest to target (None when missing or stale)
+        and the spread of the used frames' timestamps.
+        """
+        frames = {position: None for position in self.missing}
+        stamps = []
+        for position, capture in self.captures.items():
+            found = capture.nearest(target)
+            if found is None:
+                frames[position] = None
+                continue
+            captured_at, frame = found
+            if abs(captured_at - target) > self.STALE_INTERVALS * self.interval:
+                with self._stats_lock:
+                    self.stale_frames[position] += 1
+                frames[position] = None
+                continue
+            frames[position] = frame
+            stamps.append(captured_at)
+        skew = max(stamps) - min(stamps) if len(stamps) > 1 else 0.0
+        return frames, skew
+
+    def _compose_loop(self):
+        next_tick = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+                if self._stop.is_set():
+                    break
+
+            tick = next_tick
+            frames, skew = self._synchronize(tick - self.interval)
+            try:
+                composed = self.compose(frames)
+            except Exception as e:
+                print(f"Frame compose error: {e}")
+                composed = None
+
+            if composed is not None:
+                with self._stats_lock:
+                    self.composed += 1
+                    self.max_skew = max(self.max_skew, skew)
+                try:
+                    self._encode_queue.put_nowait((tick, composed))
+                except queue.Full:
+                    self._count_drop('encode_queue')
+
+            next_tick += self.interval
+            behind = time.monotonic() - next_tick
+            if behind > 0:
+                # Skip the ticks that compose overran rather than bursting to catch up
+                missed = int(behind / self.interval) + 1
+                self._count_drop('late', missed)
+                next_tick += missed * self.interval
+
+    def _encode_loop(self):
+        while not self._stop.is_set():
+            try:
+                tick, composed = self._encode_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                jpeg = encode_jpeg(composed, self.jpeg_quality)
+            except Exception as e:
+                print(f"Frame encode error: {e}")
+                continue
+
+            with self._stats_lock:
+                self.encoded += 1
+            try:
+                self._output.put_nowait((tick + self._clock_offset, jpeg))
+            except queue.Full:
+                self._count_drop('output_queue')
+
+    def stats(self) -> Dict:
+        """Throughput, per-camera capture health and dropped frames by stage."""
+        with self._stats_lock:
+            return {
+                'target_fps': self.fps,
+                'composed': self.composed,
+                'encoded': self.encoded,
+                'dropped': dict(self.dropped),
+                'dropped_total': sum(self.dropped.values()),
+                'max_skew_ms': round(self.max_skew * 1000, 1),
+                'cameras': {
+                    position: {
+                        'captured': capture.captured,
+                        'errors': capture.errors,
+                        'stale': self.stale_frames[position],
+                        'last_capture_ms': round(capture.last_capture_seconds * 1000, 1)
+                    }
+                    for position, capture in self.captures.items()
+                },
+                'missing_cameras': list(self.missing),
+                'queued': {'encode': self._encode_queue.qsize(), 'output': self._output.qsize()}
+            }
@@ -1,36 +1,122 @@
 #!/usr/bin/env python3
 """
 Cloud Backup Module
-Simulates cloud storage and auto-upload functionality
+Chunked, resumable, prioritized uploads of dashcam incidents
 """
 
+import hashlib
+import heapq
+import math
+import os
 import uuid
 import time
 import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from typing import Dict, Optional, List, Callable
 from pathlib import Path
 
+import requests
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadFailed(Exception):
+    """An upload could not make progress after retrying."""
+
+
+class _UploadPaused(Exception):
+    """An upload stopped early and goes back to the queue with its offset."""
+
+
+class TokenBucket:
+    """
+    Bandwidth limiter shared by all chunk senders.
+    
+    Tokens are bytes refilled at rate per second up to one second of
+    burst. A sender takes a whole chunk at once and, if that drives the
+    bucket negative, sleeps until the debt is repaid.
+    """
+    
+    def __init__(self, rate_bytes: float = 0):
+        """
+        Args:
+            rate_bytes: Bytes per second (0 for unlimited)
+        """
+        self._lock = threading.Lock()
+        self.set_rate(rate_bytes)
+    
+    def set_rate(self, rate_bytes: float):
+        with self._lock:
+            self.rate = max(rate_bytes, 0)
+            self.tokens = self.rate
+            self.updated = time.monotonic()
+    
+    def consume(self, amount: int):
+        """Block until amount bytes may be sent."""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        
+        if delay:
+            time.sleep(delay)
+
 
 class CloudBackupService:
-    """Simulated cloud backup service for dashcam incidents."""
+    """
+    Cloud backup service for dashcam incidents.
     
-    def __init__(self, callback: Optional[Callable] = None):
+    Uploads wait in a priority queue persisted in dashcam_cloud_uploads
+    (incidents before routine clips, then oldest first) and survive
+    restarts. Each file is sent as fixed-size chunks, several in parallel,
+    each with a SHA-256 the server verifies; the server reports which
+    chunks it already holds, so an interrupted upload resumes instead of
+    restarting, and the contiguous byte offset is stored on the row.
+    Failed chunks retry with backoff, a Wi-Fi drop or a newly queued
+    incident pauses the current upload between chunks, and a token bucket
+    caps total bandwidth.
+    
+    Without an endpoint uploads stay queued. A LocalUploadServer plays
+    the part of the cloud provider only when use_local_server is set
+    (tests, benchmarks, development), since it stores every upload on
+    the same card as the recordings.
+    """
+    
+    def __init__(self, callback: Optional[Callable] = None, database=None,
+                 endpoint: Optional[str] = None, chunk_size: int = CHUNK_SIZE,
+                 parallel_chunks: int = 4, bandwidth_kbps: float = 0,
+                 max_retries: int = 5, max_attempts: int = 10,
+                 storage_dir: Optional[str] = None, use_local_server: bool = False):
         """
         Initialize cloud backup service.
         
         Args:
             callback: Optional callback for upload status updates
+            database: Optional DashcamDatabase persisting the queue and offsets
+            endpoint: Upload server base URL (a local stand-in server when omitted)
+            chunk_size: Bytes per chunk
+            parallel_chunks: Chunks in flight at once
+            bandwidth_kbps: Upload cap in kilobytes per second (0 for unlimited)
+            max_retries: Tries per chunk before the upload is paused
+            max_attempts: Paused tries per upload before it is marked failed
+            storage_dir: Where the local stand-in server keeps uploads
+            use_local_server: Start the local stand-in server when no endpoint is given
         """
         self.enabled = True
         self.auto_upload_wifi = True
         self.wifi_connected = False
         
-        self.upload_queue = []
         self.upload_history = []
         self.uploading = False
         
         self.callback = callback
+        self.db = database
         
         self.cloud_storage_used_mb = 0.0
         self.cloud_storage_limit_mb = 10240
@@ -38,6 +124,21 @@ class CloudBackupService:
         self.upload_thread = None
         self.upload_lock = threading.Lock()
         
+        self.endpoint = endpoint.rstrip('/') if endpoint else None
+        self.local_server = None
+        self.use_local_server = use_local_server
+        self.storage_dir = storage_dir or str(Path(__file__).parent / 'cloud_storage')
+        self.chunk_size = chunk_size
+        self.parallel_chunks = parallel_chunks
+        self.max_retries = max_retries
+        self.max_attempts = max_attempts
+        self.bandwidth = TokenBucket(bandwidth_kbps * 1024)
+        self._http = threading.local()
+        
+        self._items: Dict[str, Dict] = {}
+        self._heap = []
+        self._sequence = 0
+        
         self.cloud_providers = [
             'AWS S3',
             'Google Cloud Storage',
@@ -47,6 +148,50 @@ class CloudBackupService:
         ]
         
         self.selected_provider = 'AWS S3'
+        
+        self._load_queue()
+    
+    def _load_queue(self):
+        """Restore unfinished uploads from the database."""
+        if not self.db:
+            return
+        
+        for row in self.db.get_resumable_uploads():
+            item = {
+                'upload_id': row['upload_id'],
+                'incident_id': row['incident_id'],
+                'file_path': row['file_path'],
+                'file_size_mb': row['file_size_mb'],
+                'file_size_bytes': row['file_size_bytes'],
+                'status': 'queued',
+                'queued_at': row['created_at'],
+                'priority': row['priority'] == 0,
+                'bytes_uploaded': row['bytes_uploaded'] or 0,
+                'checksum': row['checksum'],
+                'attempts': row['attempts'] or 0,
+                'progress_percent': 0
+            }
+            if item['file_size_bytes']:
+                item['progress_percent'] = int(
+                    item['bytes_uploaded'] / item['file_size_bytes'] * 100
+                )
+            self._push(item)
+    
+    def _push(self, item: Dict):
+        """Add an item to the priority queue (lock held or during init)."""
+        self._sequence += 1
+        self._items[item['upload_id']] = item
+        rank = 0 if item['priority'] else 1
+        heapq.heappush(self._heap, (rank, self._sequence, item['upload_id']))
+    
+    def _peek(self) -> Optional[Dict]:
+        """Highest-priority queued item, discarding cancelled entries (lock held)."""
+        while self._heap:
+            item = self._items.get(self._heap[0][2])
+            if item and item['status'] == 'queued':
+                return item
+            heapq.heappop(self._heap)
+        return None
     
     def set_enabled(self, enabled: bool):
         """Enable or disable cloud backup."""
@@ -56,6 +201,10 @@ class CloudBackupService:
         """Enable or disable auto-upload on WiFi."""
         self.auto_upload_wifi = auto_upload
     
+    def set_bandwidth_limit(self, kbps: float):
+        """Cap upload bandwidth in kilobytes per second (0 for unlimited)."""
+        self.bandwidth.set_rate(kbps * 1024)
+    
     def set_wifi_connected(self, connected: bool):
         """Set WiFi connection status."""
         self.wifi_connected = connected
@@ -64,15 +213,15 @@ class CloudBackupService:
             self.start_upload_worker()
     
     def queue_upload(self, incident_id: str, file_path: str,
-                    file_size_mb: float, priority: bool = False) -> Dict:
+                    file_size_mb: float = None, priority: bool = False) -> Dict:
         """
         Queue a file for cloud upload.
         
         Args:
             incident_id: Associated incident ID
             file_path: Path to file to upload
-            file_size_mb: File size in MB
-            priority: Whether to prioritize this upload
+            file_size_mb: File size in MB (measured from the file when omitted)
+            priority: Incident footage; uploads before routine clips
         
         Returns:
             Upload info dict
@@ -80,24 +229,45 @@ class CloudBackupService:
         if not self.enabled:
             return {'ok': False, 'error': 'Cloud backup disabled'}
         
+        try:
+            file_size_bytes = os.path.getsize(file_path)
+        except OSError:
+            return {'ok': False, 'error': 'File not found'}
+        
         upload_id = f"upload_{uuid.uuid4().hex[:12]}"
         
         upload_item = {
             'upload_id': upload_id,
             'incident_id': incident_id,
             'file_path': file_path,
-            'file_size_mb': file_size_mb,
+            'file_size_mb': file_size_mb if file_size_mb is not None
+            else file_size_bytes / (1024 * 1024),
+            'file_size_bytes': file_size_bytes,
             'status': 'queued',
             'queued_at': datetime.now().isoformat(),
             'priority': priority,
+            'bytes_uploaded': 0,
+            'checksum': None,
+            'attempts': 0,
             'progress_percent': 0
         }
         
+        if self.db:
+            self.db.create_cloud_upload(
+                upload_id=upload_id,
+                incident_id=incident_id,
+                file_path=file_path,
+                file_size_mb=upload_item['file_size_mb'],
+                wifi_connected=self.wifi_connected,
+                priority=0 if priority else 1,
+                file_size_bytes=file_size_bytes,
+                chunk_size=self.chunk_size
+            )
+        
         with self.upload_lock:
-            if priority:
-                self.upload_queue.insert(0, upload_item)
-            else:
-                self.upload_queue.append(upload_item)
+            self._push(upload_item)
+            position = next(i for i, item in enumerate(self._queued())
+                            if item['upload_id'] == upload_id) + 1
         
         if self.wifi_connected and self.auto_upload_wifi and not self.uploading:
             self.start_upload_worker()
@@ -106,9 +276,14 @@ class CloudBackupService:
             'ok': True,
             'upload_id': upload_id,
             'status': 'queued',
-            'queue_position': len(self.upload_queue)
+            'queue_position': position
         }
     
+    def _queued(self) -> List[Dict]:
+        """Queued items in upload order (lock held)."""
+        return [self._items[upload_id] for _, _, upload_id in sorted(self._heap)
+                if self._items.get(upload_id, {}).get('status') == 'queued']
+    
     def start_upload_worker(self):
         """Start background upload worker thread."""
         if self.upload_thread and self.upload_thread.is_alive():
@@ -120,101 +295,319 @@ class CloudBackupService:
         )
         self.upload_thread.start()
     
+    def _can_upload(self) -> bool:
+        if self.endpoint is None and not self.use_local_server:
+            return False
+        return self.enabled and (self.wifi_connected or not self.auto_upload_wifi)
+    
     def _upload_worker(self):
-        """Background worker that processes upload queue."""
+        """Background worker that sends queued uploads in priority order."""
         self.uploading = True
         
-        while True:
-            with self.upload_lock:
-                if not self.upload_queue:
-                    self.uploading = False
-                    break
+        try:
+            while True:
+                with self.upload_lock:
+                    if not self._can_upload():
+                        break
+                    
+                    upload_item = self._peek()
+                    if upload_item is None:
+                        break
+                    
+                    heapq.heappop(self._heap)
+                    upload_item['status'] = 'uploading'
                 
-                if not self.wifi_connected and self.auto_upload_wifi:
-                    self.uploading = False
-                    break
+                result = self._upload(upload_item)
                 
-                upload_item = self.upload_queue.pop(0)
-            
-            result = self._simulate_upload(upload_item)
-            
-            with self.upload_lock:
-                self.upload_history.append(result)
+                if result['status'] in ('completed', 'failed', 'cancelled'):
+                    with self.upload_lock:
+                        self._items.pop(result['upload_id'], None)
+                        self.upload_history.append(result)
+                        
+                        if len(self.upload_history) > 100:
+                            self.upload_history = self.upload_history[-100:]
+                    
+                    if self.callback:
+                        self.callback(result)
                 
-                if len(self.upload_history) > 100:
-                    self.upload_history = self.upload_history[-100:]
-            
-            if self.callback:
-                self.callback(result)
-            
-            time.sleep(0.5)
+                elif result['status'] == 'queued' and result.get('last_error'):
+                    # Back off before retrying a failing upload
+                    time.sleep(min(2 ** result['attempts'], 60))
+        
+        finally:
+            self.uploading = False
+    
+    def _session(self) -> requests.Session:
+        """One HTTP session (keep-alive connection) per sending thread."""
+        session = getattr(self._http, 'session', None)
+        if session is None:
+            session = self._http.session = requests.Session()
+        return session
     
-    def _simulate_upload(self, upload_item: Dict) -> Dict:
+    def _endpoint(self) -> str:
+        if self.endpoint is None:
+            from services.dashcam.upload_server import LocalUploadServer
+            self.local_server = LocalUploadServer(self.storage_dir).start()
+            self.endpoint = self.local_server.url
+        return self.endpoint
+    
+    def _save_progress(self, upload_item: Dict, **fields):
+        if self.db:
+            try:
+                self.db.update_cloud_upload_progress(upload_item['upload_id'], **fields)
+            except Exception as e:
+                print(f"Upload progress save error: {e}")
+    
+    @staticmethod
+    def _file_checksum(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _upload(self, upload_item: Dict) -> Dict:
         """
-        Simulate file upload to cloud storage.
-        
-        Args:
-            upload_item: Upload item from queue
-        
-        Returns:
-            Upload result dict
+        Send one file; returns the item with status completed, failed,
+        cancelled, or queued (paused, to resume from its offset).
         """
         upload_id = upload_item['upload_id']
-        file_size_mb = upload_item['file_size_mb']
-        
-        upload_item['status'] = 'uploading'
-        upload_item['started_at'] = datetime.now().isoformat()
+        upload_item['started_at'] = upload_item.get('started_at') or datetime.now().isoformat()
+        self._save_progress(upload_item, upload_status='uploading')
+        started = time.monotonic()
         
-        upload_speed_mbps = 5.0
-        upload_duration = file_size_mb / upload_speed_mbps
+        try:
+            endpoint = self._endpoint()
+            size = os.path.getsize(upload_item['file_path'])
+            if size != upload_item.get('file_size_bytes') or not upload_item.get('checksum'):
+                upload_item['file_size_bytes'] = size
+                upload_item['checksum'] = self._file_checksum(upload_item['file_path'])
+                self._save_progress(upload_item, file_size_bytes=size,
+                                    checksum=upload_item['checksum'])
+            
+            opened = self._call('post', f"{endpoint}/uploads", json={
+                'upload_id': upload_id,
+                'file_name': os.path.basename(upload_item['file_path']),
+                'size': size,
+                'chunk_size': self.chunk_size
+            })
+            
+            total_chunks = max(1, math.ceil(size / self.chunk_size))
+            # The server's received set is authoritative: resume from it, and
+            # reset a stored offset the server no longer holds
+            done = set(opened.get('received', []))
+            upload_item['_contiguous'] = 0
+            self._record_offset(upload_item, total_chunks, done)
+            self._send_chunks(upload_item, endpoint, total_chunks, done)
+            
+            completed = self._call('post', f"{endpoint}/uploads/{upload_id}/complete",
+                                   json={'sha256': upload_item['checksum']})
         
-        steps = 10
-        for i in range(steps):
-            upload_item['progress_percent'] = int((i + 1) / steps * 100)
-            time.sleep(upload_duration / steps)
+        except _UploadPaused as e:
+            upload_item['status'] = 'cancelled' if str(e) == 'cancelled' else 'queued'
+            upload_item['paused_reason'] = str(e)
+            with self.upload_lock:
+                if upload_item['status'] == 'queued':
+                    self._push(upload_item)
+            self._save_progress(upload_item, upload_status='cancelled' if
+                                upload_item['status'] == 'cancelled' else 'pending')
+            return upload_item
         
-        cloud_url = f"https://{self.selected_provider.lower().replace(' ', '-')}.com/dashcam/{upload_id}"
+        except (UploadFailed, OSError) as e:
+            upload_item['attempts'] = upload_item.get('attempts', 0) + 1
+            upload_item['last_error'] = str(e)
+            print(f"Upload {upload_id} error: {e}")
+            
+            if upload_item['attempts'] >= self.max_attempts or isinstance(e, OSError):
+                upload_item['status'] = 'failed'
+                self._save_progress(upload_item, upload_status='failed',
+                                    attempts=upload_item['attempts'], last_error=str(e))
+                return upload_item
+            
+            upload_item['status'] = 'queued'
+            with self.upload_lock:
+                self._push(upload_item)
+            self._save_progress(upload_item, upload_status='pending',
+                                attempts=upload_item['attempts'], last_error=str(e))
+            return upload_item
         
         upload_item.update({
             'status': 'completed',
-            'cloud_url': cloud_url,
+            'cloud_url': completed.get('url'),
             'completed_at': datetime.now().isoformat(),
-            'upload_duration_seconds': upload_duration,
-            'progress_percent': 100
+            'upload_duration_seconds': round(time.monotonic() - started, 2),
+            'bytes_uploaded': size,
+            'progress_percent': 100,
+            'last_error': None
         })
         
-        self.cloud_storage_used_mb += file_size_mb
+        self.cloud_storage_used_mb += upload_item['file_size_mb']
+        self._save_progress(upload_item, bytes_uploaded=size, last_error=None)
+        if self.db:
+            self.db.update_cloud_upload(upload_id, 'completed', cloud_url=upload_item['cloud_url'])
         
         return upload_item
     
+    def _call(self, method: str, url: str, **kwargs) -> Dict:
+        """Control request with retries; raises UploadFailed."""
+        for attempt in range(self.max_retries):
+            try:
+                response = self._session().request(method, url, timeout=30, **kwargs)
+                if response.status_code < 500:
+                    data = response.json()
+                    if response.ok:
+                        return data
+                    raise UploadFailed(data.get('error', f"HTTP {response.status_code}"))
+            except (requests.RequestException, ValueError):
+                pass
+            time.sleep(min(0.25 * 2 ** attempt, 10))
+        
+        raise UploadFailed(f"{method.upper()} {url} failed after {self.max_retries} tries")
+    
+    def _pause_reason(self, upload_item: Dict) -> Optional[str]:
+        """Why the current upload should stop between chunks, if it should."""
+        if upload_item.get('cancel_requested'):
+            return 'cancelled'
+        if not self._can_upload():
+            return 'wifi_disconnected'
+        if not upload_item['priority']:
+            with self.upload_lock:
+                waiting = self._peek()
+            if waiting and waiting['priority']:
+                return 'preempted'
+        return None
+    
+    def _send_chunks(self, upload_item: Dict, endpoint: str, total_chunks: int, done: set):
+        """Send missing chunks with parallel_chunks in flight, recording the offset as they land."""
+        pending = iter([i for i in range(total_chunks) if i not in done])
+        in_flight = {}
+        error = None
+        reason = None
+        
+        with ThreadPoolExecutor(max_workers=self.parallel_chunks,
+                                thread_name_prefix='upload-chunk') as pool:
+            while True:
+                while error is None and reason is None and len(in_flight) < self.parallel_chunks:
+                    index = next(pending, None)
+                    if index is None:
+                        break
+                    future = pool.submit(self._send_chunk, upload_item, endpoint, index)
+                    in_flight[future] = index
+                
+                if not in_flight:
+                    break
+                
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = in_flight.pop(future)
+                    try:
+                        future.result()
+                    except UploadFailed as e:
+                        error = error or e
+                        continue
+                    except _UploadPaused as e:
+                        reason = reason or str(e)
+                        continue
+                    done.add(index)
+                
+                self._record_offset(upload_item, total_chunks, done)
+                reason = reason or self._pause_reason(upload_item)
+        
+        if error:
+            raise error
+        if reason:
+            raise _UploadPaused(reason)
+    
+    def _record_offset(self, upload_item: Dict, total_chunks: int, done: set):
+        """Persist the contiguous byte offset acknowledged by the server."""
+        contiguous = upload_item.get('_contiguous', 0)
+        while contiguous < total_chunks and contiguous in done:
+            contiguous += 1
+        upload_item['_contiguous'] = contiguous
+        
+        size = upload_item['file_size_bytes']
+        offset = min(contiguous * self.chunk_size, size)
+        sent = min(len(done) * self.chunk_size, size)
+        upload_item['progress_percent'] = int(sent / size * 100) if size else 100
+        
+        if offset != upload_item.get('bytes_uploaded'):
+            upload_item['bytes_uploaded'] = offset
+            self._save_progress(upload_item, bytes_uploaded=offset)
+    
+    def _send_chunk(self, upload_item: Dict, endpoint: str, index: int):
+        """PUT one chunk with its SHA-256, retrying with backoff."""
+        offset = index * self.chunk_size
+        url = f"{endpoint}/uploads/{upload_item['upload_id']}/chunks/{index}"
+        
+        for attempt in range(self.max_retries):
+            if upload_item.get('cancel_requested'):
+                raise _UploadPaused('cancelled')
+            if not self._can_upload():
+                raise _UploadPaused('wifi_disconnected')
+            
+            with open(upload_item['file_path'], 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+            
+            self.bandwidth.consume(len(chunk))
+            try:
+                response = self._session().put(
+                    url, data=chunk, timeout=60,
+                    headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest(),
+                             'Content-Type': 'application/octet-stream'}
+                )
+                if response.ok:
+                    return
+                if response.status_code == 404:
+                    raise UploadFailed('Upload session expired')
+            except requests.RequestException:
+                pass
+            
+            time.sleep(min(0.25 * 2 ** attempt, 10))
+        
+        raise UploadFailed(f"Chunk {index} failed after {self.max_retries} tries")
+    
     def cancel_upload(self, upload_id: str) -> bool:
         """Cancel a queued or in-progress upload."""
         with self.upload_lock:
-            for i, item in enumerate(self.upload_queue):
-                if item['upload_id'] == upload_id:
-                    item['status'] = 'cancelled'
-                    self.upload_queue.pop(i)
-                    return True
+            item = self._items.get(upload_id)
+            if item is None:
+                return False
+            
+            if item['status'] == 'uploading':
+                # Stops between chunks; the worker records the cancellation
+                item['cancel_requested'] = True
+                return True
+            
+            item['status'] = 'cancelled'
+            self._items.pop(upload_id)
+            self.upload_history.append(item)
         
-        return False
+        self._save_progress(item, upload_status='cancelled')
+        return True
+    
+    @staticmethod
+    def _public(item: Dict) -> Dict:
+        return {key: value for key, value in item.items() if not key.startswith('_')}
     
     def get_upload_status(self, upload_id: str) -> Optional[Dict]:
         """Get status of a specific upload."""
         with self.upload_lock:
-            for item in self.upload_queue:
-                if item['upload_id'] == upload_id:
-                    return item.copy()
+            item = self._items.get(upload_id)
+            if item:
+                return self._public(item)
             
             for item in self.upload_history:
                 if item['upload_id'] == upload_id:
-                    return item.copy()
+                    return self._public(item)
         
         return None
     
     def get_queue(self) -> List[Dict]:
-        """Get current upload queue."""
+        """Get current upload queue: the upload in progress, then queued items in order."""
         with self.upload_lock:
-            return [item.copy() for item in self.upload_queue]
+            active = [item for item in self._items.values() if item['status'] == 'uploading']
+            return [self._public(item) for item in active + self._queued()]
     
     def get_upload_history(self, limit: int = 50) -> List[Dict]:
         """Get upload history."""
@@ -251,6 +644,10 @@ class CloudBackupService:
             'auto_upload_wifi': self.auto_upload_wifi,
             'wifi_connected': self.wifi_connected,
             'uploading': self.uploading,
-            'queue_size': len(self.upload_queue),
+            'queue_size': len(self._items),
+            'endpoint': self.endpoint,
+            'chunk_size': self.chunk_size,
+            'parallel_chunks': self.parallel_chunks,
+            'bandwidth_kbps': round(self.bandwidth.rate / 1024, 1),
             'cloud_storage': self.get_cloud_storage_stats()
         }
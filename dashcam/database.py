@@ -124,11 +124,89 @@ class DashcamDatabase:
             ON dashcam_incidents(incident_type)
         """)
         
+        self._ensure_columns(cursor, 'dashcam_cloud_uploads', {
+            'priority': 'INTEGER DEFAULT 1',
+            'file_size_bytes': 'INTEGER',
+            'chunk_size': 'INTEGER',
+            'bytes_uploaded': 'INTEGER DEFAULT 0',
+            'checksum': 'TEXT',
+            'attempts': 'INTEGER DEFAULT 0',
+            'last_error': 'TEXT'
+        })
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dashcam_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                snapshot_id TEXT UNIQUE NOT NULL,
+                snapshot_path TEXT NOT NULL,
+                reason TEXT DEFAULT 'manual',
+                file_size_mb REAL,
+                preview_small TEXT,
+                preview_medium TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_dashcam_snapshots_created 
+            ON dashcam_snapshots(created_at)
+        """)
+        
+        for table in ('dashcam_recordings', 'dashcam_incidents'):
+            self._ensure_columns(cursor, table, {
+                'preview_small': 'TEXT',
+                'preview_medium': 'TEXT'
+            })
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_dashcam_cloud_uploads_queue 
+            ON dashcam_cloud_uploads(upload_status, priority, created_at)
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dashcam_frame_index (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recording_id TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                frame_number INTEGER,
+                byte_offset INTEGER,
+                byte_size INTEGER,
+                latitude REAL,
+                longitude REAL,
+                speed_kmh REAL,
+                geo_cell INTEGER
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_dashcam_frame_index_time 
+            ON dashcam_frame_index(timestamp)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_dashcam_frame_index_cell 
+            ON dashcam_frame_index(geo_cell, timestamp)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_dashcam_frame_index_recording 
+            ON dashcam_frame_index(recording_id)
+        """)
+        
         self._init_default_settings(cursor)
         
         conn.commit()
         conn.close()
     
+    def _ensure_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Add columns introduced after the table was first created."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    
     def _init_default_settings(self, cursor):
         """Initialize default settings."""
         default_settings = {
@@ -145,6 +223,8 @@ class DashcamDatabase:
             'storage_alert_threshold_gb': '10',
             'timestamp_overlay': 'true',
             'gps_overlay': 'true',
+            'pre_roll_seconds': '15',
+            'cloud_bandwidth_kbps': '0',
             'continuous_recording': 'true'
         }
         
@@ -347,6 +427,21 @@ class DashcamDatabase:
             return dict(row)
         return None
     
+    def get_recording_files(self) -> List[Dict]:
+        """Get recording_id, video_path and protected for every recording."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT recording_id, video_path, protected FROM dashcam_recordings
+        """)
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     def delete_recording(self, recording_id: str) -> bool:
         """Delete a recording (only if not protected)."""
         conn = sqlite3.connect(self.db_path)
@@ -358,11 +453,180 @@ class DashcamDatabase:
         """, (recording_id,))
         
         deleted = cursor.rowcount > 0
+        if deleted:
+            cursor.execute("""
+                DELETE FROM dashcam_frame_index WHERE recording_id = ?
+            """, (recording_id,))
         conn.commit()
         conn.close()
         
         return deleted
     
+    def set_recording_previews(self, recording_id: str, small: str, medium: str) -> bool:
+        """Attach content-addressed preview digests to a recording."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE dashcam_recordings 
+            SET preview_small = ?, preview_medium = ?
+            WHERE recording_id = ?
+        """, (small, medium, recording_id))
+        
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return success
+    
+    def set_incident_previews(self, incident_id: str, small: str, medium: str,
+                              thumbnail_path: str = None) -> bool:
+        """Attach content-addressed preview digests to an incident."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE dashcam_incidents 
+            SET preview_small = ?, preview_medium = ?,
+                thumbnail_path = COALESCE(?, thumbnail_path)
+            WHERE incident_id = ?
+        """, (small, medium, thumbnail_path, incident_id))
+        
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return success
+    
+    def create_snapshot(self, snapshot_id: str, snapshot_path: str, reason: str,
+                        file_size_mb: float, small: str = None, medium: str = None) -> bool:
+        """Record a saved snapshot and its preview digests."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT INTO dashcam_snapshots 
+                (snapshot_id, snapshot_path, reason, file_size_mb, preview_small, preview_medium)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (snapshot_id, snapshot_path, reason, file_size_mb, small, medium))
+            conn.commit()
+            success = True
+        except sqlite3.IntegrityError:
+            success = False
+        
+        conn.close()
+        return success
+    
+    def get_snapshots(self, limit: int = 100) -> List[Dict]:
+        """Get snapshots, newest first."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM dashcam_snapshots 
+            ORDER BY created_at DESC, id DESC 
+            LIMIT ?
+        """, (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_preview_digests(self) -> set:
+        """Every preview digest still referenced by a recording, incident or snapshot."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        digests = set()
+        for table in ('dashcam_recordings', 'dashcam_incidents', 'dashcam_snapshots'):
+            cursor.execute(f"""
+                SELECT preview_small, preview_medium FROM {table}
+                WHERE preview_small IS NOT NULL
+            """)
+            for small, medium in cursor.fetchall():
+                digests.update((small, medium))
+        
+        conn.close()
+        return digests
+    
+    def add_frame_index(self, recording_id: str, records: List[Dict]):
+        """Insert a segment's frame index records (timestamp, offsets, GPS fix)."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany("""
+            INSERT INTO dashcam_frame_index 
+            (recording_id, timestamp, frame_number, byte_offset, byte_size,
+             latitude, longitude, speed_kmh, geo_cell)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(recording_id, r['timestamp'], r['frame_number'], r['byte_offset'],
+               r['byte_size'], r['latitude'], r['longitude'], r['speed_kmh'],
+               r.get('geo_cell')) for r in records])
+        
+        conn.commit()
+        conn.close()
+    
+    def find_frame_at(self, timestamp: float) -> Optional[Dict]:
+        """Latest frame index record at or before timestamp, with its video path."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT f.*, r.video_path FROM dashcam_frame_index f
+            JOIN dashcam_recordings r ON r.recording_id = f.recording_id
+            WHERE f.timestamp <= ?
+            ORDER BY f.timestamp DESC
+            LIMIT 1
+        """, (timestamp,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return dict(row)
+        return None
+    
+    def find_frames_in_box(self, min_lat: float, max_lat: float,
+                           min_lng: float, max_lng: float,
+                           start: float = None, end: float = None,
+                           cells: List[int] = None) -> List[Dict]:
+        """
+        Frame index records with a GPS fix inside a lat/lng box (and time window).
+        
+        cells, the grid cells covering the box, turns the search into index
+        lookups; without it the latitude/longitude range is scanned.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        query = """
+            SELECT f.*, r.video_path FROM dashcam_frame_index f
+            JOIN dashcam_recordings r ON r.recording_id = f.recording_id
+            WHERE f.latitude BETWEEN ? AND ? AND f.longitude BETWEEN ? AND ?
+        """
+        params = [min_lat, max_lat, min_lng, max_lng]
+        
+        if cells:
+            query += f" AND f.geo_cell IN ({','.join('?' * len(cells))})"
+            params.extend(cells)
+        if start is not None:
+            query += " AND f.timestamp >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND f.timestamp <= ?"
+            params.append(end)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     def delete_old_recordings(self, keep_count: int = 100) -> int:
         """Delete old unprotected recordings, keeping only recent ones."""
         conn = sqlite3.connect(self.db_path)
@@ -405,18 +669,19 @@ class DashcamDatabase:
     
     def create_cloud_upload(self, upload_id: str, incident_id: str,
                            file_path: str, file_size_mb: float,
-                           wifi_connected: bool = False) -> int:
-        """Create cloud upload entry."""
+                           wifi_connected: bool = False, priority: int = 1,
+                           file_size_bytes: int = None, chunk_size: int = None) -> int:
+        """Create cloud upload entry (priority 0 uploads before 1)."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
             INSERT INTO dashcam_cloud_uploads 
             (upload_id, incident_id, file_path, file_size_mb, wifi_connected,
-             upload_status, created_at)
-            VALUES (?, ?, ?, ?, ?, 'pending', ?)
+             upload_status, priority, file_size_bytes, chunk_size, created_at)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?, ?)
         """, (upload_id, incident_id, file_path, file_size_mb, wifi_connected,
-              datetime.now().isoformat()))
+              priority, file_size_bytes, chunk_size, datetime.now().isoformat()))
         
         upload_db_id = cursor.lastrowid
         conn.commit()
@@ -446,6 +711,43 @@ class DashcamDatabase:
         conn.commit()
         conn.close()
     
+    def update_cloud_upload_progress(self, upload_id: str, **fields):
+        """Update resume state: bytes_uploaded, checksum, attempts, last_error, upload_status."""
+        allowed = {'bytes_uploaded', 'checksum', 'attempts', 'last_error', 'upload_status',
+                   'file_size_bytes', 'chunk_size'}
+        updates = {key: value for key, value in fields.items() if key in allowed}
+        if not updates:
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        assignments = ', '.join(f"{key} = ?" for key in updates)
+        cursor.execute(
+            f"UPDATE dashcam_cloud_uploads SET {assignments} WHERE upload_id = ?",
+            list(updates.values()) + [upload_id]
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_resumable_uploads(self) -> List[Dict]:
+        """Uploads still to send, highest priority then oldest first."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM dashcam_cloud_uploads 
+            WHERE upload_status IN ('pending', 'uploading')
+            ORDER BY priority ASC, created_at ASC
+        """)
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     def get_pending_uploads(self, wifi_only: bool = False) -> List[Dict]:
         """Get pending cloud uploads."""
         conn = sqlite3.connect(self.db_path)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Frame Index
+Per-segment sidecar of frame byte offsets, timestamps and GPS fixes, and
+time/place queries over the indexed rows
+"""
+
+import math
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+FRAME_INDEX_EXTENSION = '.tidx'
+
+# timestamp, frame number, byte offset, byte size, latitude, longitude, speed
+# (offset/size -1 when the container cannot report them, NaN for no GPS fix)
+FRAME_INDEX_RECORD = struct.Struct('<dIqiddf')
+
+EARTH_RADIUS_M = 6371008.8
+
+# Grid cells (~550 m of latitude) that GPS fixes are bucketed into for radius search
+GEO_CELL_DEGREES = 0.005
+GEO_CELL_COLUMNS = int(360 / GEO_CELL_DEGREES)
+MAX_QUERY_CELLS = 64
+
+
+def geo_cell(latitude: float, longitude: float) -> int:
+    """Grid cell id of a point."""
+    row = int((latitude + 90) // GEO_CELL_DEGREES)
+    column = int((longitude + 180) // GEO_CELL_DEGREES)
+    return row * GEO_CELL_COLUMNS + column
+
+
+def geo_cells(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> List[int]:
+    """Ids of every grid cell overlapping a lat/lng box."""
+    first, last = geo_cell(min_lat, min_lng), geo_cell(max_lat, max_lng)
+    rows = range(first // GEO_CELL_COLUMNS, last // GEO_CELL_COLUMNS + 1)
+    columns = range(first % GEO_CELL_COLUMNS, last % GEO_CELL_COLUMNS + 1)
+    return [row * GEO_CELL_COLUMNS + column for row in rows for column in columns]
+
+
+class GpsSampler:
+    """
+    GPS fix to stamp frames with, read from locate() at most once per
+    interval so a 10 fps stream does not poll the receiver every frame.
+    Frames carry the fix from when they were captured, so footage written
+    later (incident pre-roll) is indexed where it was recorded.
+    """
+
+    def __init__(self, locate: Callable[[], Optional[Dict]], interval: float = 1.0):
+        """
+        Args:
+            locate: Returns the current GPS location dict (latitude, longitude, speed_kmh)
+            interval: Seconds a fix is reused for
+        """
+        self.locate = locate
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._fix: Optional[Dict] = None
+        self._read_at: Optional[float] = None
+
+    def fix(self, now: Optional[float] = None) -> Optional[Dict]:
+        """Fix current at epoch time now (None when GPS is unavailable)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._read_at is None or abs(now - self._read_at) >= self.interval:
+                self._read_at = now
+                try:
+                    self._fix = self.locate() or None
+                except Exception as e:
+                    print(f"Frame index GPS error: {e}")
+                    self._fix = None
+            return self._fix
+
+
+class FrameIndexWriter:
+    """
+    Appends one record every cadence seconds of footage while a segment is
+    written. The sidecar is flushed and fsynced with the segment, so it is
+    as durable as the video it describes; on close its records are loaded
+    into dashcam_frame_index.
+    """
+
+    def __init__(self, path_base: Path, cadence: float = 1.0,
+                 locate: Optional[Callable[[], Optional[Dict]]] = None):
+        """
+        Args:
+            path_base: Segment path without extension
+            cadence: Seconds of footage between records
+            locate: Returns the current GPS location dict (latitude, longitude, speed_kmh),
+                read for frames written without their own fix
+        """
+        self.path = Path(f'{path_base}{FRAME_INDEX_EXTENSION}')
+        self.cadence = cadence
+        self.locate = locate
+
+        self._file = open(self.path, 'wb')
+        self._next = None
+        self.records = 0
+
+    def add(self, timestamp: float, frame_number: int, location: Optional[Tuple[int, int]],
+            fix: Optional[Dict] = None):
+        """
+        Called for every frame written; records one when the cadence is due.
+
+        fix is the GPS fix from when the frame was captured ({} for none);
+        when omitted, locate() is read now.
+        """
+        if self._next is not None and timestamp < self._next:
+            return
+        self._next = timestamp + self.cadence
+
+        offset, size = location if location else (-1, -1)
+        if fix is None and self.locate:
+            try:
+                fix = self.locate()
+            except Exception as e:
+                print(f"Frame index GPS error: {e}")
+        fix = fix or {}
+        lat = fix.get('latitude', math.nan)
+        lng = fix.get('longitude', math.nan)
+        speed = fix.get('speed_kmh', math.nan)
+
+        self._file.write(FRAME_INDEX_RECORD.pack(timestamp, frame_number, offset, size,
+                                                 lat, lng, speed))
+        self.records += 1
+
+    def sync(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+            if not self.records:
+                self.path.unlink(missing_ok=True)
+
+
+def read_frame_index(path) -> List[Dict]:
+    """Records of a sidecar file, as dicts with None for unknown values."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    usable = len(data) - len(data) % FRAME_INDEX_RECORD.size
+    records = []
+    for timestamp, frame, offset, size, lat, lng, speed in \
+            FRAME_INDEX_RECORD.iter_unpack(data[:usable]):
+        located = not (math.isnan(lat) or math.isnan(lng))
+        records.append({
+            'timestamp': timestamp,
+            'frame_number': frame,
+            'byte_offset': offset if offset >= 0 else None,
+            'byte_size': size if size >= 0 else None,
+            'latitude': None if math.isnan(lat) else lat,
+            'longitude': None if math.isnan(lng) else lng,
+            'speed_kmh': None if math.isnan(speed) else round(speed, 2),
+            'geo_cell': geo_cell(lat, lng) if located else None
+        })
+    return records
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _byte_range(first: Dict, last: Dict) -> Optional[Dict]:
+    if first['byte_offset'] is None or last['byte_offset'] is None:
+        return None
+    start = first['byte_offset']
+    end = last['byte_offset'] + last['byte_size'] - 1
+    return {'start': start, 'end': end, 'header': f"bytes={start}-{end}"}
+
+
+class FrameLocator:
+    """
+    Answers "what was recorded at this moment" and "which clips passed near
+    this point" from dashcam_frame_index alone, without opening any video
+    file. Seeking is one descending range scan of the timestamp index.
+    Radius search looks up the few ~550 m grid cells around the point
+    (fixes carry their cell id) and refines them with the haversine
+    distance, so both cost about the same however large the archive is.
+    """
+
+    def __init__(self, database):
+        """
+        Args:
+            database: DashcamDatabase with the frame index tables
+        """
+        self.db = database
+
+    def index_segment(self, recording_id: str, sidecar_path) -> int:
+        """Load a finished segment's sidecar into the database; returns rows added."""
+        records = read_frame_index(sidecar_path)
+        if records:
+            self.db.add_frame_index(recording_id, records)
+        return len(records)
+
+    def seek(self, when: float, max_gap: float = 2.0) -> Optional[Dict]:
+        """
+        Frame recorded at (or just before) epoch time when.
+
+        Args:
+            when: Epoch seconds
+            max_gap: Largest distance to the nearest index record still counted as covered
+
+        Returns:
+            Recording, frame number, timestamp and byte range of that frame, or None
+        """
+        row = self.db.find_frame_at(when)
+        if row is None or when - row['timestamp'] > max_gap:
+            return None
+
+        return {
+            'recording_id': row['recording_id'],
+            'video_path': row['video_path'],
+            'timestamp': row['timestamp'],
+            'frame_number': row['frame_number'],
+            'offset_seconds': round(when - row['timestamp'], 3),
+            'location': {'latitude': row['latitude'], 'longitude': row['longitude']}
+            if row['latitude'] is not None else None,
+            'byte_range': _byte_range(row, row)
+        }
+
+    def near(self, latitude: float, longitude: float, radius_m: float = 200,
+             start: Optional[float] = None, end: Optional[float] = None,
+             limit: int = 50) -> List[Dict]:
+        """
+        Clips with GPS fixes within radius_m of a point, newest first.
+
+        Args:
+            latitude: Point latitude
+            longitude: Point longitude
+            radius_m: Search radius in meters
+            start: Optional earliest epoch time
+            end: Optional latest epoch time
+            limit: Maximum clips returned
+
+        Returns:
+            One dict per recording: when it was inside the radius, closest
+            approach, and the byte range covering those frames
+        """
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        box = (latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng)
+        cells = geo_cells(*box)
+        rows = self.db.find_frames_in_box(*box, start=start, end=end,
+                                          cells=cells if len(cells) <= MAX_QUERY_CELLS else None)
+
+        clips: Dict[str, Dict] = {}
+        for row in rows:
+            distance = haversine_m(latitude, longitude, row['latitude'], row['longitude'])
+            if distance > radius_m:
+                continue
+
+            clip = clips.get(row['recording_id'])
+            if clip is None:
+                clip = clips[row['recording_id']] = {
+                    'recording_id': row['recording_id'],
+                    'video_path': row['video_path'],
+                    'first': row, 'last': row,
+                    'closest_m': distance,
+                    'fixes': 0
+                }
+            if row['timestamp'] < clip['first']['timestamp']:
+                clip['first'] = row
+            if row['timestamp'] > clip['last']['timestamp']:
+                clip['last'] = row
+            clip['closest_m'] = min(clip['closest_m'], distance)
+            clip['fixes'] += 1
+
+        results = []
+        for clip in clips.values():
+            first, last = clip.pop('first'), clip.pop('last')
+            clip.update({
+                'start_time': first['timestamp'],
+                'end_time': last['timestamp'],
+                'closest_m': round(clip['closest_m'], 1),
+                'byte_range': _byte_range(first, last)
+            })
+            results.append(clip)
+
+        results.sort(key=lambda clip: clip['start_time'], reverse=True)
+        return results[:limit]
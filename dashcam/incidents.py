@@ -7,19 +7,243 @@ G-sensor (accelerometer) simulation and collision/hard braking detection
 import uuid
 import random
 import math
+import threading
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any, List, Callable
 
+import numpy as np
+
+
+# Standard gravity, m/s^2 per g
+STANDARD_GRAVITY = 9.80665
+
+IMU_SAMPLE_RATE_RANGE = (100, 400)
+
+
+class ImuStreamDetector:
+    """
+    Streaming accelerometer event detector.
+    
+    Samples (timestamp, x, y, z in g) arrive in batches, the way an IMU
+    FIFO is drained, at 100-400 Hz. They are copied into a preallocated
+    numpy ring buffer that is stored twice end to end, so the most recent
+    window is always one contiguous slice. Each batch is reduced in a few
+    vectorized passes over that window:
+        
+        peak    - largest dynamic acceleration (gravity removed), g
+        jerk    - largest rate of change of acceleration, g/s
+        delta_v - velocity change integrated over the window, km/h
+    
+    Classification uses hysteresis: an event opens when the peak crosses
+    trigger_g and closes only after acceleration has stayed below
+    release_ratio * trigger_g for hold_seconds, so an impact that rings
+    around the threshold is one event rather than several. An event is
+    reported once, report_after seconds after onset (or at release if that
+    comes first), so the spike and its delta-v are inside the window.
+    """
+    
+    def __init__(self, sample_rate: float = 200, trigger_g: float = 0.6,
+                 release_ratio: float = 0.6, hold_seconds: float = 0.5,
+                 window_seconds: float = 0.5, report_after: float = 0.25,
+                 buffer_seconds: float = 2.0, gravity_seconds: float = 2.0):
+        """
+        Args:
+            sample_rate: Accelerometer output data rate in Hz (100-400)
+            trigger_g: Dynamic acceleration that opens an event
+            release_ratio: Fraction of trigger_g the signal must stay under to close it
+            hold_seconds: How long the signal must stay under the release level
+            window_seconds: Sliding window for jerk and delta-v
+            report_after: Delay from onset to reporting the event
+            buffer_seconds: Samples kept in the ring buffer
+            gravity_seconds: Time constant of the mounting-orientation estimate
+        """
+        low, high = IMU_SAMPLE_RATE_RANGE
+        if not low <= sample_rate <= high:
+            raise ValueError(f"sample_rate must be between {low} and {high} Hz")
+        
+        self.sample_rate = sample_rate
+        self.hold_seconds = hold_seconds
+        self.report_after = report_after
+        self.gravity_seconds = gravity_seconds
+        self.release_ratio = release_ratio
+        self.set_trigger(trigger_g)
+        
+        self.window = max(2, int(window_seconds * sample_rate))
+        self.capacity = max(self.window * 2, int(buffer_seconds * sample_rate))
+        # Jerk over ~10 ms rather than adjacent samples keeps sensor noise from dominating it
+        self.jerk_span = max(1, int(sample_rate / 100))
+        
+        self._lock = threading.Lock()
+        self._buffer = np.zeros((self.capacity * 2, 4))
+        self._head = 0
+        self._count = 0
+        self._gravity = np.array([0.0, 0.0, 1.0])
+        
+        self._event: Optional[Dict[str, Any]] = None
+        self._last_loud = 0.0
+        
+        self.samples = 0
+        self.batches = 0
+        self.events = 0
+        self.processing_seconds = 0.0
+        self.last_peak = 0.0
+    
+    def set_trigger(self, trigger_g: float):
+        """Set the opening threshold; the release level follows it."""
+        self.trigger_g = trigger_g
+        self.release_g = trigger_g * self.release_ratio
+    
+    @property
+    def active(self) -> bool:
+        return self._event is not None
+    
+    def push(self, samples) -> List[Dict[str, Any]]:
+        """
+        Add a batch of samples and return any events it completes.
+        
+        Args:
+            samples: (n, 4) array-like of timestamp (epoch seconds), x, y, z in g
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim != 2 or samples.shape[1] != 4:
+            raise ValueError("samples must be an (n, 4) array of timestamp, x, y, z")
+        
+        events = []
+        step = self.capacity - self.window
+        with self._lock:
+            for start in range(0, len(samples), step):
+                events.extend(self._process(samples[start:start + step]))
+        return events
+    
+    def _process(self, batch: np.ndarray) -> List[Dict[str, Any]]:
+        """Append one batch (at most capacity - window samples) and evaluate it (lock held)."""
+        started = time.perf_counter()
+        n = len(batch)
+        
+        slots = (self._head + np.arange(n)) % self.capacity
+        self._buffer[slots] = batch
+        self._buffer[slots + self.capacity] = batch
+        self._head = (self._head + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+        
+        end = self._head + self.capacity
+        span = min(self._count, max(self.window, n) + self.jerk_span)
+        recent = self._buffer[end - span:end]
+        timestamps = recent[:, 0]
+        dynamic = recent[:, 1:] - self._gravity
+        magnitude = np.sqrt(np.einsum('ij,ij->i', dynamic, dynamic))
+        
+        new_magnitude = magnitude[-n:]
+        new_timestamps = timestamps[-n:]
+        now = new_timestamps[-1]
+        events = []
+        
+        if self._event is None:
+            above = np.flatnonzero(new_magnitude >= self.trigger_g)
+            if above.size:
+                self._event = {
+                    'onset': new_timestamps[above[0]],
+                    'peak_g': 0.0,
+                    'vector': None,
+                    'jerk_g_per_s': 0.0,
+                    'delta_v_kmh': 0.0,
+                    'reported': False
+                }
+        
+        if self._event is not None:
+            event = self._event
+            peak_index = int(np.argmax(new_magnitude))
+            if new_magnitude[peak_index] > event['peak_g']:
+                event['peak_g'] = float(new_magnitude[peak_index])
+                event['vector'] = dynamic[-n + peak_index].copy()
+            
+            window_t = timestamps[-self.window:]
+            window_a = dynamic[-self.window:]
+            event['jerk_g_per_s'] = max(event['jerk_g_per_s'], self._jerk(timestamps, dynamic))
+            event['delta_v_kmh'] = max(event['delta_v_kmh'], self._delta_v(window_t, window_a))
+            
+            loud = np.flatnonzero(new_magnitude >= self.release_g)
+            if loud.size:
+                self._last_loud = new_timestamps[loud[-1]]
+            released = now - self._last_loud >= self.hold_seconds
+            
+            if not event['reported'] and (released or now - event['onset'] >= self.report_after):
+                event['reported'] = True
+                events.append(self._report(event, now))
+            if released:
+                self._event = None
+        else:
+            # Track the mounting orientation only while nothing is happening
+            alpha = 1.0 - math.exp(-n / (self.sample_rate * self.gravity_seconds))
+            self._gravity += alpha * (batch[:, 1:].mean(axis=0) - self._gravity)
+        
+        self.samples += n
+        self.batches += 1
+        self.last_peak = float(new_magnitude.max())
+        self.processing_seconds += time.perf_counter() - started
+        return events
+    
+    def _jerk(self, timestamps: np.ndarray, dynamic: np.ndarray) -> float:
+        """Largest |da/dt| in g/s over jerk_span samples."""
+        k = self.jerk_span
+        if len(dynamic) <= k:
+            return 0.0
+        change = dynamic[k:] - dynamic[:-k]
+        elapsed = np.maximum(timestamps[k:] - timestamps[:-k], 1e-6)
+        return float((np.sqrt(np.einsum('ij,ij->i', change, change)) / elapsed).max())
+    
+    @staticmethod
+    def _delta_v(timestamps: np.ndarray, dynamic: np.ndarray) -> float:
+        """Magnitude of the trapezoid-integrated acceleration, in km/h."""
+        if len(dynamic) < 2:
+            return 0.0
+        dt = np.diff(timestamps)[:, None]
+        velocity = ((dynamic[1:] + dynamic[:-1]) * 0.5 * dt).sum(axis=0)
+        return float(np.sqrt(velocity @ velocity) * STANDARD_GRAVITY * 3.6)
+    
+    def _report(self, event: Dict[str, Any], now: float) -> Dict[str, Any]:
+        self.events += 1
+        x, y, z = event['vector']
+        return {
+            'onset': float(event['onset']),
+            'peak_g': event['peak_g'],
+            'vector': {'x': float(x), 'y': float(y), 'z': float(z)},
+            'jerk_g_per_s': event['jerk_g_per_s'],
+            'delta_v_kmh': event['delta_v_kmh'],
+            'duration_ms': (now - event['onset']) * 1000
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and detector state."""
+        with self._lock:
+            per_sample = self.processing_seconds / self.samples if self.samples else 0.0
+            return {
+                'sample_rate': self.sample_rate,
+                'samples': self.samples,
+                'batches': self.batches,
+                'events': self.events,
+                'active': self._event is not None,
+                'trigger_g': round(self.trigger_g, 3),
+                'release_g': round(self.release_g, 3),
+                'last_peak_g': round(self.last_peak, 3),
+                'gravity': [round(float(v), 3) for v in self._gravity],
+                'us_per_sample': round(per_sample * 1e6, 3),
+                # Share of one core needed to keep up in real time
+                'cpu_percent': round(per_sample * self.sample_rate * 100, 4)
+            }
+
 
 class IncidentDetector:
     """G-sensor based incident detection for dashcam."""
     
-    def __init__(self, callback: Optional[Callable] = None):
+    def __init__(self, callback: Optional[Callable] = None, imu_sample_rate: float = 200):
         """
         Initialize incident detector.
         
         Args:
             callback: Optional callback function called when incident detected
+            imu_sample_rate: Accelerometer stream rate in Hz (100-400)
         """
         self.sensitivity = 0.5
         self.enabled = True
@@ -48,9 +272,18 @@ class IncidentDetector:
         
         self.auto_snapshot_on_honk = True
         
+        self.imu = ImuStreamDetector(sample_rate=imu_sample_rate,
+                                     trigger_g=self._adjusted_threshold())
+        self._imu_clock = None
+        
+    def _adjusted_threshold(self) -> float:
+        """Dynamic g that counts as an incident at the current sensitivity."""
+        return 0.8 * (1.0 - self.sensitivity * 0.5)
+    
     def set_sensitivity(self, sensitivity: float):
         """Set G-sensor sensitivity (0.0 to 1.0)."""
         self.sensitivity = max(0.0, min(1.0, sensitivity))
+        self.imu.set_trigger(self._adjusted_threshold())
     
     def set_enabled(self, enabled: bool):
         """Enable or disable incident detection."""
@@ -117,9 +350,7 @@ class IncidentDetector:
         
         total_g = math.sqrt(g_force['x']**2 + g_force['y']**2 + (g_force['z'] - 1.0)**2)
         
-        adjusted_threshold = 0.8 * (1.0 - self.sensitivity * 0.5)
-        
-        if total_g < adjusted_threshold:
+        if total_g < self._adjusted_threshold():
             return None
         
         incident_type = self._classify_incident(g_force, total_g, speed_kmh)
@@ -141,6 +372,103 @@ class IncidentDetector:
         
         return incident
     
+    def simulate_imu_samples(self, speed_kmh: float = None,
+                             driving_mode: str = 'normal',
+                             now: float = None) -> np.ndarray:
+        """
+        Simulate draining the accelerometer FIFO: every sample since the last call.
+        
+        Args:
+            speed_kmh: Current speed
+            driving_mode: Driving mode (normal, aggressive, parking)
+            now: Current epoch time (defaults to time.time())
+        
+        Returns:
+            (n, 4) array of timestamp, x, y, z in g
+        """
+        now = time.time() if now is None else now
+        rate = self.imu.sample_rate
+        start = self._imu_clock if self._imu_clock is not None else now - 1.0 / rate
+        # A FIFO holds about a second of samples; anything older was overwritten
+        start = max(start, now - 1.0)
+        
+        count = int((now - start) * rate)
+        if count <= 0:
+            return np.empty((0, 4))
+        timestamps = start + np.arange(1, count + 1) / rate
+        self._imu_clock = timestamps[-1]
+        
+        if driving_mode == 'parking' or (speed_kmh is not None and speed_kmh < 5):
+            noise = 0.01
+        elif driving_mode == 'aggressive':
+            noise = 0.08
+        else:
+            noise = 0.03
+        
+        samples = np.empty((count, 4))
+        samples[:, 0] = timestamps
+        samples[:, 1:] = np.random.normal(0.0, noise, (count, 3))
+        samples[:, 3] += 1.0
+        return samples
+    
+    def process_imu_samples(self, samples, speed_kmh: float = None,
+                            location: Dict[str, float] = None) -> List[Dict[str, Any]]:
+        """
+        Feed a batch of accelerometer samples to the stream detector.
+        
+        Args:
+            samples: (n, 4) array-like of timestamp, x, y, z in g
+            speed_kmh: Current speed
+            location: GPS location dict with lat/lng
+        
+        Returns:
+            Incidents detected in this batch
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) == 0:
+            return []
+        
+        events = self.imu.push(samples)
+        x, y, z = samples[-1, 1:]
+        self.current_g_force = {'x': float(x), 'y': float(y), 'z': float(z)}
+        
+        if not self.enabled:
+            return []
+        
+        incidents = []
+        for event in events:
+            if self.last_incident_time:
+                time_since_last = (datetime.now() - self.last_incident_time).total_seconds()
+                if time_since_last < self.incident_cooldown:
+                    continue
+            
+            # Classification rules expect the vector with gravity on z
+            g_force = dict(event['vector'])
+            g_force['z'] += 1.0
+            total_g = event['peak_g']
+            
+            incident = self._create_incident_event(
+                incident_type=self._classify_incident(g_force, total_g, speed_kmh),
+                g_force_value=total_g,
+                g_force_vector=g_force,
+                speed_kmh=speed_kmh,
+                location=location,
+                severity=self._calculate_severity(total_g)
+            )
+            incident['jerk_g_per_s'] = round(event['jerk_g_per_s'], 1)
+            incident['delta_v_kmh'] = round(event['delta_v_kmh'], 2)
+            incident['onset'] = datetime.fromtimestamp(event['onset']).isoformat()
+            incident['source'] = 'imu_stream'
+            
+            self.last_incident_time = datetime.now()
+            
+            if self.callback:
+                self.callback(incident)
+            
+            incidents.append(incident)
+        
+        return incidents
+    
     def _classify_incident(self, g_force: Dict[str, float], total_g: float,
                           speed_kmh: Optional[float]) -> str:
         """Classify the type of incident based on G-force patterns."""
@@ -273,5 +601,6 @@ class IncidentDetector:
             'current_g_force': self.current_g_force,
             'thresholds': self.g_force_thresholds,
             'auto_snapshot_on_honk': self.auto_snapshot_on_honk,
+            'imu_stream': self.imu.stats(),
             'last_incident': self.last_incident_time.isoformat() if self.last_incident_time else None
         }
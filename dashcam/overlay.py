@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Overlay Compositor
+Timestamp and GPS text stamped onto frames from pre-rendered glyphs
+"""
+
+import math
+import threading
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Glyphs rendered into the atlas up front; anything else shows as '?'
+CHARSET = ''.join(chr(code) for code in range(32, 127))
+
+
+class _TextStrip:
+    """One overlay line: an RGBA strip of fixed-width cells and the text it shows."""
+
+    def __init__(self, cell_size: Tuple[int, int], capacity: int):
+        self.cell_width, self.cell_height = cell_size
+        self.text = ''
+        self.capacity = capacity
+        self.image = Image.new('RGBA', (capacity * self.cell_width, self.cell_height), (0, 0, 0, 0))
+
+
+class OverlayCompositor:
+    """
+    Stamps text lines onto frames with a few small pastes.
+
+    The font is loaded once and every printable character is rendered
+    into a glyph atlas of fixed-width RGBA cells. Each overlay line keeps
+    its own RGBA strip; when the text changes only the cells whose
+    character differs are repasted, so labels such as "GPS:" and "km/h"
+    are rendered once and a timestamp touches one or two digit cells per
+    second. Per frame, a line costs one masked paste of its strip.
+    """
+
+    def __init__(self, font_path: Optional[str] = None, font_size: int = 14,
+                 color: Tuple[int, int, int] = (255, 255, 255)):
+        """
+        Args:
+            font_path: TrueType font file (PIL's default font when omitted)
+            font_size: Point size for a TrueType font
+            color: Text color
+        """
+        if font_path:
+            self.font = ImageFont.truetype(font_path, font_size)
+        else:
+            self.font = ImageFont.load_default()
+        self.color = color
+
+        self._lock = threading.Lock()
+        self._lines: Dict[str, _TextStrip] = {}
+        self._labels: Dict[str, Image.Image] = {}
+        self._build_atlas()
+
+    def _build_atlas(self):
+        """Render CHARSET once into equal-size cells."""
+        boxes = {ch: self.font.getbbox(ch) for ch in CHARSET}
+        advance = max(math.ceil(self.font.getlength(ch)) for ch in CHARSET)
+        self.cell_width = max(advance, max(box[2] for box in boxes.values()))
+        self.cell_height = max(box[3] for box in boxes.values()) + 1
+
+        self._glyphs = {}
+        for ch in CHARSET:
+            glyph = Image.new('RGBA', (self.cell_width, self.cell_height), (0, 0, 0, 0))
+            ImageDraw.Draw(glyph).text((0, 0), ch, font=self.font, fill=self.color + (255,))
+            self._glyphs[ch] = glyph
+        self._blank = Image.new('RGBA', (self.cell_width, self.cell_height), (0, 0, 0, 0))
+
+    def _update(self, strip: _TextStrip, text: str) -> _TextStrip:
+        """Repaste only the cells whose character changed."""
+        if len(text) > strip.capacity:
+            strip = _TextStrip((self.cell_width, self.cell_height), len(text) + 8)
+
+        old = strip.text
+        for i in range(max(len(text), len(old))):
+            ch = text[i] if i < len(text) else None
+            if i < len(old) and old[i] == ch:
+                continue
+            glyph = self._blank if ch is None else self._glyphs.get(ch, self._glyphs['?'])
+            strip.image.paste(glyph, (i * self.cell_width, 0))
+
+        strip.text = text
+        return strip
+
+    def draw_text(self, frame: Image.Image, key: str, text: str, position: Tuple[int, int]):
+        """Stamp the line identified by key onto frame at position."""
+        with self._lock:
+            strip = self._lines.get(key)
+            if strip is None:
+                strip = _TextStrip((self.cell_width, self.cell_height), len(text) + 8)
+            if strip.text != text:
+                strip = self._update(strip, text)
+            self._lines[key] = strip
+
+            # Unused trailing cells are transparent, so the whole strip is the mask
+            frame.paste(strip.image, position, strip.image)
+
+    def label(self, text: str) -> Image.Image:
+        """Static text rendered once with the font's natural spacing."""
+        with self._lock:
+            sprite = self._labels.get(text)
+            if sprite is None:
+                left, top, right, bottom = self.font.getbbox(text)
+                sprite = Image.new('RGBA', (right + 1, bottom + 1), (0, 0, 0, 0))
+                ImageDraw.Draw(sprite).text((0, 0), text, font=self.font, fill=self.color + (255,))
+                self._labels[text] = sprite
+            return sprite
+
+    def draw_label(self, frame: Image.Image, text: str, position: Tuple[int, int]):
+        """Paste a cached static label onto frame."""
+        sprite = self.label(text)
+        frame.paste(sprite, position, sprite)
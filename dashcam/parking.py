@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Parking Mode Recorder
+Low-rate time-lapse while parked, full-rate capture only while something moves
+"""
+
+import math
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from services.dashcam.segments import SegmentWriter, encode_jpeg
+
+
+class MotionDetector:
+    """
+    Frame differencing on heavily downscaled grayscale frames.
+
+    Each frame is reduced to a thumbnail (64x36 by default) and compared
+    with a slowly adapting background. The median difference is removed
+    first, so a global brightness change (dusk, a passing headlight wash)
+    does not count as motion. Motion is reported when the fraction of
+    thumbnail pixels that changed exceeds a sensitivity-derived area.
+    """
+
+    def __init__(self, size: Tuple[int, int] = (64, 36), pixel_threshold: int = 20,
+                 sensitivity: float = 0.7, background_seconds: float = 20.0):
+        """
+        Args:
+            size: Thumbnail size the comparison runs at
+            pixel_threshold: Luma change (0-255) that marks a thumbnail pixel as changed
+            sensitivity: 0.0 (large objects only) to 1.0 (small movements)
+            background_seconds: Time constant of the background model
+        """
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.background_seconds = background_seconds
+        self.set_sensitivity(sensitivity)
+
+        self._background: Optional[np.ndarray] = None
+        self._last_update = None
+        self.last_score = 0.0
+
+    def set_sensitivity(self, sensitivity: float):
+        """Map sensitivity (0.0 to 1.0) to the changed-area fraction that counts as motion."""
+        self.sensitivity = max(0.0, min(1.0, sensitivity))
+        self.min_area = 0.002 + 0.03 * (1.0 - self.sensitivity)
+
+    def thumbnail(self, frame: Image.Image) -> np.ndarray:
+        """Grayscale thumbnail as float32."""
+        small = frame.resize(self.size, Image.BILINEAR, reducing_gap=2.0).convert('L')
+        return np.asarray(small, dtype=np.float32)
+
+    def update(self, frame: Image.Image, now: float) -> bool:
+        """Compare frame with the background, fold it in, and report motion."""
+        small = self.thumbnail(frame)
+        if self._background is None:
+            self._background = small
+            self._last_update = now
+            return False
+
+        diff = small - self._background
+        diff -= np.median(diff)
+        self.last_score = float(np.count_nonzero(np.abs(diff) > self.pixel_threshold)) / diff.size
+
+        elapsed = max(now - self._last_update, 0.0)
+        alpha = 1.0 - math.exp(-elapsed / self.background_seconds)
+        self._background += alpha * (small - self._background)
+        self._last_update = now
+
+        return self.last_score >= self.min_area
+
+
+class ParkingRecorder:
+    """
+    Parking-mode capture policy.
+
+    While the scene is still, one frame is captured every probe_interval
+    and only checked for motion; every time_lapse_interval a frame is
+    stamped, encoded and appended to a time-lapse segment that plays back
+    at the recorder's normal fps. When motion appears the recorder switches
+    to full-rate capture into a protected event clip (starting with the
+    frame that showed the motion) and keeps going until nothing has moved
+    for motion_hold_seconds.
+
+    The policy lives in step(now), which captures once and returns when the
+    next capture is due, so it can be driven by its own thread or replayed
+    against a simulated clock.
+    """
+
+    def __init__(self, capture: Callable[[], Image.Image],
+                 stamp: Callable[[Image.Image], Image.Image],
+                 open_writer: Callable[[str, bool], SegmentWriter],
+                 on_segment: Callable[[Dict, str, bool], None],
+                 fps: float = 10, jpeg_quality: int = 85, sensitivity: float = 0.7,
+                 time_lapse: bool = True, probe_interval: float = 2.0,
+                 time_lapse_interval: float = 10.0, motion_hold_seconds: float = 5.0,
+                 segment_seconds: float = 3600,
+                 on_event: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            capture: Returns the current raw camera frame
+            stamp: Draws overlays on a frame that is about to be written
+            open_writer: (name prefix, time_lapse) -> new SegmentWriter
+            on_segment: Called with (closed segment info, recording type, protected)
+            fps: Capture rate while motion is present
+            jpeg_quality: JPEG quality of written frames
+            sensitivity: Motion sensitivity (0.0 to 1.0)
+            time_lapse: Keep a time-lapse of the idle periods
+            probe_interval: Seconds between motion checks while idle
+            time_lapse_interval: Seconds between time-lapse frames
+            motion_hold_seconds: Stillness required to end an event clip
+            segment_seconds: Wall time covered by one time-lapse segment
+            on_event: Called with the event dict when an event clip is finished
+        """
+        self.capture = capture
+        self.stamp = stamp
+        self.open_writer = open_writer
+        self.on_segment = on_segment
+        self.on_event = on_event
+
+        self.fps = fps
+        self.jpeg_quality = jpeg_quality
+        self.time_lapse = time_lapse
+        self.probe_interval = probe_interval
+        self.time_lapse_interval = time_lapse_interval
+        self.motion_hold_seconds = motion_hold_seconds
+        self.segment_seconds = segment_seconds
+
+        self.motion = MotionDetector(sensitivity=sensitivity)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.mode = 'idle'
+        self._lapse_writer: Optional[SegmentWriter] = None
+        self._lapse_opened = 0.0
+        self._next_lapse = 0.0
+        self._event_writer: Optional[SegmentWriter] = None
+        self._event: Optional[Dict[str, Any]] = None
+        self._last_motion = 0.0
+        self._started = None
+        self._last_step = None
+
+        self.captures = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.motion_events = 0
+        self.seconds_in_mode = {'idle': 0.0, 'motion': 0.0}
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='parking-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._close_event(self._last_step or time.time())
+            self._close_lapse()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                due = self.step(time.time())
+            except Exception as e:
+                print(f"Parking recorder error: {e}")
+                due = time.time() + self.probe_interval
+            self._stop.wait(max(0.0, due - time.time()))
+
+    def step(self, now: float) -> float:
+        """Capture one frame, act on it, and return the time the next capture is due."""
+        with self._lock:
+            if self._started is None:
+                self._started = now
+                self._next_lapse = now
+            if self._last_step is not None:
+                self.seconds_in_mode[self.mode] += now - self._last_step
+            self._last_step = now
+
+            frame = self.capture()
+            self.captures += 1
+            moving = self.motion.update(frame, now)
+
+            if self.mode == 'idle' and moving:
+                self._open_event(now)
+
+            if self.mode == 'motion':
+                if moving:
+                    self._last_motion = now
+                    self._event['peak_score'] = max(self._event['peak_score'],
+                                                    self.motion.last_score)
+                frame = self.stamp(frame)
+                jpeg = encode_jpeg(frame, self.jpeg_quality)
+                self._write(self._event_writer, jpeg, now)
+                self._time_lapse(jpeg, now)
+
+                if now - self._last_motion >= self.motion_hold_seconds:
+                    self._close_event(now)
+                return now + 1.0 / self.fps
+
+            if self.time_lapse and now >= self._next_lapse:
+                self._time_lapse(encode_jpeg(self.stamp(frame), self.jpeg_quality), now)
+            return now + self.probe_interval
+
+    def _write(self, writer: SegmentWriter, jpeg: bytes, now: float):
+        writer.write(jpeg, now)
+        self.frames_written += 1
+        self.bytes_written += len(jpeg)
+
+    def _time_lapse(self, jpeg: bytes, now: float):
+        """Append to the time-lapse segment when a frame is due (lock held)."""
+        if not self.time_lapse or now < self._next_lapse:
+            return
+        if self._lapse_writer is not None and (now - self._lapse_opened >= self.segment_seconds
+                                               or self._lapse_writer.full):
+            self._close_lapse()
+        if self._lapse_writer is None:
+            self._lapse_writer = self.open_writer('parking_timelapse', True)
+            self._lapse_opened = now
+        self._write(self._lapse_writer, jpeg, now)
+        self._next_lapse = now + self.time_lapse_interval
+
+    def _open_event(self, now: float):
+        self.mode = 'motion'
+        self._last_motion = now
+        self.motion_events += 1
+        self._event_writer = self.open_writer('parking_motion', False)
+        self._event = {
+            'event_id': f"parking_event_{uuid.uuid4().hex[:12]}",
+            'event_type': 'parking_mode_motion',
+            'motion_detected': True,
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+            'started': now,
+            'peak_score': self.motion.last_score,
+            'severity': 'medium',
+            'protected': True
+        }
+
+    def _close_event(self, now: float):
+        """Finish the event clip and report it (lock held)."""
+        if self._event_writer is None:
+            return
+        writer, event = self._event_writer, self._event
+        self._event_writer = None
+        self._event = None
+        self.mode = 'idle'
+
+        result = writer.close()
+        if result['frame_count']:
+            self.on_segment(result, 'parking_motion', True)
+        event.update({
+            'video_path': result['video_path'],
+            'frame_count': result['frame_count'],
+            'duration_seconds': round(now - event.pop('started'), 2),
+            'motion_score': round(event.pop('peak_score'), 4)
+        })
+
+        if self.on_event:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                print(f"Parking event callback error: {e}")
+
+    def _close_lapse(self):
+        if self._lapse_writer is None:
+            return
+        writer = self._lapse_writer
+        self._lapse_writer = None
+        result = writer.close()
+        if result['frame_count']:
+            self.on_segment(result, 'parking_timelapse', False)
+
+    def set_sensitivity(self, sensitivity: float):
+        with self._lock:
+            self.motion.set_sensitivity(sensitivity)
+
+    def stats(self) -> Dict[str, Any]:
+        """Captures and writes compared with recording continuously at fps."""
+        with self._lock:
+            elapsed = (self._last_step - self._started) if self._started is not None else 0.0
+            continuous_frames = elapsed * self.fps
+            average_frame = self.bytes_written / self.frames_written if self.frames_written else 0
+            return {
+                'mode': self.mode,
+                'sensitivity': self.motion.sensitivity,
+                'time_lapse': self.time_lapse,
+                'elapsed_seconds': round(elapsed, 1),
+                'seconds_in_mode': {k: round(v, 1) for k, v in self.seconds_in_mode.items()},
+                'captures': self.captures,
+                'frames_written': self.frames_written,
+                'bytes_written': self.bytes_written,
+                'motion_events': self.motion_events,
+                'last_motion_score': round(self.motion.last_score, 4),
+                'capture_reduction': round(continuous_frames / self.captures, 1)
+                if self.captures else None,
+                'write_reduction': round(continuous_frames * average_frame / self.bytes_written, 1)
+                if self.bytes_written else None
+            }
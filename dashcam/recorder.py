@@ -5,27 +5,63 @@ Handles continuous dashcam recording with quality settings and overlays
 """
 
 import os
-import io
 import time
 import uuid
 import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, List
-from PIL import Image, ImageDraw, ImageFont
+from typing import Callable, Dict, Optional, List
+from PIL import Image
+
+from services.dashcam.segments import (
+    CONTAINERS, FrameRingBuffer, SegmentWriter, encode_jpeg,
+    open_segment_writer
+)
+from services.dashcam.capture import CapturePipeline
+from services.dashcam.frame_index import (
+    FrameIndexWriter, FrameLocator, GpsSampler, read_frame_index
+)
+from services.dashcam.overlay import OverlayCompositor
+from services.dashcam.parking import ParkingRecorder
+from services.dashcam.snapshots import SnapshotPipeline
+from services.dashcam.storage import StorageIndex
 
 
 class LoopRecorder:
     """Continuous loop recording manager for dashcam."""
     
-    def __init__(self, output_dir: str = None, max_storage_gb: float = 128):
+    PRE_ROLL_RANGE = (10, 30)
+    
+    CAMERA_LAYOUTS = {
+        'front': ['front'],
+        'rear': ['rear'],
+        'dual': ['front', 'rear'],
+        'quad': ['front', 'rear', 'left', 'right']
+    }
+    
+    def __init__(self, output_dir: str = None, max_storage_gb: float = 128,
+                 container: str = 'avi', jpeg_quality: int = 85,
+                 fsync_interval: float = 2.0, pre_roll_seconds: float = 15,
+                 pre_roll_max_mb: float = 64, database=None,
+                 frame_index_interval: float = 1.0):
         """
         Initialize loop recorder.
         
         Args:
             output_dir: Directory to save recordings
             max_storage_gb: Maximum storage to use (in GB)
+            container: Segment container (avi, mjpeg, ffmpeg)
+            jpeg_quality: JPEG quality of recorded frames
+            fsync_interval: Seconds between fsyncs of the open segment
+            pre_roll_seconds: Seconds before an incident kept in memory (10-30)
+            pre_roll_max_mb: Memory cap for the pre-roll buffer
+            database: Optional DashcamDatabase to register recordings in
+            frame_index_interval: Seconds of footage between frame index records
         """
+        if container not in CONTAINERS:
+            raise ValueError(f"Container must be one of: {list(CONTAINERS)}")
+        self._validate_pre_roll(pre_roll_seconds)
+        
         if output_dir is None:
             output_dir = Path(__file__).parent / "recordings"
         
@@ -34,6 +70,26 @@ class LoopRecorder:
         
         self.max_storage_bytes = max_storage_gb * 1024 * 1024 * 1024
         
+        self.db = database
+        self.storage = StorageIndex(self.output_dir, self.max_storage_bytes, database)
+        self.storage.reconcile()
+        
+        self.frame_index_interval = frame_index_interval
+        self.frame_locator = FrameLocator(database) if database else None
+        
+        # Hidden directory: the storage scan skips dot entries
+        self.snapshots = SnapshotPipeline(self.output_dir / '.previews')
+        self.preview_prune_interval = 600
+        self._last_preview_prune = 0.0
+        
+        self.container = container
+        self.jpeg_quality = jpeg_quality
+        self.fsync_interval = fsync_interval
+        self.fps = 10
+        
+        self.pre_roll = FrameRingBuffer(pre_roll_seconds, int(pre_roll_max_mb * 1024 * 1024))
+        self.incident_clips = {}
+        
         self.active_recordings = {}
         self.recording_lock = threading.Lock()
         
@@ -48,9 +104,11 @@ class LoopRecorder:
         
         self.timestamp_overlay = True
         self.gps_overlay = True
+        self.overlay = OverlayCompositor()
         
         self.parking_mode_active = False
         self.parking_mode_time_lapse = False
+        self.parking_recorder = None
     
     def start_continuous_recording(self, camera_system, camera_layout: str = 'dual',
                                    quality: str = '1080p',
@@ -113,117 +171,220 @@ class LoopRecorder:
             self.continuous_recording_active = False
         
         time.sleep(2)
+        self.pre_roll.clear()
         
         return {'ok': True, 'status': 'stopped'}
     
     def _continuous_recording_loop(self, recording_id: str):
         """Background loop for continuous recording."""
         segment_duration = 60
+        pipeline = None
         
-        while True:
-            with self.recording_lock:
-                if not self.continuous_recording_active:
-                    break
+        try:
+            while True:
+                with self.recording_lock:
+                    if not self.continuous_recording_active:
+                        break
+                    
+                    if recording_id not in self.active_recordings:
+                        break
+                    
+                    recording_info = self.active_recordings[recording_id]
                 
-                if recording_id not in self.active_recordings:
-                    break
+                if pipeline is None:
+                    pipeline = self._start_pipeline(recording_info)
+                    recording_info['pipeline'] = pipeline
                 
-                recording_info = self.active_recordings[recording_id]
-            
-            self._check_and_cleanup_storage()
-            
-            segment_result = self._record_segment(recording_info, segment_duration)
-            
-            if segment_result:
+                self._check_and_cleanup_storage()
+                
+                segment_result = self._record_segment(recording_info, segment_duration)
+                
+                if segment_result:
+                    with self.recording_lock:
+                        if recording_id in self.active_recordings:
+                            self.active_recordings[recording_id]['segment_count'] += 1
+        
+        finally:
+            if pipeline:
+                pipeline.stop()
                 with self.recording_lock:
                     if recording_id in self.active_recordings:
-                        self.active_recordings[recording_id]['segment_count'] += 1
-            
-            time.sleep(1)
+                        self.active_recordings[recording_id]['pipeline'] = None
+    
+    def _start_pipeline(self, recording_info: Dict) -> CapturePipeline:
+        """Start per-camera capture threads and the compose/encode stages."""
+        camera_system = recording_info['camera_system']
+        camera_layout = recording_info['camera_layout']
+        gps_tracker = recording_info.get('gps_tracker')
+        
+        cameras = {pos: camera_system.get_camera(pos)
+                   for pos in self.CAMERA_LAYOUTS.get(camera_layout, [])}
+        
+        def compose(frames: Dict[str, Optional[Image.Image]]) -> Image.Image:
+            frame = self._compose_frame(camera_layout, frames)
+            if any(frame is source for source in frames.values()):
+                # Single-camera frames may be matched to two ticks; never draw on the original
+                frame = frame.copy()
+            if self.timestamp_overlay or self.gps_overlay:
+                frame = self._add_overlays(frame, gps_tracker)
+            return frame
+        
+        pipeline = CapturePipeline(cameras, compose, fps=self.fps, jpeg_quality=self.jpeg_quality)
+        pipeline.start()
+        return pipeline
     
     def _record_segment(self, recording_info: Dict, duration_seconds: int) -> Optional[Dict]:
-        """Record a segment of video."""
+        """Record a segment of video, streaming each frame to disk."""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             camera_layout = recording_info['camera_layout']
             quality = recording_info['quality']
             segment_num = recording_info['segment_count']
             
-            filename = f"{camera_layout}_{quality}_{timestamp}_seg{segment_num}.mp4"
-            video_path = self.output_dir / filename
-            
-            camera_system = recording_info['camera_system']
-            gps_tracker = recording_info.get('gps_tracker')
-            
-            fps = 10
-            frame_delay = 1.0 / fps
-            total_frames = int(duration_seconds * fps)
+            path_base = self.output_dir / f"{camera_layout}_{quality}_{timestamp}_seg{segment_num}"
+            # Frames carry their own GPS fix (see _gps_sampler)
+            writer = self._open_writer(path_base)
             
-            frames = []
-            
-            for frame_num in range(total_frames):
-                if not self.continuous_recording_active:
-                    break
-                
-                try:
-                    frame = self._capture_frame(camera_system, camera_layout)
-                    
-                    if self.timestamp_overlay or self.gps_overlay:
-                        frame = self._add_overlays(frame, gps_tracker)
-                    
-                    frames.append(frame)
-                    
-                except Exception as e:
-                    print(f"Frame capture error: {e}")
-                
-                time.sleep(frame_delay)
+            if recording_info.get('pipeline'):
+                self._stream_pipeline(
+                    writer, recording_info['pipeline'], recording_info.get('gps_tracker'),
+                    duration_seconds, lambda: self.continuous_recording_active,
+                    ring=self.pre_roll
+                )
+            else:
+                self._stream_frames(
+                    writer, recording_info['camera_system'], camera_layout,
+                    recording_info.get('gps_tracker'), duration_seconds,
+                    lambda: self.continuous_recording_active, ring=self.pre_roll
+                )
             
-            if frames:
-                self._save_frames_as_gif(frames, video_path)
-                
-                file_size_mb = video_path.stat().st_size / (1024 * 1024)
-                
-                return {
-                    'video_path': str(video_path),
-                    'duration_seconds': duration_seconds,
-                    'file_size_mb': file_size_mb,
-                    'frame_count': len(frames)
-                }
+            result = writer.close()
+            if result['frame_count']:
+                self._register_recording(result, camera_layout, quality, 'continuous')
+                return result
         
         except Exception as e:
             print(f"Segment recording error: {e}")
         
         return None
     
+    def _open_writer(self, path_base: Path, gps_tracker=None,
+                     time_lapse: bool = False) -> SegmentWriter:
+        """Open a segment writer with a frame index sidecar (timestamps, offsets, GPS)."""
+        writer = open_segment_writer(self.container, path_base, self.fps,
+                                     self.fsync_interval, time_lapse=time_lapse)
+        writer.frame_index = FrameIndexWriter(
+            path_base, self.frame_index_interval,
+            locate=gps_tracker.get_current_location if gps_tracker else None
+        )
+        return writer
+    
+    def _gps_sampler(self, gps_tracker) -> Optional[GpsSampler]:
+        """
+        Sampler stamping frames with the fix from when they were captured,
+        so frames written later (incident pre-roll) keep their location.
+        """
+        if not gps_tracker:
+            return None
+        return GpsSampler(gps_tracker.get_current_location, self.frame_index_interval)
+    
+    def _stream_pipeline(self, writer: SegmentWriter, pipeline: CapturePipeline,
+                         gps_tracker, duration_seconds: float, keep_going=None,
+                         ring: Optional[FrameRingBuffer] = None):
+        """Append encoded frames from the capture pipeline until the duration ends."""
+        end_time = time.monotonic() + duration_seconds
+        sampler = self._gps_sampler(gps_tracker)
+        
+        while time.monotonic() < end_time and not writer.full:
+            if keep_going is not None and not keep_going():
+                break
+            
+            item = pipeline.get(timeout=min(0.5, max(end_time - time.monotonic(), 0.01)))
+            if item is None:
+                continue
+            
+            captured_at, jpeg = item
+            fix = sampler.fix(captured_at) if sampler else None
+            writer.write(jpeg, captured_at, fix)
+            if ring is not None:
+                ring.push(jpeg, captured_at, fix)
+    
+    def _stream_frames(self, writer: SegmentWriter, camera_system, camera_layout: str,
+                       gps_tracker, duration_seconds: float, keep_going=None,
+                       ring: Optional[FrameRingBuffer] = None):
+        """
+        Capture, overlay, encode and append frames until the duration ends.
+        
+        Only the frame in flight is held in memory (plus the ring buffer, if
+        given, which receives the same JPEG bytes). Frames are paced against
+        a fixed schedule so capture time does not stretch the segment.
+        """
+        frame_delay = 1.0 / self.fps
+        total_frames = int(duration_seconds * self.fps)
+        next_frame = time.monotonic()
+        sampler = self._gps_sampler(gps_tracker)
+        
+        for _ in range(total_frames):
+            if keep_going is not None and not keep_going():
+                break
+            if writer.full:
+                break
+            
+            try:
+                frame = self._capture_frame(camera_system, camera_layout)
+                
+                if self.timestamp_overlay or self.gps_overlay:
+                    frame = self._add_overlays(frame, gps_tracker)
+                
+                jpeg = encode_jpeg(frame, self.jpeg_quality)
+                captured_at = time.time()
+                fix = sampler.fix(captured_at) if sampler else None
+                writer.write(jpeg, captured_at, fix)
+                if ring is not None:
+                    ring.push(jpeg, captured_at, fix)
+                
+            except Exception as e:
+                print(f"Frame capture error: {e}")
+            
+            next_frame += frame_delay
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Running behind: restart the schedule instead of bursting
+                next_frame = time.monotonic()
+    
     def _capture_frame(self, camera_system, camera_layout: str) -> Image.Image:
-        """Capture frame from camera system."""
-        if camera_layout == 'front':
-            camera = camera_system.get_camera('front')
-            return camera.generate_frame() if camera else self._create_placeholder()
+        """Capture frame from camera system (cameras read one after another)."""
+        frames = {}
+        for pos in self.CAMERA_LAYOUTS.get(camera_layout, []):
+            camera = camera_system.get_camera(pos)
+            frames[pos] = camera.generate_frame() if camera else None
         
-        elif camera_layout == 'rear':
-            camera = camera_system.get_camera('rear')
-            return camera.generate_frame() if camera else self._create_placeholder()
+        return self._compose_frame(camera_layout, frames)
+    
+    def _compose_frame(self, camera_layout: str,
+                       frames: Dict[str, Optional[Image.Image]]) -> Image.Image:
+        """Build the recorded frame for a layout from per-camera frames."""
+        if camera_layout in ('front', 'rear'):
+            frame = frames.get(camera_layout)
+            return frame if frame is not None else self._create_placeholder()
         
         elif camera_layout == 'dual':
-            front_cam = camera_system.get_camera('front')
-            rear_cam = camera_system.get_camera('rear')
+            front_frame = frames.get('front')
+            rear_frame = frames.get('rear')
             
-            front_frame = front_cam.generate_frame() if front_cam else self._create_placeholder()
-            rear_frame = rear_cam.generate_frame() if rear_cam else self._create_placeholder()
+            if front_frame is None:
+                front_frame = self._create_placeholder()
+            if rear_frame is None:
+                rear_frame = self._create_placeholder()
             
             return self._combine_dual_view(front_frame, rear_frame)
         
         elif camera_layout == 'quad':
-            from services.cameras.stitcher import create_quad_view
-            all_frames = {}
-            for pos in ['front', 'rear', 'left', 'right']:
-                cam = camera_system.get_camera(pos)
-                if cam:
-                    all_frames[pos] = cam.generate_frame()
-            
-            if len(all_frames) == 4:
-                return create_quad_view(all_frames)
+            if all(frames.get(pos) is not None for pos in self.CAMERA_LAYOUTS['quad']):
+                from services.cameras.stitcher import create_quad_view
+                return create_quad_view(frames)
         
         return self._create_placeholder()
     
@@ -237,19 +398,16 @@ class LoopRecorder:
         combined.paste(front_frame, (0, 0))
         combined.paste(rear_frame, (0, front_frame.height))
         
-        draw = ImageDraw.Draw(combined)
-        draw.text((10, 10), "FRONT", fill=(255, 255, 255))
-        draw.text((10, front_frame.height + 10), "REAR", fill=(255, 255, 255))
+        self.overlay.draw_label(combined, "FRONT", (10, 10))
+        self.overlay.draw_label(combined, "REAR", (10, front_frame.height + 10))
         
         return combined
     
     def _add_overlays(self, frame: Image.Image, gps_tracker=None) -> Image.Image:
         """Add timestamp and GPS overlays to frame."""
-        draw = ImageDraw.Draw(frame)
-        
         if self.timestamp_overlay:
             timestamp_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            draw.text((10, frame.height - 30), timestamp_text, fill=(255, 255, 255))
+            self.overlay.draw_text(frame, 'timestamp', timestamp_text, (10, frame.height - 30))
         
         if self.gps_overlay and gps_tracker:
             try:
@@ -259,7 +417,7 @@ class LoopRecorder:
                 speed = location.get('speed_kmh', 0)
                 
                 gps_text = f"GPS: {lat:.5f}, {lng:.5f} | {speed:.1f} km/h"
-                draw.text((10, frame.height - 60), gps_text, fill=(255, 255, 255))
+                self.overlay.draw_text(frame, 'gps', gps_text, (10, frame.height - 60))
             except:
                 pass
         
@@ -269,154 +427,373 @@ class LoopRecorder:
         """Create placeholder frame."""
         return Image.new('RGB', (640, 480), color=(30, 30, 30))
     
-    def _save_frames_as_gif(self, frames: List[Image.Image], output_path: Path):
-        """Save frames as animated GIF (mock video)."""
-        if not frames:
-            return
-        
-        gif_path = str(output_path).replace('.mp4', '.gif')
-        
-        if len(frames) > 100:
-            step = len(frames) // 100
-            frames = frames[::step]
-        
-        frames[0].save(
-            gif_path,
-            save_all=True,
-            append_images=frames[1:],
-            duration=100,
-            loop=0,
-            optimize=False
-        )
+    @classmethod
+    def _validate_pre_roll(cls, seconds: float):
+        low, high = cls.PRE_ROLL_RANGE
+        if not low <= seconds <= high:
+            raise ValueError(f"Pre-roll must be between {low} and {high} seconds")
+    
+    def set_pre_roll(self, seconds: float, max_mb: Optional[float] = None):
+        """Change the pre-roll window (10-30 s) and optionally its memory cap."""
+        self._validate_pre_roll(seconds)
+        max_bytes = int(max_mb * 1024 * 1024) if max_mb is not None else None
+        self.pre_roll.resize(seconds, max_bytes)
     
     def record_incident_clip(self, camera_system, incident_id: str,
                             duration_seconds: int = 30,
                             quality: str = '1080p',
-                            gps_tracker=None) -> Dict:
+                            gps_tracker=None,
+                            on_complete: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
-        Record incident clip (protected recording).
+        Record incident clip (protected recording) without blocking.
+        
+        The pre-roll ring buffer is snapshotted at the trigger and written
+        first, then post-roll frames are appended by a background thread as
+        the continuous recording produces them. Without continuous recording
+        the background thread captures the post-roll itself.
         
         Args:
             camera_system: CameraSystem instance
             incident_id: Incident ID to associate with
-            duration_seconds: Clip duration
+            duration_seconds: Post-roll duration after the trigger
             quality: Recording quality
             gps_tracker: Optional GPS tracker
+            on_complete: Called with the finished clip info
         
         Returns:
-            Clip info dict
+            Clip info dict (status 'recording'; the file is still growing)
         """
+        trigger_time = time.time()
+        from_ring = self.continuous_recording_active
+        pre_roll, last_seq = self.pre_roll.snapshot(trigger_time) if from_ring else ([], 0)
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"incident_{incident_id}_{timestamp}.mp4"
-        video_path = self.output_dir / filename
+        path_base = self.output_dir / f"incident_{incident_id}_{timestamp}"
         
-        fps = 10
-        frame_delay = 1.0 / fps
-        total_frames = int(duration_seconds * fps)
+        try:
+            # No live locate: pre-roll frames are indexed at their stored fix
+            writer = self._open_writer(path_base)
+        except Exception as e:
+            print(f"Incident clip error: {e}")
+            return {'ok': False, 'error': 'Failed to record incident clip'}
         
-        frames = []
+        clip = {
+            'ok': True,
+            'incident_id': incident_id,
+            'video_path': str(writer.path),
+            'trigger_time': trigger_time,
+            'pre_roll_frames': len(pre_roll),
+            'pre_roll_seconds': round(trigger_time - pre_roll[0][1], 2) if pre_roll else 0,
+            'post_roll_seconds': duration_seconds,
+            'quality': quality,
+            'status': 'recording',
+            'protected': True
+        }
         
-        for _ in range(total_frames):
-            try:
-                frame = self._capture_frame(camera_system, 'dual')
-                
-                if self.timestamp_overlay or self.gps_overlay:
-                    frame = self._add_overlays(frame, gps_tracker)
+        with self.recording_lock:
+            self.incident_clips[incident_id] = clip
+        
+        threading.Thread(
+            target=self._write_incident_clip,
+            args=(writer, clip, pre_roll, last_seq, from_ring, camera_system,
+                  gps_tracker, on_complete),
+            name=f"incident-{incident_id}",
+            daemon=True
+        ).start()
+        
+        return dict(clip)
+    
+    def _write_incident_clip(self, writer: SegmentWriter, clip: Dict, pre_roll: List,
+                             last_seq: int, from_ring: bool, camera_system, gps_tracker,
+                             on_complete: Optional[Callable[[Dict], None]]):
+        """Background task: flush the pre-roll, then append post-roll frames."""
+        end_time = clip['trigger_time'] + clip['post_roll_seconds']
+        
+        try:
+            for _, captured_at, jpeg, fix in pre_roll:
+                writer.write(jpeg, captured_at, fix)
+            
+            while from_ring and time.time() < end_time:
+                frames = self.pre_roll.frames_after(last_seq, timeout=1.0)
                 
-                frames.append(frame)
+                if not frames and not self.continuous_recording_active:
+                    # Recording stopped mid-clip: capture the rest directly
+                    from_ring = False
+                    break
                 
-            except Exception as e:
-                print(f"Incident clip frame error: {e}")
-            
-            time.sleep(frame_delay)
-        
-        if frames:
-            self._save_frames_as_gif(frames, video_path)
+                for seq, captured_at, jpeg, fix in frames:
+                    if captured_at > end_time:
+                        break
+                    writer.write(jpeg, captured_at, fix)
+                    last_seq = seq
             
-            file_size_mb = video_path.stat().st_size / (1024 * 1024)
+            remaining = end_time - time.time()
+            if not from_ring and remaining > 0:
+                self._stream_frames(writer, camera_system, 'dual', gps_tracker, remaining)
             
-            return {
-                'ok': True,
-                'incident_id': incident_id,
-                'video_path': str(video_path),
-                'duration_seconds': duration_seconds,
-                'file_size_mb': file_size_mb,
-                'protected': True
-            }
+            result = writer.close()
+            if result['frame_count']:
+                self._register_recording(result, 'dual', clip.get('quality', '1080p'),
+                                         'incident', protected=True,
+                                         preview_time=clip['trigger_time'],
+                                         incident_id=clip['incident_id'])
+            clip.update({
+                'ok': result['frame_count'] > 0,
+                'duration_seconds': result['duration_seconds'],
+                'frame_count': result['frame_count'],
+                'file_size_mb': result['file_size_mb'],
+                'status': 'completed' if result['frame_count'] else 'failed'
+            })
+            if not clip['ok']:
+                clip['error'] = 'Failed to record incident clip'
+        
+        except Exception as e:
+            print(f"Incident clip error: {e}")
+            clip.update({'ok': False, 'status': 'failed', 'error': str(e)})
+        
+        with self.recording_lock:
+            self.incident_clips.pop(clip['incident_id'], None)
+        
+        if on_complete:
+            try:
+                on_complete(dict(clip))
+            except Exception as e:
+                print(f"Incident clip callback error: {e}")
+    
+    def start_parking_mode(self, camera_system, camera_layout: str = 'front',
+                           sensitivity: float = 0.7, time_lapse: bool = True,
+                           gps_tracker=None,
+                           on_event: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Switch to parking-mode capture (stops continuous recording).
+        
+        Args:
+            camera_system: CameraSystem instance
+            camera_layout: Layout to watch (front, rear, dual, quad)
+            sensitivity: Motion sensitivity (0.0 to 1.0)
+            time_lapse: Keep a time-lapse of the idle periods
+            gps_tracker: Optional GPS tracker for location overlay
+            on_event: Called with each finished motion event
+        
+        Returns:
+            Parking mode info dict
+        """
+        if self.continuous_recording_active:
+            self.stop_continuous_recording()
+        self.stop_parking_mode()
+        
+        def open_writer(prefix: str, time_lapse: bool) -> SegmentWriter:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path_base = self.output_dir / f"{prefix}_{camera_layout}_{timestamp}"
+            return self._open_writer(path_base, gps_tracker, time_lapse=time_lapse)
+        
+        def on_segment(result: Dict, recording_type: str, protected: bool):
+            self._register_recording(result, camera_layout, '1080p', recording_type,
+                                     protected=protected)
+            self._check_and_cleanup_storage()
+        
+        self.parking_recorder = ParkingRecorder(
+            capture=lambda: self._capture_frame(camera_system, camera_layout),
+            stamp=lambda frame: self._add_overlays(frame, gps_tracker),
+            open_writer=open_writer,
+            on_segment=on_segment,
+            fps=self.fps,
+            jpeg_quality=self.jpeg_quality,
+            sensitivity=sensitivity,
+            time_lapse=time_lapse,
+            on_event=on_event
+        )
+        self.parking_recorder.start()
+        self.parking_mode_active = True
+        self.parking_mode_time_lapse = time_lapse
         
-        return {'ok': False, 'error': 'Failed to record incident clip'}
+        return {'ok': True, 'status': 'parking', 'camera_layout': camera_layout,
+                'time_lapse': time_lapse}
     
-    def capture_snapshot(self, camera_system, reason: str = 'manual') -> Dict:
-        """Capture single snapshot."""
+    def stop_parking_mode(self) -> Dict:
+        """Stop parking-mode capture and finalize its open segments."""
+        parking_recorder, self.parking_recorder = self.parking_recorder, None
+        self.parking_mode_active = False
+        if parking_recorder is None:
+            return {'ok': False, 'error': 'Parking mode not active'}
+        
+        parking_recorder.stop()
+        return {'ok': True, 'status': 'stopped', 'parking': parking_recorder.stats()}
+    
+    def capture_snapshot(self, camera_system, reason: str = 'manual',
+                         on_complete: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Capture single snapshot; encoding and thumbnails happen in the background.
+        
+        Once written, the snapshot and its preview digests are recorded in
+        the database, which lists them and keeps the previews from being pruned.
+        
+        Args:
+            camera_system: CameraSystem instance
+            reason: Why the snapshot was taken (part of the file name)
+            on_complete: Called with the result once the JPEG and previews are written
+        
+        Returns:
+            Snapshot info dict (status 'encoding')
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"snapshot_{reason}_{timestamp}.jpg"
         snapshot_path = self.output_dir / filename
         
         try:
             frame = self._capture_frame(camera_system, 'front')
-            frame.save(str(snapshot_path), 'JPEG', quality=95)
-            
-            file_size_mb = snapshot_path.stat().st_size / (1024 * 1024)
-            
-            return {
-                'ok': True,
-                'snapshot_path': str(snapshot_path),
-                'file_size_mb': file_size_mb,
-                'reason': reason
-            }
-        
         except Exception as e:
             return {'ok': False, 'error': str(e)}
+        
+        snapshot = {
+            'ok': True,
+            'snapshot_id': Path(filename).stem,
+            'snapshot_path': str(snapshot_path),
+            'reason': reason,
+            'status': 'encoding'
+        }
+        
+        def finished(result: Dict):
+            if result['ok']:
+                self.storage.add(snapshot_path)
+                if self.db:
+                    try:
+                        self.db.create_snapshot(snapshot['snapshot_id'], str(snapshot_path),
+                                                reason, result['file_size_mb'],
+                                                result['small'], result['medium'])
+                    except Exception as e:
+                        print(f"Snapshot registration error: {e}")
+                snapshot.update({
+                    'file_size_mb': result['file_size_mb'],
+                    'preview_small': result['small'],
+                    'preview_medium': result['medium']
+                })
+            else:
+                snapshot.update({'ok': False, 'error': result.get('error')})
+            snapshot['status'] = 'completed' if result['ok'] else 'failed'
+            if on_complete:
+                on_complete(dict(snapshot))
+        
+        if not self.snapshots.submit(frame, finished, full_path=snapshot_path):
+            return {'ok': False, 'error': 'Snapshot encoder busy'}
+        
+        return dict(snapshot)
     
-    def _check_and_cleanup_storage(self):
-        """Check storage usage and cleanup if needed."""
-        try:
-            total_size = sum(f.stat().st_size for f in self.output_dir.glob('*') if f.is_file())
-            
-            if total_size > self.max_storage_bytes * 0.9:
-                self._cleanup_old_recordings()
+    def _register_recording(self, result: Dict, camera_layout: str, quality: str,
+                            recording_type: str, protected: bool = False,
+                            preview_time: Optional[float] = None,
+                            incident_id: Optional[str] = None):
+        """
+        Add a finished file to the storage index and the recordings table,
+        and queue its previews.
+        """
+        recording_id = Path(result['video_path']).stem
         
-        except Exception as e:
-            print(f"Storage check error: {e}")
+        if self.db:
+            try:
+                self.db.create_recording(
+                    recording_id=recording_id,
+                    camera_layout=camera_layout,
+                    video_path=result['video_path'],
+                    recording_type=recording_type,
+                    quality=quality,
+                    protected=protected
+                )
+                self.db.update_recording(
+                    recording_id,
+                    duration_seconds=result['duration_seconds'],
+                    file_size_mb=result['file_size_mb']
+                )
+            except Exception as e:
+                print(f"Recording registration error: {e}")
+        
+        if self.frame_locator and result.get('frame_index_path'):
+            try:
+                self.frame_locator.index_segment(recording_id, result['frame_index_path'])
+            except Exception as e:
+                print(f"Frame index error: {e}")
+        
+        self.storage.add(result['video_path'], recording_id=recording_id, protected=protected)
+        self._queue_preview(recording_id, result, preview_time, incident_id)
     
-    def _cleanup_old_recordings(self):
-        """Delete oldest unprotected recordings."""
+    def _queue_preview(self, recording_id: str, result: Dict, preview_time: Optional[float],
+                       incident_id: Optional[str]):
+        """
+        Thumbnail one indexed frame of a recording (the one nearest
+        preview_time, else the middle).
+        """
+        index_path = result.get('frame_index_path')
+        if not self.db or not index_path or not os.path.exists(index_path):
+            return
+        
+        records = [r for r in read_frame_index(index_path) if r['byte_offset'] is not None]
+        if not records:
+            return
+        if preview_time is None:
+            record = records[len(records) // 2]
+        else:
+            record = min(records, key=lambda r: abs(r['timestamp'] - preview_time))
+        
+        video_path = result['video_path']
+        
+        def load() -> bytes:
+            with open(video_path, 'rb') as f:
+                f.seek(record['byte_offset'])
+                return f.read(record['byte_size'])
+        
+        def finished(preview: Dict):
+            if not preview['ok']:
+                return
+            self.db.set_recording_previews(recording_id, preview['small'], preview['medium'])
+            if incident_id:
+                self.db.set_incident_previews(
+                    incident_id, preview['small'], preview['medium'],
+                    thumbnail_path=str(self.snapshots.store.path(preview['medium']))
+                )
+        
+        self.snapshots.submit(load, finished)
+    
+    def _check_and_cleanup_storage(self):
+        """Delete oldest unprotected recordings once usage passes 90%."""
         try:
-            files = sorted(
-                self.output_dir.glob('*.gif'),
-                key=lambda f: f.stat().st_mtime
-            )
+            deleted = self.storage.enforce(self.max_storage_bytes * 0.9)
             
-            protected_keywords = ['incident', 'protected']
-            
-            for file in files[:10]:
-                if not any(keyword in file.name.lower() for keyword in protected_keywords):
-                    file.unlink()
-                    print(f"Deleted old recording: {file.name}")
+            prune_due = time.time() - self._last_preview_prune > self.preview_prune_interval
+            if deleted and self.db and prune_due:
+                self._last_preview_prune = time.time()
+                self.snapshots.store.prune(self.db.get_preview_digests())
         
         except Exception as e:
-            print(f"Cleanup error: {e}")
+            print(f"Storage check error: {e}")
     
     def get_storage_stats(self) -> Dict:
-        """Get storage statistics."""
+        """Get storage statistics from the storage index's running totals."""
         try:
-            files = list(self.output_dir.glob('*'))
-            total_size = sum(f.stat().st_size for f in files if f.is_file())
+            stats = self.storage.stats()
+            total_size = stats['total_bytes']
             
             total_size_gb = total_size / (1024**3)
             available_gb = (self.max_storage_bytes - total_size) / (1024**3)
             
             return {
-                'total_recordings': len([f for f in files if f.suffix in ['.gif', '.mp4']]),
+                'total_recordings': stats['recording_count'],
                 'total_size_gb': round(total_size_gb, 2),
                 'max_storage_gb': round(self.max_storage_bytes / (1024**3), 2),
                 'available_gb': round(available_gb, 2),
-                'usage_percent': round((total_size / self.max_storage_bytes) * 100, 1)
+                'usage_percent': round((total_size / self.max_storage_bytes) * 100, 1),
+                'deleted_recordings': stats['deleted_count']
             }
         
         except Exception as e:
             return {'error': str(e)}
     
+    def _capture_stats(self) -> Optional[Dict]:
+        """Capture pipeline stats (including dropped frames) of the running recording."""
+        with self.recording_lock:
+            pipelines = [info['pipeline'] for info in self.active_recordings.values()
+                         if info.get('pipeline')]
+        return pipelines[-1].stats() if pipelines else None
+    
     def is_recording(self) -> bool:
         """Check if continuous recording is active."""
         return self.continuous_recording_active
@@ -426,8 +803,14 @@ class LoopRecorder:
         return {
             'continuous_recording_active': self.continuous_recording_active,
             'parking_mode_active': self.parking_mode_active,
+            'parking': self.parking_recorder.stats() if self.parking_recorder else None,
             'timestamp_overlay': self.timestamp_overlay,
             'gps_overlay': self.gps_overlay,
+            'container': self.container,
+            'pre_roll': self.pre_roll.stats(),
+            'incident_clips_recording': len(self.incident_clips),
+            'snapshots': self.snapshots.stats(),
+            'capture': self._capture_stats(),
             'active_recordings': len(self.active_recordings),
             'storage': self.get_storage_stats()
         }
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Streaming Segment Writers
+Append encoded dashcam frames straight to disk as they are captured
+"""
+
+import io
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+def encode_jpeg(frame: Image.Image, quality: int = 85) -> bytes:
+    """Encode a frame once; every container stores the same JPEG bytes."""
+    buffer = io.BytesIO()
+    frame.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def jpeg_size(data: bytes) -> Tuple[int, int]:
+    """(width, height) from a JPEG's SOF marker without decoding it."""
+    offset = 2
+    while offset + 9 < len(data):
+        if data[offset] != 0xFF:
+            offset += 1
+            continue
+        marker = data[offset + 1]
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2):
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    raise ValueError('Not a baseline/progressive JPEG')
+
+
+class SegmentWriter:
+    """
+    Base class for streaming segment containers.
+
+    Frames are JPEG bytes written as they arrive, so memory holds one
+    frame at a time. Data is flushed and fsynced every fsync_interval
+    seconds, bounding what a power cut can lose.
+    """
+
+    extension = ''
+
+    def __init__(self, path_base: Path, fps: float, fsync_interval: float = 2.0):
+        """
+        Args:
+            path_base: Output path without extension
+            fps: Nominal frame rate (the real rate is measured on close)
+            fsync_interval: Seconds between fsyncs
+        """
+        self.path = Path(f'{path_base}{self.extension}')
+        self.fps = fps
+        self.fsync_interval = fsync_interval
+        # Time-lapse frames are seconds apart but play back at the nominal fps
+        self.time_lapse = False
+        # Optional FrameIndexWriter fed every frame's timestamp and location
+        self.frame_index = None
+
+        self.frame_count = 0
+        self.bytes_written = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self._last_sync = time.monotonic()
+
+    def write(self, jpeg: bytes, timestamp: Optional[float] = None,
+              fix: Optional[Dict] = None) -> Optional[Tuple[int, int]]:
+        """
+        Append one frame; returns its (byte offset, size) in the file when known.
+
+        fix is the GPS fix from when the frame was captured, for the frame index.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+
+        location = self._write_frame(jpeg, timestamp)
+        if self.frame_index is not None:
+            self.frame_index.add(timestamp, self.frame_count, location, fix)
+        self.frame_count += 1
+        self.bytes_written += len(jpeg)
+
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        return location
+
+    @property
+    def full(self) -> bool:
+        """True when the container cannot take more frames."""
+        return False
+
+    def measured_fps(self) -> float:
+        """Frame rate actually achieved (nominal fps until two frames exist)."""
+        if self.frame_count < 2 or self.last_timestamp <= self.first_timestamp:
+            return self.fps
+        return (self.frame_count - 1) / (self.last_timestamp - self.first_timestamp)
+
+    def playback_fps(self) -> float:
+        """Frame rate the container advertises to players."""
+        return self.fps if self.time_lapse else self.measured_fps()
+
+    def sync(self):
+        """Flush buffered frames to stable storage."""
+        if self.frame_index is not None:
+            self.frame_index.sync()
+        self._last_sync = time.monotonic()
+
+    def close(self) -> Dict:
+        """Finalize the container; returns segment info."""
+        if self.frame_index is not None:
+            self.frame_index.close()
+        duration = 0.0
+        if self.frame_count:
+            duration = self.frame_count / self.measured_fps()
+        info = {
+            'video_path': str(self.path),
+            'container': self.extension.lstrip('.'),
+            'frame_count': self.frame_count,
+            'duration_seconds': round(duration, 2),
+            'fps': round(self.measured_fps(), 2),
+            'start_time': self.first_timestamp,
+            'end_time': self.last_timestamp,
+            'file_size_mb': self.path.stat().st_size / (1024 * 1024) if self.path.exists() else 0
+        }
+        if self.frame_index is not None:
+            info['frame_index_path'] = str(self.frame_index.path)
+        return info
+
+    def _write_frame(self, jpeg: bytes, timestamp: float) -> Optional[Tuple[int, int]]:
+        raise NotImplementedError
+
+
+class MjpegAviWriter(SegmentWriter):
+    """
+    MJPEG-in-AVI, playable by any video player.
+
+    Header sizes are placeholders patched at every fsync and on close, so
+    a file cut off by a power loss still opens up to its last sync. The
+    idx1 index is written on close from offsets kept as 8 bytes per frame.
+    """
+
+    extension = '.avi'
+
+    # Stay well under the 2 GB AVI 1.0 RIFF limit
+    MAX_BYTES = 1 << 30
+
+    def __init__(self, path_base: Path, fps: float, fsync_interval: float = 2.0):
+        super().__init__(path_base, fps, fsync_interval)
+        self._file = None
+        self._movi_start = 0
+        self._index = []
+        self._size = (0, 0)
+        self._movi_bytes = 0
+        self._biggest = 0
+
+    def _open(self, width: int, height: int):
+        self._size = (width, height)
+        self._file = open(self.path, 'wb')
+        self._file.write(self._headers(0, self.fps))
+        self._movi_start = self._file.tell() - 4
+
+    def _headers(self, frames: int, fps: float) -> bytes:
+        width, height = self._size
+        rate = max(1, int(round(fps * 1000)))
+        biggest = self._biggest
+
+        avih = struct.pack('<IIIIIIIIII4I', int(1e6 / max(fps, 0.001)), 0, 0, 0x10, frames, 0, 1,
+                           biggest, width, height, 0, 0, 0, 0)
+        strh = b'vidsMJPG' + struct.pack('<IHHIIIIIIIIhhhh', 0, 0, 0, 0, 1000, rate, 0, frames,
+                                         biggest, 0xFFFFFFFF, 0, 0, 0, width, height)
+        strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG',
+                           width * height * 3, 0, 0, 0, 0)
+
+        strl = b'strl' + self._chunk(b'strh', strh) + self._chunk(b'strf', strf)
+        hdrl = b'hdrl' + self._chunk(b'avih', avih) + self._chunk(b'LIST', strl)
+        riff_size = 4 + 8 + len(hdrl) + 12 + self._movi_bytes
+
+        return b'RIFF' + struct.pack('<I', riff_size) + b'AVI ' + self._chunk(b'LIST', hdrl) + \
+            b'LIST' + struct.pack('<I', 4 + self._movi_bytes) + b'movi'
+
+    @staticmethod
+    def _chunk(fourcc: bytes, data: bytes) -> bytes:
+        return fourcc + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+    def _write_frame(self, jpeg: bytes, timestamp: float) -> Tuple[int, int]:
+        if self._file is None:
+            self._open(*jpeg_size(jpeg))
+
+        offset = self._file.tell()
+        self._file.write(b'00dc' + struct.pack('<I', len(jpeg)) + jpeg)
+        if len(jpeg) % 2:
+            self._file.write(b'\0')
+        self._index.append((offset - self._movi_start, len(jpeg)))
+        self._movi_bytes += 8 + len(jpeg) + len(jpeg) % 2
+        self._biggest = max(self._biggest, len(jpeg))
+        return offset + 8, len(jpeg)
+
+    @property
+    def full(self) -> bool:
+        """Near the RIFF size limit; the caller should start a new segment."""
+        return self._file is not None and self._file.tell() >= self.MAX_BYTES
+
+    def _patch_headers(self, with_index: bool = False):
+        end = self._file.tell()
+        header = self._headers(len(self._index), self.playback_fps())
+        if with_index:
+            riff_size = struct.unpack('<I', header[4:8])[0] + 8 + 16 * len(self._index)
+            header = header[:4] + struct.pack('<I', riff_size) + header[8:]
+        self._file.seek(0)
+        self._file.write(header)
+        self._file.seek(end)
+
+    def sync(self):
+        if self._file is not None:
+            self._patch_headers()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        super().sync()
+
+    def close(self) -> Dict:
+        if self._file is not None:
+            index = b''.join(struct.pack('<4sIII', b'00dc', 0x10, offset, size)
+                             for offset, size in self._index)
+            self._file.write(b'idx1' + struct.pack('<I', len(index)) + index)
+            self._patch_headers(with_index=True)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        return super().close()
+
+
+class JpegSequenceWriter(SegmentWriter):
+    """
+    Concatenated JPEGs (a raw MJPEG stream) plus a binary sidecar index.
+
+    The .idx file holds one (offset u64, size u32, timestamp f64) record
+    per frame, appended as frames arrive, so any frame can be read with a
+    single ranged read.
+    """
+
+    extension = '.mjpeg'
+    INDEX_RECORD = struct.Struct('<QId')
+
+    def __init__(self, path_base: Path, fps: float, fsync_interval: float = 2.0):
+        super().__init__(path_base, fps, fsync_interval)
+        self.index_path = Path(f'{path_base}.idx')
+        self._file = open(self.path, 'wb')
+        self._index_file = open(self.index_path, 'wb')
+
+    def _write_frame(self, jpeg: bytes, timestamp: float) -> Tuple[int, int]:
+        offset = self._file.tell()
+        self._file.write(jpeg)
+        self._index_file.write(self.INDEX_RECORD.pack(offset, len(jpeg), timestamp))
+        return offset, len(jpeg)
+
+    def sync(self):
+        for f in (self._file, self._index_file):
+            f.flush()
+            os.fsync(f.fileno())
+        super().sync()
+
+    def close(self) -> Dict:
+        self.sync()
+        self._file.close()
+        self._index_file.close()
+        info = super().close()
+        info['index_path'] = str(self.index_path)
+        return info
+
+
+class FfmpegPipeWriter(SegmentWriter):
+    """
+    H.264 MP4 encoded by an ffmpeg child fed JPEGs over a pipe.
+
+    Much smaller files than MJPEG at the cost of a CPU-heavy encoder;
+    byte offsets are not known until ffmpeg muxes, so write() returns None.
+    """
+
+    extension = '.mp4'
+
+    def __init__(self, path_base: Path, fps: float, fsync_interval: float = 2.0):
+        super().__init__(path_base, fps, fsync_interval)
+        self._process = subprocess.Popen([
+            'ffmpeg', '-v', 'error', '-y', '-f', 'mjpeg', '-framerate', str(fps), '-i', '-',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-movflags', '+frag_keyframe+empty_moov', str(self.path)
+        ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _write_frame(self, jpeg: bytes, timestamp: float) -> None:
+        self._process.stdin.write(jpeg)
+        return None
+
+    def sync(self):
+        self._process.stdin.flush()
+        super().sync()
+
+    def close(self) -> Dict:
+        self._process.stdin.close()
+        self._process.wait()
+        return super().close()
+
+
+class FrameRingBuffer:
+    """
+    Most recent encoded frames, kept for incident pre-roll.
+
+    Bounded by age and by total bytes, dropping the oldest frames first,
+    so a high-detail scene shortens the window instead of growing memory.
+    Each frame gets a sequence number; a post-roll reader waits for frames
+    newer than the last one it wrote. Frames keep the GPS fix they were
+    captured with, so a clip written from the buffer is indexed where
+    each frame was recorded.
+    """
+
+    def __init__(self, seconds: float = 15.0, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            seconds: Pre-roll window
+            max_bytes: Memory cap for buffered JPEG bytes
+        """
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+
+        self._frames = deque()  # (seq, timestamp, jpeg, fix)
+        self._bytes = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def push(self, jpeg: bytes, timestamp: Optional[float] = None,
+             fix: Optional[Dict] = None) -> int:
+        """Add a frame, evicting the oldest beyond the window; returns its sequence number."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, timestamp, jpeg, fix))
+            self._bytes += len(jpeg)
+            self._trim(timestamp)
+            self._cond.notify_all()
+            return self._seq
+
+    def _trim(self, now: float):
+        while self._frames and (self._bytes > self.max_bytes or
+                                self._frames[0][1] < now - self.seconds):
+            self._bytes -= len(self._frames.popleft()[2])
+
+    def resize(self, seconds: float, max_bytes: Optional[int] = None):
+        with self._cond:
+            self.seconds = seconds
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if self._frames:
+                self._trim(self._frames[-1][1])
+
+    def clear(self):
+        with self._cond:
+            self._frames.clear()
+            self._bytes = 0
+
+    def snapshot(self, now: Optional[float] = None) -> Tuple[List[Tuple], int]:
+        """
+        (seq, timestamp, jpeg, fix) frames from the last `seconds` before
+        now, plus the newest sequence number; the copy holds references,
+        not JPEG data.
+        """
+        now = time.time() if now is None else now
+        with self._cond:
+            frames = [frame for frame in self._frames if frame[1] >= now - self.seconds]
+            return frames, self._seq
+
+    def frames_after(self, seq: int, timeout: float) -> List[Tuple]:
+        """Frames newer than seq, waiting up to timeout for at least one."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq, timeout)
+            if not self._frames or self._seq <= seq:
+                return []
+            start = max(0, seq + 1 - self._frames[0][0])
+            return list(islice(self._frames, start, None))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            span = self._frames[-1][1] - self._frames[0][1] if len(self._frames) > 1 else 0.0
+            return {
+                'seconds': self.seconds,
+                'frames': len(self._frames),
+                'buffered_seconds': round(span, 2),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+CONTAINERS = {
+    'avi': MjpegAviWriter,
+    'mjpeg': JpegSequenceWriter,
+    'ffmpeg': FfmpegPipeWriter
+}
+
+# Extensions of finished recordings in any container
+RECORDING_EXTENSIONS = ('.gif', '.avi', '.mjpeg', '.mp4')
+
+
+def open_segment_writer(container: str, path_base: Path, fps: float,
+                        fsync_interval: float = 2.0, time_lapse: bool = False) -> SegmentWriter:
+    """Create a writer; 'ffmpeg' falls back to AVI when ffmpeg is not installed."""
+    if container not in CONTAINERS:
+        raise ValueError(f"Container must be one of: {list(CONTAINERS)}")
+    if container == 'ffmpeg' and not shutil.which('ffmpeg'):
+        container = 'avi'
+    writer = CONTAINERS[container](path_base, fps, fsync_interval)
+    writer.time_lapse = time_lapse
+    return writer
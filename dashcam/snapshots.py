@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Snapshot Pipeline
+Background JPEG encoding and content-addressed preview thumbnails
+"""
+
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+from PIL import Image
+
+from services.dashcam.segments import encode_jpeg
+
+
+PREVIEW_SIZES = {
+    'small': (160, 90),
+    'medium': (480, 270)
+}
+
+
+class PreviewStore:
+    """
+    Content-addressed JPEG store: a file's name is the SHA-256 of its bytes.
+
+    The digest doubles as a strong ETag, and since content never changes
+    under a name, responses can be cached indefinitely. Identical previews
+    (a parked car's unchanged scene) are stored once.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.jpg"
+
+    @staticmethod
+    def is_digest(value: str) -> bool:
+        return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+    def put(self, data: bytes) -> str:
+        """Store bytes (once) and return their digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def prune(self, keep: Iterable[str], grace_seconds: float = 86400) -> int:
+        """Delete previews not in keep and older than grace_seconds; returns count."""
+        keep = set(keep)
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for path in self.root.glob('*/*.jpg'):
+            if path.stem in keep:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+class SnapshotPipeline:
+    """
+    Encodes snapshots and previews on a background worker.
+
+    A job's source is either a PIL frame (a snapshot, also written out as a
+    full-resolution JPEG) or a loader returning an already-encoded JPEG
+    (a frame read back from a recording). Both thumbnails come from one
+    decode: encoded frames are decoded with JPEG draft mode straight to
+    about the medium size, the medium preview is made from that, and the
+    small one from the medium one.
+    """
+
+    def __init__(self, store_dir: Path, full_quality: int = 95, preview_quality: int = 75,
+                 queue_size: int = 64):
+        """
+        Args:
+            store_dir: Directory for content-addressed previews
+            full_quality: JPEG quality of full-resolution snapshots
+            preview_quality: JPEG quality of thumbnails
+            queue_size: Jobs waiting for the worker before new ones are refused
+        """
+        self.store = PreviewStore(store_dir)
+        self.full_quality = full_quality
+        self.preview_quality = preview_quality
+
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='snapshot-encoder', daemon=True)
+        self._thread.start()
+
+    def submit(self, source: Union[Image.Image, Callable[[], bytes]],
+               on_complete: Callable[[Dict], None], full_path: Optional[Path] = None) -> bool:
+        """
+        Queue a job; returns False if the worker is too far behind.
+
+        Args:
+            source: Frame to encode, or a loader returning JPEG bytes
+            on_complete: Called on the worker with the result dict
+            full_path: Where to write the full-resolution JPEG (frames only)
+        """
+        try:
+            self._queue.put((source, on_complete, full_path), timeout=1.0)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            source, on_complete, full_path = self._queue.get()
+            started = time.perf_counter()
+            try:
+                result = self._process(source, full_path)
+                with self._stats_lock:
+                    self.completed += 1
+            except Exception as e:
+                print(f"Snapshot encode error: {e}")
+                result = {'ok': False, 'error': str(e)}
+                with self._stats_lock:
+                    self.failed += 1
+            with self._stats_lock:
+                self.busy_seconds += time.perf_counter() - started
+
+            try:
+                on_complete(result)
+            except Exception as e:
+                print(f"Snapshot callback error: {e}")
+
+    def _decode(self, data: bytes) -> Image.Image:
+        """Decode a JPEG at the smallest DCT scale still covering the medium size."""
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', PREVIEW_SIZES['medium'])
+        return image.convert('RGB')
+
+    def _process(self, source, full_path: Optional[Path]) -> Dict:
+        result = {'ok': True}
+
+        if isinstance(source, Image.Image):
+            if full_path is not None:
+                data = encode_jpeg(source, self.full_quality)
+                with open(full_path, 'wb') as f:
+                    f.write(data)
+                result['full_path'] = str(full_path)
+                result['file_size_mb'] = len(data) / (1024 * 1024)
+            # New image: the caller's frame is never modified
+            medium = source.resize(self._fit(source.size, PREVIEW_SIZES['medium']),
+                                   Image.BILINEAR, reducing_gap=2.0)
+        else:
+            medium = self._decode(source())
+            medium.thumbnail(PREVIEW_SIZES['medium'], Image.BILINEAR)
+
+        small = medium.copy()
+        small.thumbnail(PREVIEW_SIZES['small'], Image.BILINEAR)
+
+        for name, preview in (('medium', medium), ('small', small)):
+            result[name] = self.store.put(encode_jpeg(preview, self.preview_quality))
+        return result
+
+    @staticmethod
+    def _fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+        scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'completed': self.completed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'busy_seconds': round(self.busy_seconds, 3)
+            }
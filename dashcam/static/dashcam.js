@@ -147,6 +147,7 @@ function renderIncidents(incidents) {
     
     incidentList.innerHTML = incidents.map(incident => `
         <div class="incident-item">
+            ${previewImage(incident)}
             <div class="incident-header">
                 <div class="incident-type">${formatIncidentType(incident.incident_type)}</div>
                 <span class="severity-badge severity-${incident.severity}">
@@ -198,6 +199,7 @@ function renderRecordings(recordings) {
     
     recordingList.innerHTML = recordings.map(rec => `
         <div class="recording-item">
+            ${previewImage(rec)}
             <div class="incident-header">
                 <div>
                     <div class="incident-type">${rec.camera_layout.toUpperCase()} - ${rec.quality}</div>
@@ -235,6 +237,16 @@ function renderRecordings(recordings) {
     `).join('');
 }
 
+function previewImage(item) {
+    // Small thumbnail; the medium one is only fetched on high-density screens
+    if (!item.preview_small_url) {
+        return '';
+    }
+    return `<img class="preview-thumb" src="${item.preview_small_url}"
+        srcset="${item.preview_small_url} 1x, ${item.preview_medium_url} 2x"
+        width="160" height="90" loading="lazy" alt="">`;
+}
+
 function formatIncidentType(type) {
     return type.replace(/_/g, ' ').replace(/\b\w/g, c => c.toUpperCase());
 }
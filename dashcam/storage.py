@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Recording Storage Index
+Running byte totals and oldest-first retention without rescanning the card
+"""
+
+import heapq
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.dashcam.frame_index import FRAME_INDEX_EXTENSION
+from services.dashcam.segments import RECORDING_EXTENSIONS
+
+
+# Files that belong to a recording and are deleted with it
+SIDECAR_EXTENSIONS = ('.idx', FRAME_INDEX_EXTENSION)
+
+PROTECTED_KEYWORDS = ('incident', 'protected')
+
+
+class StorageIndex:
+    """
+    In-memory index of the recordings directory.
+
+    The directory is scanned once at startup and reconciled with the
+    protected flags in dashcam_recordings; afterwards the recorder reports
+    every file it writes, so totals are kept as running sums. Deletable
+    recordings sit in a min-heap keyed by age: retention pops the oldest
+    in O(log n). Protection changes are applied lazily - stale heap entries
+    are skipped when popped rather than searched for.
+    """
+
+    def __init__(self, root: Path, max_bytes: float, database=None):
+        """
+        Args:
+            root: Recordings directory
+            max_bytes: Storage budget for the directory
+            database: Optional DashcamDatabase with recording rows and protected flags
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.db = database
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._by_recording: Dict[str, str] = {}
+        self._heap = []
+        self._counter = 0
+        self.total_bytes = 0
+        self.recording_count = 0
+        self.deleted_count = 0
+
+    def reconcile(self):
+        """Rebuild the index from one directory scan and the database's protected flags."""
+        rows = self.db.get_recording_files() if self.db else []
+        by_path = {os.path.abspath(row['video_path']): row for row in rows}
+
+        with self._lock:
+            self._entries.clear()
+            self._by_recording.clear()
+            self._heap = []
+            self.total_bytes = 0
+            self.recording_count = 0
+
+            with os.scandir(self.root) as scan:
+                for entry in scan:
+                    if not entry.is_file() or entry.name.startswith('.'):
+                        continue
+                    stat = entry.stat()
+                    row = by_path.get(os.path.abspath(entry.path), {})
+                    self._add(entry.path, stat.st_size, stat.st_mtime,
+                              row.get('recording_id'), bool(row.get('protected')))
+
+    @staticmethod
+    def _deletable_kind(path: str) -> bool:
+        return os.path.splitext(path)[1] in RECORDING_EXTENSIONS
+
+    def _add(self, path: str, size: int, mtime: float, recording_id: Optional[str],
+             protected: bool):
+        """Insert or refresh one file (lock held)."""
+        path = os.path.abspath(path)
+        old = self._entries.get(path)
+        if old:
+            self.total_bytes -= old['size']
+            if old['recording']:
+                self.recording_count -= 1
+
+        name = os.path.basename(path).lower()
+        entry = {
+            'size': size,
+            'mtime': mtime,
+            'recording_id': recording_id or (old or {}).get('recording_id'),
+            'protected': protected or any(k in name for k in PROTECTED_KEYWORDS),
+            'recording': self._deletable_kind(path),
+            'generation': (old['generation'] + 1) if old else 0
+        }
+        self._entries[path] = entry
+        self.total_bytes += size
+        if entry['recording']:
+            self.recording_count += 1
+        if entry['recording_id']:
+            self._by_recording[entry['recording_id']] = path
+        self._push(path, entry)
+
+    def _push(self, path: str, entry: Dict):
+        if entry['recording'] and not entry['protected']:
+            self._counter += 1
+            heapq.heappush(self._heap, (entry['mtime'], self._counter, entry['generation'], path))
+
+    def add(self, path, recording_id: Optional[str] = None, protected: bool = False):
+        """Record a file the recorder just finished writing (and its sidecars)."""
+        paths = [Path(path)] + [Path(path).with_suffix(ext) for ext in SIDECAR_EXTENSIONS]
+        with self._lock:
+            for item in paths:
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                self._add(str(item), stat.st_size, stat.st_mtime,
+                          recording_id if item == paths[0] else None, protected)
+
+    def set_protected(self, recording_id: str, protected: bool = True) -> bool:
+        """Apply a set_recording_protected change; False if the recording is not on disk."""
+        with self._lock:
+            path = self._by_recording.get(recording_id)
+            entry = self._entries.get(path) if path else None
+            if entry is None:
+                return False
+
+            name = os.path.basename(path).lower()
+            entry['protected'] = protected or any(k in name for k in PROTECTED_KEYWORDS)
+            entry['generation'] += 1
+            self._push(path, entry)
+            return True
+
+    def _forget(self, path: str) -> int:
+        """Drop an entry (lock held); returns its size."""
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return 0
+        self.total_bytes -= entry['size']
+        if entry['recording']:
+            self.recording_count -= 1
+        if entry['recording_id']:
+            self._by_recording.pop(entry['recording_id'], None)
+        return entry['size']
+
+    def _pop_oldest(self) -> Optional[str]:
+        """Oldest deletable path, skipping heap entries made stale by protection changes."""
+        while self._heap:
+            _, _, generation, path = heapq.heappop(self._heap)
+            entry = self._entries.get(path)
+            if entry and entry['generation'] == generation and not entry['protected']:
+                return path
+        return None
+
+    def enforce(self, limit_bytes: Optional[float] = None) -> List[str]:
+        """Delete oldest unprotected recordings until under limit_bytes; returns deleted paths."""
+        limit = self.max_bytes if limit_bytes is None else limit_bytes
+        deleted = []
+
+        while True:
+            with self._lock:
+                if self.total_bytes <= limit:
+                    break
+                path = self._pop_oldest()
+                if path is None:
+                    break
+                recording_id = self._entries[path]['recording_id']
+                self._forget(path)
+                companions = [str(Path(path).with_suffix(ext)) for ext in SIDECAR_EXTENSIONS]
+                for companion in companions:
+                    self._forget(companion)
+
+            for item in [path] + companions:
+                try:
+                    os.unlink(item)
+                except FileNotFoundError:
+                    pass
+            if recording_id and self.db:
+                self.db.delete_recording(recording_id)
+
+            deleted.append(path)
+            print(f"Deleted old recording: {os.path.basename(path)}")
+
+        with self._lock:
+            self.deleted_count += len(deleted)
+        return deleted
+
+    def stats(self) -> Dict:
+        """Totals from the running sums; no filesystem access."""
+        with self._lock:
+            return {
+                'total_bytes': self.total_bytes,
+                'recording_count': self.recording_count,
+                'files': len(self._entries),
+                'deleted_count': self.deleted_count
+            }
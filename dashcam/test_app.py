@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the dash cam seek and ranged video endpoints
+"""
+
+import importlib
+import os
+
+import pytest
+from PIL import Image
+
+from services.dashcam.segments import encode_jpeg
+
+START = 1_700_000_000.0
+
+
+@pytest.fixture(scope='module')
+def dashcam_app(tmp_path_factory):
+    # Keep the service's database and recordings out of the source tree
+    data = tmp_path_factory.mktemp('dashcam')
+    overrides = {'DASHCAM_DB_PATH': str(data / 'dashcam.db'),
+                 'DASHCAM_RECORDINGS_DIR': str(data / 'recordings')}
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        module = importlib.import_module('services.dashcam.app')
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key)
+            else:
+                os.environ[key] = value
+    module.app.config['TESTING'] = True
+    return module
+
+
+@pytest.fixture(scope='module')
+def segment(dashcam_app):
+    """Three seconds of 10 fps footage recorded and registered the way the recorder does."""
+    recorder = dashcam_app.recorder
+    writer = recorder._open_writer(dashcam_app.recordings_dir / 'front_seg_test')
+    jpegs = []
+    for i in range(30):
+        jpegs.append(encode_jpeg(Image.new('RGB', (64, 48), (i * 8, 120, 255 - i * 8))))
+        writer.write(jpegs[-1], START + i * 0.1, {'latitude': 10.0, 'longitude': 20.0})
+    result = writer.close()
+    recorder._register_recording(result, 'front', 'high', 'continuous')
+    result['jpegs'] = jpegs
+    return result
+
+
+@pytest.fixture
+def client(dashcam_app):
+    return dashcam_app.app.test_client()
+
+
+def test_seek_returns_frame_and_byte_range(client, segment):
+    response = client.get('/api/recordings/seek', query_string={'time': START + 1.05})
+    assert response.status_code == 200
+    frame = response.get_json()['frame']
+    assert frame['recording_id'] == 'front_seg_test'
+    assert frame['frame_number'] == 10
+    assert frame['video_url'] == '/api/recordings/front_seg_test/video'
+    assert frame['byte_range'] is not None
+
+    assert client.get('/api/recordings/seek',
+                      query_string={'time': START - 60}).status_code == 404
+    assert client.get('/api/recordings/seek',
+                      query_string={'time': 'yesterday'}).status_code == 400
+
+
+def test_range_request_returns_indexed_frame(client, segment):
+    frame = client.get('/api/recordings/seek',
+                       query_string={'time': START + 2.0}).get_json()['frame']
+    byte_range = frame['byte_range']
+
+    response = client.get(frame['video_url'], headers={'Range': byte_range['header']})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'].startswith(
+        f"bytes {byte_range['start']}-{byte_range['end']}/")
+    assert response.data == segment['jpegs'][frame['frame_number']]
+
+    whole = client.get(frame['video_url'])
+    assert whole.status_code == 200
+    assert len(whole.data) == os.path.getsize(segment['video_path'])
+
+
+def test_seek_frame_returns_jpeg(client, segment):
+    response = client.get('/api/recordings/seek/frame', query_string={'time': START + 2.95})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.data == segment['jpegs'][20]
+
+    assert client.get('/api/recordings/seek/frame',
+                      query_string={'time': START + 60}).status_code == 404
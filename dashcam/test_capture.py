@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-camera frame synchronization
+"""
+
+from PIL import Image
+
+from services.dashcam.capture import CapturePipeline
+
+
+class StillCamera:
+    def generate_frame(self):
+        return Image.new('RGB', (8, 8))
+
+
+def pipeline():
+    return CapturePipeline({'front': StillCamera(), 'rear': StillCamera(), 'left': None},
+                           compose=lambda frames: None, fps=10)
+
+
+def buffer(pipe, position, *stamps):
+    frames = []
+    for stamp in stamps:
+        frame = Image.new('RGB', (8, 8))
+        pipe.captures[position]._frames.append((stamp, frame))
+        frames.append(frame)
+    return frames
+
+
+def test_picks_nearest_frames():
+    pipe = pipeline()
+    front = buffer(pipe, 'front', 9.8, 9.9, 10.0)
+    rear = buffer(pipe, 'rear', 9.95, 10.05)
+
+    frames, skew = pipe._synchronize(10.02)
+
+    assert frames['front'] is front[2]
+    assert frames['rear'] is rear[1]
+    assert frames['left'] is None
+    assert round(skew, 3) == 0.05
+
+
+def test_stalled_camera_is_composed_as_missing():
+    pipe = pipeline()
+    front = buffer(pipe, 'front', 10.0)
+    buffer(pipe, 'rear', 9.0)
+
+    frames, skew = pipe._synchronize(10.0)
+
+    assert frames['front'] is front[0]
+    assert frames['rear'] is None
+    assert skew == 0.0
+    assert pipe.stats()['cameras']['rear']['stale'] == 1
+
+
+def test_frame_within_two_intervals_is_used():
+    pipe = pipeline()
+    rear = buffer(pipe, 'rear', 9.85)
+
+    frames, _ = pipe._synchronize(10.0)
+
+    assert frames['rear'] is rear[0]
+    assert frames['front'] is None
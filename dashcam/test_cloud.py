@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for chunked, resumable, prioritized cloud uploads against the local stand-in server
+"""
+
+import hashlib
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from services.dashcam.cloud import CloudBackupService
+from services.dashcam.database import DashcamDatabase
+from services.dashcam.upload_server import LocalUploadServer, create_upload_app
+
+CHUNK = 4096
+
+
+def make_file(path, chunks: int, seed: int = 0) -> str:
+    path.write_bytes(random.Random(seed).randbytes(chunks * CHUNK - 100))
+    return str(path)
+
+
+class Uploads:
+    """CloudBackupService with completion results collected for the test."""
+
+    def __init__(self, endpoint, **kwargs):
+        self.results = []
+        self.finished = threading.Condition()
+        self.service = CloudBackupService(callback=self._done, endpoint=endpoint,
+                                          chunk_size=CHUNK, **kwargs)
+
+    def _done(self, result):
+        with self.finished:
+            self.results.append(result)
+            self.finished.notify_all()
+
+    def wait(self, count: int, timeout: float = 30.0):
+        with self.finished:
+            assert self.finished.wait_for(lambda: len(self.results) >= count, timeout)
+        return self.results
+
+
+@pytest.fixture
+def server(tmp_path):
+    servers = []
+
+    def start(failure_rate=0.0):
+        servers.append(LocalUploadServer(str(tmp_path / 'cloud'),
+                                         failure_rate=failure_rate).start())
+        return servers[-1]
+
+    yield start
+    for running in servers:
+        running.stop()
+
+
+def stored(tmp_path, result) -> bytes:
+    return (tmp_path / 'cloud' / 'files' / result['upload_id']).read_bytes()
+
+
+def test_failed_chunks_are_retried(tmp_path, server):
+    random.seed(7)
+    endpoint = server(failure_rate=0.3).url
+    source = make_file(tmp_path / 'clip.avi', 24)
+    uploads = Uploads(endpoint, max_retries=10)
+
+    uploads.service.set_wifi_connected(True)
+    uploads.service.queue_upload('incident_1', source, priority=True)
+    result = uploads.wait(1)[0]
+
+    assert result['status'] == 'completed'
+    assert result['bytes_uploaded'] == os.path.getsize(source)
+    with open(source, 'rb') as f:
+        assert stored(tmp_path, result) == f.read()
+
+
+def test_server_restart_resumes_from_received_chunks(tmp_path, server):
+    source = make_file(tmp_path / 'clip.avi', 10)
+    with open(source, 'rb') as f:
+        data = f.read()
+
+    # A first server takes half the chunks, then goes away
+    first = create_upload_app(str(tmp_path / 'cloud')).test_client()
+    opened = first.post('/uploads', json={'upload_id': 'upload_resume', 'size': len(data),
+                                          'chunk_size': CHUNK})
+    assert opened.json['received'] == []
+    for index in range(5):
+        chunk = data[index * CHUNK:(index + 1) * CHUNK]
+        response = first.put(f'/uploads/upload_resume/chunks/{index}', data=chunk,
+                             headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()})
+        assert response.status_code == 200
+
+    uploads = Uploads(server().url)
+    sent = []
+    send_chunk = uploads.service._send_chunk
+    uploads.service._send_chunk = lambda item, endpoint, index: (
+        sent.append(index), send_chunk(item, endpoint, index))
+    item = {'upload_id': 'upload_resume', 'incident_id': None, 'file_path': source,
+            'file_size_mb': len(data) / 2 ** 20, 'file_size_bytes': len(data),
+            'priority': True, 'status': 'uploading', 'bytes_uploaded': 0, 'attempts': 0}
+    uploads.service.wifi_connected = True
+
+    result = uploads.service._upload(item)
+
+    assert result['status'] == 'completed'
+    assert sorted(sent) == [5, 6, 7, 8, 9]
+    assert stored(tmp_path, result) == data
+
+
+def test_incident_preempts_routine_upload(tmp_path, server):
+    endpoint = server().url
+    routine = make_file(tmp_path / 'routine.avi', 64, seed=1)
+    incident = make_file(tmp_path / 'incident.avi', 4, seed=2)
+    uploads = Uploads(endpoint, parallel_chunks=1, bandwidth_kbps=64)
+    service = uploads.service
+
+    service.set_wifi_connected(True)
+    routine_id = service.queue_upload(None, routine)['upload_id']
+    deadline = time.monotonic() + 10
+    while service.get_upload_status(routine_id)['bytes_uploaded'] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    incident_id = service.queue_upload('incident_2', incident, priority=True)['upload_id']
+    service.set_bandwidth_limit(0)
+
+    first, second = uploads.wait(2)
+    assert (first['upload_id'], second['upload_id']) == (incident_id, routine_id)
+    assert second['paused_reason'] == 'preempted'
+    assert second['status'] == 'completed'
+    with open(routine, 'rb') as f:
+        assert stored(tmp_path, second) == f.read()
+
+
+def test_persisted_queue_resumes_after_restart(tmp_path, server):
+    endpoint = server().url
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    routine = make_file(tmp_path / 'routine.avi', 32, seed=3)
+    incident = make_file(tmp_path / 'incident.avi', 4, seed=4)
+    first = Uploads(endpoint, database=db, parallel_chunks=1, bandwidth_kbps=32).service
+
+    first.set_wifi_connected(True)
+    routine_id = first.queue_upload(None, routine)['upload_id']
+    deadline = time.monotonic() + 10
+    while first.get_upload_status(routine_id)['bytes_uploaded'] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    first.set_wifi_connected(False)
+    first.upload_thread.join(timeout=10)
+    assert not first.upload_thread.is_alive()
+    incident_id = first.queue_upload('incident_4', incident, priority=True)['upload_id']
+
+    rows = {row['upload_id']: row for row in db.get_resumable_uploads()}
+    assert list(rows) == [incident_id, routine_id]
+    offset = rows[routine_id]['bytes_uploaded']
+    assert 0 < offset < os.path.getsize(routine)
+
+    # A new service on the same database picks the queue up where it stopped
+    uploads = Uploads(endpoint, database=db, parallel_chunks=1)
+    service = uploads.service
+    assert [item['upload_id'] for item in service.get_queue()] == [incident_id, routine_id]
+    assert service.get_upload_status(routine_id)['bytes_uploaded'] == offset
+    sent = []
+    send_chunk = service._send_chunk
+    service._send_chunk = lambda item, endpoint, index: (
+        sent.append((item['upload_id'], index)), send_chunk(item, endpoint, index))
+
+    service.set_wifi_connected(True)
+    done = uploads.wait(2)
+
+    assert [result['upload_id'] for result in done] == [incident_id, routine_id]
+    assert all(result['status'] == 'completed' for result in done)
+    resumed = [index for upload_id, index in sent if upload_id == routine_id]
+    assert resumed == list(range(offset // CHUNK, 32))
+    with open(routine, 'rb') as f:
+        assert stored(tmp_path, done[1]) == f.read()
+    assert db.get_resumable_uploads() == []
+
+
+def test_no_endpoint_keeps_uploads_queued(tmp_path):
+    service = CloudBackupService(storage_dir=str(tmp_path / 'cloud'))
+    source = make_file(tmp_path / 'clip.avi', 2)
+
+    service.set_wifi_connected(True)
+    upload_id = service.queue_upload('incident_3', source, priority=True)['upload_id']
+    if service.upload_thread:
+        service.upload_thread.join(timeout=5)
+
+    assert service.local_server is None
+    assert service.get_upload_status(upload_id)['status'] == 'queued'
+    assert not (tmp_path / 'cloud').exists()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the frame index sidecar, GPS sampling and incident clip locations
+"""
+
+import io
+import threading
+import time
+
+from PIL import Image
+
+from services.dashcam.database import DashcamDatabase
+from services.dashcam.frame_index import (FrameIndexWriter, FrameLocator, GpsSampler,
+                                          read_frame_index)
+from services.dashcam.recorder import LoopRecorder
+from services.dashcam.segments import MjpegAviWriter, encode_jpeg
+
+
+def record_segment(db, path_base, start: float, colors) -> dict:
+    """Write a real AVI segment, one indexed frame per color, and index it."""
+    writer = MjpegAviWriter(path_base, fps=10)
+    writer.frame_index = FrameIndexWriter(path_base, cadence=0.05)
+    jpegs = []
+    for i, color in enumerate(colors):
+        jpegs.append(encode_jpeg(Image.new('RGB', (64, 48), color)))
+        writer.write(jpegs[-1], start + i * 0.1, {'latitude': 10.0, 'longitude': 20.0})
+    result = writer.close()
+    db.create_recording(writer.path.stem, 'front', result['video_path'])
+    FrameLocator(db).index_segment(writer.path.stem, result['frame_index_path'])
+    result['jpegs'] = jpegs
+    return result
+
+
+class MovingGps:
+    """Stand-in tracker whose position is set by the test."""
+
+    def __init__(self, latitude=10.0):
+        self.latitude = latitude
+        self.reads = 0
+
+    def get_current_location(self):
+        self.reads += 1
+        return {'latitude': self.latitude, 'longitude': 20.0, 'speed_kmh': 50.0}
+
+
+def test_sidecar_round_trip(tmp_path):
+    writer = FrameIndexWriter(tmp_path / 'seg', cadence=1.0)
+    writer.add(100.0, 0, (232, 900), {'latitude': 10.0, 'longitude': 20.0, 'speed_kmh': 50.0})
+    writer.add(100.5, 5, (1140, 900), {'latitude': 11.0, 'longitude': 21.0})
+    writer.add(101.0, 10, None, {})
+    writer.close()
+
+    records = read_frame_index(writer.path)
+    assert [r['frame_number'] for r in records] == [0, 10]
+    assert records[0]['byte_offset'] == 232 and records[0]['latitude'] == 10.0
+    assert records[0]['speed_kmh'] == 50.0 and records[0]['geo_cell'] is not None
+    assert records[1]['byte_offset'] is None and records[1]['latitude'] is None
+
+
+def test_frames_without_fix_fall_back_to_locate(tmp_path):
+    gps = MovingGps(12.0)
+    writer = FrameIndexWriter(tmp_path / 'seg', locate=gps.get_current_location)
+    writer.add(100.0, 0, None)
+    writer.add(101.0, 10, None, {'latitude': 10.0, 'longitude': 20.0})
+    writer.close()
+
+    assert [r['latitude'] for r in read_frame_index(writer.path)] == [12.0, 10.0]
+    assert gps.reads == 1
+
+
+def test_sampler_reads_gps_once_per_interval():
+    gps = MovingGps()
+    sampler = GpsSampler(gps.get_current_location, interval=1.0)
+    fixes = [sampler.fix(100.0 + i * 0.1) for i in range(25)]
+
+    assert gps.reads == 3
+    assert all(fix['latitude'] == 10.0 for fix in fixes)
+
+
+def test_incident_pre_roll_keeps_capture_location(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    recorder = LoopRecorder(str(tmp_path / 'recordings'), database=db, pre_roll_seconds=10)
+    gps = MovingGps(10.0)
+    sampler = GpsSampler(gps.get_current_location)
+    jpeg = encode_jpeg(Image.new('RGB', (64, 48)))
+
+    now = time.time()
+    for i in range(50):
+        captured_at = now - 5 + i * 0.1
+        recorder.pre_roll.push(jpeg, captured_at, sampler.fix(captured_at))
+
+    # The car has moved ~5.5 km by the time the incident triggers
+    gps.latitude = 10.05
+    recorder.continuous_recording_active = True
+    done = threading.Event()
+    recorder.record_incident_clip(None, 'inc1', duration_seconds=1, gps_tracker=gps,
+                                  on_complete=lambda clip: done.set())
+    assert done.wait(10)
+    recorder.continuous_recording_active = False
+
+    locator = FrameLocator(db)
+    clips = locator.near(10.0, 20.0, radius_m=200)
+    assert len(clips) == 1 and clips[0]['recording_id'].startswith('incident_inc1_')
+    assert clips[0]['fixes'] == 5
+    assert locator.near(10.05, 20.0, radius_m=200) == []
+
+
+def test_seek_is_bounded_by_max_gap(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    record_segment(db, tmp_path / 'front_seg', 1000.0, [(200, 0, 0)] * 10)
+    locator = FrameLocator(db)
+
+    assert locator.seek(999.0) is None
+    assert locator.seek(1000.9)['frame_number'] == 9
+    assert locator.seek(1000.9 + 2.0)['offset_seconds'] == 2.0
+    assert locator.seek(1000.9 + 2.1) is None
+    assert locator.seek(1003.0, max_gap=5.0)['frame_number'] == 9
+
+
+def test_byte_range_reads_the_indexed_jpeg(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    colors = [(i * 25, 255 - i * 25, 60) for i in range(10)]
+    segment = record_segment(db, tmp_path / 'front_seg', 1000.0, colors)
+
+    frame = FrameLocator(db).seek(1000.42)
+    assert frame['frame_number'] == 4
+    byte_range = frame['byte_range']
+    with open(segment['video_path'], 'rb') as f:
+        f.seek(byte_range['start'])
+        jpeg = f.read(byte_range['end'] - byte_range['start'] + 1)
+
+    assert jpeg == segment['jpegs'][4]
+    pixel = Image.open(io.BytesIO(jpeg)).convert('RGB').getpixel((32, 24))
+    assert all(abs(a - b) <= 8 for a, b in zip(pixel, colors[4]))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming IMU detector and incident reporting from IMU batches
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.dashcam.incidents import ImuStreamDetector, IncidentDetector
+
+RATE = 200
+T0 = 1_700_000_000.0
+
+
+def trace(seconds: float, start: float = 0.0, x=None) -> np.ndarray:
+    """Level-mounted samples at RATE Hz; x(t) adds lateral g from t seconds into the trace."""
+    t = np.arange(int(round(seconds * RATE))) / RATE
+    samples = np.zeros((len(t), 4))
+    samples[:, 0] = T0 + start + t
+    samples[:, 3] = 1.0
+    if x is not None:
+        samples[:, 1] = x(t)
+    return samples
+
+
+def hit(seconds: float, start: float, g: float = 1.0) -> np.ndarray:
+    return trace(seconds, start, lambda t: np.full(len(t), g))
+
+
+def feed(detector, samples: np.ndarray, batch: int = 10):
+    """Push in IMU-FIFO-sized batches; returns (event, timestamp of the reporting batch)."""
+    reported = []
+    for start in range(0, len(samples), batch):
+        chunk = samples[start:start + batch]
+        reported.extend((event, chunk[-1, 0]) for event in detector.push(chunk))
+    return reported
+
+
+def test_ringing_impact_is_one_event():
+    detector = ImuStreamDetector(sample_rate=RATE, trigger_g=0.6, release_ratio=0.6,
+                                 hold_seconds=0.5)
+    # 20 Hz ringing crosses trigger_g and drops below release_g every cycle
+    ringing = trace(0.4, 1.0, lambda t: 0.9 * np.sin(2 * np.pi * 20 * t))
+    samples = np.concatenate([
+        trace(1.0),
+        ringing,
+        trace(0.3, 1.4),
+        # A knock before hold_seconds of quiet still belongs to the same event
+        hit(0.05, 1.7),
+        trace(0.6, 1.75),
+    ])
+
+    reported = feed(detector, samples)
+    assert len(reported) == 1
+    assert reported[0][0]['onset'] == ringing[np.argmax(ringing[:, 1] >= 0.6), 0]
+    assert not detector.active
+
+    # Re-armed after hold_seconds below release_g
+    reported = feed(detector, np.concatenate([hit(0.05, 2.35), trace(1.0, 2.4)]))
+    assert len(reported) == 1
+    assert reported[0][0]['onset'] == T0 + 2.35
+    assert detector.events == 2
+
+
+def test_event_is_reported_after_report_after():
+    detector = ImuStreamDetector(sample_rate=RATE, report_after=0.25, hold_seconds=0.5)
+    samples = np.concatenate([trace(1.0), hit(1.0, 1.0, g=0.8), trace(1.0, 2.0)])
+
+    ((event, reported_at),) = feed(detector, samples)
+    assert event['onset'] == T0 + 1.0
+    # Reported by the first batch that reaches onset + report_after, while still loud
+    assert T0 + 1.25 <= reported_at < T0 + 1.25 + 10 / RATE
+    assert 250 <= event['duration_ms'] < 250 + 10 / RATE * 1000
+    assert abs(event['peak_g'] - 0.8) < 1e-9
+
+
+def test_batches_larger_than_ring_capacity():
+    samples = np.concatenate([trace(0.5), hit(0.1, 0.5), trace(2.9, 0.6),
+                              hit(0.1, 3.5, g=1.5), trace(1.4, 3.6)])
+    large = ImuStreamDetector(sample_rate=RATE)
+    assert len(samples) > large.capacity - large.window
+
+    events = large.push(samples)
+    assert [event['onset'] for event in events] == [T0 + 0.5, T0 + 3.5]
+    assert [round(event['peak_g'], 6) for event in events] == [1.0, 1.5]
+    assert large.samples == len(samples)
+    assert large.batches == -(-len(samples) // (large.capacity - large.window))
+
+    small = ImuStreamDetector(sample_rate=RATE)
+    assert [event['onset'] for event, _ in feed(small, samples)] == [T0 + 0.5, T0 + 3.5]
+
+
+def test_incidents_respect_cooldown():
+    incidents = []
+    detector = IncidentDetector(callback=incidents.append, imu_sample_rate=RATE)
+
+    def impact(start):
+        return np.concatenate([hit(0.1, start, g=1.5), trace(0.9, start + 0.1)])
+
+    detector.process_imu_samples(trace(1.0), speed_kmh=50)
+    first = detector.process_imu_samples(impact(1.0), speed_kmh=50)
+    assert len(first) == 1 and first[0]['source'] == 'imu_stream'
+    assert first[0]['g_force_value'] == 1.5
+
+    # A second impact inside the cooldown is detected but not reported
+    assert detector.process_imu_samples(impact(2.0), speed_kmh=50) == []
+    assert detector.imu.events == 2
+
+    detector.last_incident_time = datetime.now() - timedelta(
+        seconds=detector.incident_cooldown + 1)
+    assert len(detector.process_imu_samples(impact(3.0), speed_kmh=50)) == 1
+    assert incidents == first + [incidents[-1]] and len(incidents) == 2
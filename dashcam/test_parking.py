@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for parking-mode motion detection and capture policy on a simulated clock
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from services.dashcam.parking import MotionDetector, ParkingRecorder
+
+WIDTH, HEIGHT = 640, 360
+SQUARE = 80
+
+
+class Clip:
+    """Stand-in SegmentWriter that keeps frames in memory."""
+
+    def __init__(self, name: str, time_lapse: bool):
+        self.name = name
+        self.time_lapse = time_lapse
+        self.frames = []
+        self.full = False
+
+    def write(self, jpeg: bytes, timestamp: float = None):
+        self.frames.append((timestamp, jpeg))
+
+    def close(self):
+        return {'video_path': f'{self.name}.avi', 'frame_count': len(self.frames)}
+
+
+def scene(brightness: float = 0.0, square_x: int = None) -> Image.Image:
+    """Textured still scene, optionally brightened and with a bright square in it."""
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    pixels = 60 + 40 * np.sin(x / 23.0) * np.cos(y / 17.0) + brightness
+    if square_x is not None:
+        pixels[140:140 + SQUARE, square_x:square_x + SQUARE] = 250
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert('RGB')
+
+
+class Parking:
+    """ParkingRecorder wired to in-memory clips, driven by step(now)."""
+
+    def __init__(self, frame_at, **kwargs):
+        self.now = 0.0
+        self.clips = []
+        self.segments = []
+        self.events = []
+        self.modes = []
+        self.recorder = ParkingRecorder(
+            capture=lambda: frame_at(self.now), stamp=lambda frame: frame,
+            open_writer=self._open, on_event=self.events.append,
+            on_segment=lambda info, kind, protected: self.segments.append(
+                (info['video_path'], info['frame_count'], kind, protected)),
+            **kwargs)
+
+    def _open(self, name, time_lapse):
+        self.clips.append(Clip(name, time_lapse))
+        return self.clips[-1]
+
+    def run(self, until: float):
+        while self.now < until:
+            due = self.recorder.step(self.now)
+            self.modes.append((self.now, self.recorder.mode))
+            self.now = due
+
+    def clips_named(self, name):
+        return [clip for clip in self.clips if clip.name == name]
+
+
+def test_brightness_change_is_not_motion():
+    detector = MotionDetector()
+    assert not detector.update(scene(), 0.0)
+    assert not detector.update(scene(brightness=60), 2.0)
+    assert detector.last_score < detector.min_area
+    assert detector.update(scene(brightness=60, square_x=300), 4.0)
+
+
+def test_motion_opens_event_and_stillness_closes_it():
+    def frame_at(now):
+        # Something crosses the frame at 100 px/s from t=20.5 to t=25.5
+        if 20.5 <= now < 25.5:
+            return scene(square_x=int((now - 20.5) * 100))
+        return scene()
+
+    parking = Parking(frame_at, fps=10, time_lapse=False, probe_interval=2.0,
+                      motion_hold_seconds=5.0)
+    parking.run(40.0)
+
+    # Idle probes every 2 s until the probe at t=22 sees the motion
+    idle = [now for now, mode in parking.modes if now < 22]
+    assert idle == [float(t) for t in range(0, 22, 2)]
+    (clip,) = parking.clips_named('parking_motion')
+    first_at, first_jpeg = clip.frames[0]
+    assert first_at == 22.0
+    first = np.asarray(Image.open(io.BytesIO(first_jpeg)).convert('L'))
+    assert first[180, 150:190].mean() > 200
+
+    # Full-rate capture continues until motion_hold_seconds without motion
+    motion = [now for now, mode in parking.modes if mode == 'motion']
+    assert np.allclose(np.diff(motion), 0.1)
+    (event,) = parking.events
+    assert 8.3 <= event['duration_seconds'] <= 8.5
+    assert event['frame_count'] == len(clip.frames) == len(motion) + 1
+    assert parking.segments == [('parking_motion.avi', len(clip.frames), 'parking_motion', True)]
+
+    # The step that closes the clip is the last full-rate one; idle probing follows
+    closed, *after = [now for now, mode in parking.modes if now > motion[-1]]
+    assert round(closed - 22, 2) == event['duration_seconds']
+    assert np.allclose(np.diff(after), 2.0)
+    assert parking.recorder.mode == 'idle' and parking.recorder.motion_events == 1
+
+
+def test_time_lapse_cadence_and_segment_rollover():
+    parking = Parking(lambda now: scene(), probe_interval=2.0, time_lapse_interval=10.0,
+                      segment_seconds=30.0)
+    parking.run(95.0)
+    parking.recorder.stop()
+
+    lapses = parking.clips_named('parking_timelapse')
+    assert all(clip.time_lapse for clip in lapses)
+    assert [[at for at, _ in clip.frames] for clip in lapses] == [
+        [0.0, 10.0, 20.0], [30.0, 40.0, 50.0], [60.0, 70.0, 80.0], [90.0]]
+    assert [segment[1:] for segment in parking.segments] == [
+        (3, 'parking_timelapse', False)] * 3 + [(1, 'parking_timelapse', False)]
+    assert parking.recorder.captures == 48
+    assert parking.recorder.motion_events == 0
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming segment writers and the pre-roll ring buffer
+"""
+
+import struct
+
+from PIL import Image
+
+from services.dashcam.segments import (FrameRingBuffer, JpegSequenceWriter, MjpegAviWriter,
+                                       encode_jpeg, jpeg_size)
+
+
+def frames(count: int, size=(64, 48)):
+    return [encode_jpeg(Image.new('RGB', size, (i * 20 % 256, 0, 0))) for i in range(count)]
+
+
+def riff_chunks(data: bytes, start: int, end: int):
+    """(fourcc, payload offset, size) of the chunks between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        fourcc, size = struct.unpack('<4sI', data[offset:offset + 8])
+        yield fourcc, offset + 8, size
+        offset += 8 + size + size % 2
+
+
+def test_jpeg_size_reads_sof():
+    assert jpeg_size(frames(1, (320, 240))[0]) == (320, 240)
+
+
+def test_avi_offsets_and_index(tmp_path):
+    jpegs = frames(5)
+    writer = MjpegAviWriter(tmp_path / 'segment', fps=10)
+    locations = [writer.write(jpeg, 1000.0 + i / 10) for i, jpeg in enumerate(jpegs)]
+    info = writer.close()
+
+    data = (tmp_path / 'segment.avi').read_bytes()
+    assert data[:4] == b'RIFF' and data[8:12] == b'AVI '
+    assert struct.unpack('<I', data[4:8])[0] == len(data) - 8
+    assert info['frame_count'] == 5 and info['fps'] == 10.0
+
+    for jpeg, (offset, size) in zip(jpegs, locations):
+        assert data[offset:offset + size] == jpeg
+
+    top = {fourcc: (offset, size) for fourcc, offset, size in riff_chunks(data, 12, len(data))}
+    idx_offset, idx_size = top[b'idx1']
+    movi = data.index(b'movi')
+    entries = list(struct.iter_unpack('<4sIII', data[idx_offset:idx_offset + idx_size]))
+    assert len(entries) == 5
+    for (fourcc, flags, offset, size), jpeg in zip(entries, jpegs):
+        assert fourcc == b'00dc' and flags == 0x10
+        chunk = movi + offset
+        assert data[chunk:chunk + 4] == b'00dc'
+        assert data[chunk + 8:chunk + 8 + size] == jpeg
+
+    avih = data.index(b'avih') + 8
+    assert struct.unpack('<I', data[avih + 16:avih + 20])[0] == 5
+
+
+def test_avi_headers_are_valid_after_sync(tmp_path):
+    writer = MjpegAviWriter(tmp_path / 'segment', fps=10)
+    for i, jpeg in enumerate(frames(3)):
+        writer.write(jpeg, 1000.0 + i / 10)
+    writer.sync()
+
+    data = (tmp_path / 'segment.avi').read_bytes()
+    assert struct.unpack('<I', data[4:8])[0] == len(data) - 8
+    writer.close()
+
+
+def test_jpeg_sequence_sidecar(tmp_path):
+    jpegs = frames(4)
+    writer = JpegSequenceWriter(tmp_path / 'segment', fps=10)
+    for i, jpeg in enumerate(jpegs):
+        writer.write(jpeg, 500.0 + i)
+    info = writer.close()
+
+    data = (tmp_path / 'segment.mjpeg').read_bytes()
+    index = list(JpegSequenceWriter.INDEX_RECORD.iter_unpack(
+        (tmp_path / 'segment.idx').read_bytes()))
+    assert [record[2] for record in index] == [500.0, 501.0, 502.0, 503.0]
+    for (offset, size, _), jpeg in zip(index, jpegs):
+        assert data[offset:offset + size] == jpeg
+    assert info['index_path'].endswith('segment.idx')
+
+
+def test_ring_buffer_window_and_post_roll():
+    ring = FrameRingBuffer(seconds=2.0, max_bytes=1 << 20)
+    for i in range(10):
+        ring.push(b'x' * 10, timestamp=100.0 + i * 0.5)
+
+    buffered, last_seq = ring.snapshot(now=104.5)
+    assert [frame[1] for frame in buffered] == [102.5, 103.0, 103.5, 104.0, 104.5]
+    assert last_seq == 10
+
+    ring.push(b'y', timestamp=105.0)
+    assert [frame[2] for frame in ring.frames_after(last_seq, timeout=0)] == [b'y']
+    assert ring.frames_after(11, timeout=0) == []
+
+
+def test_ring_buffer_byte_cap():
+    ring = FrameRingBuffer(seconds=60.0, max_bytes=25)
+    for i in range(5):
+        ring.push(b'z' * 10, timestamp=float(i))
+
+    assert ring.stats()['frames'] == 2
+    assert ring.stats()['bytes'] == 20
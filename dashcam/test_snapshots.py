@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for background snapshot encoding and snapshot preview persistence
+"""
+
+import threading
+
+from PIL import Image
+
+from services.dashcam.database import DashcamDatabase
+from services.dashcam.recorder import LoopRecorder
+
+
+class StillCamera:
+    def generate_frame(self):
+        return Image.new('RGB', (640, 360), (40, 90, 160))
+
+
+class CameraSystem:
+    def get_camera(self, position):
+        return StillCamera() if position == 'front' else None
+
+
+def take_snapshot(recorder):
+    done = threading.Event()
+    completed = {}
+
+    def finished(snapshot):
+        completed.update(snapshot)
+        done.set()
+
+    queued = recorder.capture_snapshot(CameraSystem(), reason='manual', on_complete=finished)
+    assert queued['ok'] and queued['status'] == 'encoding'
+    assert done.wait(10)
+    return completed
+
+
+def test_snapshot_reports_file_and_previews(tmp_path):
+    recorder = LoopRecorder(str(tmp_path / 'recordings'))
+    snapshot = take_snapshot(recorder)
+
+    assert snapshot['status'] == 'completed'
+    assert snapshot['file_size_mb'] > 0
+    for size in ('small', 'medium'):
+        assert recorder.snapshots.store.path(snapshot[f'preview_{size}']).exists()
+
+
+def test_snapshot_rows_keep_previews_from_pruning(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    recorder = LoopRecorder(str(tmp_path / 'recordings'), database=db)
+    snapshot = take_snapshot(recorder)
+
+    (row,) = db.get_snapshots()
+    assert row['snapshot_id'] == snapshot['snapshot_id']
+    assert row['snapshot_path'] == snapshot['snapshot_path']
+    assert row['file_size_mb'] == snapshot['file_size_mb']
+    assert (row['preview_small'], row['preview_medium']) == \
+        (snapshot['preview_small'], snapshot['preview_medium'])
+
+    store = recorder.snapshots.store
+    assert store.prune(db.get_preview_digests(), grace_seconds=0) == 0
+    assert store.path(row['preview_small']).exists()
+    assert store.path(row['preview_medium']).exists()
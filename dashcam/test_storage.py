@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the recording storage index and oldest-first retention
+"""
+
+import os
+
+from services.dashcam.database import DashcamDatabase
+from services.dashcam.storage import StorageIndex
+
+
+def make_file(path, size: int, mtime: float):
+    path.write_bytes(b'\0' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def names(paths):
+    return [os.path.basename(path) for path in paths]
+
+
+def test_enforce_deletes_oldest_first(tmp_path):
+    for i, name in enumerate(['c.avi', 'a.avi', 'b.avi']):
+        make_file(tmp_path / name, 1000, 1_000_000 + [30, 10, 20][i])
+    index = StorageIndex(tmp_path, max_bytes=1500)
+    index.reconcile()
+    assert index.stats()['total_bytes'] == 3000
+
+    assert names(index.enforce()) == ['a.avi', 'b.avi']
+    assert sorted(os.listdir(tmp_path)) == ['c.avi']
+    assert index.stats() == {'total_bytes': 1000, 'recording_count': 1,
+                             'files': 1, 'deleted_count': 2}
+
+
+def test_protection_skips_stale_heap_entries(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    recordings = tmp_path / 'recordings'
+    recordings.mkdir()
+    for i, name in enumerate(['old', 'mid', 'new']):
+        path = make_file(recordings / f'{name}.avi', 1000, 1_000_000 + i)
+        db.create_recording(name, 'front', str(path))
+    index = StorageIndex(recordings, max_bytes=10_000, database=db)
+    index.reconcile()
+
+    assert index.set_protected('old')
+    assert names(index.enforce(limit_bytes=2000)) == ['mid.avi']
+    assert (recordings / 'old.avi').exists()
+    assert db.get_recording('mid') is None
+
+    assert index.set_protected('old', False)
+    assert names(index.enforce(limit_bytes=0)) == ['old.avi', 'new.avi']
+    assert not index.set_protected('missing')
+
+
+def test_reconcile_reads_protected_flags(tmp_path):
+    db = DashcamDatabase(str(tmp_path / 'dashcam.db'))
+    recordings = tmp_path / 'recordings'
+    recordings.mkdir()
+    keep = make_file(recordings / 'front_seg1.avi', 1000, 1_000_000)
+    drop = make_file(recordings / 'front_seg2.avi', 1000, 1_000_001)
+    db.create_recording('front_seg1', 'front', str(keep), protected=True)
+    db.create_recording('front_seg2', 'front', str(drop))
+    make_file(recordings / 'incident_x.avi', 1000, 999_999)
+    make_file(recordings / 'snapshot.jpg', 500, 999_998)
+
+    index = StorageIndex(recordings, max_bytes=0, database=db)
+    index.reconcile()
+    assert index.stats()['recording_count'] == 3
+
+    assert names(index.enforce()) == ['front_seg2.avi']
+    assert sorted(os.listdir(recordings)) == ['front_seg1.avi', 'incident_x.avi', 'snapshot.jpg']
+
+
+def test_sidecars_are_deleted_and_uncounted(tmp_path):
+    segment = make_file(tmp_path / 'seg.avi', 1000, 1_000_000)
+    make_file(tmp_path / 'seg.idx', 100, 1_000_000)
+    make_file(tmp_path / 'seg.tidx', 40, 1_000_000)
+    make_file(tmp_path / 'later.avi', 1000, 1_000_100)
+
+    index = StorageIndex(tmp_path, max_bytes=10_000)
+    index.add(segment)
+    index.add(tmp_path / 'later.avi')
+    assert index.stats()['total_bytes'] == 2140
+    assert index.stats()['recording_count'] == 2
+
+    assert names(index.enforce(limit_bytes=1500)) == ['seg.avi']
+    assert sorted(os.listdir(tmp_path)) == ['later.avi']
+    assert index.stats()['total_bytes'] == 1000
+    assert index.stats()['files'] == 1
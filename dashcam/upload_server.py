@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Local Upload Server
+Stand-in for the cloud endpoint: resumable chunked uploads with checksums
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import Flask, jsonify, request, send_file
+
+
+def create_upload_app(storage_dir: str, failure_rate: float = 0.0) -> Flask:
+    """
+    Flask app speaking the chunked upload protocol CloudBackupService uses.
+
+    POST /uploads                      open or resume a session -> received chunk indices
+    PUT  /uploads/<id>/chunks/<index>  one chunk, X-Chunk-SHA256 header must match
+    POST /uploads/<id>/complete        verify the whole-file SHA-256 -> file URL
+    GET  /files/<id>                   download a completed upload
+
+    failure_rate makes that fraction of chunk requests fail with 503, to
+    exercise retries and resume the way a flaky Wi-Fi link would.
+
+    Each session's part file sits next to a JSON state file listing the
+    chunks received so far, rewritten after every chunk lands, so a
+    restarted server resumes uploads instead of starting them over.
+    """
+    storage = Path(storage_dir)
+    parts_dir = storage / 'parts'
+    files_dir = storage / 'files'
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    files_dir.mkdir(parents=True, exist_ok=True)
+
+    app = Flask(__name__)
+    sessions: Dict[str, Dict] = {}
+    lock = threading.Lock()
+    app.config['UPLOAD_SESSIONS'] = sessions
+
+    def valid_id(upload_id: str) -> bool:
+        return bool(upload_id) and upload_id.replace('_', '').isalnum()
+
+    def save_state(upload_id: str, session: Dict):
+        """Persist a session's state (lock held)."""
+        state = parts_dir / f'{upload_id}.json'
+        temp = parts_dir / f'{upload_id}.json.tmp'
+        with open(temp, 'w') as f:
+            json.dump({
+                'size': session['size'], 'chunk_size': session['chunk_size'],
+                'file_name': session['file_name'], 'received': sorted(session['received'])
+            }, f)
+        os.replace(temp, state)
+
+    def get_session(upload_id: str) -> Optional[Dict]:
+        """Session from memory, or from its state file after a restart."""
+        with lock:
+            session = sessions.get(upload_id)
+            if session is not None or not valid_id(upload_id):
+                return session
+
+            part = parts_dir / upload_id
+            try:
+                with open(parts_dir / f'{upload_id}.json') as f:
+                    state = json.load(f)
+                if part.stat().st_size != state['size']:
+                    return None
+            except (OSError, ValueError, KeyError):
+                return None
+
+            session = sessions[upload_id] = {
+                'size': state['size'], 'chunk_size': state['chunk_size'],
+                'received': set(state['received']), 'part': part,
+                'file_name': state['file_name']
+            }
+            return session
+
+    @app.route('/uploads', methods=['POST'])
+    def open_session():
+        data = request.json or {}
+        upload_id = data.get('upload_id', '')
+        if not valid_id(upload_id):
+            return jsonify({'ok': False, 'error': 'Invalid upload_id'}), 400
+
+        try:
+            size = int(data['size'])
+            chunk_size = int(data['chunk_size'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'ok': False, 'error': 'size and chunk_size required'}), 400
+        if size < 0 or chunk_size <= 0:
+            return jsonify({'ok': False, 'error': 'Invalid size or chunk_size'}), 400
+
+        session = get_session(upload_id)
+        with lock:
+            if session is None or session['size'] != size or session['chunk_size'] != chunk_size:
+                part = parts_dir / upload_id
+                with open(part, 'wb') as f:
+                    f.truncate(size)
+                session = sessions[upload_id] = {
+                    'size': size, 'chunk_size': chunk_size, 'received': set(),
+                    'part': part, 'file_name': os.path.basename(data.get('file_name', upload_id))
+                }
+                save_state(upload_id, session)
+            received = sorted(session['received'])
+
+        return jsonify({'ok': True, 'upload_id': upload_id, 'received': received})
+
+    @app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+    def put_chunk(upload_id, index):
+        if failure_rate and random.random() < failure_rate:
+            return jsonify({'ok': False, 'error': 'Simulated network failure'}), 503
+
+        session = get_session(upload_id)
+        if session is None:
+            return jsonify({'ok': False, 'error': 'Unknown upload'}), 404
+
+        offset = index * session['chunk_size']
+        body = request.get_data()
+        expected = min(session['chunk_size'], session['size'] - offset)
+        if offset >= session['size'] or len(body) != expected:
+            return jsonify({'ok': False, 'error': 'Chunk out of range or wrong length'}), 400
+
+        if hashlib.sha256(body).hexdigest() != request.headers.get('X-Chunk-SHA256'):
+            return jsonify({'ok': False, 'error': 'Checksum mismatch'}), 400
+
+        with open(session['part'], 'r+b') as f:
+            f.seek(offset)
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        with lock:
+            session['received'].add(index)
+            save_state(upload_id, session)
+
+        return jsonify({'ok': True, 'index': index})
+
+    @app.route('/uploads/<upload_id>/complete', methods=['POST'])
+    def complete(upload_id):
+        session = get_session(upload_id)
+        if session is None:
+            return jsonify({'ok': False, 'error': 'Unknown upload'}), 404
+
+        chunks = -(-session['size'] // session['chunk_size'])
+        missing = sorted(set(range(chunks)) - session['received'])
+        if missing:
+            return jsonify({'ok': False, 'error': 'Missing chunks', 'missing': missing}), 409
+
+        digest = hashlib.sha256()
+        with open(session['part'], 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        if digest.hexdigest() != (request.json or {}).get('sha256'):
+            with lock:
+                session['received'].clear()
+                save_state(upload_id, session)
+            return jsonify({'ok': False, 'error': 'File checksum mismatch'}), 400
+
+        with lock:
+            os.replace(session['part'], files_dir / upload_id)
+            (parts_dir / f'{upload_id}.json').unlink(missing_ok=True)
+            sessions.pop(upload_id, None)
+
+        return jsonify({'ok': True, 'url': f"{request.host_url}files/{upload_id}"})
+
+    @app.route('/files/<upload_id>')
+    def download(upload_id):
+        path = files_dir / os.path.basename(upload_id)
+        if not path.exists():
+            return jsonify({'ok': False, 'error': 'Not found'}), 404
+        return send_file(path)
+
+    return app
+
+
+class LocalUploadServer:
+    """Runs the stand-in upload app on a background thread (port 0 picks a free port)."""
+
+    def __init__(self, storage_dir: str, host: str = '127.0.0.1', port: int = 0,
+                 failure_rate: float = 0.0):
+        from werkzeug.serving import make_server
+
+        self.app = create_upload_app(storage_dir, failure_rate)
+        self._server = make_server(host, port, self.app, threaded=True)
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'LocalUploadServer':
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='upload-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        if self._thread:
+            self._thread.join(timeout=5)
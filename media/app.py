@@ -9,7 +9,7 @@ import os
 import sys
 import threading
 from pathlib import Path
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, jsonify, render_template, request, send_file
 from flask_cors import CORS
 from datetime import datetime
 
@@ -19,7 +19,12 @@ sys.path.insert(0, str(ROOT))
 from services.media.database import MediaDatabase
 from services.media.scanner import MediaScanner
 from services.media.metadata import MetadataExtractor
+from services.media.artwork import ArtworkStore
+from services.media.probe import VideoProbeService
 from services.media.player import PlayerIntegration
+from services.media.pipeline import LibraryScanPipeline
+from services.media.duplicates import DuplicateEngine
+from services.media.smart_playlists import BUILTIN_PLAYLISTS, SmartPlaylistEngine
 
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
@@ -27,12 +32,25 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'media-center-secret-key
 CORS(app)
 
 db = MediaDatabase()
-scanner = MediaScanner()
-metadata_extractor = MetadataExtractor()
-player = PlayerIntegration(db)
-
-scan_in_progress = False
-scan_progress = {'current': 0, 'total': 0, 'file': ''}
+scanner = MediaScanner(db)
+artwork_store = ArtworkStore(
+    max_cache_bytes=int(os.environ.get('MEDIA_ARTWORK_CACHE_MB', 256)) * 1024 * 1024
+)
+video_probe = VideoProbeService(
+    db, artwork_store, workers=int(os.environ.get('MEDIA_PROBE_WORKERS', 4))
+)
+metadata_extractor = MetadataExtractor(artwork_store, video_probe)
+player = PlayerIntegration(db, artwork_store)
+scan_pipeline = LibraryScanPipeline(
+    db, scanner, metadata_extractor,
+    workers=int(os.environ.get('MEDIA_SCAN_WORKERS', 4)),
+    batch_size=int(os.environ.get('MEDIA_SCAN_BATCH', 200))
+)
+smart_playlists = SmartPlaylistEngine(db)
+builtin_playlists = smart_playlists.ensure_builtin()
+duplicate_engine = DuplicateEngine(
+    db, workers=int(os.environ.get('MEDIA_FINGERPRINT_WORKERS', 0)) or None
+)
 
 
 @app.route('/')
@@ -60,73 +78,23 @@ def health_check():
 @app.route('/api/library/scan', methods=['POST'])
 def scan_library():
     """Scan library for music and video files."""
-    global scan_in_progress, scan_progress
-    
-    if scan_in_progress:
-        return jsonify({'ok': False, 'error': 'Scan already in progress'}), 400
-    
     data = request.json or {}
     scan_type = data.get('type', 'both')
     
+    if scan_type not in ('music', 'video', 'both'):
+        return jsonify({'ok': False, 'error': "type must be 'music', 'video' or 'both'"}), 400
+    
+    # Claimed here, not in the worker, so two requests cannot both start one
+    if not scan_pipeline.try_start():
+        return jsonify({'ok': False, 'error': 'Scan already in progress'}), 409
+    
     def scan_worker():
-        global scan_in_progress, scan_progress
-        scan_in_progress = True
-        
         try:
-            if scan_type in ['music', 'both']:
-                scan_progress = {'current': 0, 'total': 0, 'file': 'Scanning music...'}
-                music_files = scanner.scan_music()
-                
-                for i, file_data in enumerate(music_files):
-                    scan_progress = {
-                        'current': i + 1,
-                        'total': len(music_files),
-                        'file': file_data['file_name']
-                    }
-                    
-                    metadata = metadata_extractor.extract_music_metadata(file_data['file_path'])
-                    file_data.update(metadata)
-                    
-                    track_id = db.add_music_track(file_data)
-                    
-                    if metadata_extractor.mock_mode:
-                        file_data['album_art_path'] = metadata_extractor.extract_album_art(
-                            file_data['file_path'], track_id
-                        )
-                        if file_data['album_art_path']:
-                            db.add_music_track({'file_path': file_data['file_path'], 
-                                              'album_art_path': file_data['album_art_path']})
-            
-            if scan_type in ['video', 'both']:
-                scan_progress = {'current': 0, 'total': 0, 'file': 'Scanning videos...'}
-                video_files = scanner.scan_videos()
-                
-                for i, file_data in enumerate(video_files):
-                    scan_progress = {
-                        'current': i + 1,
-                        'total': len(video_files),
-                        'file': file_data['file_name']
-                    }
-                    
-                    metadata = metadata_extractor.extract_video_metadata(file_data['file_path'])
-                    file_data.update(metadata)
-                    
-                    video_id = db.add_video_file(file_data)
-                    
-                    if metadata_extractor.mock_mode:
-                        file_data['thumbnail_path'] = metadata_extractor.generate_video_thumbnail(
-                            file_data['file_path'], video_id
-                        )
-                        if file_data['thumbnail_path']:
-                            db.add_video_file({'file_path': file_data['file_path'],
-                                             'thumbnail_path': file_data['thumbnail_path']})
-            
+            scan_pipeline.run(scan_type, started=True)
             storage_stats = scanner.get_storage_usage()
             db.update_storage_stats(storage_stats)
-            
-        finally:
-            scan_in_progress = False
-            scan_progress = {'current': 0, 'total': 0, 'file': ''}
+        except Exception as e:
+            print(f"Library scan failed: {e}")
     
     thread = threading.Thread(target=scan_worker, daemon=True)
     thread.start()
@@ -143,8 +111,9 @@ def scan_progress_status():
     """Get scan progress."""
     return jsonify({
         'ok': True,
-        'scanning': scan_in_progress,
-        'progress': scan_progress
+        'scanning': scan_pipeline.running,
+        'progress': scan_pipeline.counter.snapshot(),
+        'video_probe': video_probe.stats()
     })
 
 
@@ -163,16 +132,34 @@ def library_stats():
 
 @app.route('/api/music/all')
 def get_all_music():
-    """Get all music tracks."""
+    """
+    Get music tracks a page at a time.
+    
+    Pass the returned next_cursor as `cursor` to fetch the following page.
+    `sort` is date_added (default), play_count or artist. The legacy
+    `offset` parameter is still honoured when given.
+    """
     limit = int(request.args.get('limit', 100))
-    offset = int(request.args.get('offset', 0))
     
-    tracks = db.get_all_music(limit, offset)
+    if 'offset' in request.args:
+        tracks = db.get_all_music(limit, int(request.args['offset']))
+        return jsonify({'ok': True, 'tracks': tracks, 'count': len(tracks)})
+    
+    try:
+        page = db.get_music_page(
+            sort=request.args.get('sort', 'date_added'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
     
     return jsonify({
         'ok': True,
-        'tracks': tracks,
-        'count': len(tracks)
+        'tracks': page['items'],
+        'count': len(page['items']),
+        'sort': page['sort'],
+        'next_cursor': page['next_cursor']
     })
 
 
@@ -184,6 +171,11 @@ def search_music():
     
     if not query:
         return jsonify({'ok': False, 'error': 'Query parameter required'}), 400
+    if not db.is_searchable(query):
+        return jsonify({
+            'ok': False,
+            'error': f'Query must contain at least {db.SEARCH_MIN_QUERY_LENGTH} letters or digits'
+        }), 400
     
     results = db.search_music(query, limit)
     
@@ -231,16 +223,34 @@ def get_genres():
 
 @app.route('/api/videos/all')
 def get_all_videos():
-    """Get all video files."""
+    """
+    Get video files a page at a time.
+    
+    Pass the returned next_cursor as `cursor` to fetch the following page.
+    `sort` is date_added (default), play_count or title. The legacy
+    `offset` parameter is still honoured when given.
+    """
     limit = int(request.args.get('limit', 100))
-    offset = int(request.args.get('offset', 0))
     
-    videos = db.get_all_videos(limit, offset)
+    if 'offset' in request.args:
+        videos = db.get_all_videos(limit, int(request.args['offset']))
+        return jsonify({'ok': True, 'videos': videos, 'count': len(videos)})
+    
+    try:
+        page = db.get_video_page(
+            sort=request.args.get('sort', 'date_added'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
     
     return jsonify({
         'ok': True,
-        'videos': videos,
-        'count': len(videos)
+        'videos': page['items'],
+        'count': len(page['items']),
+        'sort': page['sort'],
+        'next_cursor': page['next_cursor']
     })
 
 
@@ -277,7 +287,10 @@ def create_playlist():
 @app.route('/api/playlists/<int:playlist_id>/tracks')
 def get_playlist_tracks(playlist_id):
     """Get tracks in a playlist."""
-    tracks = db.get_playlist_tracks(playlist_id)
+    if smart_playlists.get(playlist_id):
+        tracks = smart_playlists.tracks(playlist_id, int(request.args.get('limit', -1)))
+    else:
+        tracks = db.get_playlist_tracks(playlist_id)
     
     return jsonify({
         'ok': True,
@@ -295,6 +308,12 @@ def add_to_playlist(playlist_id):
     if not track_id:
         return jsonify({'ok': False, 'error': 'track_id required'}), 400
     
+    if smart_playlists.get(playlist_id):
+        return jsonify({
+            'ok': False,
+            'error': 'Smart playlist tracks come from its rules; edit the rules instead'
+        }), 400
+    
     success = db.add_to_playlist(playlist_id, track_id)
     
     if success:
@@ -309,44 +328,93 @@ def add_to_playlist(playlist_id):
         }), 400
 
 
-@app.route('/api/playlists/smart/recently-added')
-def smart_playlist_recent():
-    """Get recently added tracks."""
-    limit = int(request.args.get('limit', 50))
-    tracks = db.get_recently_added(limit)
+def _builtin_playlist_response(slug: str, default_limit: int):
+    limit = int(request.args.get('limit', default_limit))
+    tracks = smart_playlists.tracks(builtin_playlists[slug], limit)
     
     return jsonify({
         'ok': True,
-        'playlist_name': 'Recently Added',
+        'playlist_name': BUILTIN_PLAYLISTS[slug]['name'],
         'tracks': tracks
     })
 
 
+@app.route('/api/playlists/smart/recently-added')
+def smart_playlist_recent():
+    """Get recently added tracks."""
+    return _builtin_playlist_response('recently-added', 50)
+
+
 @app.route('/api/playlists/smart/most-played')
 def smart_playlist_most_played():
     """Get most played tracks."""
-    limit = int(request.args.get('limit', 50))
-    tracks = db.get_most_played(limit)
+    return _builtin_playlist_response('most-played', 50)
+
+
+@app.route('/api/playlists/smart/favorites')
+def smart_playlist_favorites():
+    """Get favorite tracks."""
+    return _builtin_playlist_response('favorites', -1)
+
+
+@app.route('/api/playlists/smart')
+def list_smart_playlists():
+    """Get smart playlists with their rules."""
+    return jsonify({
+        'ok': True,
+        'playlists': smart_playlists.playlists()
+    })
+
+
+@app.route('/api/playlists/smart', methods=['POST'])
+def create_smart_playlist():
+    """Create a smart playlist from rules."""
+    data = request.json or {}
+    
+    try:
+        playlist_id = smart_playlists.create(
+            data.get('name'), data.get('rules') or {}, data.get('description', '')
+        )
+    except ValueError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
     
     return jsonify({
         'ok': True,
-        'playlist_name': 'Most Played',
-        'tracks': tracks
+        'playlist_id': playlist_id,
+        'playlist': smart_playlists.get(playlist_id)
     })
 
 
-@app.route('/api/playlists/smart/favorites')
-def smart_playlist_favorites():
-    """Get favorite tracks."""
-    tracks = db.get_favorites()
+@app.route('/api/playlists/smart/<int:playlist_id>', methods=['PUT'])
+def update_smart_playlist(playlist_id):
+    """Replace a smart playlist's rules."""
+    data = request.json or {}
+    
+    try:
+        updated = smart_playlists.update(
+            playlist_id, data.get('rules') or {}, data.get('name'), data.get('description')
+        )
+    except ValueError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+    
+    if not updated:
+        return jsonify({'ok': False, 'error': 'Smart playlist not found'}), 404
     
     return jsonify({
         'ok': True,
-        'playlist_name': 'Favorites',
-        'tracks': tracks
+        'playlist': smart_playlists.get(playlist_id)
     })
 
 
+@app.route('/api/playlists/smart/<int:playlist_id>', methods=['DELETE'])
+def delete_smart_playlist(playlist_id):
+    """Delete a smart playlist."""
+    if not smart_playlists.delete(playlist_id):
+        return jsonify({'ok': False, 'error': 'Smart playlist not found'}), 404
+    
+    return jsonify({'ok': True, 'message': 'Smart playlist deleted'})
+
+
 @app.route('/api/playlists/smart/genre/<genre>')
 def smart_playlist_genre(genre):
     """Get tracks by genre."""
@@ -425,8 +493,10 @@ def player_now_playing():
 
 @app.route('/api/player/queue')
 def player_get_queue():
-    """Get play queue."""
-    queue = player.get_queue()
+    """Get play queue (optionally a window: ?offset=0&limit=100)."""
+    offset = int(request.args.get('offset', 0))
+    limit = request.args.get('limit', type=int)
+    queue = player.get_queue(offset, limit)
     
     return jsonify({
         'ok': True,
@@ -451,6 +521,50 @@ def player_add_to_queue():
     })
 
 
+@app.route('/api/player/queue/remove', methods=['POST'])
+def player_remove_from_queue():
+    """Remove a track from the queue by position."""
+    data = request.json or {}
+    index = data.get('queue_position')
+    
+    if not isinstance(index, int):
+        return jsonify({'ok': False, 'error': 'queue_position required'}), 400
+    
+    result = player.remove_from_queue(index)
+    return jsonify({'ok': result['success'], 'result': result})
+
+
+@app.route('/api/player/prefetch')
+def player_prefetch():
+    """Get the upcoming track if its header and artwork are already in memory."""
+    entry = player.get_prefetched()
+    
+    if not entry:
+        return jsonify({'ok': True, 'ready': False})
+    
+    return jsonify({
+        'ok': True,
+        'ready': True,
+        'track': entry['track'],
+        'header_bytes': len(entry['header'] or b''),
+        'artwork_bytes': len(entry['artwork'] or b'')
+    })
+
+
+@app.route('/api/player/prefetch/<part>')
+def player_prefetch_data(part):
+    """Serve the upcoming track's prefetched header or artwork from memory."""
+    if part not in ('header', 'artwork'):
+        return jsonify({'ok': False, 'error': "Part must be 'header' or 'artwork'"}), 400
+    
+    entry = player.get_prefetched()
+    if not entry or not entry[part]:
+        return jsonify({'ok': False, 'error': 'Not prefetched'}), 404
+    
+    mimetype = entry['artwork_mimetype'] if part == 'artwork' else 'application/octet-stream'
+    return app.response_class(entry[part], mimetype=mimetype)
+
+
 @app.route('/api/player/queue/clear', methods=['POST'])
 def player_clear_queue():
     """Clear queue."""
@@ -532,6 +646,38 @@ def scan_duplicates():
     })
 
 
+@app.route('/api/duplicates/fingerprint', methods=['POST'])
+def fingerprint_duplicates():
+    """Start an audio fingerprint scan for re-encoded duplicates."""
+    if duplicate_engine.running:
+        return jsonify({'ok': False, 'error': 'Duplicate scan already in progress'}), 400
+    
+    def fingerprint_worker():
+        try:
+            duplicate_engine.run()
+        except Exception as e:
+            print(f"Duplicate fingerprint scan failed: {e}")
+    
+    thread = threading.Thread(target=fingerprint_worker, daemon=True)
+    thread.start()
+    
+    return jsonify({
+        'ok': True,
+        'message': 'Audio fingerprint duplicate scan started'
+    })
+
+
+@app.route('/api/duplicates/fingerprint/progress')
+def fingerprint_duplicates_progress():
+    """Get audio fingerprint scan progress and the last result."""
+    return jsonify({
+        'ok': True,
+        'scanning': duplicate_engine.running,
+        'progress': duplicate_engine.counter.snapshot(),
+        'last_run': duplicate_engine.last_run
+    })
+
+
 @app.route('/api/storage')
 def get_storage_info():
     """Get storage information."""
@@ -541,10 +687,32 @@ def get_storage_info():
     return jsonify({
         'ok': True,
         'current': current_stats,
-        'historical': storage_stats
+        'historical': storage_stats,
+        'artwork': artwork_store.usage()
     })
 
 
+@app.route('/api/artwork/<digest>')
+def get_artwork(digest):
+    """Serve album art or a thumbnail, optionally resized (?size=300)."""
+    size = request.args.get('size', type=int)
+    
+    try:
+        found = artwork_store.get(digest, size)
+    except ValueError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+    
+    if not found:
+        return jsonify({'ok': False, 'error': 'Artwork not found'}), 404
+    
+    path, mimetype = found
+    # Content-addressed: the URL changes whenever the image does
+    response = send_file(path, mimetype=mimetype, etag=artwork_store.etag(digest, size),
+                         max_age=31536000, conditional=True)
+    response.cache_control.immutable = True
+    return response
+
+
 @app.route('/api/metadata/update', methods=['POST'])
 def update_metadata():
     """Update track metadata."""
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Artwork Store
+Content-addressed album art and thumbnails with lazily generated sizes
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+# Square bounding boxes served to clients; anything else is rejected
+SIZES = (64, 150, 300, 600)
+
+IMAGE_TYPES = (
+    (b'\xff\xd8\xff', '.jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', '.png', 'image/png'),
+    (b'GIF8', '.gif', 'image/gif'),
+    (b'RIFF', '.webp', 'image/webp')
+)
+
+MIMETYPES = {ext: mimetype for _, ext, mimetype in IMAGE_TYPES}
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _image_type(data: bytes) -> Tuple[str, str]:
+    """(extension, mimetype) from the image's magic bytes (JPEG if unknown)."""
+    for magic, ext, mimetype in IMAGE_TYPES:
+        if data.startswith(magic):
+            return ext, mimetype
+    return '.jpg', 'image/jpeg'
+
+
+class ArtworkStore:
+    """
+    Album art and video thumbnails stored once per unique image.
+
+    Originals are named by a hash of their bytes, so the cover shared by
+    every track of an album is written a single time and all tracks point
+    at the same URL. Resized variants are produced on first request and
+    kept in an LRU cache capped at max_cache_bytes; originals are never
+    evicted because the library references them.
+    """
+
+    def __init__(self, root: str = 'data/artwork', max_cache_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            root: Directory holding originals/ and sizes/
+            max_cache_bytes: Disk budget for resized variants
+        """
+        self.root = Path(root).resolve()
+        self.originals = self.root / 'originals'
+        self.variants = self.root / 'sizes'
+        self.originals.mkdir(parents=True, exist_ok=True)
+        self.variants.mkdir(parents=True, exist_ok=True)
+        self.max_cache_bytes = max_cache_bytes
+
+        self._lock = threading.Lock()
+        self._known: Dict[str, Path] = {}
+        self._cache: 'OrderedDict[Path, int]' = OrderedDict()
+        self._cache_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        """Seed the original index and the LRU order (by mtime) from disk."""
+        for path in self.originals.glob('*/*'):
+            if not path.name.startswith('.'):
+                self._known[path.stem] = path
+
+        variants = []
+        for path in self.variants.glob('*/*/*'):
+            if path.name.startswith('.'):
+                continue
+            stat = path.stat()
+            variants.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(variants):
+            self._cache[path] = size
+            self._cache_bytes += size
+
+    @staticmethod
+    def url(digest: str) -> str:
+        """API path stored in album_art_path / thumbnail_path."""
+        return f'/api/artwork/{digest}'
+
+    @staticmethod
+    def etag(digest: str, size: Optional[int] = None) -> str:
+        """Content never changes for a digest, so the ETag is just its name."""
+        return f'{digest}-{size}' if size else digest
+
+    def put(self, data: bytes) -> Optional[str]:
+        """Store image bytes once; returns their digest."""
+        if not data:
+            return None
+
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            if digest in self._known:
+                return digest
+
+        ext, _ = _image_type(data)
+        path = self.originals / digest[:2] / f'{digest}{ext}'
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f'.{digest}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._known[digest] = path
+        return digest
+
+    def put_url(self, data: bytes) -> Optional[str]:
+        """Store image bytes and return the URL to save on the media row."""
+        digest = self.put(data)
+        return self.url(digest) if digest else None
+
+    def get(self, digest: str, size: Optional[int] = None) -> Optional[Tuple[Path, str]]:
+        """(path, mimetype) of the original or a size variant, generating it if needed."""
+        if not DIGEST_PATTERN.match(digest or ''):
+            return None
+        if size is not None and size not in SIZES:
+            raise ValueError(f"Size must be one of: {list(SIZES)}")
+
+        with self._lock:
+            original = self._known.get(digest)
+        if original is None or not original.exists():
+            return None
+
+        if size is None:
+            return original, MIMETYPES[original.suffix]
+
+        variant = self.variants / str(size) / digest[:2] / f'{digest}.jpg'
+        with self._lock:
+            if variant in self._cache:
+                self._cache.move_to_end(variant)
+                hit = True
+            else:
+                hit = False
+
+        if hit and variant.exists():
+            # Persist recency so the LRU order survives restarts
+            os.utime(variant)
+            return variant, 'image/jpeg'
+
+        if not self._resize(original, variant, size):
+            return original, MIMETYPES[original.suffix]
+
+        with self._lock:
+            self._cache_bytes -= self._cache.pop(variant, 0)
+            self._cache[variant] = variant.stat().st_size
+            self._cache_bytes += self._cache[variant]
+            self._evict()
+        return variant, 'image/jpeg'
+
+    def _resize(self, source: Path, target: Path, size: int) -> bool:
+        """Write a JPEG fitting size x size; False if the image cannot be decoded."""
+        try:
+            from PIL import Image
+
+            with Image.open(source) as image:
+                image = image.convert('RGB')
+                image.thumbnail((size, size), Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, 'JPEG', quality=85, optimize=True)
+        except Exception as e:
+            print(f"Error resizing artwork {source.name}: {e}")
+            return False
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f'.{target.stem}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, target)
+        return True
+
+    def _evict(self):
+        """Drop least recently used variants until under budget (lock held)."""
+        while self._cache_bytes > self.max_cache_bytes and len(self._cache) > 1:
+            path, size = self._cache.popitem(last=False)
+            self._cache_bytes -= size
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def usage(self) -> Dict:
+        """Counts and bytes for originals and cached variants."""
+        with self._lock:
+            originals = list(self._known.values())
+            variants = len(self._cache)
+            variant_bytes = self._cache_bytes
+
+        return {
+            'originals': len(originals),
+            'original_bytes': sum(p.stat().st_size for p in originals if p.exists()),
+            'variants': variants,
+            'variant_bytes': variant_bytes,
+            'max_cache_bytes': self.max_cache_bytes
+        }
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Benchmarks
+scan: sequential scan loop vs. the parallel batched pipeline on a
+      synthetic library of ID3-tagged MP3 files (requires mutagen)
+db:   per-call latency of a fresh connection per call vs. the pooled
+      persistent WAL connections in MediaDatabase, on one thread and with
+      a new thread per call (as Flask's threaded server does per request)
+
+Usage: python -m services.media.benchmark --suite scan --tracks 2000 --workers 4
+       python -m services.media.benchmark --suite db --tracks 20000
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.media.database import MediaDatabase
+from services.media.scanner import MediaScanner
+from services.media.metadata import MetadataExtractor
+from services.media.pipeline import LibraryScanPipeline
+
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames
+MPEG_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def _id3_frame(frame_id: str, text: str) -> bytes:
+    payload = b'\x03' + text.encode('utf-8')
+    return frame_id.encode('ascii') + struct.pack('>I', len(payload)) + b'\x00\x00' + payload
+
+
+def _syncsafe(size: int) -> bytes:
+    return bytes([(size >> 21) & 0x7f, (size >> 14) & 0x7f, (size >> 7) & 0x7f, size & 0x7f])
+
+
+def build_tagged_mp3(path: str, title: str, artist: str, album: str,
+                     genre: str, track: int, year: int, frames: int = 40):
+    """Write a small MP3 with an ID3v2.3 tag and silent MPEG frames."""
+    frames_data = b''.join([
+        _id3_frame('TIT2', title),
+        _id3_frame('TPE1', artist),
+        _id3_frame('TALB', album),
+        _id3_frame('TCON', genre),
+        _id3_frame('TRCK', str(track)),
+        _id3_frame('TYER', str(year))
+    ])
+    header = b'ID3\x03\x00\x00' + _syncsafe(len(frames_data))
+
+    with open(path, 'wb') as f:
+        f.write(header + frames_data + MPEG_FRAME * frames)
+
+
+def build_library(root: str, tracks: int) -> int:
+    """Create artist/album folders of tagged tracks; returns files written."""
+    genres = ['Rock', 'Pop', 'Jazz', 'Classical', 'Electronic']
+
+    for i in range(tracks):
+        artist = f'Artist {i % 97:02d}'
+        album = f'Album {i % 13:02d}'
+        folder = os.path.join(root, artist, album)
+        os.makedirs(folder, exist_ok=True)
+        build_tagged_mp3(
+            os.path.join(folder, f'{i:05d} - Track {i}.mp3'),
+            title=f'Track {i}', artist=artist, album=album,
+            genre=genres[i % len(genres)], track=(i % 12) + 1, year=1970 + i % 50
+        )
+
+    return tracks
+
+
+def run_sequential(library: str, db_path: str) -> float:
+    """The original per-file loop: extract, insert, commit."""
+    db = MediaDatabase(db_path)
+    scanner = MediaScanner(db)
+    scanner.mock_mode = False
+    extractor = MetadataExtractor()
+    extractor.mock_mode = False
+
+    start = time.perf_counter()
+    for file_data in scanner.scan_music(library):
+        file_data.update(extractor.extract_music_metadata(file_data['file_path']))
+        db.add_music_track(file_data)
+    return time.perf_counter() - start
+
+
+def run_pipeline(library: str, db_path: str, workers: int, batch_size: int) -> dict:
+    """Incremental scan through LibraryScanPipeline, then an unchanged rescan."""
+    db = MediaDatabase(db_path)
+    scanner = MediaScanner(db)
+    scanner.mock_mode = False
+    scanner.scan_paths = [library]
+    extractor = MetadataExtractor()
+    extractor.mock_mode = False
+    pipeline = LibraryScanPipeline(db, scanner, extractor, workers=workers, batch_size=batch_size)
+
+    start = time.perf_counter()
+    first = pipeline.run('music')['music']
+    initial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    second = pipeline.run('music')['music']
+    rescan = time.perf_counter() - start
+
+    return {'initial': initial, 'rescan': rescan, 'stored': first['stored'],
+            'unchanged': second['unchanged']}
+
+
+# (name, sql, params, is_write) run identically through both connection styles
+DB_OPERATIONS = [
+    ('track by id', 'SELECT * FROM music_tracks WHERE id = ?', lambda i: (i,), False),
+    ('album listing', 'SELECT * FROM music_tracks WHERE artist = ? AND album = ? '
+                      'ORDER BY disc_number, track_number',
+     lambda i: (f'Artist {i % 97:02d}', 'Album 01'), False),
+    ('library stats', 'SELECT COUNT(*), COUNT(DISTINCT artist), SUM(duration_seconds) '
+                      'FROM music_tracks', lambda i: (), False),
+    ('play count update', 'UPDATE music_tracks SET play_count = play_count + 1, last_played = ? '
+                          'WHERE id = ?', lambda i: (time.time(), i), True)
+]
+
+
+def _legacy_call(db_path: str, sql: str, params: tuple, is_write: bool):
+    """The original MediaDatabase pattern: connect, run, commit, close."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    if is_write:
+        conn.commit()
+    else:
+        cursor.fetchall()
+    conn.close()
+
+
+def _pooled_call(db: MediaDatabase, sql: str, params: tuple, is_write: bool):
+    """The same statement through a pooled persistent connection."""
+    if is_write:
+        with db._transaction() as conn:
+            conn.execute(sql, params)
+    else:
+        with db._connection() as conn:
+            conn.execute(sql, params).fetchall()
+
+
+def _thread_per_call_us(call, calls: int, concurrency: int = 8) -> float:
+    """Mean wall time per call when every call runs on a new thread, concurrency at a time."""
+    start = time.perf_counter()
+    for first in range(0, calls, concurrency):
+        threads = [threading.Thread(target=call, args=(i,))
+                   for i in range(first, min(first + concurrency, calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def _median_us(call, calls: int) -> float:
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def run_db_benchmark(work_dir: str, tracks: int, calls: int):
+    """Median per-call latency before (connection per call, rollback journal) and after."""
+    pooled_path = os.path.join(work_dir, 'pooled.db')
+    legacy_path = os.path.join(work_dir, 'legacy.db')
+
+    db = MediaDatabase(pooled_path)
+    genres = ['Rock', 'Pop', 'Jazz', 'Classical', 'Electronic']
+    rows = [{
+        'file_path': f'/library/{i}.mp3', 'file_name': f'{i}.mp3', 'title': f'Track {i}',
+        'artist': f'Artist {i % 97:02d}', 'album': f'Album {i % 13:02d}',
+        'genre': genres[i % len(genres)], 'track_number': (i % 12) + 1,
+        'duration_seconds': 180 + i % 120
+    } for i in range(tracks)]
+    for start in range(0, tracks, 5000):
+        db.add_music_tracks(rows[start:start + 5000])
+
+    db.close()
+    shutil.copy(pooled_path, legacy_path)
+    conn = sqlite3.connect(legacy_path)
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+
+    print(f"{'operation':<20}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, sql, params, is_write in DB_OPERATIONS:
+        before = _median_us(
+            lambda i: _legacy_call(legacy_path, sql, params(i % tracks + 1), is_write), calls
+        )
+        after = _median_us(
+            lambda i: _pooled_call(db, sql, params(i % tracks + 1), is_write), calls
+        )
+        print(f"{name:<20}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+    print("\nNew thread per call, 8 concurrent:")
+    name, sql, params, is_write = DB_OPERATIONS[0]
+    opened = db.connections_opened
+    before = _thread_per_call_us(
+        lambda i: _legacy_call(legacy_path, sql, params(i % tracks + 1), is_write), calls
+    )
+    after = _thread_per_call_us(
+        lambda i: _pooled_call(db, sql, params(i % tracks + 1), is_write), calls
+    )
+    print(f"{name:<20}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+    print(f"Connections opened for {calls} threads: {db.connections_opened - opened} "
+          f"(pool size {db.pool_size})")
+    db.close()
+
+
+def run_scan_benchmark(work_dir: str, tracks: int, workers: int, batch_size: int):
+    """Sequential loop vs. pipeline on a synthetic tagged library."""
+    library = os.path.join(work_dir, 'library')
+
+    start = time.perf_counter()
+    build_library(library, tracks)
+    print(f"Built {tracks} tagged tracks in {time.perf_counter() - start:.2f}s ({library})")
+
+    sequential = run_sequential(library, os.path.join(work_dir, 'sequential.db'))
+    print(f"Sequential scan:        {sequential:8.2f}s  "
+          f"({tracks / sequential:,.0f} tracks/s)")
+
+    result = run_pipeline(library, os.path.join(work_dir, 'pipeline.db'), workers, batch_size)
+    print(f"Pipeline scan:          {result['initial']:8.2f}s  "
+          f"({result['stored'] / result['initial']:,.0f} tracks/s, "
+          f"{workers} workers, batch {batch_size})")
+    print(f"Unchanged rescan:       {result['rescan']:8.2f}s  "
+          f"({result['unchanged']} files unchanged)")
+    print(f"Speedup (initial scan): {sequential / result['initial']:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark media library scanning and database access'
+    )
+    parser.add_argument('--suite', choices=['scan', 'db', 'all'], default='all')
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--calls', type=int, default=2000, help='Calls per operation (db suite)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated files')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='media_bench_')
+
+    try:
+        if args.suite in ('scan', 'all'):
+            run_scan_benchmark(work_dir, args.tracks, args.workers, args.batch_size)
+        if args.suite in ('db', 'all'):
+            run_db_benchmark(work_dir, args.tracks, args.calls)
+    finally:
+        if args.keep:
+            print(f"Kept {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
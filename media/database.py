@@ -4,8 +4,13 @@ Media Center Pro - Database Module
 Handles all database operations for media library
 """
 
+import re
+import base64
 import sqlite3
 import json
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional, Any
@@ -14,21 +19,152 @@ from typing import List, Dict, Optional, Any
 class MediaDatabase:
     """Database handler for media library."""
     
-    def __init__(self, db_path: str = 'data/media_center.db'):
+    MUSIC_COLUMNS = (
+        'file_path', 'file_name', 'file_size', 'file_hash', 'title', 'artist', 'album',
+        'album_artist', 'year', 'genre', 'track_number', 'disc_number', 'duration_seconds',
+        'bitrate', 'sample_rate', 'channels', 'format', 'album_art_path'
+    )
+    
+    VIDEO_COLUMNS = (
+        'file_path', 'file_name', 'file_size', 'file_hash', 'title', 'duration_seconds',
+        'width', 'height', 'fps', 'codec', 'bitrate', 'format', 'thumbnail_path', 'folder_path'
+    )
+    
+    ARTWORK_COLUMNS = ('album_art_path', 'thumbnail_path')
+    
+    # bm25 column weights for title, artist, album, genre
+    SEARCH_WEIGHTS = (10.0, 6.0, 4.0, 1.0)
+    
+    # Max rank boost from play count (saturates as plays grow)
+    SEARCH_PLAY_WEIGHT = 0.5
+    
+    # Shorter queries match too much of the library to be worth ranking
+    SEARCH_MIN_QUERY_LENGTH = 3
+    
+    # Keyset sort orders: (key expressions, direction). Each has a matching
+    # index and ends with id so keys are unique.
+    MUSIC_SORTS = {
+        'date_added': (('date_added', 'id'), 'DESC'),
+        'play_count': (('play_count', 'id'), 'DESC'),
+        'artist': (("COALESCE(artist, '')", "COALESCE(album, '')", 'COALESCE(disc_number, 0)',
+                    'COALESCE(track_number, 0)', 'id'), 'ASC')
+    }
+    
+    VIDEO_SORTS = {
+        'date_added': (('date_added', 'id'), 'DESC'),
+        'play_count': (('play_count', 'id'), 'DESC'),
+        'title': (('COALESCE(title, file_name)', 'id'), 'ASC')
+    }
+    
+    # Per-connection tuning; WAL lets readers proceed while a scan writes
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -16000),
+        ('mmap_size', 268435456),
+        ('temp_store', 'MEMORY'),
+        ('busy_timeout', 5000),
+        # INSERT OR REPLACE must fire delete triggers to keep music_fts in sync
+        ('recursive_triggers', 'ON')
+    )
+    
+    STATEMENT_CACHE_SIZE = 256
+    
+    # Connections open at once; further callers wait up to POOL_TIMEOUT seconds
+    POOL_SIZE = 8
+    POOL_TIMEOUT = 30.0
+    
+    def __init__(self, db_path: str = 'data/media_center.db', pool_size: int = POOL_SIZE):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fts_enabled = False
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._local = threading.local()
+        self.connections_opened = 0
         self._init_database()
     
-    def _get_connection(self):
-        """Get database connection."""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection (autocommit, prepared statement cache)."""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
         conn.row_factory = sqlite3.Row
+        for name, value in self.PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        self.connections_opened += 1
         return conn
     
+    @contextmanager
+    def _connection(self):
+        """
+        Check a connection out of the pool for the enclosed block.
+        
+        At most pool_size connections exist; idle ones are reused by any
+        thread, so a server that starts a thread per request does not open
+        (and tune) a connection per request. Nested use on the same thread
+        shares the checked-out connection; use _transaction() to group writes.
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        if not self._slots.acquire(timeout=self.POOL_TIMEOUT):
+            raise RuntimeError('Timed out waiting for a database connection')
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            
+            self._local.connection = conn
+            try:
+                yield conn
+            finally:
+                self._local.connection = None
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one transaction; nested use joins the outer one."""
+        with self._connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            
+            conn.execute('BEGIN')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    
+    def close(self):
+        """Close the idle pooled connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+    
     def _init_database(self):
         """Initialize database schema."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            self._create_schema(conn.cursor())
+    
+    def _create_schema(self, cursor):
+        """Create tables, indexes and triggers in one transaction."""
+        cursor.execute('BEGIN')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS music_tracks (
@@ -123,6 +259,25 @@ class MediaDatabase:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS smart_playlist_tracks (
+                playlist_id INTEGER NOT NULL,
+                track_id INTEGER NOT NULL,
+                sort_key,
+                PRIMARY KEY (playlist_id, track_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_probes (
+                file_path TEXT PRIMARY KEY,
+                file_size INTEGER,
+                mtime_ns INTEGER,
+                metadata TEXT NOT NULL,
+                probed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS now_playing (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
@@ -177,6 +332,31 @@ class MediaDatabase:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_manifest (
+                file_path TEXT PRIMARY KEY,
+                media_type TEXT NOT NULL,
+                file_size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                file_hash TEXT,
+                scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audio_fingerprints (
+                track_id INTEGER PRIMARY KEY,
+                file_hash TEXT,
+                file_size INTEGER,
+                duration_seconds REAL,
+                signature BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (track_id) REFERENCES music_tracks(id) ON DELETE CASCADE
+            )
+        ''')
+        
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_music_artist ON music_tracks(artist)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_music_album ON music_tracks(album)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_music_genre ON music_tracks(genre)')
@@ -184,479 +364,1058 @@ class MediaDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_music_favorite ON music_tracks(favorite)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_music_added ON music_tracks(date_added)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_folder ON video_files(folder_path)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_music_play_count ON music_tracks(play_count, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_music_browse ON music_tracks(
+                COALESCE(artist, ''), COALESCE(album, ''), COALESCE(disc_number, 0),
+                COALESCE(track_number, 0), id
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_added ON video_files(date_added, id)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_video_play_count ON video_files(play_count, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_video_title
+            ON video_files(COALESCE(title, file_name), id)
+        ''')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlist_type ON playlists(type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_manifest_type ON scan_manifest(media_type)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_duplicates_pair ON duplicates(track_id_1, track_id_2)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_smart_order
+            ON smart_playlist_tracks(playlist_id, sort_key, track_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_smart_track ON smart_playlist_tracks(track_id)
+        ''')
+        
+        # Per-playlist triggers add/update members; these keep removals and counts in step
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS smart_member_delete AFTER DELETE ON music_tracks BEGIN
+                DELETE FROM smart_playlist_tracks WHERE track_id = OLD.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS smart_count_insert
+            AFTER INSERT ON smart_playlist_tracks BEGIN
+                UPDATE playlists SET track_count = track_count + 1 WHERE id = NEW.playlist_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS smart_count_delete
+            AFTER DELETE ON smart_playlist_tracks BEGIN
+                UPDATE playlists SET track_count = track_count - 1 WHERE id = OLD.playlist_id;
+            END
+        ''')
         
         cursor.execute('INSERT OR IGNORE INTO now_playing (id) VALUES (1)')
         
-        conn.commit()
-        conn.close()
+        self._ensure_columns(cursor, 'play_queue', {'shuffle_position': 'INTEGER'})
+        self._ensure_columns(cursor, 'now_playing', {'queue_position': 'INTEGER'})
+        self._ensure_columns(cursor, 'playlists', {'builtin_slug': 'TEXT'})
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_playlist_builtin ON playlists(builtin_slug)
+            WHERE builtin_slug IS NOT NULL
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_queue_position ON play_queue(position)')
+        
+        self.fts_enabled = self._init_search_index(cursor)
+        
+        cursor.execute('COMMIT')
     
-    def add_music_track(self, track_data: Dict[str, Any]) -> int:
-        """Add or update a music track."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _ensure_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Add columns introduced after a table was first created."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, declaration in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {declaration}')
+    
+    def _init_search_index(self, cursor) -> bool:
+        """
+        Create the FTS5 index over music_tracks and its sync triggers.
+        
+        music_fts is an external-content table, so it stores only the
+        index. Returns False when SQLite was built without FTS5, in which
+        case search falls back to LIKE.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'music_fts'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS music_fts USING fts5(
+                    title, artist, album, genre,
+                    content='music_tracks', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='1 2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
         
         cursor.execute('''
-            INSERT OR REPLACE INTO music_tracks 
-            (file_path, file_name, file_size, file_hash, title, artist, album, album_artist,
-             year, genre, track_number, disc_number, duration_seconds, bitrate, sample_rate,
-             channels, format, album_art_path, date_modified)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            track_data.get('file_path'),
-            track_data.get('file_name'),
-            track_data.get('file_size'),
-            track_data.get('file_hash'),
-            track_data.get('title'),
-            track_data.get('artist'),
-            track_data.get('album'),
-            track_data.get('album_artist'),
-            track_data.get('year'),
-            track_data.get('genre'),
-            track_data.get('track_number'),
-            track_data.get('disc_number'),
-            track_data.get('duration_seconds'),
-            track_data.get('bitrate'),
-            track_data.get('sample_rate'),
-            track_data.get('channels'),
-            track_data.get('format'),
-            track_data.get('album_art_path'),
-            datetime.now().isoformat()
-        ))
-        
-        track_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return track_id
+            CREATE TRIGGER IF NOT EXISTS music_fts_insert AFTER INSERT ON music_tracks BEGIN
+                INSERT INTO music_fts (rowid, title, artist, album, genre)
+                VALUES (new.id, new.title, new.artist, new.album, new.genre);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS music_fts_delete AFTER DELETE ON music_tracks BEGIN
+                INSERT INTO music_fts (music_fts, rowid, title, artist, album, genre)
+                VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS music_fts_update
+            AFTER UPDATE OF title, artist, album, genre ON music_tracks BEGIN
+                INSERT INTO music_fts (music_fts, rowid, title, artist, album, genre)
+                VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+                INSERT INTO music_fts (rowid, title, artist, album, genre)
+                VALUES (new.id, new.title, new.artist, new.album, new.genre);
+            END
+        ''')
+        
+        if not exists:
+            cursor.execute("INSERT INTO music_fts (music_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    def add_music_track(self, track_data: Dict[str, Any]) -> int:
+        """Add or update a music track."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO music_tracks 
+                (file_path, file_name, file_size, file_hash, title, artist, album, album_artist,
+                 year, genre, track_number, disc_number, duration_seconds, bitrate, sample_rate,
+                 channels, format, album_art_path, date_modified)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                track_data.get('file_path'),
+                track_data.get('file_name'),
+                track_data.get('file_size'),
+                track_data.get('file_hash'),
+                track_data.get('title'),
+                track_data.get('artist'),
+                track_data.get('album'),
+                track_data.get('album_artist'),
+                track_data.get('year'),
+                track_data.get('genre'),
+                track_data.get('track_number'),
+                track_data.get('disc_number'),
+                track_data.get('duration_seconds'),
+                track_data.get('bitrate'),
+                track_data.get('sample_rate'),
+                track_data.get('channels'),
+                track_data.get('format'),
+                track_data.get('album_art_path'),
+                datetime.now().isoformat()
+            ))
+            
+            track_id = cursor.lastrowid
+            return track_id
     
     def add_video_file(self, video_data: Dict[str, Any]) -> int:
         """Add or update a video file."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO video_files 
+                (file_path, file_name, file_size, file_hash, title, duration_seconds,
+                 width, height, fps, codec, bitrate, format, thumbnail_path, folder_path,
+                 date_modified)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                video_data.get('file_path'),
+                video_data.get('file_name'),
+                video_data.get('file_size'),
+                video_data.get('file_hash'),
+                video_data.get('title'),
+                video_data.get('duration_seconds'),
+                video_data.get('width'),
+                video_data.get('height'),
+                video_data.get('fps'),
+                video_data.get('codec'),
+                video_data.get('bitrate'),
+                video_data.get('format'),
+                video_data.get('thumbnail_path'),
+                video_data.get('folder_path'),
+                datetime.now().isoformat()
+            ))
+            
+            video_id = cursor.lastrowid
+            return video_id
+    
+    def _bulk_upsert(self, table: str, columns: tuple,
+                     rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert rows keyed by file_path in a single transaction.
+        
+        Existing rows are updated in place, so ids, play counts, ratings
+        and playlist membership survive a rescan, and known artwork is kept
+        when the new row has none. Returns file_path -> id.
+        """
+        if not rows:
+            return {}
+        
+        now = datetime.now().isoformat()
+        all_columns = columns + ('date_modified',)
+        placeholders = ', '.join('?' for _ in all_columns)
+        updates = ', '.join(
+            f'{col} = COALESCE(excluded.{col}, {col})' if col in self.ARTWORK_COLUMNS
+            else f'{col} = excluded.{col}'
+            for col in all_columns if col != 'file_path'
+        )
+        
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany(f'''
+                INSERT INTO {table} ({', '.join(all_columns)})
+                VALUES ({placeholders})
+                ON CONFLICT(file_path) DO UPDATE SET {updates}
+            ''', [tuple(row.get(col) for col in columns) + (now,) for row in rows])
+            
+            paths = [row['file_path'] for row in rows]
+            ids = {}
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                cursor.execute(
+                    f"SELECT id, file_path FROM {table} WHERE file_path IN ({placeholders})",
+                    chunk
+                )
+                ids.update({row['file_path']: row['id'] for row in cursor.fetchall()})
+        return ids
+    
+    def add_music_tracks(self, tracks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add or update many music tracks in one transaction; returns file_path -> id."""
+        return self._bulk_upsert('music_tracks', self.MUSIC_COLUMNS, tracks)
+    
+    def add_video_files(self, videos: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add or update many video files in one transaction; returns file_path -> id."""
+        return self._bulk_upsert('video_files', self.VIDEO_COLUMNS, videos)
+    
+    def set_artwork_paths(self, media_type: str, artwork: List[tuple]):
+        """Set album art (music) or thumbnail (video) paths from (id, path) pairs."""
+        if not artwork:
+            return
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO video_files 
-            (file_path, file_name, file_size, file_hash, title, duration_seconds,
-             width, height, fps, codec, bitrate, format, thumbnail_path, folder_path, date_modified)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            video_data.get('file_path'),
-            video_data.get('file_name'),
-            video_data.get('file_size'),
-            video_data.get('file_hash'),
-            video_data.get('title'),
-            video_data.get('duration_seconds'),
-            video_data.get('width'),
-            video_data.get('height'),
-            video_data.get('fps'),
-            video_data.get('codec'),
-            video_data.get('bitrate'),
-            video_data.get('format'),
-            video_data.get('thumbnail_path'),
-            video_data.get('folder_path'),
-            datetime.now().isoformat()
-        ))
-        
-        video_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return video_id
+        if media_type == 'music':
+            sql = 'UPDATE music_tracks SET album_art_path = ? WHERE id = ?'
+        else:
+            sql = 'UPDATE video_files SET thumbnail_path = ? WHERE id = ?'
+        
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(sql, [(path, media_id) for media_id, path in artwork])
+    
+    @classmethod
+    def is_searchable(cls, query: str) -> bool:
+        """Whether a query has at least SEARCH_MIN_QUERY_LENGTH word characters."""
+        terms = re.findall(r'\w+', query, flags=re.UNICODE)
+        return sum(len(term) for term in terms) >= cls.SEARCH_MIN_QUERY_LENGTH
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn user input into an FTS5 query: every word must match as a prefix."""
+        terms = re.findall(r'\w+', query, flags=re.UNICODE)
+        return ' '.join(f'"{term}"*' for term in terms)
     
     def search_music(self, query: str, limit: int = 100) -> List[Dict]:
-        """Search music tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        """
+        Search music tracks by title, artist, album and genre.
         
-        search_query = f'%{query}%'
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            WHERE title LIKE ? OR artist LIKE ? OR album LIKE ? OR genre LIKE ?
-            ORDER BY play_count DESC, date_added DESC
-            LIMIT ?
-        ''', (search_query, search_query, search_query, search_query, limit))
+        Each word matches as a prefix, ignoring case and diacritics.
+        Every match is ranked by bm25 (title weighted highest) with a
+        saturating boost for frequently played tracks. Queries shorter
+        than SEARCH_MIN_QUERY_LENGTH word characters return nothing, so a
+        one- or two-letter prefix never ranks most of the library.
+        """
+        if not self.is_searchable(query):
+            return []
+        
+        if not self.fts_enabled:
+            return self._search_music_like(query, limit)
         
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        fts_query = self._fts_query(query)
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT m.*
+                FROM music_fts
+                JOIN music_tracks m ON m.id = music_fts.rowid
+                WHERE music_fts MATCH ?
+                ORDER BY bm25(music_fts, ?, ?, ?, ?)
+                         * (1.0 + ? * m.play_count / (m.play_count + 10.0)),
+                         m.date_added DESC
+                LIMIT ?
+            ''', (fts_query, *self.SEARCH_WEIGHTS, self.SEARCH_PLAY_WEIGHT, limit))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    def _search_music_like(self, query: str, limit: int) -> List[Dict]:
+        """Substring search used when SQLite lacks FTS5."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            search_query = f'%{query}%'
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                WHERE title LIKE ? OR artist LIKE ? OR album LIKE ? OR genre LIKE ?
+                ORDER BY play_count DESC, date_added DESC
+                LIMIT ?
+            ''', (search_query, search_query, search_query, search_query, limit))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_all_music(self, limit: int = 1000, offset: int = 0) -> List[Dict]:
         """Get all music tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            ORDER BY date_added DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                ORDER BY date_added DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_all_videos(self, limit: int = 1000, offset: int = 0) -> List[Dict]:
         """Get all video files."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM video_files
-            ORDER BY date_added DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM video_files
+                ORDER BY date_added DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    @staticmethod
+    def _encode_cursor(sort: str, keys: List[Any]) -> str:
+        """Opaque page cursor holding the sort name and the last row's keys."""
+        raw = json.dumps([sort, keys], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str, key_count: int) -> List[Any]:
+        """Decode a cursor, checking it belongs to the requested sort."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, keys = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        
+        if cursor_sort != sort or not isinstance(keys, list) or len(keys) != key_count:
+            raise ValueError('Cursor does not match the requested sort')
+        return keys
+    
+    def _keyset_page(self, table: str, sorts: Dict, sort: str, limit: int,
+                     page_cursor: Optional[str]) -> Dict[str, Any]:
+        """
+        One page of rows after `page_cursor` in the given sort order.
+        
+        Seeks the sort index with a row-value comparison instead of
+        OFFSET, so every page costs the same and rows added while
+        browsing do not shift later pages.
+        """
+        if sort not in sorts:
+            raise ValueError(f"Unsupported sort '{sort}'. Use one of: {list(sorts)}")
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        
+        keys, direction = sorts[sort]
+        key_columns = ', '.join(f'{expr} AS _key{i}' for i, expr in enumerate(keys))
+        order = ', '.join(f'{expr} {direction}' for expr in keys)
+        
+        sql = f'SELECT *, {key_columns} FROM {table}'
+        params: List[Any] = []
+        if page_cursor:
+            params = self._decode_cursor(page_cursor, sort, len(keys))
+            comparison = '<' if direction == 'DESC' else '>'
+            placeholders = ', '.join('?' for _ in keys)
+            # The bound on the leading key lets SQLite seek expression indexes
+            sql += (f" WHERE {keys[0]} {comparison}= ?"
+                    f" AND ({', '.join(keys)}) {comparison} ({placeholders})")
+            params = [params[0]] + params
+        sql += f' ORDER BY {order} LIMIT ?'
+        params.append(limit + 1)
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = self._encode_cursor(
+                    sort, [last[f'_key{i}'] for i in range(len(keys))]
+                )
+            
+            for row in rows:
+                for i in range(len(keys)):
+                    del row[f'_key{i}']
+            
+            return {'items': rows, 'next_cursor': next_cursor, 'sort': sort}
+    
+    def get_music_page(self, sort: str = 'date_added', limit: int = 100,
+                       cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get a page of music tracks with a cursor for the next page."""
+        return self._keyset_page('music_tracks', self.MUSIC_SORTS, sort, limit, cursor)
+    
+    def get_video_page(self, sort: str = 'date_added', limit: int = 100,
+                       cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get a page of video files with a cursor for the next page."""
+        return self._keyset_page('video_files', self.VIDEO_SORTS, sort, limit, cursor)
     
     def get_artists(self) -> List[Dict]:
         """Get all artists with track counts."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT artist, COUNT(*) as track_count, 
-                   COUNT(DISTINCT album) as album_count
-            FROM music_tracks
-            WHERE artist IS NOT NULL AND artist != ''
-            GROUP BY artist
-            ORDER BY artist
-        ''')
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
-    
-    def get_albums(self, artist: Optional[str] = None) -> List[Dict]:
-        """Get all albums, optionally filtered by artist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if artist:
-            cursor.execute('''
-                SELECT album, artist, album_artist, year, 
-                       COUNT(*) as track_count,
-                       MAX(album_art_path) as album_art_path
-                FROM music_tracks
-                WHERE album IS NOT NULL AND album != '' AND artist = ?
-                GROUP BY album, artist
-                ORDER BY year DESC, album
-            ''', (artist,))
-        else:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                SELECT album, artist, album_artist, year, 
-                       COUNT(*) as track_count,
-                       MAX(album_art_path) as album_art_path
+                SELECT artist, COUNT(*) as track_count, 
+                       COUNT(DISTINCT album) as album_count
                 FROM music_tracks
-                WHERE album IS NOT NULL AND album != ''
-                GROUP BY album, artist
-                ORDER BY year DESC, album
+                WHERE artist IS NOT NULL AND artist != ''
+                GROUP BY artist
+                ORDER BY artist
             ''')
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    def get_albums(self, artist: Optional[str] = None) -> List[Dict]:
+        """Get all albums, optionally filtered by artist."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if artist:
+                cursor.execute('''
+                    SELECT album, artist, album_artist, year, 
+                           COUNT(*) as track_count,
+                           MAX(album_art_path) as album_art_path
+                    FROM music_tracks
+                    WHERE album IS NOT NULL AND album != '' AND artist = ?
+                    GROUP BY album, artist
+                    ORDER BY year DESC, album
+                ''', (artist,))
+            else:
+                cursor.execute('''
+                    SELECT album, artist, album_artist, year, 
+                           COUNT(*) as track_count,
+                           MAX(album_art_path) as album_art_path
+                    FROM music_tracks
+                    WHERE album IS NOT NULL AND album != ''
+                    GROUP BY album, artist
+                    ORDER BY year DESC, album
+                ''')
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_genres(self) -> List[Dict]:
         """Get all genres with track counts."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT genre, COUNT(*) as track_count
-            FROM music_tracks
-            WHERE genre IS NOT NULL AND genre != ''
-            GROUP BY genre
-            ORDER BY track_count DESC
-        ''')
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT genre, COUNT(*) as track_count
+                FROM music_tracks
+                WHERE genre IS NOT NULL AND genre != ''
+                GROUP BY genre
+                ORDER BY track_count DESC
+            ''')
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def create_playlist(self, name: str, description: str = '', playlist_type: str = 'manual',
                        auto_criteria: Optional[str] = None) -> int:
         """Create a new playlist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO playlists (name, description, type, auto_criteria)
-            VALUES (?, ?, ?, ?)
-        ''', (name, description, playlist_type, auto_criteria))
-        
-        playlist_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return playlist_id
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO playlists (name, description, type, auto_criteria)
+                VALUES (?, ?, ?, ?)
+            ''', (name, description, playlist_type, auto_criteria))
+            
+            playlist_id = cursor.lastrowid
+            return playlist_id
     
     def add_to_playlist(self, playlist_id: int, track_id: int) -> bool:
         """Add track to playlist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT MAX(position) FROM playlist_tracks WHERE playlist_id = ?
-        ''', (playlist_id,))
-        
-        max_pos = cursor.fetchone()[0]
-        position = (max_pos or 0) + 1
-        
         try:
-            cursor.execute('''
-                INSERT INTO playlist_tracks (playlist_id, track_id, position)
-                VALUES (?, ?, ?)
-            ''', (playlist_id, track_id, position))
-            
-            cursor.execute('''
-                UPDATE playlists SET track_count = track_count + 1, updated_at = ?
-                WHERE id = ?
-            ''', (datetime.now().isoformat(), playlist_id))
-            
-            conn.commit()
-            success = True
+            with self._transaction() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT MAX(position) FROM playlist_tracks WHERE playlist_id = ?
+                ''', (playlist_id,))
+                
+                max_pos = cursor.fetchone()[0]
+                position = (max_pos or 0) + 1
+                
+                cursor.execute('''
+                    INSERT INTO playlist_tracks (playlist_id, track_id, position)
+                    VALUES (?, ?, ?)
+                ''', (playlist_id, track_id, position))
+                
+                cursor.execute('''
+                    UPDATE playlists SET track_count = track_count + 1, updated_at = ?
+                    WHERE id = ?
+                ''', (datetime.now().isoformat(), playlist_id))
+            return True
         except sqlite3.IntegrityError:
-            success = False
-        
-        conn.close()
-        return success
+            return False
     
     def get_playlists(self) -> List[Dict]:
         """Get all playlists."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM playlists ORDER BY created_at DESC')
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM playlists ORDER BY created_at DESC')
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_playlist_tracks(self, playlist_id: int) -> List[Dict]:
         """Get tracks in a playlist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT m.*, pt.position
-            FROM music_tracks m
-            JOIN playlist_tracks pt ON m.id = pt.track_id
-            WHERE pt.playlist_id = ?
-            ORDER BY pt.position
-        ''', (playlist_id,))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT m.*, pt.position
+                FROM music_tracks m
+                JOIN playlist_tracks pt ON m.id = pt.track_id
+                WHERE pt.playlist_id = ?
+                ORDER BY pt.position
+            ''', (playlist_id,))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def increment_play_count(self, track_id: int):
         """Increment play count for a track."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE music_tracks
-            SET play_count = play_count + 1, last_played = ?
-            WHERE id = ?
-        ''', (datetime.now().isoformat(), track_id))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE music_tracks
+                SET play_count = play_count + 1, last_played = ?
+                WHERE id = ?
+            ''', (datetime.now().isoformat(), track_id))
+    
+    def get_tracks_by_ids(self, track_ids: List[int]) -> Dict[int, Dict]:
+        """Get tracks keyed by id in chunked IN queries."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            results = {}
+            
+            unique_ids = list(dict.fromkeys(track_ids))
+            for start in range(0, len(unique_ids), 500):
+                chunk = unique_ids[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                cursor.execute(f"SELECT * FROM music_tracks WHERE id IN ({placeholders})", chunk)
+                results.update({row['id']: dict(row) for row in cursor.fetchall()})
+            return results
+    
+    def get_play_queue(self) -> List[Dict]:
+        """Get persisted queue items in insertion order."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT position, track_id, shuffle_position FROM play_queue ORDER BY position'
+            )
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    def append_play_queue(self, items: List[tuple]):
+        """Insert (position, track_id, shuffle_position) queue items."""
+        if not items:
+            return
+        
+        with self._transaction() as conn:
+            conn.executemany('''
+                INSERT INTO play_queue (position, track_id, shuffle_position) VALUES (?, ?, ?)
+            ''', items)
+    
+    def replace_play_queue(self, items: List[tuple]):
+        """Replace the whole queue with (position, track_id, shuffle_position) items."""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM play_queue')
+            conn.executemany('''
+                INSERT INTO play_queue (position, track_id, shuffle_position) VALUES (?, ?, ?)
+            ''', items)
+    
+    def remove_play_queue_items(self, positions: List[int]):
+        """Delete queue items by position."""
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM play_queue WHERE position = ?',
+                             [(position,) for position in positions])
+    
+    def set_shuffle_positions(self, items: List[tuple]):
+        """Store a new shuffle order from (shuffle_position, position) pairs."""
+        with self._transaction() as conn:
+            conn.executemany('UPDATE play_queue SET shuffle_position = ? WHERE position = ?', items)
+    
+    def update_queue_state(self, **fields):
+        """Update queue_position, shuffle and/or repeat on the now playing row."""
+        allowed = {k: v for k, v in fields.items() if k in ('queue_position', 'shuffle', 'repeat')}
+        if not allowed:
+            return
+        
+        with self._connection() as conn:
+            conn.execute(
+                f"UPDATE now_playing SET {', '.join(f'{k} = ?' for k in allowed)} WHERE id = 1",
+                list(allowed.values())
+            )
     
     def update_now_playing(self, track_id: Optional[int], state: str = 'playing',
                           position_seconds: float = 0):
         """Update now playing status."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE now_playing
-            SET track_id = ?, state = ?, position_seconds = ?, updated_at = ?
-            WHERE id = 1
-        ''', (track_id, state, position_seconds, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE now_playing
+                SET track_id = ?, state = ?, position_seconds = ?, updated_at = ?
+                WHERE id = 1
+            ''', (track_id, state, position_seconds, datetime.now().isoformat()))
     
     def get_now_playing(self) -> Dict:
         """Get current now playing info."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT np.*, m.*
-            FROM now_playing np
-            LEFT JOIN music_tracks m ON np.track_id = m.id
-            WHERE np.id = 1
-        ''')
-        
-        row = cursor.fetchone()
-        result = dict(row) if row else {}
-        conn.close()
-        return result
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT np.*, m.*
+                FROM now_playing np
+                LEFT JOIN music_tracks m ON np.track_id = m.id
+                WHERE np.id = 1
+            ''')
+            
+            row = cursor.fetchone()
+            result = dict(row) if row else {}
+            return result
     
     def get_recently_added(self, limit: int = 50) -> List[Dict]:
         """Get recently added tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            ORDER BY date_added DESC
-            LIMIT ?
-        ''', (limit,))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                ORDER BY date_added DESC
+                LIMIT ?
+            ''', (limit,))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_most_played(self, limit: int = 50) -> List[Dict]:
         """Get most played tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            WHERE play_count > 0
-            ORDER BY play_count DESC, last_played DESC
-            LIMIT ?
-        ''', (limit,))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                WHERE play_count > 0
+                ORDER BY play_count DESC, last_played DESC
+                LIMIT ?
+            ''', (limit,))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_favorites(self) -> List[Dict]:
         """Get favorite tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            WHERE favorite = 1
-            ORDER BY date_added DESC
-        ''')
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                WHERE favorite = 1
+                ORDER BY date_added DESC
+            ''')
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def get_by_genre(self, genre: str, limit: int = 100) -> List[Dict]:
         """Get tracks by genre."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM music_tracks
-            WHERE genre = ?
-            ORDER BY artist, album, track_number
-            LIMIT ?
-        ''', (genre, limit))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM music_tracks
+                WHERE genre = ?
+                ORDER BY artist, album, track_number
+                LIMIT ?
+            ''', (genre, limit))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    def save_smart_playlist(self, playlist_id: Optional[int], name: str, description: str,
+                            criteria: str, predicate_new: str, predicate_table: str,
+                            sort_column: str, watch_columns: List[str],
+                            builtin_slug: Optional[str] = None) -> int:
+        """
+        Create or redefine a smart playlist and materialize its members.
+        
+        Predicates and column names come from SmartPlaylistEngine, which
+        builds them from whitelisted fields only. Two triggers re-evaluate
+        the rules for each inserted or updated track; members are rebuilt
+        from scratch here in the same transaction. builtin_slug marks a
+        new playlist as one the media center ships with.
+        """
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            
+            if playlist_id is None:
+                cursor.execute('''
+                    INSERT INTO playlists (name, description, type, auto_criteria, builtin_slug)
+                    VALUES (?, ?, 'smart', ?, ?)
+                ''', (name, description, criteria, builtin_slug))
+                playlist_id = cursor.lastrowid
+            else:
+                cursor.execute('''
+                    UPDATE playlists
+                    SET name = ?, description = ?, auto_criteria = ?, updated_at = ?
+                    WHERE id = ? AND type = 'smart'
+                ''', (name, description, criteria, datetime.now().isoformat(), playlist_id))
+            
+            playlist_id = int(playlist_id)
+            self._drop_smart_triggers(cursor, playlist_id)
+            cursor.execute('DELETE FROM smart_playlist_tracks WHERE playlist_id = ?',
+                           (playlist_id,))
+            
+            cursor.execute(f'''
+                CREATE TRIGGER smart_playlist_{playlist_id}_insert AFTER INSERT ON music_tracks
+                WHEN {predicate_new} BEGIN
+                    INSERT OR REPLACE INTO smart_playlist_tracks (playlist_id, track_id, sort_key)
+                    VALUES ({playlist_id}, NEW.id, NEW.{sort_column});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER smart_playlist_{playlist_id}_update
+                AFTER UPDATE OF {', '.join(watch_columns)} ON music_tracks BEGIN
+                    DELETE FROM smart_playlist_tracks
+                    WHERE playlist_id = {playlist_id} AND track_id = NEW.id
+                      AND NOT COALESCE({predicate_new}, 0);
+                    INSERT INTO smart_playlist_tracks (playlist_id, track_id, sort_key)
+                    SELECT {playlist_id}, NEW.id, NEW.{sort_column} WHERE {predicate_new}
+                    ON CONFLICT (playlist_id, track_id) DO UPDATE SET sort_key = excluded.sort_key
+                    WHERE sort_key IS NOT excluded.sort_key;
+                END
+            ''')
+            
+            cursor.execute(f'''
+                INSERT INTO smart_playlist_tracks (playlist_id, track_id, sort_key)
+                SELECT ?, m.id, m.{sort_column} FROM music_tracks AS m WHERE {predicate_table}
+            ''', (playlist_id,))
+        return playlist_id
+    
+    def _drop_smart_triggers(self, cursor, playlist_id: int):
+        for event in ('insert', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS smart_playlist_{int(playlist_id)}_{event}')
+    
+    def delete_smart_playlist(self, playlist_id: int) -> bool:
+        """Delete a smart playlist with its triggers and members."""
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT 1 FROM playlists WHERE id = ? AND type = 'smart'",
+                           (playlist_id,))
+            if not cursor.fetchone():
+                return False
+            
+            self._drop_smart_triggers(cursor, playlist_id)
+            cursor.execute('DELETE FROM smart_playlist_tracks WHERE playlist_id = ?',
+                           (playlist_id,))
+            cursor.execute('DELETE FROM playlists WHERE id = ?', (playlist_id,))
+        return True
+    
+    def get_smart_playlists(self) -> List[Dict]:
+        """Get smart playlists with their raw rule JSON."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, name, description, auto_criteria, builtin_slug, track_count,
+                       created_at, updated_at
+                FROM playlists
+                WHERE type = 'smart'
+                ORDER BY id
+            ''')
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
+    
+    def get_smart_playlist_tracks(self, playlist_id: int, limit: int = 100, offset: int = 0,
+                                  descending: bool = True) -> List[Dict]:
+        """Get materialized smart playlist members in order (one index range read)."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            direction = 'DESC' if descending else 'ASC'
+            
+            cursor.execute(f'''
+                SELECT m.*
+                FROM smart_playlist_tracks s
+                JOIN music_tracks m ON m.id = s.track_id
+                WHERE s.playlist_id = ?
+                ORDER BY s.sort_key {direction}, s.track_id {direction}
+                LIMIT ? OFFSET ?
+            ''', (playlist_id, limit, offset))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def record_duplicate(self, track_id_1: int, track_id_2: int, 
                         similarity_score: float, match_type: str):
         """Record a duplicate detection."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR IGNORE INTO duplicates 
-            (track_id_1, track_id_2, similarity_score, match_type)
-            VALUES (?, ?, ?, ?)
-        ''', (track_id_1, track_id_2, similarity_score, match_type))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO duplicates 
+                (track_id_1, track_id_2, similarity_score, match_type)
+                VALUES (?, ?, ?, ?)
+            ''', (track_id_1, track_id_2, similarity_score, match_type))
+    
+    def record_duplicates(self, duplicates: List[tuple]):
+        """Record (track_id_1, track_id_2, score, match_type) rows, skipping known pairs."""
+        if not duplicates:
+            return
+        
+        rows = [(min(a, b), max(a, b), score, match_type) for a, b, score, match_type in duplicates]
+        
+        with self._transaction() as conn:
+            conn.executemany('''
+                INSERT INTO duplicates (track_id_1, track_id_2, similarity_score, match_type)
+                SELECT ?1, ?2, ?3, ?4
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM duplicates
+                    WHERE track_id_1 = ?1 AND track_id_2 = ?2 AND match_type = ?4
+                )
+            ''', rows)
     
     def get_duplicates(self, resolved: bool = False) -> List[Dict]:
         """Get duplicate tracks."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT d.*, 
-                   m1.file_path as path1, m1.title as title1, m1.artist as artist1,
-                   m2.file_path as path2, m2.title as title2, m2.artist as artist2
-            FROM duplicates d
-            JOIN music_tracks m1 ON d.track_id_1 = m1.id
-            JOIN music_tracks m2 ON d.track_id_2 = m2.id
-            WHERE d.resolved = ?
-            ORDER BY d.similarity_score DESC
-        ''', (1 if resolved else 0,))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT d.*, 
+                       m1.file_path as path1, m1.title as title1, m1.artist as artist1,
+                       m2.file_path as path2, m2.title as title2, m2.artist as artist2
+                FROM duplicates d
+                JOIN music_tracks m1 ON d.track_id_1 = m1.id
+                JOIN music_tracks m2 ON d.track_id_2 = m2.id
+                WHERE d.resolved = ?
+                ORDER BY d.similarity_score DESC
+            ''', (1 if resolved else 0,))
+            
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
     
     def update_storage_stats(self, stats: Dict[str, float]):
         """Update storage statistics."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO storage_stats 
-            (total_size_gb, music_size_gb, video_size_gb, other_size_gb, free_size_gb)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            stats.get('total_size_gb', 0),
-            stats.get('music_size_gb', 0),
-            stats.get('video_size_gb', 0),
-            stats.get('other_size_gb', 0),
-            stats.get('free_size_gb', 0)
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO storage_stats 
+                (total_size_gb, music_size_gb, video_size_gb, other_size_gb, free_size_gb)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                stats.get('total_size_gb', 0),
+                stats.get('music_size_gb', 0),
+                stats.get('video_size_gb', 0),
+                stats.get('other_size_gb', 0),
+                stats.get('free_size_gb', 0)
+            ))
     
     def get_latest_storage_stats(self) -> Optional[Dict]:
         """Get latest storage statistics."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM storage_stats
-            ORDER BY scan_timestamp DESC
-            LIMIT 1
-        ''')
-        
-        row = cursor.fetchone()
-        result = dict(row) if row else None
-        conn.close()
-        return result
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM storage_stats
+                ORDER BY scan_timestamp DESC
+                LIMIT 1
+            ''')
+            
+            row = cursor.fetchone()
+            result = dict(row) if row else None
+            return result
+    
+    def get_scan_manifest(self, media_type: str) -> Dict[str, Dict]:
+        """Get the persisted scan manifest keyed by file path."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT file_path, file_size, mtime_ns, inode, file_hash
+                FROM scan_manifest
+                WHERE media_type = ?
+            ''', (media_type,))
+            
+            results = {row['file_path']: dict(row) for row in cursor.fetchall()}
+            return results
+    
+    def update_scan_manifest(self, media_type: str, entries: List[Dict[str, Any]],
+                             removed_paths: List[str]):
+        """Upsert changed manifest entries and drop removed paths in one transaction."""
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO scan_manifest
+                (file_path, media_type, file_size, mtime_ns, inode, file_hash, scanned_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (e['file_path'], media_type, e['file_size'], e['mtime_ns'],
+                 e['inode'], e.get('file_hash'), now)
+                for e in entries
+            ])
+            
+            cursor.executemany('DELETE FROM scan_manifest WHERE file_path = ?',
+                               [(path,) for path in removed_paths])
+    
+    def remove_media_files(self, media_type: str, file_paths: List[str]) -> int:
+        """Remove tracks or videos whose files no longer exist."""
+        table = 'music_tracks' if media_type == 'music' else 'video_files'
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany(f'DELETE FROM {table} WHERE file_path = ?',
+                               [(path,) for path in file_paths])
+            removed = cursor.rowcount
+            
+            if media_type == 'music':
+                cursor.execute('''
+                    DELETE FROM audio_fingerprints
+                    WHERE track_id NOT IN (SELECT id FROM music_tracks)
+                ''')
+            else:
+                cursor.executemany('DELETE FROM video_probes WHERE file_path = ?',
+                                   [(path,) for path in file_paths])
+        return removed
+    
+    def get_audio_fingerprints(self) -> Dict[int, Dict]:
+        """Get cached audio fingerprints keyed by track id."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT track_id, file_hash, file_size, duration_seconds, signature, vector
+                FROM audio_fingerprints
+            ''')
+            
+            results = {row['track_id']: dict(row) for row in cursor.fetchall()}
+            return results
+    
+    def save_audio_fingerprints(self, fingerprints: List[Dict[str, Any]]):
+        """Insert or replace audio fingerprints in one transaction."""
+        if not fingerprints:
+            return
+        
+        with self._transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO audio_fingerprints
+                (track_id, file_hash, file_size, duration_seconds, signature, vector)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (fp['track_id'], fp.get('file_hash'), fp.get('file_size'),
+                 fp.get('duration_seconds'), fp['signature'], fp['vector'])
+                for fp in fingerprints
+            ])
+    
+    def get_video_probe(self, file_path: str) -> Optional[Dict]:
+        """Get the cached probe result for a video (with its file_size and mtime_ns)."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT file_size, mtime_ns, metadata FROM video_probes WHERE file_path = ?
+            ''', (file_path,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return {'file_size': row['file_size'], 'mtime_ns': row['mtime_ns'],
+                    'metadata': json.loads(row['metadata'])}
+    
+    def save_video_probes(self, probes: List[Dict[str, Any]]):
+        """Insert or replace cached probe results in one transaction."""
+        if not probes:
+            return
+        
+        with self._transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO video_probes (file_path, file_size, mtime_ns, metadata)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (p['file_path'], p['file_size'], p['mtime_ns'], json.dumps(p['metadata']))
+                for p in probes
+            ])
     
     def get_stats(self) -> Dict:
         """Get library statistics."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as count FROM music_tracks')
-        music_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) as count FROM video_files')
-        video_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) as count FROM playlists')
-        playlist_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT artist) as count FROM music_tracks')
-        artist_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT album) as count FROM music_tracks')
-        album_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT SUM(duration_seconds) as total FROM music_tracks')
-        total_music_duration = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        return {
-            'total_music_tracks': music_count,
-            'total_video_files': video_count,
-            'total_playlists': playlist_count,
-            'total_artists': artist_count,
-            'total_albums': album_count,
-            'total_music_duration_hours': round(total_music_duration / 3600, 2)
-        }
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT COUNT(*) as count FROM music_tracks')
+            music_count = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT COUNT(*) as count FROM video_files')
+            video_count = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT COUNT(*) as count FROM playlists')
+            playlist_count = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT COUNT(DISTINCT artist) as count FROM music_tracks')
+            artist_count = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT COUNT(DISTINCT album) as count FROM music_tracks')
+            album_count = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT SUM(duration_seconds) as total FROM music_tracks')
+            total_music_duration = cursor.fetchone()[0] or 0
+            
+            return {
+                'total_music_tracks': music_count,
+                'total_video_files': video_count,
+                'total_playlists': playlist_count,
+                'total_artists': artist_count,
+                'total_albums': album_count,
+                'total_music_duration_hours': round(total_music_duration / 3600, 2)
+            }
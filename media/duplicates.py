@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Duplicate Detection
+Chroma fingerprints with locality-sensitive hashing for near-duplicate tracks
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.media.pipeline import ScanCounter
+
+
+SAMPLE_RATE = 11025
+FRAME_SIZE = 4096
+HOP_SIZE = 2048
+MAX_SECONDS = 120
+
+# Fingerprint layout: SEGMENTS time slices x 12 pitch classes
+SEGMENTS = 32
+VECTOR_SIZE = SEGMENTS * 12
+
+# 256 random-hyperplane bits, split into 16 LSH bands of 16 bits. A
+# re-encode (cosine ~0.96) shares a band with ~98% probability; unrelated
+# tracks collide in a band with probability 1/65536.
+SIGNATURE_BITS = 256
+BANDS = 16
+
+
+@lru_cache(maxsize=4)
+def _chroma_matrix(sample_rate: int, frame_size: int) -> np.ndarray:
+    """(bins, 12) matrix folding FFT bins from 55 Hz to 4 kHz into pitch classes."""
+    freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+    matrix = np.zeros((len(freqs), 12))
+    in_range = (freqs >= 55.0) & (freqs <= 4000.0)
+    pitch = np.round(12 * np.log2(freqs[in_range] / 440.0) + 69).astype(int) % 12
+    matrix[np.flatnonzero(in_range), pitch] = 1.0
+    matrix.setflags(write=False)
+    return matrix
+
+
+@lru_cache(maxsize=1)
+def _hyperplanes() -> np.ndarray:
+    """Fixed random projections so signatures are stable across runs."""
+    planes = np.random.default_rng(0x5EED).standard_normal((SIGNATURE_BITS, VECTOR_SIZE))
+    planes.setflags(write=False)
+    return planes
+
+
+def decode_audio(file_path: str, sample_rate: int = SAMPLE_RATE,
+                 max_seconds: int = MAX_SECONDS) -> np.ndarray:
+    """Decode a file to mono float samples with ffmpeg (WAV is read directly as a fallback)."""
+    if shutil.which('ffmpeg'):
+        result = subprocess.run([
+            'ffmpeg', '-v', 'quiet', '-i', file_path, '-t', str(max_seconds),
+            '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-'
+        ], capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f'ffmpeg could not decode {file_path}')
+        return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768.0
+
+    if os.path.splitext(file_path)[1].lower() != '.wav':
+        raise RuntimeError('ffmpeg is required to decode non-WAV audio')
+
+    with wave.open(file_path, 'rb') as wav:
+        rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+        raw = wav.readframes(min(wav.getnframes(), rate * max_seconds))
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise RuntimeError(f'Unsupported WAV sample width: {width}')
+
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        positions = np.arange(0, len(samples) - 1, rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def chroma_fingerprint(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Optional[np.ndarray]:
+    """
+    Compact, encoding-independent fingerprint of decoded audio.
+
+    Frames are folded into 12 pitch classes, leading/trailing silence is
+    trimmed, and the chroma sequence is averaged into SEGMENTS slices.
+    The centered, L2-normalized result is quantized to int8, so bitrate
+    and codec changes barely move it while different songs land far apart.
+    """
+    if len(samples) < FRAME_SIZE * 4:
+        return None
+
+    count = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    index = np.arange(FRAME_SIZE)[None, :] + HOP_SIZE * np.arange(count)[:, None]
+    frames = samples[index] * np.hanning(FRAME_SIZE).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    loudness = power.sum(axis=1)
+    active = np.flatnonzero(loudness > loudness.max() * 1e-3)
+    if len(active) < SEGMENTS:
+        return None
+    power = power[active[0]:active[-1] + 1]
+
+    chroma = power @ _chroma_matrix(sample_rate, FRAME_SIZE)
+    chroma /= np.maximum(chroma.sum(axis=1, keepdims=True), 1e-12)
+
+    edges = np.linspace(0, len(chroma), SEGMENTS + 1).astype(int)
+    segments = np.add.reduceat(chroma, edges[:-1], axis=0) / np.diff(edges)[:, None]
+    vector = (segments - segments.mean(axis=1, keepdims=True)).ravel()
+
+    norm = np.linalg.norm(vector)
+    if norm < 1e-9:
+        return None
+    return np.round(vector / norm * 127).astype(np.int8)
+
+
+def signature(vector: np.ndarray) -> bytes:
+    """Random-hyperplane (SimHash) signature of a fingerprint, SIGNATURE_BITS long."""
+    bits = (_hyperplanes() @ vector.astype(np.float64)) > 0
+    return np.packbits(bits).tobytes()
+
+
+def fingerprint_file(file_path: str) -> Optional[Tuple[bytes, bytes, float]]:
+    """Worker: decode and fingerprint one file -> (vector bytes, signature, seconds)."""
+    try:
+        samples = decode_audio(file_path)
+    except Exception as e:
+        print(f"Error decoding {file_path}: {e}")
+        return None
+
+    vector = chroma_fingerprint(samples)
+    if vector is None:
+        return None
+    return vector.tobytes(), signature(vector), len(samples) / SAMPLE_RATE
+
+
+class DuplicateEngine:
+    """
+    Finds re-encoded and re-tagged copies of the same recording.
+
+    Fingerprints are computed in a process pool and cached per track by
+    (file_hash, file_size). Each signature is cut into BANDS keys;
+    only tracks sharing a bucket are compared, so work grows with the
+    number of near matches instead of the square of the library size.
+    """
+
+    # Candidate pairs scored per vectorized step
+    VERIFY_CHUNK = 20000
+
+    def __init__(self, database, workers: Optional[int] = None, threshold: float = 0.9,
+                 max_bucket_size: int = 200, counter: Optional[ScanCounter] = None):
+        """
+        Args:
+            database: MediaDatabase instance
+            workers: Fingerprint processes (defaults to the CPU count)
+            threshold: Minimum fingerprint cosine similarity for a duplicate
+            max_bucket_size: Buckets larger than this (silence, test tones) are skipped
+            counter: Progress counter (created if not given)
+        """
+        self.db = database
+        self.workers = workers or os.cpu_count() or 2
+        self.threshold = threshold
+        self.max_bucket_size = max_bucket_size
+        self.counter = counter or ScanCounter()
+        self.last_run: Optional[Dict] = None
+        self._run_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def run(self) -> Dict:
+        """
+        Fingerprint the whole music library and record duplicates; raises
+        RuntimeError if busy.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError('Duplicate scan already in progress')
+
+        try:
+            started = time.time()
+            duplicates = self.find_duplicates()
+            self.last_run = {
+                'duplicates_found': len(duplicates),
+                'elapsed_seconds': round(time.time() - started, 2),
+                'errors': self.counter.snapshot()['errors'],
+                'completed_at': time.time()
+            }
+            return self.last_run
+        finally:
+            self.counter.reset()
+            self._run_lock.release()
+
+    def fingerprint_library(self, tracks: List[Dict], batch_size: int = 200) -> Dict[int, Dict]:
+        """Fingerprint tracks whose cached fingerprint is missing or stale."""
+        cached = self.db.get_audio_fingerprints()
+        stale = [
+            t for t in tracks
+            if os.path.exists(t['file_path']) and (
+                t['id'] not in cached
+                or cached[t['id']]['file_hash'] != t.get('file_hash')
+                or cached[t['id']]['file_size'] != t.get('file_size'))
+        ]
+
+        self.counter.set_total(len(stale), 'Fingerprinting audio...')
+        if stale:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(fingerprint_file, [t['file_path'] for t in stale],
+                                       chunksize=8)
+                pending = []
+                for track, result in zip(stale, results):
+                    self.counter.increment(track.get('file_name', ''), error=result is None)
+                    if result is None:
+                        continue
+                    vector, sig, seconds = result
+                    pending.append({
+                        'track_id': track['id'], 'file_hash': track.get('file_hash'),
+                        'file_size': track.get('file_size'), 'duration_seconds': seconds,
+                        'signature': sig, 'vector': vector
+                    })
+                    if len(pending) >= batch_size:
+                        self.db.save_audio_fingerprints(pending)
+                        pending = []
+                self.db.save_audio_fingerprints(pending)
+
+        wanted = {t['id'] for t in tracks}
+        return {tid: fp for tid, fp in self.db.get_audio_fingerprints().items() if tid in wanted}
+
+    def candidate_pairs(self, fingerprints: Dict[int, Dict]) -> set:
+        """Pairs of track ids that share at least one LSH band bucket."""
+        band_bytes = SIGNATURE_BITS // BANDS // 8
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+        for track_id, fp in fingerprints.items():
+            sig = fp['signature']
+            for band in range(BANDS):
+                key = (band, sig[band * band_bytes:(band + 1) * band_bytes])
+                buckets.setdefault(key, []).append(track_id)
+
+        pairs = set()
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > self.max_bucket_size:
+                continue
+            members.sort()
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    pairs.add((first, second))
+        return pairs
+
+    def find_duplicates(self, tracks: Optional[List[Dict]] = None,
+                        record: bool = True) -> List[Dict]:
+        """Fingerprint, bucket and verify; returns pairs in MediaScanner.find_duplicates format."""
+        if tracks is None:
+            tracks = self.db.get_all_music(limit=1000000)
+        by_id = {t['id']: t for t in tracks}
+
+        fingerprints = self.fingerprint_library(tracks)
+        pairs = sorted(self.candidate_pairs(fingerprints))
+        self.counter.set_file(f'Comparing {len(pairs)} candidate pairs...')
+
+        duplicates = []
+        if pairs:
+            ids = sorted(fingerprints)
+            row_of = {tid: i for i, tid in enumerate(ids)}
+            vectors = np.stack([
+                np.frombuffer(fingerprints[tid]['vector'], dtype=np.int8) for tid in ids
+            ]).astype(np.float32) / 127.0
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+            # Prefer tagged durations; decoded ones are capped at MAX_SECONDS
+            durations = np.array([
+                by_id[tid].get('duration_seconds') or fingerprints[tid]['duration_seconds']
+                for tid in ids
+            ], dtype=float)
+
+            pair_rows = np.array([(row_of[a], row_of[b]) for a, b in pairs])
+            for start in range(0, len(pair_rows), self.VERIFY_CHUNK):
+                left, right = pair_rows[start:start + self.VERIFY_CHUNK].T
+                scores = np.einsum('ij,ij->i', vectors[left], vectors[right])
+                ratio = np.minimum(durations[left], durations[right]) / \
+                    np.maximum(np.maximum(durations[left], durations[right]), 1e-9)
+
+                for offset in np.flatnonzero((scores >= self.threshold) & (ratio >= 0.9)):
+                    a, b = pairs[start + offset]
+                    duplicates.append({
+                        'track1': by_id[a],
+                        'track2': by_id[b],
+                        'match_type': 'audio_fingerprint',
+                        'similarity_score': round(float(scores[offset]), 4)
+                    })
+
+        if record:
+            self.db.record_duplicates([
+                (d['track1']['id'], d['track2']['id'], d['similarity_score'], d['match_type'])
+                for d in duplicates
+            ])
+
+        return duplicates
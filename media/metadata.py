@@ -6,19 +6,28 @@ Extracts and manages metadata for music and video files
 
 import os
 import json
+import subprocess
 from typing import Dict, Optional, Any
-from pathlib import Path
+
+# Imported once at module load; scans parse thousands of files
+try:
+    import mutagen
+    from mutagen.mp3 import MP3
+    from mutagen.flac import FLAC
+    from mutagen.mp4 import MP4
+except ImportError:
+    mutagen = None
+
+from services.media.artwork import ArtworkStore
 
 
 class MetadataExtractor:
     """Extracts metadata from media files."""
     
-    def __init__(self):
+    def __init__(self, artwork_store: Optional[ArtworkStore] = None, video_probe=None):
         self.mock_mode = True
-        self.album_art_cache = Path('data/album_art')
-        self.album_art_cache.mkdir(parents=True, exist_ok=True)
-        self.thumbnail_cache = Path('data/thumbnails')
-        self.thumbnail_cache.mkdir(parents=True, exist_ok=True)
+        self.artwork = artwork_store or ArtworkStore()
+        self.video_probe = video_probe
     
     def extract_music_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract metadata from music file."""
@@ -26,10 +35,8 @@ class MetadataExtractor:
             return self._mock_music_metadata(file_path)
         
         try:
-            import mutagen
-            from mutagen.mp3 import MP3
-            from mutagen.flac import FLAC
-            from mutagen.mp4 import MP4
+            if mutagen is None:
+                raise RuntimeError('mutagen is not installed')
             
             ext = os.path.splitext(file_path)[1].lower()
             
@@ -46,6 +53,11 @@ class MetadataExtractor:
                 audio = mutagen.File(file_path)
                 metadata = {}
             
+            # Embedded art comes from the same parse; identical covers are stored once
+            art_url = self.artwork.put_url(self._embedded_art(audio))
+            if art_url:
+                metadata['album_art_path'] = art_url
+            
             if hasattr(audio, 'info'):
                 metadata['duration_seconds'] = audio.info.length
                 metadata['bitrate'] = getattr(audio.info, 'bitrate', 0)
@@ -62,9 +74,10 @@ class MetadataExtractor:
         if self.mock_mode:
             return self._mock_video_metadata(file_path)
         
+        if self.video_probe is not None:
+            return self.video_probe.probe(file_path)
+        
         try:
-            import subprocess
-            
             result = subprocess.run([
                 'ffprobe', '-v', 'quiet', '-print_format', 'json',
                 '-show_format', '-show_streams', file_path
@@ -85,36 +98,10 @@ class MetadataExtractor:
             return f'/static/mock_album_art_{track_id % 10}.jpg'
         
         try:
-            import mutagen
-            from mutagen.id3 import ID3, APIC
-            from mutagen.flac import FLAC, Picture
-            from mutagen.mp4 import MP4
-            
-            ext = os.path.splitext(file_path)[1].lower()
-            image_data = None
-            
-            if ext == '.mp3':
-                audio = ID3(file_path)
-                for key in audio.keys():
-                    if key.startswith('APIC'):
-                        image_data = audio[key].data
-                        break
-            
-            elif ext == '.flac':
-                audio = FLAC(file_path)
-                if audio.pictures:
-                    image_data = audio.pictures[0].data
-            
-            elif ext in ['.m4a', '.mp4']:
-                audio = MP4(file_path)
-                if 'covr' in audio:
-                    image_data = bytes(audio['covr'][0])
+            if mutagen is None:
+                raise RuntimeError('mutagen is not installed')
             
-            if image_data:
-                art_path = self.album_art_cache / f'art_{track_id}.jpg'
-                with open(art_path, 'wb') as f:
-                    f.write(image_data)
-                return str(art_path)
+            return self.artwork.put_url(self._embedded_art(mutagen.File(file_path)))
         
         except Exception as e:
             print(f"Error extracting album art from {file_path}: {e}")
@@ -126,19 +113,18 @@ class MetadataExtractor:
         if self.mock_mode:
             return f'/static/mock_thumbnail_{video_id % 5}.jpg'
         
+        if self.video_probe is not None:
+            return self.video_probe.probe(file_path).get('thumbnail_path')
+        
         try:
-            import subprocess
-            
-            thumb_path = self.thumbnail_cache / f'thumb_{video_id}.jpg'
-            
-            subprocess.run([
-                'ffmpeg', '-i', file_path, '-ss', '00:00:10',
-                '-vframes', '1', '-vf', 'scale=320:-1',
-                str(thumb_path)
+            result = subprocess.run([
+                'ffmpeg', '-v', 'quiet', '-i', file_path, '-ss', '00:00:10',
+                '-vframes', '1', '-vf', 'scale=640:-1',
+                '-f', 'image2pipe', '-vcodec', 'mjpeg', '-'
             ], capture_output=True)
             
-            if thumb_path.exists():
-                return str(thumb_path)
+            if result.returncode == 0:
+                return self.artwork.put_url(result.stdout)
         
         except Exception as e:
             print(f"Error generating thumbnail for {file_path}: {e}")
@@ -151,7 +137,8 @@ class MetadataExtractor:
             return True
         
         try:
-            import mutagen
+            if mutagen is None:
+                raise RuntimeError('mutagen is not installed')
             
             audio = mutagen.File(file_path)
             
@@ -192,6 +179,27 @@ class MetadataExtractor:
         
         return {'title': name_without_ext}
     
+    def _embedded_art(self, audio) -> Optional[bytes]:
+        """First embedded picture of a parsed mutagen file (ID3, FLAC or MP4)."""
+        if audio is None:
+            return None
+        
+        if getattr(audio, 'pictures', None):
+            return audio.pictures[0].data
+        
+        tags = getattr(audio, 'tags', None)
+        if tags is None:
+            return None
+        
+        if hasattr(tags, 'getall'):
+            frames = tags.getall('APIC')
+            if frames:
+                return frames[0].data
+        elif 'covr' in tags and tags['covr']:
+            return bytes(tags['covr'][0])
+        
+        return None
+    
     def _extract_id3_tags(self, audio) -> Dict:
         """Extract ID3 tags from MP3."""
         metadata = {}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Scan Pipeline
+Parallel metadata extraction with batched database writes
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+
+class ScanCounter:
+    """Thread-safe scan progress shared between workers and the API."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, phase: str = ''):
+        """Start a new phase with an unknown total."""
+        with self._lock:
+            self._current = 0
+            self._total = 0
+            self._file = phase
+            self._errors = 0
+
+    def set_total(self, total: int, phase: str = ''):
+        """Set the number of files the current phase will process."""
+        with self._lock:
+            self._current = 0
+            self._total = total
+            self._file = phase
+
+    def increment(self, file_name: str = '', error: bool = False):
+        """Record one processed file."""
+        with self._lock:
+            self._current += 1
+            if file_name:
+                self._file = file_name
+            if error:
+                self._errors += 1
+
+    def set_file(self, file_name: str):
+        """Update the file being reported without counting it."""
+        with self._lock:
+            self._file = file_name
+
+    def snapshot(self) -> Dict:
+        """Consistent copy of the progress fields."""
+        with self._lock:
+            return {
+                'current': self._current,
+                'total': self._total,
+                'file': self._file,
+                'errors': self._errors
+            }
+
+
+class LibraryScanPipeline:
+    """
+    Scan the library with a bounded worker pool and bulk inserts.
+
+    Tag parsing runs on `workers` threads while the previous batch is
+    written, so at most two batches are in flight. Each batch is stored
+    with one executemany upsert, and artwork paths with one more, in the
+    same transaction as its scan manifest entries: a batch that fails is
+    not in the manifest and is picked up again by the next scan.
+    """
+
+    def __init__(self, database, scanner, extractor, workers: int = 4,
+                 batch_size: int = 200, counter: Optional[ScanCounter] = None):
+        """
+        Args:
+            database: MediaDatabase instance
+            scanner: MediaScanner used to find new/modified/deleted files
+            extractor: MetadataExtractor used for tags and artwork
+            workers: Number of tag parsing threads
+            batch_size: Files per database transaction
+            counter: Progress counter (created if not given)
+        """
+        if workers < 1 or batch_size < 1:
+            raise ValueError("workers and batch_size must be at least 1")
+
+        self.db = database
+        self.scanner = scanner
+        self.extractor = extractor
+        self.workers = workers
+        self.batch_size = batch_size
+        self.counter = counter or ScanCounter()
+        self._run_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def try_start(self) -> bool:
+        """
+        Claim the scan slot without blocking; False if a scan is running.
+        The caller must follow up with run(..., started=True), which
+        releases it.
+        """
+        return self._run_lock.acquire(blocking=False)
+
+    def run(self, scan_type: str = 'both', started: bool = False) -> Dict:
+        """
+        Scan music and/or videos; raises RuntimeError if a scan is already running.
+
+        Args:
+            scan_type: 'music', 'video' or 'both'
+            started: The slot was already claimed with try_start()
+        """
+        if not started and not self.try_start():
+            raise RuntimeError('Scan already in progress')
+
+        try:
+            if scan_type not in ('music', 'video', 'both'):
+                raise ValueError("Scan type must be 'music', 'video' or 'both'")
+            summary = {}
+            for media_type in ('music', 'video'):
+                if scan_type in (media_type, 'both'):
+                    summary[media_type] = self.scan(media_type)
+            return summary
+        finally:
+            self.counter.reset()
+            self._run_lock.release()
+
+    def scan(self, media_type: str) -> Dict:
+        """Find changes for one media type and store them."""
+        label = 'music' if media_type == 'music' else 'videos'
+        self.counter.reset(f'Scanning {label}...')
+
+        changes = self.scanner.scan_changes(
+            media_type, progress_callback=lambda count, name: self.counter.set_file(name)
+        )
+        if changes['deleted']:
+            with self.db._transaction():
+                self.db.remove_media_files(media_type, changes['deleted'])
+                self.db.update_scan_manifest(media_type, [], changes['deleted'])
+
+        files = changes['added'] + changes['modified']
+        manifest = {entry['file_path']: entry for entry in changes['manifest']}
+        stored = self.process(media_type, files, manifest)
+
+        return {
+            'added': len(changes['added']),
+            'modified': len(changes['modified']),
+            'deleted': len(changes['deleted']),
+            'unchanged': changes['unchanged'],
+            'stored': stored,
+            'errors': self.counter.snapshot()['errors']
+        }
+
+    def process(self, media_type: str, files: List[Dict],
+                manifest: Optional[Dict[str, Dict]] = None) -> int:
+        """
+        Extract metadata for files in parallel and write them in batches.
+
+        Args:
+            media_type: 'music' or 'video'
+            files: Scanner file info dicts
+            manifest: file_path -> scan manifest entry, committed with each batch
+        """
+        self.counter.set_total(len(files))
+        stored = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='media-scan') as executor:
+            pending = None
+            for start in range(0, len(files), self.batch_size):
+                batch = files[start:start + self.batch_size]
+                futures = [executor.submit(self._extract, media_type, f) for f in batch]
+
+                if pending is not None:
+                    stored += self._write(media_type, [f.result() for f in pending], manifest)
+                pending = futures
+
+            if pending is not None:
+                stored += self._write(media_type, [f.result() for f in pending], manifest)
+
+        return stored
+
+    def _extract(self, media_type: str, file_data: Dict) -> Dict:
+        """Worker: merge parsed tags into the scanner's file info."""
+        error = False
+        try:
+            if media_type == 'music':
+                metadata = self.extractor.extract_music_metadata(file_data['file_path'])
+            else:
+                metadata = self.extractor.extract_video_metadata(file_data['file_path'])
+            file_data = {**file_data, **metadata}
+        except Exception as e:
+            print(f"Error extracting metadata from {file_data['file_path']}: {e}")
+            error = True
+
+        self.counter.increment(file_data['file_name'], error=error)
+        return file_data
+
+    def _write(self, media_type: str, rows: List[Dict],
+               manifest: Optional[Dict[str, Dict]] = None) -> int:
+        """Store one batch, its artwork paths and its manifest entries in one transaction."""
+        with self.db._transaction():
+            if media_type == 'music':
+                ids = self.db.add_music_tracks(rows)
+            else:
+                ids = self.db.add_video_files(rows)
+
+            if self.extractor.mock_mode:
+                artwork = []
+                for file_path, media_id in ids.items():
+                    if media_type == 'music':
+                        path = self.extractor.extract_album_art(file_path, media_id)
+                    else:
+                        path = self.extractor.generate_video_thumbnail(file_path, media_id)
+                    if path:
+                        artwork.append((media_id, path))
+                self.db.set_artwork_paths(media_type, artwork)
+
+            if manifest:
+                entries = [manifest[row['file_path']] for row in rows
+                           if row['file_path'] in manifest]
+                self.db.update_scan_manifest(media_type, entries, [])
+
+        return len(ids)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Play Queue
+Persisted queue with a precomputed shuffle order and next-track prefetch
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+
+class PlayQueue:
+    """
+    Play queue kept as a base list plus a precomputed play order.
+
+    Shuffling runs Fisher-Yates once (current track first) and stores
+    each item's shuffle_position, so next/previous only move a cursor.
+    Ranks only ever grow between reshuffles (removals leave gaps), so
+    the stored ranks always sort into the in-memory order.
+    Every edit writes just the rows it touches: appends insert new rows,
+    removals delete one, and a cursor move updates the now_playing row.
+    """
+
+    REPEAT_MODES = ('off', 'all', 'one')
+
+    def __init__(self, database, rng: Optional[random.Random] = None):
+        """
+        Args:
+            database: MediaDatabase instance holding play_queue and now_playing
+            rng: Random source for shuffles (seed it for reproducible orders)
+        """
+        self.db = database
+        self._rng = rng or random.Random()
+        self._lock = threading.RLock()
+
+        self._positions: List[int] = []
+        self._tracks: List[int] = []
+        self._order: List[int] = []
+        self._cursor = -1
+        self._next_rank = 0
+        self.shuffle = False
+        self.repeat = 'off'
+        self._load()
+
+    def _load(self):
+        """Restore the queue, shuffle order and cursor from the database."""
+        items = self.db.get_play_queue()
+        state = self.db.get_now_playing()
+
+        self._positions = [item['position'] for item in items]
+        self._tracks = [item['track_id'] for item in items]
+        self.shuffle = bool(state.get('shuffle'))
+        self.repeat = state.get('repeat') or 'off'
+
+        ranks = [item['shuffle_position'] for item in items]
+        if self.shuffle and None not in ranks:
+            self._order = sorted(range(len(items)), key=lambda i: ranks[i])
+        else:
+            self._order = list(range(len(items)))
+        self._next_rank = max([len(items)] + [rank + 1 for rank in ranks if rank is not None])
+
+        index_of = {position: i for i, position in enumerate(self._positions)}
+        current = index_of.get(state.get('queue_position'))
+        self._cursor = self._order.index(current) if current is not None else -1
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    @property
+    def index(self) -> int:
+        """Cursor in play order (-1 before the first track)."""
+        return self._cursor
+
+    def current(self) -> Optional[int]:
+        with self._lock:
+            if self._cursor < 0:
+                return None
+            return self._tracks[self._order[self._cursor]]
+
+    def _step(self, delta: int) -> Optional[int]:
+        """Cursor after moving delta, honoring repeat-all wraparound."""
+        if not self._order:
+            return None
+
+        target = self._cursor + delta
+        if 0 <= target < len(self._order):
+            return target
+        if self.repeat == 'all':
+            return target % len(self._order)
+        return None
+
+    def peek_next(self) -> Optional[int]:
+        """Track that next() would return, without moving."""
+        with self._lock:
+            target = self._step(1)
+            return self._tracks[self._order[target]] if target is not None else None
+
+    def _move(self, target: Optional[int]) -> Optional[int]:
+        if target is None:
+            return None
+        self._cursor = target
+        base = self._order[target]
+        self.db.update_queue_state(queue_position=self._positions[base])
+        return self._tracks[base]
+
+    def next(self) -> Optional[int]:
+        """Advance and return the new current track (None at the end)."""
+        with self._lock:
+            return self._move(self._step(1))
+
+    def previous(self) -> Optional[int]:
+        """Step back and return the new current track (None at the start)."""
+        with self._lock:
+            if self._cursor <= 0:
+                return None
+            return self._move(self._cursor - 1)
+
+    def jump(self, index: int) -> Optional[int]:
+        """Make the item at play-order index current."""
+        with self._lock:
+            if not 0 <= index < len(self._order):
+                return None
+            return self._move(index)
+
+    def _shuffled(self, indices: List[int]) -> List[int]:
+        indices = list(indices)
+        self._rng.shuffle(indices)  # Fisher-Yates
+        return indices
+
+    def append(self, track_ids: List[int]) -> int:
+        """
+        Add tracks after everything already queued; returns the new length.
+
+        With shuffle on, the new items are shuffled among themselves and
+        placed after the existing order, so nothing already queued moves.
+        """
+        with self._lock:
+            start = len(self._tracks)
+            next_position = (self._positions[-1] + 1) if self._positions else 0
+            added = list(range(start, start + len(track_ids)))
+
+            self._positions.extend(range(next_position, next_position + len(track_ids)))
+            self._tracks.extend(track_ids)
+            order_start = len(self._order)
+            self._order.extend(self._shuffled(added) if self.shuffle else added)
+
+            # After the highest stored rank, not len(order): removals leave gaps
+            shuffle_position = {
+                base: rank for rank, base in enumerate(self._order[order_start:], self._next_rank)
+            }
+            self._next_rank += len(added)
+            self.db.append_play_queue([
+                (self._positions[base], self._tracks[base], shuffle_position[base])
+                for base in added
+            ])
+            return len(self._tracks)
+
+    def replace(self, track_ids: List[int], start: int = 0) -> Optional[int]:
+        """Replace the queue and make track_ids[start] current."""
+        with self._lock:
+            self._positions = list(range(len(track_ids)))
+            self._tracks = list(track_ids)
+
+            if self.shuffle and track_ids:
+                rest = [i for i in range(len(track_ids)) if i != start]
+                self._order = [start] + self._shuffled(rest)
+            else:
+                self._order = list(range(len(track_ids)))
+
+            ranks = {base: rank for rank, base in enumerate(self._order)}
+            self._next_rank = len(self._order)
+            self.db.replace_play_queue([
+                (self._positions[base], self._tracks[base], ranks[base])
+                for base in range(len(self._tracks))
+            ])
+
+            if not track_ids:
+                self._cursor = -1
+                self.db.update_queue_state(queue_position=None)
+                return None
+            return self._move(self._order.index(start))
+
+    def clear(self):
+        """Empty the queue."""
+        self.replace([])
+
+    def remove(self, index: int) -> bool:
+        """Remove the item at play-order index."""
+        with self._lock:
+            if not 0 <= index < len(self._order):
+                return False
+
+            base = self._order.pop(index)
+            position = self._positions.pop(base)
+            self._tracks.pop(base)
+            self._order = [i - 1 if i > base else i for i in self._order]
+            self.db.remove_play_queue_items([position])
+
+            if index < self._cursor:
+                self._cursor -= 1
+            elif index == self._cursor:
+                # The next item slides into the cursor slot
+                if self._cursor >= len(self._order):
+                    self._cursor = len(self._order) - 1
+                current = self._positions[self._order[self._cursor]] if self._cursor >= 0 else None
+                self.db.update_queue_state(queue_position=current)
+            return True
+
+    def set_shuffle(self, enabled: bool):
+        """Precompute a new shuffle order (current track first) or restore queue order."""
+        with self._lock:
+            current = self._order[self._cursor] if self._cursor >= 0 else None
+
+            if enabled:
+                rest = [i for i in range(len(self._tracks)) if i != current]
+                self._order = ([current] if current is not None else []) + self._shuffled(rest)
+                self.db.set_shuffle_positions([
+                    (rank, self._positions[base]) for rank, base in enumerate(self._order)
+                ])
+                self._next_rank = len(self._order)
+                self._cursor = 0 if current is not None else -1
+            else:
+                self._order = list(range(len(self._tracks)))
+                self._cursor = current if current is not None else -1
+
+            self.shuffle = enabled
+            self.db.update_queue_state(shuffle=int(enabled))
+
+    def set_repeat(self, mode: str):
+        if mode not in self.REPEAT_MODES:
+            raise ValueError('Invalid repeat mode')
+        with self._lock:
+            self.repeat = mode
+            self.db.update_queue_state(repeat=mode)
+
+    def items(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Slice of the queue in play order: [{'track_id', 'queue_position', 'is_current'}]."""
+        with self._lock:
+            end = len(self._order) if limit is None else min(len(self._order), offset + limit)
+            return [
+                {'track_id': self._tracks[self._order[i]], 'queue_position': i,
+                 'is_current': i == self._cursor}
+                for i in range(max(offset, 0), end)
+            ]
+
+
+class TrackPrefetcher:
+    """
+    Loads the upcoming track's header and artwork into memory.
+
+    Work runs on one background thread, so a skip never waits on disk.
+    For ID3-tagged files the whole tag plus the first audio frames is
+    read, so a client can start decoding without another request.
+    """
+
+    HEADER_BYTES = 64 * 1024
+    CACHE_ENTRIES = 4
+
+    def __init__(self, database, artwork_store=None, artwork_size: int = 300):
+        """
+        Args:
+            database: MediaDatabase instance
+            artwork_store: ArtworkStore resolving /api/artwork/<digest> paths
+            artwork_size: Artwork variant kept in memory
+        """
+        self.db = database
+        self.artwork = artwork_store
+        self.artwork_size = artwork_size
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-prefetch')
+
+    def prefetch(self, track_id: Optional[int]):
+        """Queue a background load of track_id unless it is cached or loading."""
+        if track_id is None:
+            return
+        with self._lock:
+            if track_id in self._cache or track_id in self._pending:
+                return
+            self._pending.add(track_id)
+        self._executor.submit(self._load, track_id)
+
+    def get(self, track_id: Optional[int]) -> Optional[Dict]:
+        """Prefetched entry ({'track', 'header', 'artwork', 'artwork_mimetype'}) if ready."""
+        with self._lock:
+            entry = self._cache.get(track_id)
+            if entry is not None:
+                self._cache.move_to_end(track_id)
+            return entry
+
+    def _read_header(self, file_path: str) -> bytes:
+        with open(file_path, 'rb') as f:
+            head = f.read(10)
+            size = self.HEADER_BYTES
+            if head[:3] == b'ID3' and len(head) == 10:
+                tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+                size += tag_size
+            return head + f.read(size - len(head))
+
+    def _read_artwork(self, art_path: Optional[str]):
+        if not art_path or self.artwork is None or not art_path.startswith('/api/artwork/'):
+            return None, None
+
+        found = self.artwork.get(art_path.rsplit('/', 1)[-1], self.artwork_size)
+        if not found:
+            return None, None
+        path, mimetype = found
+        return path.read_bytes(), mimetype
+
+    def _load(self, track_id: int):
+        try:
+            track = self.db.get_tracks_by_ids([track_id]).get(track_id)
+            if not track:
+                return
+
+            header = None
+            try:
+                header = self._read_header(track['file_path'])
+            except OSError as e:
+                print(f"Error prefetching {track['file_path']}: {e}")
+
+            artwork, mimetype = self._read_artwork(track.get('album_art_path'))
+            entry = {'track': track, 'header': header, 'artwork': artwork,
+                     'artwork_mimetype': mimetype}
+
+            with self._lock:
+                self._cache[track_id] = entry
+                while len(self._cache) > self.CACHE_ENTRIES:
+                    self._cache.popitem(last=False)
+        finally:
+            with self._lock:
+                self._pending.discard(track_id)
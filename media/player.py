@@ -8,22 +8,35 @@ import json
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from services.media.play_queue import PlayQueue, TrackPrefetcher
+from services.media.smart_playlists import SmartPlaylistEngine
+
 
 class PlayerIntegration:
     """Integrates with Android music player."""
     
-    def __init__(self, database):
+    def __init__(self, database, artwork_store=None):
         self.db = database
-        self.queue = []
-        self.current_index = -1
-        self.shuffle_enabled = False
-        self.repeat_mode = 'off'
+        self.queue = PlayQueue(database)
+        self.prefetcher = TrackPrefetcher(database, artwork_store)
+        self.smart_playlists = SmartPlaylistEngine(database)
+    
+    @property
+    def shuffle_enabled(self) -> bool:
+        return self.queue.shuffle
+    
+    @property
+    def repeat_mode(self) -> str:
+        return self.queue.repeat
     
     def play_track(self, track_id: int) -> Dict:
         """Play a specific track."""
         self.db.update_now_playing(track_id, state='playing', position_seconds=0)
         self.db.increment_play_count(track_id)
         
+        # Warm the following track so the next transition is gapless
+        self.prefetcher.prefetch(self.queue.peek_next())
+        
         return {
             'success': True,
             'message': f'Now playing track {track_id}',
@@ -69,48 +82,59 @@ class PlayerIntegration:
             'state': 'stopped'
         }
     
+    def _play_from_queue(self, track_id: int) -> Dict:
+        prefetched = self.prefetcher.get(track_id) is not None
+        result = self.play_track(track_id)
+        result['prefetched'] = prefetched
+        return result
+    
     def next_track(self) -> Dict:
         """Skip to next track in queue."""
-        if not self.queue:
+        if not len(self.queue):
             return {'success': False, 'error': 'Queue is empty'}
         
-        if self.current_index < len(self.queue) - 1:
-            self.current_index += 1
-            track_id = self.queue[self.current_index]
-            return self.play_track(track_id)
-        elif self.repeat_mode == 'all':
-            self.current_index = 0
-            track_id = self.queue[self.current_index]
-            return self.play_track(track_id)
-        else:
+        track_id = self.queue.next()
+        if track_id is None:
             return {'success': False, 'error': 'End of queue'}
+        return self._play_from_queue(track_id)
     
     def previous_track(self) -> Dict:
         """Go to previous track in queue."""
-        if not self.queue:
+        if not len(self.queue):
             return {'success': False, 'error': 'Queue is empty'}
         
-        if self.current_index > 0:
-            self.current_index -= 1
-            track_id = self.queue[self.current_index]
-            return self.play_track(track_id)
-        else:
+        track_id = self.queue.previous()
+        if track_id is None:
             return {'success': False, 'error': 'Beginning of queue'}
+        return self._play_from_queue(track_id)
     
     def add_to_queue(self, track_ids: List[int]) -> Dict:
         """Add tracks to play queue."""
-        self.queue.extend(track_ids)
+        queue_length = self.queue.append(track_ids)
+        self.prefetcher.prefetch(self.queue.peek_next())
         
         return {
             'success': True,
             'message': f'Added {len(track_ids)} track(s) to queue',
+            'queue_length': queue_length
+        }
+    
+    def remove_from_queue(self, index: int) -> Dict:
+        """Remove the track at a queue position."""
+        if not self.queue.remove(index):
+            return {'success': False, 'error': 'Invalid queue position'}
+        
+        self.prefetcher.prefetch(self.queue.peek_next())
+        
+        return {
+            'success': True,
+            'message': 'Track removed from queue',
             'queue_length': len(self.queue)
         }
     
     def clear_queue(self) -> Dict:
         """Clear the play queue."""
-        self.queue = []
-        self.current_index = -1
+        self.queue.clear()
         
         return {
             'success': True,
@@ -118,34 +142,26 @@ class PlayerIntegration:
             'queue_length': 0
         }
     
-    def get_queue(self) -> List[Dict]:
+    def get_queue(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
         """Get current play queue."""
+        items = self.queue.items(offset, limit)
+        rows = self.db.get_tracks_by_ids([item['track_id'] for item in items])
+        
         tracks = []
-        for i, track_id in enumerate(self.queue):
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM music_tracks WHERE id = ?', (track_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
+        for item in items:
+            row = rows.get(item['track_id'])
             if row:
                 track = dict(row)
-                track['queue_position'] = i
-                track['is_current'] = (i == self.current_index)
+                track['queue_position'] = item['queue_position']
+                track['is_current'] = item['is_current']
                 tracks.append(track)
         
         return tracks
     
     def set_shuffle(self, enabled: bool) -> Dict:
         """Enable or disable shuffle."""
-        self.shuffle_enabled = enabled
-        
-        if enabled and self.queue:
-            import random
-            current_track = self.queue[self.current_index] if self.current_index >= 0 else None
-            random.shuffle(self.queue)
-            if current_track:
-                self.current_index = self.queue.index(current_track)
+        self.queue.set_shuffle(enabled)
+        self.prefetcher.prefetch(self.queue.peek_next())
         
         return {
             'success': True,
@@ -155,10 +171,11 @@ class PlayerIntegration:
     
     def set_repeat(self, mode: str) -> Dict:
         """Set repeat mode: off, all, one."""
-        if mode not in ['off', 'all', 'one']:
+        if mode not in PlayQueue.REPEAT_MODES:
             return {'success': False, 'error': 'Invalid repeat mode'}
         
-        self.repeat_mode = mode
+        self.queue.set_repeat(mode)
+        self.prefetcher.prefetch(self.queue.peek_next())
         
         return {
             'success': True,
@@ -209,58 +226,57 @@ class PlayerIntegration:
             'shuffle': self.shuffle_enabled,
             'repeat': self.repeat_mode,
             'queue_length': len(self.queue),
-            'queue_position': self.current_index + 1 if self.current_index >= 0 else 0
+            'queue_position': self.queue.index + 1 if self.queue.index >= 0 else 0
         }
     
+    def get_prefetched(self) -> Optional[Dict]:
+        """In-memory header and artwork of the upcoming track, if loaded."""
+        return self.prefetcher.get(self.queue.peek_next())
+    
     def play_playlist(self, playlist_id: int) -> Dict:
-        """Play all tracks from a playlist."""
-        tracks = self.db.get_playlist_tracks(playlist_id)
+        """Play all tracks from a playlist (smart playlists in rule order)."""
+        if self.smart_playlists.get(playlist_id):
+            tracks = self.smart_playlists.tracks(playlist_id, limit=-1)
+        else:
+            tracks = self.db.get_playlist_tracks(playlist_id)
         
         if not tracks:
             return {'success': False, 'error': 'Playlist is empty'}
         
         track_ids = [t['id'] for t in tracks]
-        self.queue = track_ids
-        self.current_index = 0
-        
-        return self.play_track(track_ids[0])
+        return self.play_track(self.queue.replace(track_ids))
     
     def play_album(self, artist: str, album: str) -> Dict:
         """Play all tracks from an album."""
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM music_tracks
-            WHERE artist = ? AND album = ?
-            ORDER BY disc_number, track_number
-        ''', (artist, album))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self.db._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id FROM music_tracks
+                WHERE artist = ? AND album = ?
+                ORDER BY disc_number, track_number
+            ''', (artist, album))
+            
+            rows = cursor.fetchall()
         
         if not rows:
             return {'success': False, 'error': 'Album not found'}
         
         track_ids = [row[0] for row in rows]
-        self.queue = track_ids
-        self.current_index = 0
-        
-        return self.play_track(track_ids[0])
+        return self.play_track(self.queue.replace(track_ids))
     
     def play_artist(self, artist: str, shuffle: bool = False) -> Dict:
         """Play all tracks from an artist."""
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM music_tracks
-            WHERE artist = ?
-            ORDER BY album, disc_number, track_number
-        ''', (artist,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self.db._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id FROM music_tracks
+                WHERE artist = ?
+                ORDER BY album, disc_number, track_number
+            ''', (artist,))
+            
+            rows = cursor.fetchall()
         
         if not rows:
             return {'success': False, 'error': 'Artist not found'}
@@ -271,24 +287,19 @@ class PlayerIntegration:
             import random
             random.shuffle(track_ids)
         
-        self.queue = track_ids
-        self.current_index = 0
-        
-        return self.play_track(track_ids[0])
+        return self.play_track(self.queue.replace(track_ids))
     
     def create_android_intent(self, track_id: int) -> Dict:
         """Create Android intent for external player."""
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM music_tracks WHERE id = ?', (track_id,))
-        row = cursor.fetchone()
-        conn.close()
+        prefetched = self.prefetcher.get(track_id)
+        if prefetched:
+            track = prefetched['track']
+        else:
+            track = self.db.get_tracks_by_ids([track_id]).get(track_id)
         
-        if not row:
+        if not track:
             return {'success': False, 'error': 'Track not found'}
         
-        track = dict(row)
-        
         return {
             'success': True,
             'intent': {
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Video Probe Service
+Single-pass ffmpeg metadata and keyframe thumbnails with a persistent cache
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Dict
+
+
+DURATION_PATTERN = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+BITRATE_PATTERN = re.compile(r'bitrate: (\d+) kb/s')
+VIDEO_STREAM_PATTERN = re.compile(r'Stream #0:\d+.*?: Video: (\w+)(.*)')
+SIZE_PATTERN = re.compile(r'\b(\d{2,5})x(\d{2,5})\b')
+FPS_PATTERN = re.compile(r'(\d+(?:\.\d+)?) (?:fps|tbr)')
+
+
+def parse_ffmpeg_header(stderr: str) -> Dict:
+    """
+    Parse the input summary ffmpeg prints to stderr.
+
+    Returns the same keys as MetadataExtractor._parse_ffprobe_output so
+    callers do not care which tool produced them.
+    """
+    # Only the input section; the mjpeg output stream is described below it
+    header = stderr.split('Output #0', 1)[0].split('Stream mapping:', 1)[0]
+    metadata = {}
+
+    match = DURATION_PATTERN.search(header)
+    if match:
+        hours, minutes, seconds = match.groups()
+        metadata['duration_seconds'] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    match = BITRATE_PATTERN.search(header)
+    if match:
+        metadata['bitrate'] = int(match.group(1)) * 1000
+
+    match = VIDEO_STREAM_PATTERN.search(header)
+    if match:
+        metadata['codec'] = match.group(1)
+        details = match.group(2)
+
+        size = SIZE_PATTERN.search(details)
+        if size:
+            metadata['width'], metadata['height'] = int(size.group(1)), int(size.group(2))
+
+        fps = FPS_PATTERN.search(details)
+        metadata['fps'] = round(float(fps.group(1)), 2) if fps else 24.0
+
+    return metadata
+
+
+class VideoProbeService:
+    """
+    Video metadata and thumbnail from one ffmpeg process per file.
+
+    ffmpeg seeks on the input (-ss before -i) and decodes keyframes only,
+    so it jumps straight to the nearest keyframe instead of decoding from
+    the start; the stream summary it prints while opening the file
+    replaces the separate ffprobe run. At most `workers` processes run at
+    once across all callers. Results with a duration are cached in the
+    database by (path, size, mtime), so unchanged files are never probed
+    again; failed probes (timeouts, unreadable files) are retried next time.
+    """
+
+    def __init__(self, database, artwork_store, workers: int = 4, seek_seconds: float = 10.0,
+                 thumbnail_width: int = 640, timeout: float = 120.0):
+        """
+        Args:
+            database: MediaDatabase holding the probe cache
+            artwork_store: ArtworkStore receiving thumbnails
+            workers: Maximum concurrent ffmpeg processes
+            seek_seconds: Thumbnail position (clips shorter than this use the first keyframe)
+            thumbnail_width: Stored thumbnail width; smaller sizes come from the artwork store
+            timeout: Seconds before a stuck ffmpeg is killed
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.db = database
+        self.artwork = artwork_store
+        self.workers = workers
+        self.seek_seconds = seek_seconds
+        self.thumbnail_width = thumbnail_width
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(workers)
+        self._stats_lock = threading.Lock()
+        self.cache_hits = 0
+        self.probes = 0
+
+    @property
+    def available(self) -> bool:
+        return shutil.which('ffmpeg') is not None
+
+    def probe(self, file_path: str) -> Dict:
+        """Metadata (with thumbnail_path) for a video, from cache when unchanged."""
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            print(f"Error probing {file_path}: {e}")
+            return {}
+
+        cached = self.db.get_video_probe(file_path)
+        if cached and cached['file_size'] == stat.st_size and \
+                cached['mtime_ns'] == stat.st_mtime_ns:
+            with self._stats_lock:
+                self.cache_hits += 1
+            return dict(cached['metadata'])
+
+        if not self.available:
+            return {}
+
+        with self._slots:
+            metadata = self._run(file_path, self.seek_seconds)
+            if 'thumbnail_path' not in metadata and 'duration_seconds' in metadata and \
+                    metadata['duration_seconds'] < self.seek_seconds:
+                # Seek target past the end of a short clip: take the first keyframe
+                metadata.update(self._run(file_path, 0))
+
+        with self._stats_lock:
+            self.probes += 1
+
+        if 'duration_seconds' in metadata:
+            self.db.save_video_probes([{
+                'file_path': file_path, 'file_size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'metadata': metadata
+            }])
+        return metadata
+
+    def _run(self, file_path: str, seek: float) -> Dict:
+        """One ffmpeg pass: parse the stream summary and grab one keyframe as JPEG."""
+        try:
+            result = subprocess.run([
+                'ffmpeg', '-hide_banner', '-nostdin',
+                '-skip_frame', 'nokey', '-ss', str(seek), '-i', file_path,
+                '-map', '0:v:0', '-frames:v', '1', '-vf', f'scale={self.thumbnail_width}:-2',
+                '-f', 'image2pipe', '-vcodec', 'mjpeg', '-'
+            ], capture_output=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Error probing {file_path}: {e}")
+            return {}
+
+        metadata = parse_ffmpeg_header(result.stderr.decode('utf-8', errors='replace'))
+        if result.returncode == 0 and result.stdout:
+            metadata['thumbnail_path'] = self.artwork.put_url(result.stdout)
+        return metadata
+
+    def stats(self) -> Dict:
+        """Probe and cache hit counters."""
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'probes': self.probes,
+                'cache_hits': self.cache_hits,
+                'ffmpeg_available': self.available
+            }
@@ -23,9 +23,10 @@ class MediaScanner:
         '.webm', '.m4v', '.mpg', '.mpeg', '.3gp'
     }
     
-    def __init__(self):
+    def __init__(self, database=None):
         self.scan_paths = ['/media', '/storage', '/sdcard/Music', '/sdcard/Movies']
         self.mock_mode = True
+        self.db = database
     
     def scan_music(self, path: Optional[str] = None, 
                    progress_callback: Optional[Callable] = None) -> List[Dict]:
@@ -33,33 +34,7 @@ class MediaScanner:
         if self.mock_mode:
             return self._generate_mock_music()
         
-        music_files = []
-        scan_dir = path if path else self.scan_paths
-        
-        if isinstance(scan_dir, str):
-            scan_dirs = [scan_dir]
-        else:
-            scan_dirs = scan_dir
-        
-        for directory in scan_dirs:
-            if not os.path.exists(directory):
-                continue
-            
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in self.MUSIC_EXTENSIONS:
-                        file_path = os.path.join(root, file)
-                        try:
-                            file_info = self._get_file_info(file_path)
-                            music_files.append(file_info)
-                            
-                            if progress_callback:
-                                progress_callback(len(music_files), file)
-                        except Exception as e:
-                            print(f"Error scanning {file_path}: {e}")
-        
-        return music_files
+        return self._full_scan(path, self.MUSIC_EXTENSIONS, progress_callback)
     
     def scan_videos(self, path: Optional[str] = None,
                    progress_callback: Optional[Callable] = None) -> List[Dict]:
@@ -67,39 +42,143 @@ class MediaScanner:
         if self.mock_mode:
             return self._generate_mock_videos()
         
-        video_files = []
+        return self._full_scan(path, self.VIDEO_EXTENSIONS, progress_callback,
+                               include_folder=True)
+    
+    def scan_changes(self, media_type: str, path: Optional[str] = None,
+                     progress_callback: Optional[Callable] = None) -> Dict:
+        """
+        Incrementally scan for new, modified and deleted files.
+        
+        Each file's (size, mtime_ns, inode) is compared against the manifest
+        persisted by the previous scan; only new or modified files are
+        hashed. Deletions are the manifest paths under the scanned roots
+        that were not seen this time. Roots that are missing (e.g. an
+        unplugged USB drive) are skipped, so their files are not reported
+        as deleted.
+        
+        Nothing is written here: the caller commits 'manifest' (the entries
+        of added/modified files) and 'deleted' with update_scan_manifest()
+        only after the files are stored, so an interrupted scan picks the
+        same files up again next time.
+        
+        Returns {'added': [...], 'modified': [...], 'deleted': [paths],
+        'unchanged': count, 'manifest': [entries]}, where added/modified
+        are file info dicts.
+        """
+        if media_type not in ('music', 'video'):
+            raise ValueError("media_type must be 'music' or 'video'")
+        
+        if self.mock_mode:
+            if media_type == 'music':
+                files = self._generate_mock_music()
+            else:
+                files = self._generate_mock_videos()
+            return {'added': files, 'modified': [], 'deleted': [], 'unchanged': 0, 'manifest': []}
+        
+        if self.db is None:
+            raise RuntimeError('Incremental scans need a database for the manifest')
+        
+        extensions = self.MUSIC_EXTENSIONS if media_type == 'music' else self.VIDEO_EXTENSIONS
+        manifest = self.db.get_scan_manifest(media_type)
+        
+        changes = {'added': [], 'modified': [], 'deleted': [], 'unchanged': 0, 'manifest': []}
+        manifest_updates = changes['manifest']
+        seen = set()
+        scanned_roots = []
+        
+        for directory in self._scan_dirs(path):
+            if not os.path.isdir(directory):
+                continue
+            scanned_roots.append(os.path.join(os.path.abspath(directory), ''))
+            
+            for entry, folder, stat in self._iter_media_files(directory, extensions):
+                file_path = entry.path
+                seen.add(file_path)
+                previous = manifest.get(file_path)
+                
+                if (previous and previous['file_size'] == stat.st_size
+                        and previous['mtime_ns'] == stat.st_mtime_ns
+                        and previous['inode'] == stat.st_ino):
+                    changes['unchanged'] += 1
+                    continue
+                
+                file_info = self._file_info_from_stat(file_path, stat)
+                if media_type == 'video':
+                    file_info['folder_path'] = folder
+                
+                changes['modified' if previous else 'added'].append(file_info)
+                manifest_updates.append({
+                    'file_path': file_path,
+                    'file_size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'inode': stat.st_ino,
+                    'file_hash': file_info['file_hash']
+                })
+                
+                if progress_callback:
+                    progress_callback(len(manifest_updates), entry.name)
+        
+        changes['deleted'] = [
+            file_path for file_path in manifest.keys() - seen
+            if any(os.path.abspath(file_path).startswith(root) for root in scanned_roots)
+        ]
+        return changes
+    
+    def _scan_dirs(self, path) -> List[str]:
+        """Normalize a path argument into a list of directories."""
         scan_dir = path if path else self.scan_paths
+        return [scan_dir] if isinstance(scan_dir, str) else list(scan_dir)
+    
+    def _iter_media_files(self, directory: str, extensions: set):
+        """Yield (entry, folder, stat) for media files below directory using os.scandir."""
+        stack = [directory]
         
-        if isinstance(scan_dir, str):
-            scan_dirs = [scan_dir]
-        else:
-            scan_dirs = scan_dir
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file() and \
+                                    os.path.splitext(entry.name)[1].lower() in extensions:
+                                yield entry, folder, entry.stat()
+                        except OSError as e:
+                            print(f"Error scanning {entry.path}: {e}")
+            except OSError as e:
+                print(f"Error scanning {folder}: {e}")
+    
+    def _full_scan(self, path, extensions: set, progress_callback: Optional[Callable],
+                   include_folder: bool = False) -> List[Dict]:
+        """Hash and describe every media file under the scan paths."""
+        files = []
         
-        for directory in scan_dirs:
+        for directory in self._scan_dirs(path):
             if not os.path.exists(directory):
                 continue
             
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in self.VIDEO_EXTENSIONS:
-                        file_path = os.path.join(root, file)
-                        try:
-                            file_info = self._get_file_info(file_path)
-                            file_info['folder_path'] = root
-                            video_files.append(file_info)
-                            
-                            if progress_callback:
-                                progress_callback(len(video_files), file)
-                        except Exception as e:
-                            print(f"Error scanning {file_path}: {e}")
+            for entry, folder, stat in self._iter_media_files(directory, extensions):
+                try:
+                    file_info = self._file_info_from_stat(entry.path, stat)
+                    if include_folder:
+                        file_info['folder_path'] = folder
+                    files.append(file_info)
+                    
+                    if progress_callback:
+                        progress_callback(len(files), entry.name)
+                except Exception as e:
+                    print(f"Error scanning {entry.path}: {e}")
         
-        return video_files
+        return files
     
     def _get_file_info(self, file_path: str) -> Dict:
         """Get basic file information."""
-        stat = os.stat(file_path)
-        
+        return self._file_info_from_stat(file_path, os.stat(file_path))
+    
+    def _file_info_from_stat(self, file_path: str, stat: os.stat_result) -> Dict:
+        """Build file information from an existing stat result."""
         return {
             'file_path': file_path,
             'file_name': os.path.basename(file_path),
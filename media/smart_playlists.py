@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Media Center Pro - Smart Playlists
+Rule-based playlists materialized into an index maintained by triggers
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Optional
+
+
+# Rule field -> value kind
+FIELDS = {
+    'title': 'text', 'artist': 'text', 'album': 'text', 'album_artist': 'text',
+    'genre': 'text', 'format': 'text',
+    'year': 'number', 'track_number': 'number', 'disc_number': 'number',
+    'duration_seconds': 'number', 'bitrate': 'number', 'play_count': 'number',
+    'rating': 'number',
+    'favorite': 'bool',
+    'date_added': 'date', 'last_played': 'date'
+}
+
+OPERATORS = {
+    'text': ('=', '!=', 'contains', 'in'),
+    'number': ('=', '!=', '>', '>=', '<', '<=', 'in'),
+    'bool': ('=', '!='),
+    'date': ('>', '>=', '<', '<=')
+}
+
+# Playlists the media center ships with, keyed by their API slug
+BUILTIN_PLAYLISTS = {
+    'recently-added': {
+        'name': 'Recently Added',
+        'rules': {'match': 'all', 'conditions': [],
+                  'order': {'field': 'date_added', 'direction': 'desc'}}
+    },
+    'most-played': {
+        'name': 'Most Played',
+        'rules': {'match': 'all', 'conditions': [{'field': 'play_count', 'op': '>', 'value': 0}],
+                  'order': {'field': 'play_count', 'direction': 'desc'}}
+    },
+    'favorites': {
+        'name': 'Favorites',
+        'rules': {'match': 'all', 'conditions': [{'field': 'favorite', 'op': '=', 'value': True}],
+                  'order': {'field': 'date_added', 'direction': 'desc'}}
+    }
+}
+
+
+def _literal(kind: str, value: Any) -> str:
+    """SQL literal for a validated rule value (triggers cannot take parameters)."""
+    if kind == 'bool':
+        return '1' if value in (True, 1, '1', 'true') else '0'
+
+    if kind == 'number':
+        if isinstance(value, bool):
+            raise ValueError('Expected a number')
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError('Expected a finite number')
+        return str(int(number)) if number.is_integer() else repr(number)
+
+    if not isinstance(value, str) or '\x00' in value:
+        raise ValueError('Expected a string')
+    return "'" + value.replace("'", "''") + "'"
+
+
+def validate_rules(rules: Dict) -> Dict:
+    """Normalize a rule definition; raises ValueError on anything unsupported."""
+    if not isinstance(rules, dict):
+        raise ValueError('Rules must be an object')
+
+    match = rules.get('match', 'all')
+    if match not in ('all', 'any'):
+        raise ValueError("match must be 'all' or 'any'")
+
+    conditions = []
+    for condition in rules.get('conditions') or []:
+        field = condition.get('field')
+        op = condition.get('op', '=')
+        if field not in FIELDS:
+            raise ValueError(f"Unsupported field: {field}. Use one of: {sorted(FIELDS)}")
+
+        kind = FIELDS[field]
+        if op not in OPERATORS[kind]:
+            raise ValueError(f"Operator {op} not supported for {field}")
+
+        value = condition.get('value')
+        values = value if op == 'in' else [value]
+        if not isinstance(values, list) or not values:
+            raise ValueError("'in' needs a non-empty list of values")
+        for item in values:
+            _literal(kind, item)
+
+        conditions.append({'field': field, 'op': op, 'value': value})
+
+    order = rules.get('order') or {'field': 'date_added', 'direction': 'desc'}
+    if order.get('field') not in FIELDS:
+        raise ValueError(f"Unsupported order field: {order.get('field')}")
+    if order.get('direction', 'desc') not in ('asc', 'desc'):
+        raise ValueError("Order direction must be 'asc' or 'desc'")
+
+    return {
+        'match': match,
+        'conditions': conditions,
+        'order': {'field': order['field'], 'direction': order.get('direction', 'desc')}
+    }
+
+
+def compile_predicate(rules: Dict, row: str) -> str:
+    """SQL boolean expression over `row` (a table alias or NEW) for validated rules."""
+    clauses = []
+    for condition in rules['conditions']:
+        kind = FIELDS[condition['field']]
+        column = f"{row}.{condition['field']}"
+        op = condition['op']
+
+        if op == 'in':
+            values = ', '.join(_literal(kind, v) for v in condition['value'])
+            clauses.append(f'{column} IN ({values})')
+        elif op == 'contains':
+            value = _literal(kind, condition['value'])
+            clauses.append(f"instr(lower({column}), lower({value})) > 0")
+        elif kind == 'bool':
+            clauses.append(f"COALESCE({column}, 0) {op} {_literal(kind, condition['value'])}")
+        else:
+            clauses.append(f"{column} {op} {_literal(kind, condition['value'])}")
+
+    if not clauses:
+        return '1'
+    joiner = ' AND ' if rules['match'] == 'all' else ' OR '
+    return '(' + joiner.join(f'({clause})' for clause in clauses) + ')'
+
+
+class SmartPlaylistEngine:
+    """
+    Smart playlists stored as playlists rows (type 'smart', rules in
+    auto_criteria) with their members materialized in
+    smart_playlist_tracks.
+
+    Each playlist gets insert/update triggers on music_tracks that
+    re-evaluate its rules for the changed row only, so play counts,
+    favorites and scans keep every playlist current as they happen.
+    Opening a playlist is a range read on (playlist_id, sort_key).
+    """
+
+    def __init__(self, database):
+        """
+        Args:
+            database: MediaDatabase instance
+        """
+        self.db = database
+
+    def _install(self, playlist_id: Optional[int], name: str, description: str,
+                 rules: Dict, builtin_slug: Optional[str] = None) -> int:
+        rules = validate_rules(rules)
+        watch = {c['field'] for c in rules['conditions']} | {rules['order']['field']}
+
+        return self.db.save_smart_playlist(
+            playlist_id, name, description, json.dumps(rules),
+            predicate_new=compile_predicate(rules, 'NEW'),
+            predicate_table=compile_predicate(rules, 'm'),
+            sort_column=rules['order']['field'],
+            watch_columns=sorted(watch),
+            builtin_slug=builtin_slug
+        )
+
+    def create(self, name: str, rules: Dict, description: str = '') -> int:
+        """Create and materialize a smart playlist; returns its id."""
+        if not name:
+            raise ValueError('name required')
+        return self._install(None, name, description, rules)
+
+    def update(self, playlist_id: int, rules: Dict, name: Optional[str] = None,
+               description: Optional[str] = None) -> bool:
+        """Replace a smart playlist's rules and rebuild its members."""
+        playlist = self.get(playlist_id)
+        if not playlist:
+            return False
+
+        self._install(playlist_id, name or playlist['name'],
+                      playlist['description'] if description is None else description, rules)
+        return True
+
+    def delete(self, playlist_id: int) -> bool:
+        """Drop a smart playlist, its triggers and its members."""
+        return self.db.delete_smart_playlist(playlist_id)
+
+    def get(self, playlist_id: int) -> Optional[Dict]:
+        """Smart playlist row with its rules decoded."""
+        for playlist in self.playlists():
+            if playlist['id'] == playlist_id:
+                return playlist
+        return None
+
+    def playlists(self) -> List[Dict]:
+        """All smart playlists with rules decoded."""
+        playlists = self.db.get_smart_playlists()
+        for playlist in playlists:
+            playlist['rules'] = json.loads(playlist.pop('auto_criteria') or '{}')
+        return playlists
+
+    def tracks(self, playlist_id: int, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Members in rule order, read straight from the materialized index."""
+        playlist = self.get(playlist_id)
+        if not playlist:
+            return []
+
+        descending = playlist['rules'].get('order', {}).get('direction', 'desc') == 'desc'
+        return self.db.get_smart_playlist_tracks(playlist_id, limit, offset, descending)
+
+    def ensure_builtin(self) -> Dict[str, int]:
+        """
+        Create the shipped playlists if missing; returns slug -> playlist id.
+
+        Built-ins are found by their stored builtin_slug, so renaming one
+        keeps it and a user playlist with the same name is left alone.
+        """
+        existing = {p['builtin_slug']: p['id'] for p in self.playlists() if p['builtin_slug']}
+        ids = {}
+        for slug, builtin in BUILTIN_PLAYLISTS.items():
+            if slug in existing:
+                ids[slug] = existing[slug]
+            else:
+                ids[slug] = self._install(None, builtin['name'], '', builtin['rules'], slug)
+        return ids
+
+    def rebuild(self, playlist_id: int) -> bool:
+        """Re-materialize a playlist from its stored rules."""
+        playlist = self.get(playlist_id)
+        if not playlist:
+            return False
+        self._install(playlist_id, playlist['name'], playlist['description'], playlist['rules'])
+        return True
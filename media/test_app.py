@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the media center HTTP endpoints
+"""
+
+import importlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture(scope='module')
+def media_app(tmp_path_factory):
+    # The service keeps its database and artwork under data/ in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('media'))
+    try:
+        module = importlib.import_module('services.media.app')
+    finally:
+        os.chdir(cwd)
+    module.app.config['TESTING'] = True
+    return module
+
+
+@pytest.fixture
+def client(media_app):
+    return media_app.app.test_client()
+
+
+def test_scan_rejected_while_another_is_starting(media_app, client):
+    assert media_app.scan_pipeline.try_start()
+    try:
+        response = client.post('/api/library/scan', json={'type': 'music'})
+        assert response.status_code == 409
+        assert response.get_json()['ok'] is False
+    finally:
+        media_app.scan_pipeline._run_lock.release()
+
+
+def test_scan_rejects_unknown_type(client):
+    assert client.post('/api/library/scan', json={'type': 'photos'}).status_code == 400
+
+
+@pytest.mark.parametrize('query', ['ab', 'a-b', '!!!x', '   '])
+def test_search_rejects_queries_with_too_few_word_characters(client, query):
+    response = client.get('/api/music/search', query_string={'q': query})
+    assert response.status_code == 400
+
+
+def test_search_accepts_punctuated_query(client):
+    response = client.get('/api/music/search', query_string={'q': 'a-bc'})
+    assert response.status_code == 200
+    assert response.get_json()['ok'] is True
+
+
+def test_artwork_etag_round_trip(media_app, client):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 400), (30, 60, 90)).save(buffer, 'JPEG')
+    digest = media_app.artwork_store.put(buffer.getvalue())
+
+    response = client.get(f'/api/artwork/{digest}', query_string={'size': 150})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['ETag'] == f'"{digest}-150"'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    cached = client.get(f'/api/artwork/{digest}', query_string={'size': 150},
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    original = client.get(f'/api/artwork/{digest}')
+    assert original.headers['ETag'] == f'"{digest}"'
+    assert client.get(f'/api/artwork/{digest}', query_string={'size': 77}).status_code == 400
+    assert client.get(f'/api/artwork/{"0" * 32}').status_code == 404
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed artwork store
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from services.media.artwork import ArtworkStore
+
+
+def cover(color, size=(800, 800)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = ArtworkStore(str(tmp_path))
+    first = store.put(cover((200, 0, 0)))
+    second = store.put(cover((200, 0, 0)))
+    other = store.put(cover((0, 200, 0)))
+
+    assert first == second != other
+    assert store.url(first) == f'/api/artwork/{first}'
+    assert store.usage()['originals'] == 2
+    assert len(list((tmp_path / 'originals').glob('*/*'))) == 2
+
+
+def test_variants_are_created_on_first_request(tmp_path):
+    store = ArtworkStore(str(tmp_path))
+    digest = store.put(cover((0, 0, 200)))
+    assert store.usage()['variants'] == 0
+
+    path, mimetype = store.get(digest, 150)
+    assert mimetype == 'image/jpeg'
+    with Image.open(path) as image:
+        assert max(image.size) == 150
+    assert store.usage()['variants'] == 1
+
+    assert store.get(digest, 150)[0] == path
+    assert store.usage()['variants'] == 1
+
+    original, original_type = store.get(digest)
+    assert original_type == 'image/png' and original.parent.parent.name == 'originals'
+
+
+def test_unknown_digest_and_size(tmp_path):
+    store = ArtworkStore(str(tmp_path))
+    digest = store.put(cover((10, 10, 10)))
+
+    assert store.get('0' * 32) is None
+    assert store.get('../../etc/passwd') is None
+    with pytest.raises(ValueError):
+        store.get(digest, 123)
+
+
+def test_lru_eviction_keeps_originals(tmp_path):
+    store = ArtworkStore(str(tmp_path))
+    digests = [store.put(cover((i * 60, 100, 50))) for i in range(3)]
+    variant_size = store.get(digests[0], 600)[0].stat().st_size
+    store.max_cache_bytes = int(variant_size * 2.5)
+
+    first = store.get(digests[0], 600)[0]
+    second = store.get(digests[1], 600)[0]
+    store.get(digests[0], 600)  # most recent again
+    third = store.get(digests[2], 600)[0]
+
+    assert first.exists() and third.exists()
+    assert not second.exists()
+    assert store.usage()['variants'] == 2
+    for digest in digests:
+        assert store.get(digest)[0].exists()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for MediaDatabase search, pagination and connection handling
+"""
+
+import threading
+
+import pytest
+
+from services.media.database import MediaDatabase
+
+
+def track(i: int, **fields) -> dict:
+    row = {
+        'file_path': f'/music/{i:05d}.mp3',
+        'file_name': f'{i:05d}.mp3',
+        'title': f'Song {i}',
+        'artist': f'Artist {i % 7}',
+        'album': f'Album {i % 11}',
+        'genre': 'Rock',
+        'track_number': i % 12 + 1
+    }
+    row.update(fields)
+    return row
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MediaDatabase(str(tmp_path / 'media.db'))
+    yield database
+    database.close()
+
+
+def test_search_ranks_every_match(db):
+    if not db.fts_enabled:
+        pytest.skip('SQLite built without FTS5')
+
+    favorite = db.add_music_tracks([track(0, title='Love Song')])['/music/00000.mp3']
+    db.add_music_tracks([track(i, title=f'Love Letter {i}') for i in range(1, 1200)])
+    for _ in range(50):
+        db.increment_play_count(favorite)
+
+    results = db.search_music('love song', limit=5)
+    assert results[0]['id'] == favorite
+
+    broad = db.search_music('love', limit=5)
+    assert broad[0]['id'] == favorite
+
+
+def test_search_prefix_and_diacritics(db):
+    db.add_music_tracks([track(1, title='Café del Mar', artist='Energy 52')])
+
+    assert [r['title'] for r in db.search_music('cafe')] == ['Café del Mar']
+    assert [r['title'] for r in db.search_music('energ')] == ['Café del Mar']
+
+
+def test_short_queries_return_nothing(db):
+    db.add_music_tracks([track(1, title='Ab')])
+
+    assert db.search_music('a') == []
+    assert db.search_music('ab') == []
+    assert db.search_music('  ') == []
+
+
+def test_pool_reuses_connections_across_threads(tmp_path):
+    database = MediaDatabase(str(tmp_path / 'media.db'), pool_size=2)
+    opened = database.connections_opened
+
+    threads = [threading.Thread(target=database.get_all_music) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+
+    assert database.connections_opened - opened <= 1
+    database.close()
+
+
+def test_pool_is_bounded_under_concurrency(tmp_path):
+    database = MediaDatabase(str(tmp_path / 'media.db'), pool_size=3)
+    database.add_music_tracks([track(i) for i in range(20)])
+
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                database.get_all_music()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert database.connections_opened <= 3
+    database.close()
+
+
+def test_nested_transaction_shares_the_connection(db):
+    with db._connection() as outer:
+        with db._transaction() as inner:
+            assert inner is outer
+
+
+def walk_pages(db, sort, limit):
+    ids, cursor = [], None
+    while True:
+        page = db.get_music_page(sort=sort, limit=limit, cursor=cursor)
+        ids.extend(row['id'] for row in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('sort', ['date_added', 'play_count', 'artist'])
+def test_keyset_pages_cover_every_row_once(db, sort):
+    ids = db.add_music_tracks([track(i, artist=None if i % 5 == 0 else f'Artist {i % 3}')
+                               for i in range(47)])
+    for track_id in list(ids.values())[:10]:
+        db.increment_play_count(track_id)
+
+    paged = walk_pages(db, sort, limit=6)
+    full = [row['id'] for row in db.get_music_page(sort=sort, limit=1000)['items']]
+
+    assert paged == full
+    assert sorted(paged) == sorted(ids.values())
+
+
+def test_keyset_page_ignores_rows_added_while_browsing(db):
+    db.add_music_tracks([track(i) for i in range(10)])
+    first = db.get_music_page(sort='artist', limit=4)
+    expected = db.get_music_page(sort='artist', limit=4, cursor=first['next_cursor'])
+
+    db.add_music_tracks([track(100, artist='')])
+
+    second = db.get_music_page(sort='artist', limit=4, cursor=first['next_cursor'])
+    assert second['items'] == expected['items']
+
+
+def test_keyset_cursor_is_checked_against_the_sort(db):
+    db.add_music_tracks([track(i) for i in range(5)])
+    page = db.get_music_page(sort='date_added', limit=2)
+
+    with pytest.raises(ValueError):
+        db.get_music_page(sort='artist', limit=2, cursor=page['next_cursor'])
+    with pytest.raises(ValueError):
+        db.get_music_page(sort='date_added', limit=2, cursor='not-a-cursor')
+    with pytest.raises(ValueError):
+        db.get_music_page(sort='title', limit=2)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for chroma fingerprint duplicate detection
+"""
+
+import wave
+
+import numpy as np
+import pytest
+
+from services.media.database import MediaDatabase
+from services.media.duplicates import (DuplicateEngine, SIGNATURE_BITS, chroma_fingerprint,
+                                       signature)
+
+
+def melody(seed: int, rate: int = 11025, seconds: float = 20.0) -> np.ndarray:
+    """Random sequence of half-second notes."""
+    rng = np.random.default_rng(seed)
+    notes = rng.integers(48, 72, int(seconds * 2))
+    t = np.arange(int(rate * 0.5)) / rate
+    return np.concatenate([
+        0.4 * np.sin(2 * np.pi * 440.0 * 2 ** ((note - 69) / 12) * t) for note in notes
+    ]).astype(np.float32)
+
+
+def write_wav(path, samples: np.ndarray, rate: int = 11025):
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+    return str(path)
+
+
+def reencode(samples: np.ndarray, seed: int = 1) -> np.ndarray:
+    """Quieter copy with noise, standing in for a lossy re-encode."""
+    noise = np.random.default_rng(seed).normal(0, 0.01, len(samples))
+    return (samples * 0.7 + noise).astype(np.float32)
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a, b = a.astype(float), b.astype(float)
+    return float(a @ b / np.linalg.norm(a) / np.linalg.norm(b))
+
+
+def test_fingerprint_survives_reencoding():
+    original = melody(1)
+    copy = chroma_fingerprint(reencode(original))
+    other = chroma_fingerprint(melody(2))
+    fp = chroma_fingerprint(original)
+
+    assert cosine(fp, copy) > 0.95
+    assert cosine(fp, other) < 0.5
+    assert len(signature(fp)) == SIGNATURE_BITS // 8
+
+
+def test_short_or_silent_audio_has_no_fingerprint():
+    assert chroma_fingerprint(np.zeros(1000, dtype=np.float32)) is None
+    assert chroma_fingerprint(np.zeros(11025 * 10, dtype=np.float32)) is None
+
+
+@pytest.fixture
+def library(tmp_path):
+    db = MediaDatabase(str(tmp_path / 'media.db'))
+    song = melody(1)
+    files = {
+        'original': write_wav(tmp_path / 'original.wav', song),
+        'copy': write_wav(tmp_path / 'copy.wav', reencode(song)),
+        'other': write_wav(tmp_path / 'other.wav', melody(2)),
+    }
+    ids = db.add_music_tracks([{
+        'file_path': path, 'file_name': f'{name}.wav', 'file_hash': name,
+        'file_size': 1, 'title': name, 'artist': 'Test'
+    } for name, path in files.items()])
+    yield db, {name: ids[path] for name, path in files.items()}
+    db.close()
+
+
+def test_finds_reencoded_copy_only(library):
+    db, ids = library
+    engine = DuplicateEngine(db, workers=1)
+
+    duplicates = engine.find_duplicates()
+
+    assert [(d['track1']['id'], d['track2']['id']) for d in duplicates] == \
+        [(ids['original'], ids['copy'])]
+    assert duplicates[0]['match_type'] == 'audio_fingerprint'
+    assert len(db.get_duplicates()) == 1
+
+
+def test_fingerprints_are_cached_until_the_file_changes(library):
+    db, ids = library
+    engine = DuplicateEngine(db, workers=1)
+    tracks = db.get_all_music()
+    engine.fingerprint_library(tracks)
+
+    engine.counter.reset()
+    engine.fingerprint_library(tracks)
+    assert engine.counter.snapshot()['total'] == 0
+
+    for track in tracks:
+        if track['id'] == ids['copy']:
+            track['file_size'] = 2
+    engine.fingerprint_library(tracks)
+    assert engine.counter.snapshot()['total'] == 1
+
+
+def test_oversized_buckets_are_skipped():
+    engine = DuplicateEngine(None, max_bucket_size=3)
+    same = {'signature': bytes(SIGNATURE_BITS // 8)}
+
+    assert len(engine.candidate_pairs({i: same for i in range(3)})) == 3
+    assert engine.candidate_pairs({i: same for i in range(4)}) == set()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the persisted shuffle-order play queue
+"""
+
+import random
+
+import pytest
+
+from services.media.database import MediaDatabase
+from services.media.play_queue import PlayQueue
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MediaDatabase(str(tmp_path / 'media.db'))
+    yield database
+    database.close()
+
+
+def restored(db, queue):
+    """Queue state as a fresh PlayQueue reads it back after a restart."""
+    reloaded = PlayQueue(db)
+    assert reloaded.items() == queue.items()
+    assert reloaded.current() == queue.current()
+    return reloaded
+
+
+def test_shuffle_order_survives_restart(db):
+    queue = PlayQueue(db, rng=random.Random(1))
+    queue.replace(list(range(100, 120)), start=5)
+    queue.set_shuffle(True)
+    queue.next()
+    queue.next()
+
+    reloaded = restored(db, queue)
+    assert reloaded.shuffle
+    assert reloaded.items()[0]['track_id'] == 105
+
+
+def test_remove_then_append_keeps_order_after_restart(db):
+    queue = PlayQueue(db, rng=random.Random(2))
+    queue.replace(list(range(10)), start=0)
+    queue.set_shuffle(True)
+
+    queue.remove(3)
+    queue.remove(0)
+    queue.append([50, 51, 52])
+    queue.next()
+
+    reloaded = restored(db, queue)
+    assert [item['track_id'] for item in reloaded.items()[-3:]] == \
+        [item['track_id'] for item in queue.items()[-3:]]
+
+    reloaded.remove(1)
+    reloaded.append([60])
+    assert reloaded.items()[-1]['track_id'] == 60
+    restored(db, reloaded)
+
+
+def test_unshuffled_queue_round_trip(db):
+    queue = PlayQueue(db)
+    queue.replace([1, 2, 3])
+    queue.append([4])
+    queue.remove(1)
+    queue.jump(2)
+
+    reloaded = restored(db, queue)
+    assert [item['track_id'] for item in reloaded.items()] == [1, 3, 4]
+    assert reloaded.current() == 4
+    assert reloaded.next() is None
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass ffmpeg video probe service
+"""
+
+import subprocess
+
+import pytest
+
+from services.media import probe as probe_module
+from services.media.database import MediaDatabase
+from services.media.probe import VideoProbeService, parse_ffmpeg_header
+
+HEADER = b'''Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'clip.mp4':
+  Duration: 00:01:05.50, start: 0.000000, bitrate: 4500 kb/s
+  Stream #0:0(und): Video: h264 (High) (avc1 / 0x31637661), yuv420p, 1920x1080, 29.97 fps
+Stream mapping:
+  Stream #0:0 -> #0:0 (h264 (native) -> mjpeg (native))
+Output #0, image2pipe, to 'pipe:':
+  Stream #0:0(und): Video: mjpeg, yuvj420p, 640x360, 29.97 fps
+'''
+
+
+class FakeArtwork:
+    def put_url(self, data):
+        return '/artwork/thumb.jpg'
+
+
+class FakeFFmpeg:
+    """Records ffmpeg invocations and replays scripted results."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, args, **kwargs):
+        self.calls.append(args)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def completed(stdout=b'', stderr=HEADER, returncode=0):
+    return subprocess.CompletedProcess([], returncode, stdout=stdout, stderr=stderr)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(probe_module.shutil, 'which', lambda name: '/usr/bin/ffmpeg')
+    db = MediaDatabase(str(tmp_path / 'media.db'))
+    video = tmp_path / 'clip.mp4'
+    video.write_bytes(b'\0' * 64)
+    yield VideoProbeService(db, FakeArtwork(), timeout=1.0), str(video)
+    db.close()
+
+
+def test_parse_header_ignores_output_stream():
+    metadata = parse_ffmpeg_header(HEADER.decode())
+
+    assert metadata == {
+        'duration_seconds': 65.5, 'bitrate': 4500000, 'codec': 'h264',
+        'width': 1920, 'height': 1080, 'fps': 29.97
+    }
+
+
+def test_successful_probe_is_cached(service, monkeypatch):
+    svc, video = service
+    ffmpeg = FakeFFmpeg(completed(stdout=b'jpeg'))
+    monkeypatch.setattr(probe_module.subprocess, 'run', ffmpeg)
+
+    first = svc.probe(video)
+    second = svc.probe(video)
+
+    assert first == second
+    assert first['thumbnail_path'] == '/artwork/thumb.jpg'
+    assert len(ffmpeg.calls) == 1
+    assert svc.stats()['cache_hits'] == 1
+
+
+def test_timeout_is_not_cached_or_retried(service, monkeypatch):
+    svc, video = service
+    ffmpeg = FakeFFmpeg(subprocess.TimeoutExpired('ffmpeg', 1.0), completed(stdout=b'jpeg'))
+    monkeypatch.setattr(probe_module.subprocess, 'run', ffmpeg)
+
+    assert svc.probe(video) == {}
+    assert len(ffmpeg.calls) == 1
+
+    assert svc.probe(video)['duration_seconds'] == 65.5
+    assert len(ffmpeg.calls) == 2
+
+
+def test_short_clip_retries_from_the_first_keyframe(service, monkeypatch):
+    svc, video = service
+    short = HEADER.replace(b'00:01:05.50', b'00:00:04.00')
+    ffmpeg = FakeFFmpeg(completed(stderr=short), completed(stdout=b'jpeg', stderr=short))
+    monkeypatch.setattr(probe_module.subprocess, 'run', ffmpeg)
+
+    metadata = svc.probe(video)
+
+    assert metadata['thumbnail_path'] == '/artwork/thumb.jpg'
+    assert [call[call.index('-ss') + 1] for call in ffmpeg.calls] == ['10.0', '0']
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for manifest-based incremental library scanning
+"""
+
+import os
+
+import pytest
+
+from services.media.artwork import ArtworkStore
+from services.media.database import MediaDatabase
+from services.media.metadata import MetadataExtractor
+from services.media.pipeline import LibraryScanPipeline
+from services.media.scanner import MediaScanner
+
+
+@pytest.fixture
+def library(tmp_path):
+    music = tmp_path / 'music'
+    music.mkdir()
+    for i in range(5):
+        (music / f'track_{i}.mp3').write_bytes(os.urandom(2048))
+
+    db = MediaDatabase(str(tmp_path / 'media.db'))
+    scanner = MediaScanner(db)
+    scanner.mock_mode = False
+    scanner.scan_paths = [str(music)]
+    extractor = MetadataExtractor(ArtworkStore(str(tmp_path / 'artwork')))
+    pipeline = LibraryScanPipeline(db, scanner, extractor, workers=2, batch_size=2)
+    yield music, db, scanner, pipeline
+    db.close()
+
+
+def test_scan_changes_does_not_write_manifest(library):
+    _, db, scanner, _ = library
+
+    changes = scanner.scan_changes('music')
+
+    assert len(changes['added']) == 5
+    assert len(changes['manifest']) == 5
+    assert db.get_scan_manifest('music') == {}
+    assert len(scanner.scan_changes('music')['added']) == 5
+
+
+def test_rescan_finds_only_changes(library):
+    music, db, scanner, pipeline = library
+    assert pipeline.scan('music')['stored'] == 5
+
+    (music / 'track_0.mp3').write_bytes(os.urandom(4096))
+    (music / 'track_1.mp3').unlink()
+    (music / 'track_9.mp3').write_bytes(os.urandom(1024))
+
+    summary = pipeline.scan('music')
+    assert (summary['added'], summary['modified'], summary['deleted'], summary['unchanged']) == \
+        (1, 1, 1, 3)
+    assert len(db.get_all_music()) == 5
+
+
+def test_missing_root_is_not_reported_as_deleted(library, tmp_path):
+    music, _, scanner, pipeline = library
+    pipeline.scan('music')
+
+    scanner.scan_paths = [str(tmp_path / 'unplugged')]
+    assert scanner.scan_changes('music')['deleted'] == []
+
+
+def test_failed_store_is_rescanned(library, monkeypatch):
+    _, db, _, pipeline = library
+
+    def fail(rows):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(db, 'add_music_tracks', fail)
+    with pytest.raises(RuntimeError):
+        pipeline.scan('music')
+    monkeypatch.undo()
+
+    summary = pipeline.scan('music')
+    assert summary['added'] == 5
+    assert summary['stored'] == 5
+    assert pipeline.scan('music')['unchanged'] == 5
+
+
+def test_batches_commit_their_manifest_entries(library, monkeypatch):
+    _, db, _, pipeline = library
+    upsert = db.add_music_tracks
+    calls = []
+
+    def fail_second_batch(rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError('disk I/O error')
+        return upsert(rows)
+
+    monkeypatch.setattr(db, 'add_music_tracks', fail_second_batch)
+    with pytest.raises(RuntimeError):
+        pipeline.scan('music')
+    monkeypatch.undo()
+
+    stored = {row['file_path'] for row in db.get_all_music()}
+    assert len(stored) == 2
+    assert set(db.get_scan_manifest('music')) == stored
+
+    summary = pipeline.scan('music')
+    assert (summary['added'], summary['unchanged']) == (3, 2)
+
+
+def test_claimed_scan_slot_blocks_other_scans(library):
+    _, db, _, pipeline = library
+    assert pipeline.try_start()
+    assert not pipeline.try_start()
+    with pytest.raises(RuntimeError):
+        pipeline.run('music')
+
+    summary = pipeline.run('music', started=True)
+    assert summary['music']
+    assert not pipeline.running
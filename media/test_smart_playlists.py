@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for trigger-maintained smart playlists
+"""
+
+import pytest
+
+from services.media.database import MediaDatabase
+from services.media.player import PlayerIntegration
+from services.media.smart_playlists import BUILTIN_PLAYLISTS, SmartPlaylistEngine
+
+ROCK = {'match': 'all', 'conditions': [{'field': 'genre', 'op': '=', 'value': 'Rock'}],
+        'order': {'field': 'play_count', 'direction': 'desc'}}
+
+
+def track(i: int, genre: str = 'Rock') -> dict:
+    return {'file_path': f'/music/{i}.mp3', 'file_name': f'{i}.mp3', 'title': f'Song {i}',
+            'artist': 'Artist', 'genre': genre}
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MediaDatabase(str(tmp_path / 'media.db'))
+    yield database
+    database.close()
+
+
+def member_ids(engine, playlist_id):
+    return [t['id'] for t in engine.tracks(playlist_id, limit=-1)]
+
+
+def test_triggers_keep_members_current(db):
+    engine = SmartPlaylistEngine(db)
+    ids = db.add_music_tracks([track(1), track(2, 'Jazz')])
+    rock = engine.create('Rock', ROCK)
+    assert member_ids(engine, rock) == [ids['/music/1.mp3']]
+
+    added = db.add_music_tracks([track(3)])['/music/3.mp3']
+    db.increment_play_count(added)
+    assert member_ids(engine, rock) == [added, ids['/music/1.mp3']]
+
+    db.add_music_tracks([{**track(3), 'genre': 'Jazz'}])
+    assert member_ids(engine, rock) == [ids['/music/1.mp3']]
+    assert engine.get(rock)['track_count'] == 1
+
+
+def set_favorite(db, track_id, favorite):
+    with db._transaction() as conn:
+        conn.execute('UPDATE music_tracks SET favorite = ? WHERE id = ?', (favorite, track_id))
+
+
+def test_favorites_follow_updates(db):
+    engine = SmartPlaylistEngine(db)
+    favorites = engine.ensure_builtin()['favorites']
+    track_id = db.add_music_tracks([track(1)])['/music/1.mp3']
+
+    set_favorite(db, track_id, 1)
+    assert member_ids(engine, favorites) == [track_id]
+    set_favorite(db, track_id, 0)
+    assert member_ids(engine, favorites) == []
+
+
+def test_builtins_are_keyed_by_slug(db):
+    engine = SmartPlaylistEngine(db)
+    mine = engine.create('Favorites', ROCK)
+    ids = engine.ensure_builtin()
+
+    assert ids['favorites'] != mine
+    assert engine.get(mine)['rules']['conditions'] == ROCK['conditions']
+
+    engine.update(ids['favorites'], BUILTIN_PLAYLISTS['favorites']['rules'], name='Loved')
+    assert engine.ensure_builtin() == ids
+    assert len(engine.playlists()) == len(BUILTIN_PLAYLISTS) + 1
+
+
+def test_user_copy_of_a_builtin_stays_the_users(db):
+    engine = SmartPlaylistEngine(db)
+    mine = engine.create('Most Played', BUILTIN_PLAYLISTS['most-played']['rules'])
+
+    assert engine.ensure_builtin()['most-played'] != mine
+    assert engine.get(mine)['builtin_slug'] is None
+
+
+def test_player_plays_smart_playlists(db):
+    engine = SmartPlaylistEngine(db)
+    ids = db.add_music_tracks([track(1), track(2)])
+    rock = engine.create('Rock', ROCK)
+
+    result = PlayerIntegration(db).play_playlist(rock)
+
+    assert result['success']
+    assert result['track_id'] in ids.values()
@@ -0,0 +1,428 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any, Optional, Hashable
+
+import numpy as np
+
+
+class _LRUCache:
+    """
+    Small thread-safe LRU cache used for per-geometry acoustic results.
+    Values are deep-copied on the way in and out, so a caller mutating a
+    returned dict, list or array cannot change what later callers get.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AcousticModelEngine:
+    """
+    Vectorized modal and image-source model for a rectangular cabin.
+    Geometry is (length, width, height) in inches with the origin at the
+    dashboard / left door / floor corner. Results are cached per geometry
+    and listening position so repeated API calls are served from memory.
+    """
+
+    DIMENSION_NAMES = ('length', 'width', 'height')
+    DIMENSION_LETTERS = ('L', 'W', 'H')
+
+    # (low wall, high wall) per axis, matching CabinAcoustics surface naming
+    SURFACE_NAMES = (
+        ('dashboard', 'rear'),
+        ('left_door', 'right_door'),
+        ('floor', 'ceiling')
+    )
+
+    SURFACE_MATERIALS = {
+        'dashboard': 'plastic_trim',
+        'rear': 'plastic_trim',
+        'left_door': 'glass',
+        'right_door': 'glass',
+        'floor': 'carpet',
+        'ceiling': 'headliner'
+    }
+
+    MAX_MODE_ORDER = 40
+    MAX_REFLECTION_ORDER = 12
+
+    def __init__(
+        self,
+        speed_of_sound: float = 13503.9,
+        cache_size: int = 64
+    ):
+        """
+        Args:
+            speed_of_sound: Speed of sound in inches per second
+            cache_size: Maximum cached entries per result type
+        """
+        self.speed_of_sound = speed_of_sound
+        self._mode_cache = _LRUCache(cache_size)
+        self._image_cache = _LRUCache(cache_size)
+        self._reflection_cache = _LRUCache(cache_size)
+        self._mode_table_cache = _LRUCache(cache_size)
+
+    @staticmethod
+    def _geometry_key(dimensions: Tuple[float, float, float]) -> Tuple[float, ...]:
+        return tuple(round(float(d), 3) for d in dimensions)
+
+    @staticmethod
+    def _position_key(position: Tuple[float, float, float]) -> Tuple[float, ...]:
+        return tuple(round(float(p), 3) for p in position)
+
+    def _mode_table(
+        self,
+        dimensions: Tuple[float, float, float],
+        max_order: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (indices, frequencies) for every mode up to max_order per axis.
+        Indices is an (N, 3) int array, sorted by frequency.
+        """
+        if not 1 <= max_order <= self.MAX_MODE_ORDER:
+            raise ValueError(f"max_order must be between 1 and {self.MAX_MODE_ORDER}")
+
+        key = (self._geometry_key(dimensions), max_order)
+        cached = self._mode_table_cache.get(key)
+        if cached is not None:
+            return cached
+
+        n = np.arange(max_order + 1)
+        nx, ny, nz = np.meshgrid(n, n, n, indexing='ij')
+        indices = np.stack([nx.ravel(), ny.ravel(), nz.ravel()], axis=1)[1:]
+
+        dims = np.asarray(dimensions, dtype=float)
+        frequencies = 0.5 * self.speed_of_sound * np.sqrt(
+            np.sum((indices / dims) ** 2, axis=1)
+        )
+
+        order = np.argsort(frequencies, kind='stable')
+        result = (indices[order], frequencies[order])
+        self._mode_table_cache.put(key, result)
+        return result
+
+    def room_modes(
+        self,
+        dimensions: Tuple[float, float, float],
+        max_order: int = 5,
+        max_frequency: Optional[float] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Generate axial, tangential and oblique modes up to max_order per axis.
+        Modes above max_frequency are dropped (None keeps all of them).
+        """
+        key = (self._geometry_key(dimensions), max_order, max_frequency)
+        cached = self._mode_cache.get(key)
+        if cached is not None:
+            return cached
+
+        indices, frequencies = self._mode_table(dimensions, max_order)
+        if max_frequency is not None:
+            keep = frequencies <= max_frequency
+            indices = indices[keep]
+            frequencies = frequencies[keep]
+
+        nonzero = np.count_nonzero(indices, axis=1)
+
+        modes: Dict[str, List[Dict[str, Any]]] = {
+            'axial': [],
+            'tangential': [],
+            'oblique': []
+        }
+
+        for idx, freq, count in zip(indices.tolist(), frequencies.tolist(), nonzero.tolist()):
+            axes = [axis for axis in range(3) if idx[axis]]
+            orders = tuple(idx[axis] for axis in axes)
+
+            if count == 1:
+                axis = axes[0]
+                modes['axial'].append({
+                    'mode': f'{self.DIMENSION_NAMES[axis].capitalize()} {idx[axis]}',
+                    'frequency_hz': freq,
+                    'dimension': self.DIMENSION_NAMES[axis],
+                    'order': idx[axis]
+                })
+            else:
+                letters = ''.join(self.DIMENSION_LETTERS[axis] for axis in axes)
+                modes['tangential' if count == 2 else 'oblique'].append({
+                    'mode': f"{letters} {','.join(str(o) for o in orders)}",
+                    'frequency_hz': freq,
+                    'dimensions': '-'.join(self.DIMENSION_NAMES[axis] for axis in axes),
+                    'order': orders
+                })
+
+        self._mode_cache.put(key, modes)
+        return modes
+
+    def image_sources(
+        self,
+        dimensions: Tuple[float, float, float],
+        source: Tuple[float, float, float],
+        max_order: int = 1
+    ) -> Dict[str, np.ndarray]:
+        """
+        Generate all image sources up to max_order reflections (Allen-Berkley).
+
+        Returns a dict of arrays:
+            positions: (N, 3) image source coordinates
+            hits: (N, 6) reflection count per surface, ordered as
+                  dashboard, rear, left_door, right_door, floor, ceiling
+            order: (N,) total reflection order
+        """
+        if not 1 <= max_order <= self.MAX_REFLECTION_ORDER:
+            raise ValueError(
+                f"max_order must be between 1 and {self.MAX_REFLECTION_ORDER}"
+            )
+
+        key = (self._geometry_key(dimensions), self._position_key(source), max_order)
+        cached = self._image_cache.get(key)
+        if cached is not None:
+            return cached
+
+        m = np.arange(-max_order, max_order + 1)
+        mm, pp = np.meshgrid(m, np.array([0, 1]), indexing='ij')
+        mm = mm.ravel()
+        pp = pp.ravel()
+        low_hits = np.abs(mm - pp)
+        high_hits = np.abs(mm)
+        axis_order = low_hits + high_hits
+        per_axis = axis_order <= max_order
+        mm, pp = mm[per_axis], pp[per_axis]
+        low_hits, high_hits = low_hits[per_axis], high_hits[per_axis]
+        axis_order = axis_order[per_axis]
+
+        count = len(mm)
+        ix, iy, iz = np.meshgrid(
+            np.arange(count), np.arange(count), np.arange(count), indexing='ij'
+        )
+        ix, iy, iz = ix.ravel(), iy.ravel(), iz.ravel()
+
+        total_order = axis_order[ix] + axis_order[iy] + axis_order[iz]
+        valid = (total_order >= 1) & (total_order <= max_order)
+        ix, iy, iz = ix[valid], iy[valid], iz[valid]
+
+        dims = np.asarray(dimensions, dtype=float)
+        src = np.asarray(source, dtype=float)
+
+        positions = np.empty((len(ix), 3))
+        hits = np.empty((len(ix), 6), dtype=np.int64)
+        for axis, sel in enumerate((ix, iy, iz)):
+            positions[:, axis] = (1 - 2 * pp[sel]) * src[axis] + 2 * mm[sel] * dims[axis]
+            hits[:, 2 * axis] = low_hits[sel]
+            hits[:, 2 * axis + 1] = high_hits[sel]
+
+        result = {
+            'positions': positions,
+            'hits': hits,
+            'order': total_order[valid]
+        }
+        self._image_cache.put(key, result)
+        return result
+
+    def early_reflections(
+        self,
+        dimensions: Tuple[float, float, float],
+        speaker_position: Tuple[float, float, float],
+        listener_position: Tuple[float, float, float],
+        surface_absorption: Dict[str, float],
+        max_order: int = 1,
+        limit: Optional[int] = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Calculate reflection paths from speaker to listener via image sources.
+
+        Args:
+            surface_absorption: Absorption coefficient per surface name
+            max_order: Highest reflection order to include
+            limit: Number of earliest reflections to return (None for all)
+        """
+        key = (
+            self._geometry_key(dimensions),
+            self._position_key(speaker_position),
+            self._position_key(listener_position),
+            tuple(sorted((name, round(a, 4)) for name, a in surface_absorption.items())),
+            max_order,
+            limit
+        )
+        cached = self._reflection_cache.get(key)
+        if cached is not None:
+            return cached
+
+        images = self.image_sources(dimensions, speaker_position, max_order)
+        listener = np.asarray(listener_position, dtype=float)
+        speaker = np.asarray(speaker_position, dtype=float)
+
+        direct_distance = float(np.linalg.norm(speaker - listener))
+        path_lengths = np.linalg.norm(images['positions'] - listener, axis=1)
+
+        surface_order = [name for pair in self.SURFACE_NAMES for name in pair]
+        reflection_coef = np.sqrt(1.0 - np.clip(
+            np.array([surface_absorption.get(name, 0.1) for name in surface_order]),
+            0.0, 0.999
+        ))
+
+        # Spreading loss relative to the direct path plus wall losses per bounce
+        gain = np.prod(reflection_coef ** images['hits'], axis=1)
+        gain *= max(direct_distance, 1e-6) / np.maximum(path_lengths, 1e-6)
+        attenuation_db = 20.0 * np.log10(np.maximum(gain, 1e-12))
+
+        speed_inches_per_ms = self.speed_of_sound / 1000.0
+        delay_ms = (path_lengths - direct_distance) / speed_inches_per_ms
+
+        order = np.lexsort((attenuation_db, delay_ms))
+        if limit is not None:
+            order = order[:limit]
+
+        reflections = []
+        for i in order.tolist():
+            counts = images['hits'][i]
+            surfaces = [
+                name if n == 1 else f'{name}x{n}'
+                for name, n in zip(surface_order, counts.tolist()) if n
+            ]
+            materials = sorted({
+                self.SURFACE_MATERIALS[name]
+                for name, n in zip(surface_order, counts.tolist()) if n
+            })
+            reflections.append({
+                'surface': '+'.join(surfaces),
+                'delay_ms': float(delay_ms[i]),
+                'path_length_inches': float(path_lengths[i]),
+                'material': '+'.join(materials),
+                'attenuation_db': round(float(attenuation_db[i]), 2),
+                'order': int(images['order'][i]),
+                'image_position': [round(float(v), 3) for v in images['positions'][i]]
+            })
+
+        self._reflection_cache.put(key, reflections)
+        return reflections
+
+    def modal_pressure(
+        self,
+        dimensions: Tuple[float, float, float],
+        sources: np.ndarray,
+        receivers: np.ndarray,
+        frequencies: np.ndarray,
+        max_order: int = 8,
+        damping_ratio: float = 0.08
+    ) -> np.ndarray:
+        """
+        Complex modal pressure transfer from every source to every receiver.
+
+        Args:
+            sources: (S, 3) source positions in inches
+            receivers: (R, 3) receiver positions in inches
+            frequencies: (F,) frequencies in Hz
+            damping_ratio: Modal damping (cabins are heavily damped)
+
+        Returns:
+            (S, R, F) complex array, scaled to the lowest non-zero mode.
+        """
+        indices, mode_freqs = self._mode_table(dimensions, max_order)
+        dims = np.asarray(dimensions, dtype=float)
+
+        sources = np.atleast_2d(np.asarray(sources, dtype=float))
+        receivers = np.atleast_2d(np.asarray(receivers, dtype=float))
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+
+        # Include the 0,0,0 (pressure) mode so the response does not vanish below the first mode
+        indices = np.vstack([np.zeros((1, 3), dtype=indices.dtype), indices])
+        mode_freqs = np.concatenate([[0.0], mode_freqs])
+
+        k = np.pi * indices / dims
+        psi_src = np.prod(np.cos(sources[:, None, :] * k[None, :, :]), axis=2)
+        psi_rcv = np.prod(np.cos(receivers[:, None, :] * k[None, :, :]), axis=2)
+
+        w = 2 * np.pi * frequencies
+        wn = 2 * np.pi * mode_freqs
+        denom = (wn[:, None] ** 2 - w[None, :] ** 2) + 2j * damping_ratio * wn[:, None] * w[None, :]
+        # Constant volume-acceleration drive: the zero mode yields the
+        # familiar +12 dB/octave cabin gain below the first axial mode.
+        modal = (wn[1] ** 2) / denom
+
+        # (S, M) x (R, M) x (M, F) -> (S, R, F)
+        return np.einsum('sm,rm,mf->srf', psi_src, psi_rcv, modal, optimize=True)
+
+    def modal_response(
+        self,
+        dimensions: Tuple[float, float, float],
+        source: Tuple[float, float, float],
+        listener: Tuple[float, float, float],
+        start_freq: float = 20.0,
+        end_freq: float = 300.0,
+        points: int = 200,
+        max_order: int = 8
+    ) -> Dict[str, Any]:
+        """Magnitude response in dB at the listener for a log frequency sweep."""
+        key = (
+            'response',
+            self._geometry_key(dimensions),
+            self._position_key(source),
+            self._position_key(listener),
+            start_freq, end_freq, points, max_order
+        )
+        cached = self._mode_cache.get(key)
+        if cached is not None:
+            return cached
+
+        frequencies = np.geomspace(start_freq, end_freq, points)
+        pressure = self.modal_pressure(
+            dimensions, [source], [listener], frequencies, max_order=max_order
+        )[0, 0]
+        magnitude_db = 20.0 * np.log10(np.maximum(np.abs(pressure), 1e-12))
+        magnitude_db -= np.median(magnitude_db)
+
+        result = {
+            'frequencies_hz': np.round(frequencies, 2).tolist(),
+            'magnitude_db': np.round(magnitude_db, 2).tolist(),
+            'peak_frequency_hz': round(float(frequencies[np.argmax(magnitude_db)]), 2),
+            'null_frequency_hz': round(float(frequencies[np.argmin(magnitude_db)]), 2)
+        }
+        self._mode_cache.put(key, result)
+        return result
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Report cache occupancy and hit counts."""
+        caches = {
+            'modes': self._mode_cache,
+            'mode_tables': self._mode_table_cache,
+            'image_sources': self._image_cache,
+            'reflections': self._reflection_cache
+        }
+        return {
+            name: {'entries': len(cache), 'hits': cache.hits, 'misses': cache.misses}
+            for name, cache in caches.items()
+        }
+
+    def clear_cache(self):
+        for cache in (self._mode_cache, self._mode_table_cache,
+                      self._image_cache, self._reflection_cache):
+            cache.clear()
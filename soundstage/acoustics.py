@@ -1,5 +1,6 @@
-import math
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
+
+from services.soundstage.acoustic_engine import AcousticModelEngine
 
 
 class CabinAcoustics:
@@ -76,78 +77,34 @@ class CabinAcoustics:
     }
     
     SPEED_OF_SOUND_INCHES_PER_MS = 13.5
+    SPEED_OF_SOUND_INCHES_PER_SEC = 13503.9
     
-    def __init__(self):
+    def __init__(self, engine: Optional[AcousticModelEngine] = None):
         self.dimensions = self.SONIC_CABIN_DIMENSIONS.copy()
         self.materials = self.MATERIAL_ABSORPTION_COEFFICIENTS.copy()
         self.distribution = self.SONIC_MATERIAL_DISTRIBUTION.copy()
+        self.engine = engine or AcousticModelEngine(
+            speed_of_sound=self.SPEED_OF_SOUND_INCHES_PER_SEC
+        )
+    
+    def _geometry(self) -> Tuple[float, float, float]:
+        return (
+            self.dimensions['length_inches'],
+            self.dimensions['width_inches'],
+            self.dimensions['height_inches']
+        )
     
-    def calculate_room_modes(self) -> Dict[str, List[Dict[str, Any]]]:
+    def calculate_room_modes(
+        self,
+        max_order: int = 5,
+        max_frequency: Optional[float] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Calculate standing wave frequencies (room modes) for the cabin.
-        Uses length, width, and height to find modal frequencies.
+        Generates axial, tangential and oblique modes up to max_order per
+        dimension, keeping those at or below max_frequency (None keeps all).
         """
-        length = self.dimensions['length_inches']
-        width = self.dimensions['width_inches']
-        height = self.dimensions['height_inches']
-        
-        speed_of_sound = 13503.9
-        
-        modes = {
-            'axial': [],
-            'tangential': [],
-            'oblique': []
-        }
-        
-        for n in range(1, 6):
-            modes['axial'].append({
-                'mode': f'Length {n}',
-                'frequency_hz': (n * speed_of_sound) / (2 * length),
-                'dimension': 'length',
-                'order': n
-            })
-            modes['axial'].append({
-                'mode': f'Width {n}',
-                'frequency_hz': (n * speed_of_sound) / (2 * width),
-                'dimension': 'width',
-                'order': n
-            })
-            modes['axial'].append({
-                'mode': f'Height {n}',
-                'frequency_hz': (n * speed_of_sound) / (2 * height),
-                'dimension': 'height',
-                'order': n
-            })
-        
-        for nx in range(1, 4):
-            for ny in range(1, 4):
-                freq = speed_of_sound * math.sqrt((nx/length)**2 + (ny/width)**2) / 2
-                if freq < 500:
-                    modes['tangential'].append({
-                        'mode': f'LW {nx},{ny}',
-                        'frequency_hz': freq,
-                        'dimensions': 'length-width',
-                        'order': (nx, ny)
-                    })
-        
-        for nx in range(1, 3):
-            for ny in range(1, 3):
-                for nz in range(1, 3):
-                    freq = speed_of_sound * math.sqrt(
-                        (nx/length)**2 + (ny/width)**2 + (nz/height)**2
-                    ) / 2
-                    if freq < 500:
-                        modes['oblique'].append({
-                            'mode': f'LWH {nx},{ny},{nz}',
-                            'frequency_hz': freq,
-                            'dimensions': 'length-width-height',
-                            'order': (nx, ny, nz)
-                        })
-        
-        for mode_type in modes:
-            modes[mode_type] = sorted(modes[mode_type], key=lambda x: x['frequency_hz'])
-        
-        return modes
+        return self.engine.room_modes(self._geometry(), max_order, max_frequency)
     
     def calculate_rt60(self, frequency_band: str = '1000Hz') -> float:
         """
@@ -234,59 +191,48 @@ class CabinAcoustics:
     def calculate_early_reflections(
         self,
         speaker_position: Tuple[float, float, float],
-        listener_position: Tuple[float, float, float]
+        listener_position: Tuple[float, float, float],
+        max_order: int = 1,
+        limit: Optional[int] = 5,
+        frequency_band: str = '1000Hz'
     ) -> List[Dict[str, Any]]:
         """
         Calculate early reflection paths from speaker to listener.
-        Returns reflection points and delays.
+        Returns reflection points and delays, up to max_order bounces.
         """
-        reflections = []
-        
-        surfaces = [
-            {'name': 'floor', 'axis': 2, 'value': 0},
-            {'name': 'ceiling', 'axis': 2, 'value': self.dimensions['height_inches']},
-            {'name': 'left_door', 'axis': 1, 'value': 0},
-            {'name': 'right_door', 'axis': 1, 'value': self.dimensions['width_inches']},
-            {'name': 'dashboard', 'axis': 0, 'value': 0},
-            {'name': 'rear', 'axis': 0, 'value': self.dimensions['length_inches']}
-        ]
+        surface_absorption = {
+            surface: self.materials[material].get(frequency_band, 0.1)
+            for surface, material in self.engine.SURFACE_MATERIALS.items()
+        }
         
-        direct_distance = math.sqrt(
-            (speaker_position[0] - listener_position[0])**2 +
-            (speaker_position[1] - listener_position[1])**2 +
-            (speaker_position[2] - listener_position[2])**2
+        return self.engine.early_reflections(
+            self._geometry(),
+            speaker_position,
+            listener_position,
+            surface_absorption,
+            max_order=max_order,
+            limit=limit
+        )
+    
+    def calculate_modal_response(
+        self,
+        source_position: Tuple[float, float, float],
+        listener_position: Tuple[float, float, float],
+        start_freq: float = 20.0,
+        end_freq: float = 300.0,
+        points: int = 200,
+        max_order: int = 8
+    ) -> Dict[str, Any]:
+        """Predict the modal bass response at the listener for a source position."""
+        return self.engine.modal_response(
+            self._geometry(),
+            source_position,
+            listener_position,
+            start_freq=start_freq,
+            end_freq=end_freq,
+            points=points,
+            max_order=max_order
         )
-        
-        for surface in surfaces:
-            axis = surface['axis']
-            surface_val = surface['value']
-            
-            mirror_speaker = list(speaker_position)
-            mirror_speaker[axis] = 2 * surface_val - speaker_position[axis]
-            
-            reflection_distance = math.sqrt(
-                (mirror_speaker[0] - listener_position[0])**2 +
-                (mirror_speaker[1] - listener_position[1])**2 +
-                (mirror_speaker[2] - listener_position[2])**2
-            )
-            
-            delay_ms = (reflection_distance - direct_distance) / self.SPEED_OF_SOUND_INCHES_PER_MS
-            
-            material = 'floor' if 'floor' in surface['name'] else \
-                      'ceiling' if 'ceiling' in surface['name'] else \
-                      'glass' if 'door' in surface['name'] else 'plastic_trim'
-            
-            reflections.append({
-                'surface': surface['name'],
-                'delay_ms': delay_ms,
-                'path_length_inches': reflection_distance,
-                'material': material,
-                'attenuation_db': -2.0
-            })
-        
-        reflections.sort(key=lambda x: x['delay_ms'])
-        
-        return reflections[:5]
     
     def get_cabin_info(self) -> Dict[str, Any]:
         """Get complete cabin acoustic information."""
@@ -1,96 +1,300 @@
 import os
-from typing import Dict, List, Any, Optional
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 
-class AITuner:
-    """
-    AI-powered soundstage tuning using Anthropic Claude.
-    Analyzes current setup and provides intelligent recommendations.
-    """
+class ClaudeBackend:
+    """Remote analysis backend using Anthropic Claude."""
     
-    def __init__(self):
-        self.has_api_key = False
+    def __init__(self, model: str = 'claude-sonnet-4-20250514'):
+        self.model = model
         self.client = None
-        self.model = 'claude-sonnet-4-20250514'
         
-        self._init_claude()
-    
-    def _init_claude(self):
-        """Initialize Claude client if API key is available."""
         try:
             import anthropic
             api_key = os.getenv('ANTHROPIC_API_KEY')
             
             if api_key:
                 self.client = anthropic.Anthropic(api_key=api_key)
-                self.has_api_key = True
         except ImportError:
             pass
         except Exception:
             pass
     
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+    
+    def complete(self, prompt: str) -> Tuple[str, int]:
+        """Send prompt and return (response text, tokens used)."""
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=2000,
+            messages=[{
+                'role': 'user',
+                'content': prompt
+            }]
+        )
+        
+        tokens_used = message.usage.input_tokens + message.usage.output_tokens
+        return message.content[0].text, tokens_used
+    
+
+class LocalStandInBackend:
+    """
+    Offline stand-in for the remote model.
+    Returns deterministic, well-formed analysis text so tests and offline
+    sessions exercise the same cache and coalescing paths as the real backend.
+    """
+    
+    def __init__(self, latency_seconds: float = 0.0, model: str = 'local-stand-in'):
+        self.model = model
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def available(self) -> bool:
+        return True
+    
+    def complete(self, prompt: str) -> Tuple[str, int]:
+        with self._lock:
+            self.calls += 1
+        
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        text = f"""LOCAL ANALYSIS {digest}
+
+1. Soundstage geometry
+   - Speaker layout parsed from request
+
+2. Time alignment
+   - Align all speakers to the furthest driver
+
+3. Balance / fader
+   - Adjust balance toward the off-axis side in 0.5 dB steps
+
+4. EQ corrections
+   - Cut axial room modes below 200 Hz by 3 dB (Q=4.0)
+
+5. Center image
+   - Verify with mono pink noise
+
+6. Priority ranking
+   - Time alignment, balance, EQ"""
+        return text, len(prompt.split()) + len(text.split())
+
+
+class AITuner:
+    """
+    AI-powered soundstage tuning using Anthropic Claude.
+    Analyzes current setup and provides intelligent recommendations.
+    
+    Results are cached persistently by a canonical hash of the normalized
+    setup, concurrent requests for the same setup share one remote call,
+    and the rule-based tuner answers immediately while the model runs.
+    """
+    
+    CACHE_VERSION = 1
+    
+    def __init__(self, cache_db=None, backend=None, max_workers: int = 2):
+        if backend is None:
+            if os.getenv('SOUNDSTAGE_AI_BACKEND', '').lower() == 'local':
+                backend = LocalStandInBackend()
+            else:
+                backend = ClaudeBackend()
+        
+        self.backend = backend
+        self.client = getattr(backend, 'client', None)
+        self.has_api_key = backend.available
+        self.model = backend.model
+        self.cache_db = cache_db
+        
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai_tuner')
+    
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        """Round floats and sort mappings so equivalent setups hash identically."""
+        if isinstance(value, dict):
+            items = sorted(value.items(), key=lambda kv: str(kv[0]))
+            return {str(k): AITuner._normalize(v) for k, v in items}
+        if isinstance(value, (list, tuple)):
+            return [AITuner._normalize(v) for v in value]
+        if isinstance(value, float):
+            normalized = round(value, 2)
+            return 0.0 if normalized == 0 else normalized
+        return value
+    
+    def make_cache_key(self, kind: str, **inputs: Any) -> str:
+        """Canonical hash of the normalized request inputs."""
+        payload = json.dumps(
+            {
+                'version': self.CACHE_VERSION,
+                'kind': kind,
+                'model': self.model,
+                'inputs': self._normalize(inputs)
+            },
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _cache_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        if self.cache_db is None:
+            return None
+        entry = self.cache_db.get_ai_cache(cache_key)
+        return entry['result'] if entry else None
+    
+    def _cache_put(self, cache_key: str, kind: str, result: Dict[str, Any]):
+        if self.cache_db is not None:
+            self.cache_db.save_ai_cache(cache_key, kind, result.get('source', 'unknown'), result)
+    
+    def _coalesced(self, cache_key: str, kind: str, compute, inline: bool = False) -> Future:
+        """
+        Return the in-flight future for cache_key, starting compute() if none exists.
+        Cheap local work runs inline in the first caller's thread; remote
+        calls run on the background executor.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            if future is not None:
+                return future
+            
+            future = Future()
+            self._inflight[cache_key] = future
+        
+        def run():
+            try:
+                result = compute()
+            except Exception as e:
+                with self._inflight_lock:
+                    self._inflight.pop(cache_key, None)
+                future.set_exception(e)
+                return
+            
+            # A failed cache write must not fail a result that was computed
+            try:
+                self._cache_put(cache_key, kind, result)
+            except Exception as e:
+                print(f"AI tuner cache write error: {e}")
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+            future.set_result(result)
+        
+        if inline:
+            run()
+        else:
+            self._executor.submit(run)
+        return future
+    
+    def get_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Look up a finished result (e.g. a remote analysis started earlier)."""
+        result = self._cache_get(cache_key)
+        if result is not None:
+            return {**result, 'cached': True, 'cache_key': cache_key}
+        
+        with self._inflight_lock:
+            pending = cache_key in self._inflight
+        return {'pending_ai': True, 'cache_key': cache_key} if pending else None
+    
     def analyze_setup(
         self,
         speaker_positions: Dict[str, Any],
         acoustic_data: Dict[str, Any],
         listening_position: str = 'driver',
-        current_settings: Optional[Dict[str, Any]] = None
+        current_settings: Optional[Dict[str, Any]] = None,
+        wait_for_ai: bool = False,
+        timeout: float = 60.0
     ) -> Dict[str, Any]:
         """
         Analyze current soundstage setup and provide recommendations.
         Works with or without AI API key.
+        
+        A cached result is returned when the same setup was analyzed
+        before. Otherwise the rule-based analysis is returned immediately
+        and the model runs in the background (or is awaited when
+        wait_for_ai is set); its result lands in the cache.
         """
-        if not self.has_api_key or not self.client:
-            return self._fallback_analysis(
-                speaker_positions,
-                acoustic_data,
-                listening_position,
-                current_settings
-            )
+        cache_key = self.make_cache_key(
+            'analyze',
+            speaker_positions=speaker_positions,
+            acoustic_data=self._acoustic_fingerprint(acoustic_data),
+            listening_position=listening_position,
+            current_settings=current_settings
+        )
+        
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True, 'cache_key': cache_key}
+        
+        local = self._fallback_analysis(
+            speaker_positions,
+            acoustic_data,
+            listening_position,
+            current_settings
+        )
+        
+        if not self.has_api_key:
+            return {**local, 'cached': False, 'cache_key': cache_key}
+        
+        prompt = self._build_analysis_prompt(
+            speaker_positions,
+            acoustic_data,
+            listening_position,
+            current_settings
+        )
+        future = self._coalesced(cache_key, 'analyze', lambda: self._remote_analysis(prompt))
+        
+        if wait_for_ai:
+            try:
+                return {**future.result(timeout=timeout), 'cached': False, 'cache_key': cache_key}
+            except Exception as e:
+                return {
+                    **local,
+                    'source': 'fallback',
+                    'error': str(e),
+                    'cached': False,
+                    'cache_key': cache_key
+                }
+        
+        return {**local, 'cached': False, 'pending_ai': True, 'cache_key': cache_key}
+    
+    def _remote_analysis(self, prompt: str) -> Dict[str, Any]:
+        """Run the model on a prepared prompt."""
+        analysis_text, tokens_used = self.backend.complete(prompt)
+        recommendations = self._parse_ai_response(analysis_text)
         
-        try:
-            prompt = self._build_analysis_prompt(
-                speaker_positions,
-                acoustic_data,
-                listening_position,
-                current_settings
-            )
-            
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt
-                }]
-            )
-            
-            analysis_text = message.content[0].text
-            tokens_used = message.usage.input_tokens + message.usage.output_tokens
-            
-            recommendations = self._parse_ai_response(analysis_text)
-            
-            return {
-                'source': 'ai',
-                'model': self.model,
-                'analysis': analysis_text,
-                'recommendations': recommendations,
-                'tokens_used': tokens_used,
-                'confidence_score': 0.85
-            }
-            
-        except Exception as e:
-            return {
-                'source': 'fallback',
-                'error': str(e),
-                **self._fallback_analysis(
-                    speaker_positions,
-                    acoustic_data,
-                    listening_position,
-                    current_settings
-                )
-            }
+        return {
+            'source': 'ai',
+            'model': self.model,
+            'analysis': analysis_text,
+            'recommendations': recommendations,
+            'tokens_used': tokens_used,
+            'confidence_score': 0.85
+        }
+    
+    @staticmethod
+    def _acoustic_fingerprint(acoustic_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Subset of the cabin data that influences the analysis."""
+        return {
+            'dimensions': acoustic_data.get('dimensions', {}),
+            'axial_modes': [
+                m.get('frequency_hz')
+                for m in acoustic_data.get('room_modes', {}).get('axial', [])[:5]
+            ],
+            'absorption_spectrum': acoustic_data.get('absorption_spectrum', {}),
+            'recommended_corrections': acoustic_data.get('recommended_corrections', [])
+        }
     
     def _build_analysis_prompt(
         self,
@@ -282,6 +486,33 @@ PRIORITY RANKING:
         Generate one-click auto-tune settings.
         Applies best practices for optimal soundstage.
         """
+        cache_key = self.make_cache_key(
+            'auto_tune',
+            speaker_positions=speaker_positions,
+            acoustic_data=self._acoustic_fingerprint(acoustic_data),
+            listening_position=listening_position
+        )
+        
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True, 'cache_key': cache_key}
+        
+        result = self._coalesced(
+            cache_key,
+            'auto_tune',
+            lambda: self._compute_auto_tune(speaker_positions, acoustic_data, listening_position),
+            inline=True
+        ).result()
+        
+        return {**result, 'cached': False, 'cache_key': cache_key}
+    
+    def _compute_auto_tune(
+        self,
+        speaker_positions: Dict[str, Any],
+        acoustic_data: Dict[str, Any],
+        listening_position: str
+    ) -> Dict[str, Any]:
+        """Deterministic auto-tune from geometry and cabin data."""
         auto_settings = {
             'time_alignment': {},
             'balance_db': 0.0,
@@ -308,6 +539,7 @@ PRIORITY RANKING:
         auto_settings['eq_bands'] = eq_corrections[:8]
         
         return {
+            'source': 'rule_based',
             'auto_tune_settings': auto_settings,
             'description': 'Optimized for ' + listening_position,
             'estimated_improvement': '60-70% better soundstage quality',
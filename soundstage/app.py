@@ -31,7 +31,7 @@ db = SoundStageDatabase()
 acoustics = CabinAcoustics()
 positioning = SpeakerPositioning()
 measurement = MeasurementTools()
-ai_tuner = AITuner()
+ai_tuner = AITuner(cache_db=db)
 
 DSP_SERVICE_URL = os.getenv('DSP_SERVICE_URL', 'http://localhost:8100')
 
@@ -226,11 +226,18 @@ def api_acoustics_cabin_info():
 def api_acoustics_room_modes():
     """Calculate room modes."""
     try:
-        modes = acoustics.calculate_room_modes()
+        max_order = int(request.args.get('max_order', 5))
+        # Optional cap; without it every mode up to max_order is returned
+        max_frequency = request.args.get('max_frequency', '')
+        max_frequency = None if max_frequency in ('', 'none') else float(max_frequency)
+        
+        modes = acoustics.calculate_room_modes(max_order, max_frequency)
         
         return jsonify({
             'ok': True,
             'room_modes': modes,
+            'max_order': max_order,
+            'max_frequency_hz': max_frequency,
             'note': 'These frequencies may cause acoustic resonances'
         })
     except Exception as e:
@@ -282,11 +289,59 @@ def api_acoustics_early_reflections():
         speaker_pos = tuple(data.get('speaker_position', [12, 8, 24]))
         listener_pos = tuple(data.get('listener_position', [32, 12, 20]))
         
-        reflections = acoustics.calculate_early_reflections(speaker_pos, listener_pos)
+        max_order = int(data.get('max_order', 1))
+        limit = data.get('limit', 5)
+        frequency_band = data.get('frequency_band', '1000Hz')
+        
+        reflections = acoustics.calculate_early_reflections(
+            speaker_pos,
+            listener_pos,
+            max_order=max_order,
+            limit=None if limit is None else int(limit),
+            frequency_band=frequency_band
+        )
+        
+        return jsonify({
+            'ok': True,
+            'early_reflections': reflections,
+            'max_order': max_order
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/acoustics/modal-response', methods=['POST'])
+def api_acoustics_modal_response():
+    """Predict modal bass response at the listener."""
+    try:
+        data = request.json or {}
+        source_pos = tuple(data.get('source_position', [60, 27.5, 10]))
+        listener_pos = tuple(data.get('listener_position', [32, 12, 20]))
+        
+        response = acoustics.calculate_modal_response(
+            source_pos,
+            listener_pos,
+            start_freq=float(data.get('start_freq', 20)),
+            end_freq=float(data.get('end_freq', 300)),
+            points=int(data.get('points', 200)),
+            max_order=int(data.get('max_order', 8))
+        )
         
         return jsonify({
             'ok': True,
-            'early_reflections': reflections
+            'modal_response': response
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/acoustics/cache-stats')
+def api_acoustics_cache_stats():
+    """Get acoustic model cache statistics."""
+    try:
+        return jsonify({
+            'ok': True,
+            'cache': acoustics.engine.get_cache_stats()
         })
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -415,11 +470,12 @@ def api_ai_analyze():
             speaker_pos,
             acoustic_data,
             listening_pos,
-            current_settings
+            current_settings,
+            wait_for_ai=bool(data.get('wait_for_ai', False))
         )
         
-        tuning_id = f"tune_{int(datetime.now().timestamp())}"
-        if 'recommendations' in analysis:
+        tuning_id = f"tune_{int(datetime.now().timestamp())}_{analysis['cache_key'][:8]}"
+        if 'recommendations' in analysis and not analysis.get('cached'):
             db.save_ai_tuning(
                 tuning_id=tuning_id,
                 analysis=analysis.get('analysis', ''),
@@ -458,6 +514,36 @@ def api_ai_auto_tune():
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
+@app.route('/api/ai/result/<cache_key>')
+def api_ai_result(cache_key):
+    """Fetch a cached or pending AI analysis by cache key."""
+    try:
+        result = ai_tuner.get_cached_result(cache_key)
+        if result is None:
+            return jsonify({'ok': False, 'error': 'Unknown cache key'}), 404
+        
+        return jsonify({
+            'ok': True,
+            **result
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
+@app.route('/api/ai/cache', methods=['DELETE'])
+def api_ai_cache_clear():
+    """Clear cached AI results."""
+    try:
+        removed = db.clear_ai_cache(request.args.get('kind'))
+        
+        return jsonify({
+            'ok': True,
+            'removed': removed
+        })
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
 @app.route('/api/ai/tips')
 def api_ai_tips():
     """Get tuning tips."""
@@ -93,6 +93,16 @@ class SoundStageDatabase:
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 );
                 
+                CREATE TABLE IF NOT EXISTS soundstage_ai_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    hit_count INTEGER DEFAULT 0,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_hit_at DATETIME
+                );
+                
                 CREATE INDEX IF NOT EXISTS idx_soundstage_presets_position 
                     ON soundstage_presets(listening_position);
                 CREATE INDEX IF NOT EXISTS idx_soundstage_measurements_type 
@@ -305,6 +315,49 @@ class SoundStageDatabase:
         )
         return [dict(row) for row in cursor.fetchall()]
     
+    def get_ai_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
+        cursor = conn.execute(
+            "SELECT * FROM soundstage_ai_cache WHERE cache_key = ?",
+            (cache_key,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        conn.execute(
+            """
+            UPDATE soundstage_ai_cache
+            SET hit_count = hit_count + 1, last_hit_at = ?
+            WHERE cache_key = ?
+            """,
+            (datetime.utcnow().isoformat(), cache_key)
+        )
+        
+        entry = dict(row)
+        entry['result'] = json.loads(entry['result'])
+        return entry
+    
+    def save_ai_cache(self, cache_key: str, kind: str, source: str, result: Dict):
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO soundstage_ai_cache (
+                    cache_key, kind, source, result, created_at
+                )
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (cache_key, kind, source, json.dumps(result), datetime.utcnow().isoformat())
+            )
+    
+    def clear_ai_cache(self, kind: Optional[str] = None) -> int:
+        with self._transaction() as conn:
+            if kind:
+                cursor = conn.execute("DELETE FROM soundstage_ai_cache WHERE kind = ?", (kind,))
+            else:
+                cursor = conn.execute("DELETE FROM soundstage_ai_cache")
+            return cursor.rowcount
+    
     def get_stats(self) -> Dict[str, Any]:
         conn = self._get_connection()
         
@@ -319,6 +372,9 @@ class SoundStageDatabase:
         cursor = conn.execute("SELECT COUNT(*) as count FROM soundstage_ai_tunings")
         stats['total_ai_tunings'] = cursor.fetchone()['count']
         
+        cursor = conn.execute("SELECT COUNT(*) as count FROM soundstage_ai_cache")
+        stats['cached_ai_results'] = cursor.fetchone()['count']
+        
         return stats
     
     def close(self):
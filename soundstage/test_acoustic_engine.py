@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized acoustic model engine
+"""
+
+import numpy as np
+
+from services.soundstage.acoustic_engine import AcousticModelEngine, _LRUCache
+
+CABIN = (110.0, 66.0, 46.0)
+
+
+def test_cache_returns_copies():
+    cache = _LRUCache(4)
+    value = {'modes': [1, 2, 3]}
+    cache.put('key', value)
+
+    value['modes'].append(4)
+    first = cache.get('key')
+    first['modes'].clear()
+
+    assert cache.get('key') == {'modes': [1, 2, 3]}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = _LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert len(cache) == 2
+
+
+def test_mutating_room_modes_does_not_corrupt_cache():
+    engine = AcousticModelEngine()
+    modes = engine.room_modes(CABIN)
+    expected = engine.room_modes(CABIN)
+
+    for group in modes.values():
+        group.clear()
+
+    assert engine.room_modes(CABIN) == expected
+    assert engine.get_cache_stats()
+
+
+def test_modal_pressure_is_reciprocal():
+    engine = AcousticModelEngine()
+    a = np.array([[10.0, 5.0, 5.0]])
+    b = np.array([[80.0, 40.0, 30.0]])
+    frequencies = np.array([40.0, 63.0, 100.0])
+
+    forward = engine.modal_pressure(CABIN, a, b, frequencies)
+    backward = engine.modal_pressure(CABIN, b, a, frequencies)
+
+    np.testing.assert_allclose(forward, backward)
+
+
+def test_room_modes_uncapped_by_default():
+    engine = AcousticModelEngine()
+    axial = engine.room_modes(CABIN)['axial']
+    capped = engine.room_modes(CABIN, max_frequency=500.0)['axial']
+
+    assert len(axial) == 15
+    assert max(mode['frequency_hz'] for mode in axial) > 500
+    assert all(mode['frequency_hz'] <= 500 for mode in capped)
+    assert len(capped) < len(axial)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for AI tuner caching and request coalescing
+"""
+
+import threading
+
+from services.soundstage.ai_tuner import AITuner, LocalStandInBackend
+from services.soundstage.database import SoundStageDatabase
+
+SPEAKERS = {'front_left': {'x': 10.0, 'y': 5.0, 'z': 30.0},
+            'front_right': {'x': 10.0, 'y': 50.0, 'z': 30.0}}
+ACOUSTICS = {'dimensions': {'length': 68.0, 'width': 55.0, 'height': 38.0}}
+
+
+class FailingCache:
+    """Cache whose writes always fail."""
+
+    def get_ai_cache(self, cache_key):
+        return None
+
+    def save_ai_cache(self, cache_key, kind, source, result):
+        raise OSError('disk full')
+
+
+def test_concurrent_requests_share_one_backend_call(tmp_path):
+    backend = LocalStandInBackend(latency_seconds=0.2)
+    tuner = AITuner(cache_db=SoundStageDatabase(tmp_path / 'cache.db'), backend=backend)
+
+    results = []
+    def request():
+        results.append(tuner.analyze_setup(SPEAKERS, ACOUSTICS, wait_for_ai=True, timeout=5))
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert all(r['source'] == 'ai' for r in results)
+    assert len({r['cache_key'] for r in results}) == 1
+
+
+def test_finished_result_is_served_from_cache(tmp_path):
+    backend = LocalStandInBackend()
+    tuner = AITuner(cache_db=SoundStageDatabase(tmp_path / 'cache.db'), backend=backend)
+
+    first = tuner.analyze_setup(SPEAKERS, ACOUSTICS, wait_for_ai=True)
+    second = tuner.analyze_setup(SPEAKERS, ACOUSTICS, wait_for_ai=True)
+
+    assert not first['cached']
+    assert second['cached']
+    assert second['analysis'] == first['analysis']
+    assert backend.calls == 1
+
+
+def test_equivalent_setups_hash_identically():
+    tuner = AITuner(backend=LocalStandInBackend())
+    rounded = {'front_left': {'z': 30.0, 'y': 5.0, 'x': 10.001},
+               'front_right': {'x': 10.0, 'y': 50.0, 'z': 30.0}}
+
+    assert tuner.make_cache_key('analyze', speakers=SPEAKERS) == \
+        tuner.make_cache_key('analyze', speakers=rounded)
+
+
+def test_cache_write_failure_does_not_fail_result(capsys):
+    tuner = AITuner(cache_db=FailingCache(), backend=LocalStandInBackend())
+
+    result = tuner.analyze_setup(SPEAKERS, ACOUSTICS, wait_for_ai=True)
+
+    assert result['source'] == 'ai'
+    assert 'error' not in result
+    assert 'cache write error' in capsys.readouterr().out
+    assert tuner.get_cached_result(result['cache_key']) is None